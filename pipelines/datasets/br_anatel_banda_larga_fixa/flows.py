@@ -9,7 +9,7 @@ from prefect.run_configs import KubernetesRun
 from prefect.storage import GCS
 from prefect.tasks.prefect import create_flow_run, wait_for_flow_run
 from pipelines.constants import constants
-from pipelines.utils.tasks import update_django_metadata
+from pipelines.utils.tasks import update_django_metadata_batch
 from pipelines.utils.constants import constants as utils_constants
 from pipelines.utils.decorators import Flow
 from pipelines.utils.execute_dbt_model.constants import constants as dump_db_constants
@@ -63,6 +63,10 @@ with Flow(
 
     update_metadata = Parameter("update_metadata", default=True, required=False)
 
+    # ! materializações das tabelas "_atualizado", cuja cobertura temporal é
+    # ! atualizada de uma vez ao final do flow
+    waits_for_materialization_atualizado = []
+
     rename_flow_run = rename_current_flow_run_dataset_table(
         prefix="Dump: ", dataset_id=dataset_id, table_id=table_id[0], wait=table_id[0]
     )
@@ -140,18 +144,7 @@ with Flow(
         wait_for_materialization.retry_delay = timedelta(
             seconds=dump_db_constants.WAIT_FOR_MATERIALIZATION_RETRY_INTERVAL.value
         )
-
-        with case(update_metadata, True):
-            date = get_today_date_atualizado()  # task que retorna a data atual
-            update_django_metadata(
-                dataset_id,
-                table_id[0] + "_atualizado",
-                metadata_type="DateTimeRange",
-                bq_last_update=False,
-                api_mode="prod",
-                date_format="yy-mm",
-                _last_date=date,
-            )
+        waits_for_materialization_atualizado.append(wait_for_materialization)
 
     # ! BRASIL
     filepath_brasil = treatment_br(upstream_tasks=[filepath_microdados])
@@ -221,18 +214,7 @@ with Flow(
         wait_for_materialization.retry_delay = timedelta(
             seconds=dump_db_constants.WAIT_FOR_MATERIALIZATION_RETRY_INTERVAL.value
         )
-
-        with case(update_metadata, True):
-            date = get_today_date_atualizado()  # task que retorna a data atual
-            update_django_metadata(
-                dataset_id,
-                table_id[1] + "_atualizado",
-                metadata_type="DateTimeRange",
-                bq_last_update=False,
-                api_mode="prod",
-                date_format="yy-mm",
-                _last_date=date,
-            )
+        waits_for_materialization_atualizado.append(wait_for_materialization)
 
     # ! UF
 
@@ -304,18 +286,7 @@ with Flow(
         wait_for_materialization.retry_delay = timedelta(
             seconds=dump_db_constants.WAIT_FOR_MATERIALIZATION_RETRY_INTERVAL.value
         )
-
-        with case(update_metadata, True):
-            date = get_today_date_atualizado()  # task que retorna a data atual
-            update_django_metadata(
-                dataset_id,
-                table_id[2] + "_atualizado",
-                metadata_type="DateTimeRange",
-                bq_last_update=False,
-                api_mode="prod",
-                date_format="yy-mm",
-                _last_date=date,
-            )
+        waits_for_materialization_atualizado.append(wait_for_materialization)
 
     # ! MUNICIPIO
     filepath_municipio = treatment_municipio(upstream_tasks=[filepath_microdados])
@@ -387,17 +358,20 @@ with Flow(
         wait_for_materialization.retry_delay = timedelta(
             seconds=dump_db_constants.WAIT_FOR_MATERIALIZATION_RETRY_INTERVAL.value
         )
+        waits_for_materialization_atualizado.append(wait_for_materialization)
 
+    # ! atualiza a cobertura temporal de todas as tabelas "_atualizado" de uma vez
+    with case(materialize_after_dump, True):
         with case(update_metadata, True):
             date = get_today_date_atualizado()  # task que retorna a data atual
-            update_django_metadata(
-                dataset_id,
-                table_id[3] + "_atualizado",
-                metadata_type="DateTimeRange",
-                bq_last_update=False,
+            update_django_metadata_batch(
+                tables=[
+                    {"dataset_id": dataset_id, "table_id": table_id[i] + "_atualizado"}
+                    for i in range(4)
+                ],
                 api_mode="prod",
-                date_format="yy-mm",
                 _last_date=date,
+                upstream_tasks=waits_for_materialization_atualizado,
             )
 
 br_anatel_banda_larga.storage = GCS(constants.GCS_FLOWS_BUCKET.value)
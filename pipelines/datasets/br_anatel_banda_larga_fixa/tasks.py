@@ -21,9 +21,8 @@ from pipelines.utils.utils import (
 )
 from pipelines.datasets.br_anatel_banda_larga_fixa.utils import (
     check_and_create_column,
-    download_and_unzip,
-    to_partitions_microdados,
 )
+from pipelines.utils.download import open_archive
 from pipelines.constants import constants
 
 
@@ -33,16 +32,15 @@ from pipelines.constants import constants
 )
 def treatment(ano: int):
     log("Iniciando o tratamento do arquivo microdados da Anatel")
-    download_and_unzip(
-        url=anatel_constants.URL.value, path=anatel_constants.INPUT_PATH.value
-    )
+    with open_archive(anatel_constants.URL.value) as zipfile:
+        # ! Apenas a tabela de densidade, lida pelas tasks seguintes, é extraída
+        zipfile.extract(
+            "Densidade_Banda_Larga_Fixa.csv", path=anatel_constants.INPUT_PATH.value
+        )
 
-    # ! Lendo o arquivo csv
-    df = pd.read_csv(
-        f"{anatel_constants.INPUT_PATH.value}Acessos_Banda_Larga_Fixa_{ano}.csv",
-        sep=";",
-        encoding="utf-8",
-    )
+        # ! Lendo o arquivo csv direto do zip
+        with zipfile.open(f"Acessos_Banda_Larga_Fixa_{ano}.csv") as member:
+            df = pd.read_csv(member, sep=";", encoding="utf-8")
 
     # ! Fazendo referencia a função criada anteriormente para verificar colunas
     df = check_and_create_column(df, "Tipo de Produto")
@@ -124,7 +122,7 @@ def treatment(ano: int):
     )
     log("Salvando o arquivo microdados da Anatel")
     # ! Fazendo referencia a função criada anteriormente para particionar o arquivo o arquivo
-    to_partitions_microdados(
+    to_partitions(
         df,
         partition_columns=["ano", "mes", "sigla_uf"],
         savepath=anatel_constants.OUTPUT_PATH_MICRODADOS.value,
@@ -239,7 +237,7 @@ def treatment_municipio():
     log("Salvando o arquivo densidade municipio da Anatel")
     # ! Fazendo referencia a função criada anteriormente para particionar o arquivo o arquivo
 
-    to_partitions_microdados(
+    to_partitions(
         df_municipio,
         partition_columns=["ano"],
         savepath=anatel_constants.OUTPUT_PATH_MUNICIPIO.value,
@@ -59,3 +59,6 @@ class constants(Enum):  # pylint: disable=c0103
     OUTPUT_PATH_UF = "/tmp/data/UF/output/"
 
     OUTPUT_PATH_MUNICIPIO = "/tmp/data/MUNICIPIO/output/"
+
+    # Linhas lidas por bloco do arquivo de microdados
+    CHUNKSIZE = 500_000
@@ -10,7 +10,7 @@ from prefect import Parameter, case
 from prefect.tasks.prefect import create_flow_run, wait_for_flow_run
 
 from pipelines.utils.execute_dbt_model.constants import constants as dump_db_constants
-from pipelines.utils.tasks import update_django_metadata
+from pipelines.utils.tasks import update_django_metadata_batch
 from pipelines.utils.constants import constants as utils_constants
 from pipelines.constants import constants
 from pipelines.datasets.br_anatel_telefonia_movel.constants import (
@@ -72,6 +72,10 @@ with Flow(name="br_anatel_telefonia_movel", code_owners=["tricktx"]) as br_anate
     mes_dois = Parameter("mes_dois", default="06", required=True)
     update_metadata = Parameter("update_metadata", default=True, required=False)
 
+    # ! materializações das tabelas "_atualizado", cuja cobertura temporal é
+    # ! atualizada de uma vez ao final do flow
+    waits_for_materialization_atualizado = []
+
     # ! MICRODADOS
     filepath_microdados = clean_csv_microdados(
         anos=anos,
@@ -147,19 +151,7 @@ with Flow(name="br_anatel_telefonia_movel", code_owners=["tricktx"]) as br_anate
         wait_for_materialization.retry_delay = timedelta(
             seconds=dump_db_constants.WAIT_FOR_MATERIALIZATION_RETRY_INTERVAL.value
         )
-
-        with case(update_metadata, True):
-            date = get_today_date_atualizado()  # task que retorna a data atual
-            update_django_metadata(
-                dataset_id,
-                table_id[0] + "_atualizado",
-                metadata_type="DateTimeRange",
-                bq_last_update=False,
-                api_mode="prod",
-                date_format="yy-mm",
-                _last_date=date,
-                upstream_tasks=[wait_for_materialization],
-            )
+        waits_for_materialization_atualizado.append(wait_for_materialization)
 
     # ! BRASIL
     filepath_brasil = clean_csv_brasil(upstream_tasks=[filepath_microdados])
@@ -229,19 +221,7 @@ with Flow(name="br_anatel_telefonia_movel", code_owners=["tricktx"]) as br_anate
         wait_for_materialization.retry_delay = timedelta(
             seconds=dump_db_constants.WAIT_FOR_MATERIALIZATION_RETRY_INTERVAL.value
         )
-
-        with case(update_metadata, True):
-            date = get_today_date_atualizado()  # task que retorna a data atual
-            update_django_metadata(
-                dataset_id,
-                table_id[1] + "_atualizado",
-                metadata_type="DateTimeRange",
-                bq_last_update=False,
-                api_mode="prod",
-                date_format="yy-mm",
-                _last_date=date,
-                upstream_tasks=[wait_for_materialization],
-            )
+        waits_for_materialization_atualizado.append(wait_for_materialization)
 
     # ! UF
 
@@ -313,19 +293,7 @@ with Flow(name="br_anatel_telefonia_movel", code_owners=["tricktx"]) as br_anate
         wait_for_materialization.retry_delay = timedelta(
             seconds=dump_db_constants.WAIT_FOR_MATERIALIZATION_RETRY_INTERVAL.value
         )
-
-        with case(update_metadata, True):
-            date = get_today_date_atualizado()  # task que retorna a data atual
-            update_django_metadata(
-                dataset_id,
-                table_id[2] + "_atualizado",
-                metadata_type="DateTimeRange",
-                bq_last_update=False,
-                api_mode="prod",
-                date_format="yy-mm",
-                _last_date=date,
-                upstream_tasks=[wait_for_materialization],
-            )
+        waits_for_materialization_atualizado.append(wait_for_materialization)
 
     # ! MUNICIPIO
     filepath_municipio = clean_csv_municipio(upstream_tasks=[filepath_microdados])
@@ -397,18 +365,20 @@ with Flow(name="br_anatel_telefonia_movel", code_owners=["tricktx"]) as br_anate
         wait_for_materialization.retry_delay = timedelta(
             seconds=dump_db_constants.WAIT_FOR_MATERIALIZATION_RETRY_INTERVAL.value
         )
+        waits_for_materialization_atualizado.append(wait_for_materialization)
 
+    # ! atualiza a cobertura temporal de todas as tabelas "_atualizado" de uma vez
+    with case(materialize_after_dump, True):
         with case(update_metadata, True):
             date = get_today_date_atualizado()  # task que retorna a data atual
-            update_django_metadata(
-                dataset_id,
-                table_id[3] + "_atualizado",
-                metadata_type="DateTimeRange",
-                bq_last_update=False,
+            update_django_metadata_batch(
+                tables=[
+                    {"dataset_id": dataset_id, "table_id": table_id[i] + "_atualizado"}
+                    for i in range(4)
+                ],
                 api_mode="prod",
-                date_format="yy-mm",
                 _last_date=date,
-                upstream_tasks=[wait_for_materialization],
+                upstream_tasks=waits_for_materialization_atualizado,
             )
 
 br_anatel.storage = GCS(constants.GCS_FLOWS_BUCKET.value)
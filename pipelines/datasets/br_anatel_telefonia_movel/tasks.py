@@ -9,14 +9,11 @@ import numpy as np
 from datetime import datetime, timedelta
 import os
 from pipelines.constants import constants
-from pipelines.datasets.br_anatel_telefonia_movel.utils import (
-    download_and_unzip,
-    to_partitions_microdados,
-)
 from pipelines.datasets.br_anatel_telefonia_movel.constants import (
     constants as anatel_constants,
 )
-from pipelines.utils.utils import log
+from pipelines.utils.download import open_archive
+from pipelines.utils.utils import log, PartitionSink
 
 
 # ! TASK MICRODADOS
@@ -51,69 +48,71 @@ def clean_csv_microdados(anos, mes_um, mes_dois):
     # Imprime a URL dos dados
     log(anatel_constants.URL.value)
 
-    # Realiza o download e descompactação dos dados
-    download_and_unzip(
-        url=anatel_constants.URL.value, path=anatel_constants.INPUT_PATH.value
-    )
-
-    # Imprime a mensagem de abertura do arquivo
-    log(f"Abrindo o arquivo:{anos}, {mes_um}, {mes_dois}..")
-
-    # Imprime uma linha de separação no log
-    log("=" * 50)
-
-    # Lê o arquivo CSV contendo os dados
-    df = pd.read_csv(
-        f"{anatel_constants.INPUT_PATH.value}Acessos_Telefonia_Movel_{anos}{mes_um}-{anos}{mes_dois}.csv",
-        sep=";",
-        encoding="utf-8",
-    )
-
-    # Imprime a mensagem de renomeação das colunas
-    log("Renomeando as colunas:")
-
-    # Imprime uma linha de separação no log
-    log("=" * 50)
-
-    # Renomeia as colunas do DataFrame de acordo com as constantes definidas
-    df.rename(columns=anatel_constants.RENAME.value, inplace=True)
-
-    # Imprime a mensagem de remoção das colunas desnecessárias
-    log(f"Removendo colunas desnecessárias: {anos}, {mes_um}, {mes_dois}..")
-
-    # Imprime uma linha de separação no log
-    log("=" * 50)
-
-    # Remove as colunas desnecessárias do DataFrame
-    df.drop(["grupo_economico", "municipio", "ddd_chip"], axis=1, inplace=True)
-
-    # Imprime a mensagem de tratamento dos dados
-    log(f"Tratando os dados: {anos}, {mes_um}, {mes_dois}...")
-
-    # Imprime uma linha de separação no log
-    log("=" * 50)
-
-    # Converte os valores da coluna "produto" para letras minúsculas
-    df["produto"] = df["produto"].str.lower()
-
-    # Converte o tipo da coluna "id_municipio" para string
-    df["id_municipio"] = df["id_municipio"].astype(str)
-
-    # Converte o tipo da coluna "ddd" para numérico e, em seguida, para string
-    df["ddd"] = pd.to_numeric(df["ddd"], downcast="integer").astype(str)
-
-    # Converte o tipo da coluna "cnpj" para string
-    df["cnpj"] = df["cnpj"].astype(str)
-
-    # Ordena as colunas do DataFrame de acordo com as constantes definidas
-    df = df[anatel_constants.ORDEM.value]
-
-    # Divide o DataFrame em partições com base nas colunas "ano" e "mes" e salva os dados
-    to_partitions_microdados(
-        df,
-        partition_columns=["ano", "mes"],
-        savepath=anatel_constants.OUTPUT_PATH_MICRODADOS.value,
-    )
+    # Realiza o download dos dados; apenas a tabela de densidade, lida pelas tasks
+    # seguintes, é extraída para o disco
+    with open_archive(anatel_constants.URL.value) as zipfile:
+        zipfile.extract(
+            "Densidade_Telefonia_Movel.csv", path=anatel_constants.INPUT_PATH.value
+        )
+
+        # Imprime a mensagem de abertura do arquivo
+        log(f"Abrindo o arquivo:{anos}, {mes_um}, {mes_dois}..")
+
+        # Imprime uma linha de separação no log
+        log("=" * 50)
+
+        # Lê o arquivo CSV direto do zip em blocos e salva cada bloco tratado nas
+        # partições "ano" e "mes", sem carregar a tabela inteira em memória. Todas
+        # as colunas são lidas como texto: os tipos inferidos bloco a bloco podem
+        # mudar de um bloco para outro e misturar tipos nos arquivos de saída
+        with zipfile.open(
+            f"Acessos_Telefonia_Movel_{anos}{mes_um}-{anos}{mes_dois}.csv"
+        ) as member:
+            chunks = pd.read_csv(
+                member,
+                sep=";",
+                encoding="utf-8",
+                dtype=str,
+                chunksize=anatel_constants.CHUNKSIZE.value,
+            )
+
+            log(f"Tratando os dados: {anos}, {mes_um}, {mes_dois}...")
+
+            with PartitionSink(
+                anatel_constants.OUTPUT_PATH_MICRODADOS.value,
+                partition_columns=["ano", "mes"],
+            ) as sink:
+                for df in chunks:
+                    # Renomeia as colunas do DataFrame de acordo com as constantes definidas
+                    df.rename(columns=anatel_constants.RENAME.value, inplace=True)
+
+                    # Remove as colunas desnecessárias do DataFrame
+                    df.drop(
+                        ["grupo_economico", "municipio", "ddd_chip"],
+                        axis=1,
+                        inplace=True,
+                    )
+
+                    # Converte os valores da coluna "produto" para letras minúsculas
+                    df["produto"] = df["produto"].str.lower()
+
+                    # Converte o tipo da coluna "id_municipio" para string
+                    df["id_municipio"] = df["id_municipio"].astype(str)
+
+                    # Converte o tipo da coluna "ddd" para inteiro e, em seguida, para string;
+                    # Int64 mantém o mesmo formato ("11") em todos os chunks, mesmo nos que
+                    # têm ddd vazio, que seriam lidos como float ("11.0")
+                    df["ddd"] = (
+                        pd.to_numeric(df["ddd"]).astype("Int64").astype("string")
+                    )
+
+                    # Converte o tipo da coluna "cnpj" para string
+                    df["cnpj"] = df["cnpj"].astype(str)
+
+                    # Ordena as colunas do DataFrame de acordo com as constantes definidas
+                    sink.write(df[anatel_constants.ORDEM.value])
+
+    log(f"{sink.rows_written} linhas salvas em {len(sink.partitions)} partições")
 
     # Retorna o caminho de saída dos microdados
     return anatel_constants.OUTPUT_PATH_MICRODADOS.value
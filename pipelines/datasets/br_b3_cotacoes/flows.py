@@ -64,6 +64,7 @@ with Flow(name="br_b3_cotacoes.cotacoes", code_owners=["trick"]) as cotacoes:
         dataset_id=dataset_id,
         table_id=table_id,
         dump_mode="append",
+        incremental=True,
         wait=filepath,
     )
 
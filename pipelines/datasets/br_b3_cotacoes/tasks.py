@@ -3,6 +3,7 @@
 Tasks for br_b3_cotacoes
 """
 
+import os
 from prefect import task
 import pandas as pd
 import numpy as np
@@ -11,13 +12,13 @@ from pipelines.datasets.br_b3_cotacoes.constants import (
     constants as br_b3_cotacoes_constants,
 )
 
+from pipelines.utils.download import open_archive
 from pipelines.utils.utils import (
     log,
 )
 from pipelines.constants import constants
 
 from pipelines.datasets.br_b3_cotacoes.utils import (
-    download_and_unzip,
     read_files,
     partition_data,
 )
@@ -44,15 +45,18 @@ def tratamento(delta_day: int):
 
     day_url = datetime.strptime(day, "%d-%m-%Y").strftime("%Y-%m-%d")
 
-    download_and_unzip(
-        br_b3_cotacoes_constants.B3_URL.value.format(day_url),
-        br_b3_cotacoes_constants.B3_PATH_INPUT.value,
-    )
     log(
         "********************************ABRINDO O ARQUIVO********************************"
     )
 
-    df = read_files(br_b3_cotacoes_constants.B3_PATH_INPUT_TXT.value.format(day))
+    # lê o txt direto do zip, sem extraí-lo para o disco
+    txt_name = os.path.basename(
+        br_b3_cotacoes_constants.B3_PATH_INPUT_TXT.value.format(day)
+    )
+    with open_archive(
+        br_b3_cotacoes_constants.B3_URL.value.format(day_url)
+    ) as zipfile, zipfile.open(txt_name) as member:
+        df = read_files(member)
 
     rename = {
         "DataReferencia": "data_referencia",
@@ -5,9 +5,6 @@ General purpose functions for the br_bcb_estban project
 import requests
 from lxml import html
 import basedosdados as bd
-from io import BytesIO
-from zipfile import ZipFile
-from urllib.request import urlopen
 import pandas as pd
 import numpy as np
 import os
@@ -18,39 +15,20 @@ import urllib.request
 import urllib.error
 from pipelines.utils.utils import (
     log,
+    PartitionSink,
 )
 from pipelines.constants import constants
 
 # ------- macro etapa 1 download de dados
 
 
-def download_and_unzip(url, path):
-    """download and unzip a zip file
-
-    Args:
-        url (str): a url
-
-
-    Returns:
-        list: unziped files in a given folder
-    """
-
-    os.system(f"mkdir -p {path}")
-
-    http_response = urlopen(url)
-    zipfile = ZipFile(BytesIO(http_response.read()))
-    zipfile.extractall(path=path)
-
-    return path
-
-
 # ------- macro etapa 2 tratamento de dados
 # --- read files
-def read_files(path: str) -> pd.DataFrame:
+def read_files(path) -> pd.DataFrame:
     """This function read a file from a given path
 
     Args:
-        path (str): a path to a file
+        path (str): a path to a file or an open file, e.g. a member of a zip file
 
     Returns:
         pd.DataFrame: a dataframe with the file data
@@ -64,7 +42,7 @@ def read_files(path: str) -> pd.DataFrame:
     return df
 
 
-def partition_data(df: pd.DataFrame, column_name: list[str], output_directory: str):
+def partition_data(df: pd.DataFrame, column_name: str, output_directory: str):
     """
     Particiona os dados em subconjuntos de acordo com os valores únicos de uma coluna.
     Salva cada subconjunto em um arquivo CSV separado.
@@ -72,26 +50,11 @@ def partition_data(df: pd.DataFrame, column_name: list[str], output_directory: s
     column_name: nome da coluna a ser usada para particionar os dados
     output_directory: diretório onde os arquivos CSV serão salvos
     """
-    unique_values = df[column_name].unique()
-    log(f"Valores únicos: {unique_values}")
-    for value in unique_values:
-        value_str = str(value)[:10]
-        date_value = datetime.strptime(value_str, "%Y-%m-%d").date()
-        log(date_value)
-        formatted_value = date_value.strftime("%Y-%m-%d")
-        log(formatted_value)
-
-        partition_path = os.path.join(
-            output_directory, f"{column_name}={formatted_value}"
-        )
-        log(f"Salvando dados em {partition_path}")
-        if not os.path.exists(partition_path):
-            os.makedirs(partition_path)
-
-        df_partition = df[df[column_name] == value].copy()
-
-        df_partition.drop([column_name], axis=1, inplace=True)
-        log(f"df_partition: {df_partition}")
-        csv_path = os.path.join(partition_path, "data.csv")
-        df_partition.to_csv(csv_path, index=False, encoding="utf-8", na_rep="")
-        log(f"Arquivo {csv_path} salvo com sucesso!")
+    # as partições usam a data no formato YYYY-MM-DD
+    dates = pd.to_datetime(df[column_name].astype(str).str[:10], format="%Y-%m-%d")
+    df = df.assign(**{column_name: dates.dt.strftime("%Y-%m-%d")})
+    with PartitionSink(
+        output_directory, partition_columns=[column_name], if_exists="replace"
+    ) as sink:
+        sink.write(df)
+    log(f"{sink.rows_written} linhas salvas nas partições {sink.partitions}")
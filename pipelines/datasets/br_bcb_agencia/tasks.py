@@ -20,7 +20,6 @@ from pipelines.datasets.br_bcb_agencia.utils import (
     rename_cols,
     check_and_create_column,
     clean_nome_municipio,
-    get_data_from_prod,
     order_cols,
     remove_non_numeric_chars,
     remove_empty_spaces,
@@ -32,6 +31,7 @@ from pipelines.datasets.br_bcb_agencia.utils import (
 )
 
 from prefect import task
+from pipelines.utils.directories import get_directories
 from pipelines.utils.utils import (
     log,
     to_partitions,
@@ -56,8 +56,11 @@ def download_data(url, xpath):
 
     log(f"Downloading file from: {current_link} ")
 
+    # only the spreadsheets read by clean_data are extracted
     download_and_unzip(
-        url=current_link, extract_to=agencia_constants.DOWNLOAD_PATH_AGENCIA.value
+        url=current_link,
+        path=agencia_constants.DOWNLOAD_PATH_AGENCIA.value,
+        pattern="*.xls*",
     )
 
     log(
@@ -120,40 +123,23 @@ def clean_data():
             # todo : copy from estban
             df = clean_nome_municipio(df)
 
-            municipio = get_data_from_prod(
-                "br_bd_diretorios_brasil",
-                "municipio",
-                ["nome", "sigla_uf", "id_municipio", "ddd"],
-            )
-
-            log("municipio dataset successfully downloaded!")
+            # índices do diretório de municípios, carregados uma vez por processo
+            directories = get_directories()
+            log("municipio dataset successfully loaded!")
 
-            municipio = clean_nome_municipio(municipio)
             # check if id_municipio already exists
 
             if "id_municipio" not in df.columns:
-                # read municipio from bd datalake
-
-                # join id_municipio to df
-                df = pd.merge(
-                    df,
-                    municipio[["nome", "sigla_uf", "id_municipio", "ddd"]],
-                    left_on=["nome", "sigla_uf"],
-                    right_on=["nome", "sigla_uf"],
-                    how="left",
-                )
+                # join id_municipio to df by name
+                id_municipio = directories.id_municipio_by_nome()
+                df["id_municipio"] = [
+                    id_municipio.get(key) for key in zip(df["nome"], df["sigla_uf"])
+                ]
 
             # check if ddd already exists, if it doesnt, add it
             if "ddd" not in df.columns:
-                #
-                # read municipio from bd datalake
-
-                df = pd.merge(
-                    df,
-                    municipio[["id_municipio", "ddd"]],
-                    left_on=["id_municipio"],
-                    right_on=["id_municipio"],
-                    how="left",
+                df["ddd"] = df["id_municipio"].map(
+                    directories.lookup("municipio", "id_municipio", "ddd")
                 )
 
             # clean cep column
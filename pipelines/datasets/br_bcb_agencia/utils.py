@@ -6,9 +6,6 @@ General purpose functions for the br_bcb_agencia project
 
 import requests
 from lxml import html
-from io import BytesIO
-from zipfile import ZipFile
-from urllib.request import urlopen
 import basedosdados as bd
 import os
 import pandas as pd
@@ -18,6 +15,8 @@ import unicodedata
 from pipelines.utils.utils import (
     log,
 )
+from pipelines.utils.directories import normalize_nome_municipio
+from pipelines.utils.download import download_and_unzip  # pylint: disable=unused-import
 
 # ---- functions to download data
 
@@ -54,24 +53,6 @@ def extract_download_links(url, xpath):
     return values
 
 
-def download_and_unzip(url, extract_to):
-    """download and unzip a zip file
-
-    Args:
-        url (str): a url
-        extract_to (str): path to download data
-
-    Returns:
-        list: unziped files in a given folder
-    """
-
-    os.system(f"mkdir -p {extract_to}")
-
-    http_response = urlopen(url)
-    zipfile = ZipFile(BytesIO(http_response.read()))
-    zipfile.extractall(path=extract_to)
-
-
 # ---- functions to read data and make previous analysis on column names change across the years and mothns
 
 
@@ -296,14 +277,7 @@ def clean_nome_municipio(df: pd.DataFrame) -> pd.DataFrame:
     Returns:
         pd.DataFrame: dataframe with municipio cleaned column
     """
-    df["nome"] = df["nome"].apply(
-        lambda x: unicodedata.normalize("NFKD", str(x))
-        .encode("ascii", "ignore")
-        .decode("utf-8")
-    )
-    df["nome"] = df["nome"].apply(lambda x: re.sub(r"[^\w\s]", "", x))
-    df["nome"] = df["nome"].str.lower()
-    df["nome"] = df["nome"].str.strip()
+    df["nome"] = normalize_nome_municipio(df["nome"])
     return df
 
 
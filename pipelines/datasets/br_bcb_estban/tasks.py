@@ -15,6 +15,7 @@ from pipelines.datasets.br_bcb_estban.constants import (
 )
 from datetime import datetime, timedelta
 
+from pipelines.utils.directories import get_directories
 from pipelines.utils.utils import (
     clean_dataframe,
     to_partitions,
@@ -37,7 +38,6 @@ from pipelines.datasets.br_bcb_estban.utils import (
     pre_cleaning_for_pivot_long_agencia,
     wide_to_long_agencia,
     cols_order_agencia,
-    get_data_from_prod,
 )
 
 
@@ -80,14 +80,8 @@ def download_estban_files(xpath: str, save_path: str) -> str:
 def get_id_municipio(table) -> pd.DataFrame:
     """get id municipio from basedosdados"""
 
-    municipio = get_data_from_prod(
-        "br_bd_diretorios_brasil",
-        table,
-        ["id_municipio_bcb", "id_municipio"],
-    )
-
-    municipio = dict(zip(municipio.id_municipio_bcb, municipio.id_municipio))
-    log("municipio dataset successfully downloaded!")
+    municipio = get_directories().lookup(table, "id_municipio_bcb", "id_municipio")
+    log("municipio dataset successfully loaded!")
     return municipio
 
 
@@ -5,9 +5,6 @@ General purpose functions for the br_bcb_estban project
 import requests
 from lxml import html
 import basedosdados as bd
-from io import BytesIO
-from zipfile import ZipFile
-from urllib.request import urlopen
 import pandas as pd
 import unicodedata
 import numpy as np
@@ -16,6 +13,7 @@ import os
 from pipelines.utils.utils import (
     log,
 )
+from pipelines.utils.download import download_and_unzip  # pylint: disable=unused-import
 
 # ------- macro etapa 1 download de dados
 
@@ -52,26 +50,6 @@ def extract_download_links(url, xpath):
     return values
 
 
-def download_and_unzip(url, path):
-    """download and unzip a zip file
-
-    Args:
-        url (str): a url
-
-
-    Returns:
-        list: unziped files in a given folder
-    """
-
-    os.system(f"mkdir -p {path}")
-
-    http_response = urlopen(url)
-    zipfile = ZipFile(BytesIO(http_response.read()))
-    zipfile.extractall(path=path)
-
-    return path
-
-
 # ------- macro etapa 2 tratamento de dados
 # --- read files
 def read_files(path: str) -> pd.DataFrame:
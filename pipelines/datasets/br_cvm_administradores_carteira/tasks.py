@@ -8,24 +8,21 @@ import os
 import shutil
 
 import pandas as pd
-import requests
 from pandas.api.types import is_string_dtype
 from prefect import task
 from unidecode import unidecode
 
+from pipelines.utils.download import download_file
+
 
 @task
-def crawl(root: str, url: str, chunk_size=128) -> None:
+def crawl(root: str, url: str) -> None:
     """Download and unzip dataset br_cvm_administradores_carteira"""
     filepath = f"{root}/data.zip"
     os.makedirs(root, exist_ok=True)
     os.makedirs(f"{root}/cleaned", exist_ok=True)
 
-    response = requests.get(url, timeout=300)
-
-    with open(filepath, "wb") as file:
-        for chunk in response.iter_content(chunk_size=chunk_size):
-            file.write(chunk)
+    download_file(url, filepath)
 
     shutil.unpack_archive(filepath, extract_dir=root)
 
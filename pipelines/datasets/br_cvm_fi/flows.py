@@ -39,6 +39,7 @@ from pipelines.datasets.br_cvm_fi.constants import constants as cvm_constants
 from pipelines.constants import constants
 from pipelines.utils.tasks import (
     log_task,
+    preload_architectures,
     update_django_metadata,
 )
 from pipelines.utils.tasks import (
@@ -72,6 +73,7 @@ with Flow(
         default=cvm_constants.INFORME_DIARIO_URL.value,
         required=False,
     )
+    file_format = Parameter("file_format", default="csv", required=False)
     df = extract_links_and_dates(url)
     log_task(f"Links e datas: {df}")
     arquivos = check_for_updates(df, upstream_tasks=[df])
@@ -80,11 +82,17 @@ with Flow(
         log_task(f"Não houveram atualizações em {url.default}!")
 
     with case(is_empty(arquivos), False):
+        architectures = preload_architectures(
+            urls=[cvm_constants.ARQUITETURA_URL_INF.value]
+        )
         input_filepath = download_unzip_csv(
             files=arquivos, url=url, id=table_id, upstream_tasks=[arquivos]
         )
         output_filepath = clean_data_and_make_partitions(
-            path=input_filepath, table_id=table_id, upstream_tasks=[input_filepath]
+            path=input_filepath,
+            table_id=table_id,
+            file_format=file_format,
+            upstream_tasks=[input_filepath, architectures],
         )
 
         rename_flow_run = rename_current_flow_run_dataset_table(
@@ -96,6 +104,8 @@ with Flow(
             dataset_id=dataset_id,
             table_id=table_id,
             dump_mode="append",
+            incremental=True,
+            file_format=file_format,
             wait=output_filepath,
         )
         with case(materialize_after_dump, True):
@@ -180,11 +190,16 @@ with Flow(
         log_task(f"Não houveram atualizações em {url.default}!")
 
     with case(is_empty(arquivos), False):
+        architectures = preload_architectures(
+            urls=[cvm_constants.ARQUITETURA_URL.value]
+        )
         input_filepath = download_unzip_csv(
             url=url, files=arquivos, id=table_id, upstream_tasks=[arquivos]
         )
         output_filepath = clean_data_make_partitions_cda(
-            input_filepath, table_id=table_id, upstream_tasks=[input_filepath]
+            input_filepath,
+            table_id=table_id,
+            upstream_tasks=[input_filepath, architectures],
         )
 
         rename_flow_run = rename_current_flow_run_dataset_table(
@@ -196,6 +211,7 @@ with Flow(
             dataset_id=dataset_id,
             table_id=table_id,
             dump_mode="append",
+            incremental=True,
             wait=output_filepath,
         )
         with case(materialize_after_dump, True):
@@ -286,11 +302,16 @@ with Flow(
         log_task(f"Não houveram atualizações em {url.default}!")
 
     with case(is_empty(arquivos), False):
+        architectures = preload_architectures(
+            urls=[cvm_constants.ARQUITETURA_URL_EXT.value]
+        )
         input_filepath = download_csv_cvm(
             url=url, table_id=table_id, files=arquivos, upstream_tasks=[arquivos]
         )
         output_filepath = clean_data_make_partitions_ext(
-            input_filepath, table_id=table_id, upstream_tasks=[input_filepath]
+            input_filepath,
+            table_id=table_id,
+            upstream_tasks=[input_filepath, architectures],
         )
 
         rename_flow_run = rename_current_flow_run_dataset_table(
@@ -302,6 +323,7 @@ with Flow(
             dataset_id=dataset_id,
             table_id=table_id,
             dump_mode="append",
+            incremental=True,
             wait=output_filepath,
         )
         with case(materialize_after_dump, True):
@@ -383,11 +405,16 @@ with Flow(
         log_task(f"Não houveram atualizações em {url.default}!")
 
     with case(is_empty(arquivos), False):
+        architectures = preload_architectures(
+            urls=[cvm_constants.ARQUITETURA_URL_PERFIL_MENSAL.value]
+        )
         input_filepath = download_csv_cvm(
             url=url, table_id=table_id, files=arquivos, upstream_tasks=[arquivos]
         )
         output_filepath = clean_data_make_partitions_perfil(
-            input_filepath, table_id=table_id, upstream_tasks=[input_filepath]
+            input_filepath,
+            table_id=table_id,
+            upstream_tasks=[input_filepath, architectures],
         )
 
         rename_flow_run = rename_current_flow_run_dataset_table(
@@ -399,6 +426,7 @@ with Flow(
             dataset_id=dataset_id,
             table_id=table_id,
             dump_mode="append",
+            incremental=True,
             wait=output_filepath,
         )
         with case(materialize_after_dump, True):
@@ -479,9 +507,14 @@ with Flow(
         log_task(f"Não houveram atualizações em {url.default}!")
 
     with case(is_empty(files), False):
+        architectures = preload_architectures(
+            urls=[cvm_constants.ARQUITETURA_URL_CAD.value]
+        )
         input_filepath = download_csv_cvm(url=url, files=files, table_id=table_id)
         output_filepath = clean_data_make_partitions_cad(
-            diretorio=input_filepath, table_id=table_id, upstream_tasks=[input_filepath]
+            diretorio=input_filepath,
+            table_id=table_id,
+            upstream_tasks=[input_filepath, architectures],
         )
 
         rename_flow_run = rename_current_flow_run_dataset_table(
@@ -493,6 +526,7 @@ with Flow(
             dataset_id=dataset_id,
             table_id=table_id,
             dump_mode="append",
+            incremental=True,
             wait=output_filepath,
         )
         with case(materialize_after_dump, True):
@@ -576,9 +610,14 @@ with Flow(
         log_task(f"Não houveram atualizações em {url.default}!")
 
     with case(is_empty(files), False):
+        architectures = preload_architectures(
+            urls=[cvm_constants.ARQUITETURA_URL_BALANCETE.value]
+        )
         input_filepath = download_unzip_csv(url=url, files=files, id=table_id)
         output_filepath = clean_data_make_partitions_balancete(
-            input_filepath, table_id=table_id, upstream_tasks=[input_filepath]
+            input_filepath,
+            table_id=table_id,
+            upstream_tasks=[input_filepath, architectures],
         )
 
         rename_flow_run = rename_current_flow_run_dataset_table(
@@ -590,6 +629,7 @@ with Flow(
             dataset_id=dataset_id,
             table_id=table_id,
             dump_mode="append",
+            incremental=True,
             wait=output_filepath,
         )
         with case(materialize_after_dump, True):
@@ -9,6 +9,7 @@ import os
 from datetime import datetime
 import requests
 from tqdm import tqdm
+import tempfile
 import zipfile
 from bs4 import BeautifulSoup
 import re
@@ -24,6 +25,7 @@ from pipelines.datasets.br_cvm_fi.utils import (
     limpar_string,
     obter_anos_meses,
 )
+from pipelines.utils.download import download_and_unzip, download_files
 from pipelines.utils.utils import (
     log,
     to_partitions,
@@ -39,9 +41,7 @@ def get_today_date():
 
 
 @task  # noqa
-def download_unzip_csv(
-    url: str, files, chunk_size: int = 128, mkdir: bool = True, id="teste"
-) -> str:
+def download_unzip_csv(url: str, files, mkdir: bool = True, id="teste") -> str:
     """
     Downloads and unzips a .csv file from a given list of files and saves it to a local directory.
     Parameters:
@@ -50,8 +50,6 @@ def download_unzip_csv(
         The base URL from which to download the files.
     files: list or str
         The .zip file names or a single .zip file name to download the csv file from.
-    chunk_size: int, optional
-        The size of each chunk to download in bytes. Default is 128 bytes.
     mkdir: bool, optional
         Whether to create a new directory for the downloaded file. Default is False.
     Returns:
@@ -63,60 +61,28 @@ def download_unzip_csv(
     if mkdir:
         os.makedirs(f"/tmp/data/br_cvm_fi/{id}/input/", exist_ok=True)
 
-    request_headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/80.0.3987.149 Safari/537.36",
-    }
-
-    if isinstance(files, list):
-        for file in files:
-            log(f"Baixando o arquivo {file}")
-            download_url = f"{url}{file}"
-            save_path = f"/tmp/data/br_cvm_fi/{id}/input/{file}"
+    if isinstance(files, str):
+        files = [files]
+    elif not isinstance(files, list):
+        raise ValueError("O argumento 'files' possui um tipo inadequado.")
 
-            r = requests.get(
-                download_url, headers=request_headers, stream=True, timeout=50
-            )
-            with open(save_path, "wb") as fd:
-                for chunk in tqdm(r.iter_content(chunk_size=chunk_size)):
-                    fd.write(chunk)
+    log(f"Baixando os arquivos {files}")
+    # os zips ficam num diretório temporário e apenas os csvs são extraídos
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        save_paths = download_files(
+            [(f"{url}{file}", f"{tmp_dir}/{file}") for file in files]
+        )
 
+        for file, save_path in zip(files, save_paths):
             try:
-                with zipfile.ZipFile(save_path) as z:
-                    z.extractall(f"/tmp/data/br_cvm_fi/{id}/input")
+                download_and_unzip(
+                    save_path, f"/tmp/data/br_cvm_fi/{id}/input", pattern="*.csv"
+                )
                 log("Dados extraídos com sucesso!")
 
             except zipfile.BadZipFile:
                 log(f"O arquivo {file} não é um arquivo ZIP válido.")
 
-            os.system(
-                f'cd /tmp/data/br_cvm_fi/{id}/input; find . -type f ! -iname "*.csv" -delete'
-            )
-
-    elif isinstance(files, str):
-        log(f"Baixando o arquivo {files}")
-        download_url = f"{url}{files}"
-        save_path = f"/tmp/data/br_cvm_fi/{id}/input/{files}"
-
-        r = requests.get(download_url, headers=request_headers, stream=True, timeout=10)
-        with open(save_path, "wb") as fd:
-            for chunk in tqdm(r.iter_content(chunk_size=chunk_size)):
-                fd.write(chunk)
-
-        try:
-            with zipfile.ZipFile(save_path) as z:
-                z.extractall(f"/tmp/data/br_cvm_fi/{id}/input")
-            log("Dados extraídos com sucesso!")
-
-        except zipfile.BadZipFile:
-            log(f"O arquivo {files} não é um arquivo ZIP válido.")
-
-        os.system(
-            f'cd /tmp/data/br_cvm_fi/{id}/input; find . -type f ! -iname "*.csv" -delete'
-        )
-
-    else:
-        raise ValueError("O argumento 'files' possui um tipo inadequado.")
-
     return f"/tmp/data/br_cvm_fi/{id}/input/"
 
 
@@ -204,7 +170,9 @@ def is_empty(lista):
 
 
 @task
-def clean_data_and_make_partitions(path: str, table_id: str) -> str:
+def clean_data_and_make_partitions(
+    path: str, table_id: str, file_format: str = "csv"
+) -> str:
     """
     Clean cvm data based on architecture file and make partitions.
     """
@@ -233,6 +201,7 @@ def clean_data_and_make_partitions(path: str, table_id: str) -> str:
             df,
             partition_columns=["ano", "mes"],
             savepath=f"/tmp/data/br_cvm_fi/{table_id}/output/",
+            file_format=file_format,
         )  # constant
         log("Partition created.")
 
@@ -347,35 +316,18 @@ def clean_data_make_partitions_ext(diretorio, table_id):
 
 
 @task
-def download_csv_cvm(
-    url: str, table_id: str, files, chunk_size: int = 128, mkdir: bool = True
-) -> str:
+def download_csv_cvm(url: str, table_id: str, files, mkdir: bool = True) -> str:
     if mkdir:
         os.makedirs(f"/tmp/data/br_cvm_fi/{table_id}/input/", exist_ok=True)
-    request_headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/80.0.3987.149 Safari/537.36",
-    }
-    if isinstance(files, list):
-        for file in files:
-            log(f"Baixando o arquivo {file}")
-            download_url = f"{url}{file}"
-            save_path = f"/tmp/data/br_cvm_fi/{table_id}/input/{file}"
-
-            r = requests.get(
-                download_url, headers=request_headers, stream=True, timeout=10
-            )
-            with open(save_path, "wb") as fd:
-                for chunk in tqdm(r.iter_content(chunk_size=chunk_size)):
-                    fd.write(chunk)
-
-    elif isinstance(files, str):
-        log(f"Baixando o arquivo {files}")
-        download_url = f"{url}{files}"
-        save_path = f"/tmp/data/br_cvm_fi/{table_id}/input/{files}"
-        r = requests.get(download_url, headers=request_headers, stream=True, timeout=10)
-        with open(save_path, "wb") as fd:
-            for chunk in tqdm(r.iter_content(chunk_size=chunk_size)):
-                fd.write(chunk)
+    if isinstance(files, str):
+        files = [files]
+    log(f"Baixando os arquivos {files}")
+    download_files(
+        [
+            (f"{url}{file}", f"/tmp/data/br_cvm_fi/{table_id}/input/{file}")
+            for file in files
+        ]
+    )
 
     return f"/tmp/data/br_cvm_fi/{table_id}/input/"
 
@@ -2,20 +2,19 @@
 """
 General purpose functions for the br_cvm_fi project
 """
-from io import StringIO
-import requests
 import pandas as pd
 import os
 import re
 from unidecode import unidecode
 
+from pipelines.utils.architecture import get_architecture
+
 
 def sheet_to_df(columns_config_url_or_path):
     """
     Convert sheet to dataframe. Check if your google sheet Share are: Anyone on the internet with this link can view
     """
-    url = columns_config_url_or_path.replace("edit#gid=", "export?format=csv&gid=")
-    return pd.read_csv(StringIO(requests.get(url, timeout=10).content.decode("utf-8")))
+    return get_architecture(columns_config_url_or_path).table.copy()
 
 
 def rename_columns(df_origem, df_destino):
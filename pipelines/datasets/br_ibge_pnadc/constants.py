@@ -1312,3 +1312,6 @@ class constants(Enum):  # pylint: disable=c0103
         "V1028199",
         "V1028200",
     ]
+
+    # lines of the microdata decoded at a time, and written as one row group
+    CHUNKSIZE = 25_000
@@ -16,8 +16,7 @@ from pipelines.constants import constants
 from pipelines.datasets.br_ibge_pnadc.tasks import (
     get_url_from_template,
     download_txt,
-    build_parquet_files,
-    save_partitions,
+    build_partitions,
 )
 from pipelines.utils.decorators import Flow
 from pipelines.utils.tasks import (
@@ -34,6 +33,7 @@ with Flow(name="br_ibge_pnadc.microdados", code_owners=["lucas_cr"]) as br_pnadc
     table_id = Parameter("table_id", default="microdados", required=True)
     year = Parameter("year", default=2020, required=False)
     quarter = Parameter("quarter", default=1, required=False)
+    file_format = Parameter("file_format", default="csv", required=False)
     materialization_mode = Parameter(
         "materialization_mode", default="prod", required=False
     )
@@ -48,11 +48,8 @@ with Flow(name="br_ibge_pnadc.microdados", code_owners=["lucas_cr"]) as br_pnadc
 
     url = get_url_from_template(year, quarter, upstream_tasks=[rename_flow_run])
     input_filepath = download_txt(url, mkdir=True, upstream_tasks=[url])
-    staging_filepath = build_parquet_files(
-        input_filepath, upstream_tasks=[input_filepath]
-    )
-    output_filepath = save_partitions(
-        staging_filepath, upstream_tasks=[staging_filepath]
+    output_filepath = build_partitions(
+        input_filepath, file_format=file_format, upstream_tasks=[input_filepath]
     )
 
     wait_upload_table = create_table_and_upload_to_gcs(
@@ -60,6 +57,7 @@ with Flow(name="br_ibge_pnadc.microdados", code_owners=["lucas_cr"]) as br_pnadc
         dataset_id=dataset_id,
         table_id=table_id,
         dump_mode="append",
+        file_format=file_format,
         wait=output_filepath,
     )
     with case(materialize_after_dump, True):
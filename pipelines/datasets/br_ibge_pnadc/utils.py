@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+General purpose functions for the br_ibge_pnadc project
+"""
+from typing import BinaryIO, Iterator, List
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+def _read_lines(file: BinaryIO, chunksize: int, line_length: int) -> Iterator[bytes]:
+    """
+    Yields blocks of whole lines of `file`, with up to `chunksize` lines each.
+    `line_length` is the expected length of a line, used to size the reads.
+    """
+    rest = b""
+    while True:
+        block = file.read(max(chunksize * line_length - len(rest), line_length))
+        data = rest + block
+        if not block:
+            if data.strip():
+                yield data if data.endswith(b"\n") else data + b"\n"
+            return
+        ends = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == ord("\n"))
+        if len(ends) == 0:
+            rest = data
+            continue
+        end = ends[min(chunksize, len(ends)) - 1] + 1
+        yield data[:end]
+        rest = data[end:]
+
+
+def _records(lines: bytes, record_length: int) -> np.ndarray:
+    """
+    Converts a block of lines to a `(lines, record_length)` array of bytes. Short
+    lines are padded with spaces and blank lines are skipped.
+    """
+    data = np.frombuffer(lines, dtype=np.uint8)
+    ends = np.flatnonzero(data == ord("\n"))
+    starts = np.concatenate([[0], ends[:-1] + 1])
+    lengths = ends - starts
+    carriage_return = (lengths > 0) & (data[np.maximum(ends - 1, 0)] == ord("\r"))
+    lengths -= carriage_return
+
+    # every line is a full record followed by the same line break
+    line_length = record_length + 1 + int(carriage_return[0])
+    if (lengths == record_length).all() and len(data) == len(ends) * line_length:
+        return data.reshape(-1, line_length)[:, :record_length]
+
+    keep = lengths > 0
+    starts, lengths = starts[keep], lengths[keep]
+    positions = np.arange(record_length)
+    records = data[np.minimum(starts[:, None] + positions, len(data) - 1)]
+    records[positions >= lengths[:, None]] = ord(" ")
+    return records
+
+
+def iter_fixed_width(
+    filepath: str, widths: List[int], names: List[str], chunksize: int = 25_000
+) -> Iterator[pd.DataFrame]:
+    """
+    Reads a fixed width file in chunks of `chunksize` lines, like
+    `pd.read_fwf(..., dtype=str, chunksize=chunksize)`: values are stripped and
+    blank values are missing.
+
+    Fields are sliced from the raw bytes of a whole chunk at once, so `widths`
+    are in bytes and the file must be ASCII or UTF-8 (as the PNAD Contínua
+    microdata).
+    """
+    starts = np.concatenate([[0], np.cumsum(widths)[:-1]])
+    record_length = int(sum(widths))
+    with open(filepath, "rb") as file:
+        for lines in _read_lines(file, chunksize, record_length + 2):
+            records = _records(lines, record_length)
+            n_records = len(records)
+            if n_records == 0:
+                continue
+            # True where a field has any non blank character
+            filled = np.logical_or.reduceat(records != ord(" "), starts, axis=1)
+            columns = []
+            for i, (start, width) in enumerate(zip(starts, widths)):
+                values = np.ascontiguousarray(records[:, start : start + width])
+                offsets = np.arange(0, (n_records + 1) * width, width, dtype=np.int32)
+                validity = np.packbits(filled[:, i], bitorder="little")
+                column = pa.StringArray.from_buffers(
+                    n_records,
+                    pa.py_buffer(offsets),
+                    pa.py_buffer(values),
+                    pa.py_buffer(validity),
+                )
+                column.validate(full=True)
+                columns.append(pc.utf8_trim_whitespace(column))
+            yield pa.Table.from_arrays(columns, names=names).to_pandas()
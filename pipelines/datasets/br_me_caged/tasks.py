@@ -14,6 +14,7 @@ from unidecode import unidecode
 from tqdm import tqdm
 
 from pipelines.constants import constants
+from pipelines.utils.directories import get_directories
 
 
 @task
@@ -46,6 +47,7 @@ def build_partitions(table_id: str) -> str:
     table_id: microdados_movimentacao | microdados_movimentacao_fora_prazo | microdados_movimentacao_excluida
     """
     input_files = glob(f"/tmp/caged/{table_id}/input/*txt")
+    dict_uf = get_directories().lookup("municipio", "id_uf", "sigla_uf")
     for filename in tqdm(input_files):
         df = pd.read_csv(filename, sep=";", dtype={"uf": str})
         date = re.search(r"\d+", filename).group()
@@ -54,39 +56,9 @@ def build_partitions(table_id: str) -> str:
 
         df.columns = [unidecode(col) for col in df.columns]
 
-        dict_uf = {
-            "11": "RO",
-            "12": "AC",
-            "13": "AM",
-            "14": "RR",
-            "15": "PA",
-            "16": "AP",
-            "17": "TO",
-            "21": "MA",
-            "22": "PI",
-            "23": "CE",
-            "24": "RN",
-            "25": "PB",
-            "26": "PE",
-            "27": "AL",
-            "28": "SE",
-            "29": "BA",
-            "31": "MG",
-            "32": "ES",
-            "33": "RJ",
-            "35": "SP",
-            "41": "PR",
-            "42": "SC",
-            "43": "RS",
-            "50": "MS",
-            "51": "MT",
-            "52": "GO",
-            "53": "DF",
-        }
-
         df["uf"] = df["uf"].map(dict_uf)
 
-        for state in dict_uf.values():
+        for state in sorted(set(dict_uf.values())):
             data = df[df["uf"] == state]
             data.drop(["competenciamov", "uf"], axis=1, inplace=True)
             data.to_csv(
@@ -6,7 +6,6 @@ Tasks for br_me_comex_stat
 # pylint: disable=invalid-name,too-many-nested-blocks
 from glob import glob
 from zipfile import ZipFile
-import time as tm
 from datetime import timedelta
 import pandas as pd
 import numpy as np
@@ -59,8 +58,6 @@ def download_br_me_comex_stat(
     )
     log("data downloaded!")
 
-    tm.sleep(10)
-
 
 @task
 def clean_br_me_comex_stat(
@@ -2,9 +2,8 @@
 """ Utils for the Brazilian Comex Stat pipeline. """
 # pylint: disable=invalid-name
 import os
-import wget
-import time as tm
 from tqdm import tqdm
+from pipelines.utils.download import download_file
 from pipelines.utils.utils import (
     log,
 )
@@ -60,8 +59,6 @@ def download_data(
 
         log(f"Downloading {url}")
 
-        # downloads the file and saves it
-        wget.download(url, out=path + table_name + "/input")
-        # just for precaution,
-        # sleep for 8 secs in between iterations
-        tm.sleep(8)
+        # downloads the file and saves it; requests to the comex stat website are
+        # spaced by the rate limit of the shared downloader
+        download_file(url, path + table_name + "/input")
@@ -23,6 +23,12 @@ class constants(Enum):  # pylint: disable=c0103
         },
     ]
     TABLES_NAMES = ["less100", "oferta_dia", "relampago", "barato_dia"]
+    # cliente HTTP dos crawlers
+    HEADERS = {"User-Agent": "Chrome/39.0.2171.95"}
+    MAX_CONCURRENCY = 8
+    MAX_PER_HOST = 4
+    # requisições por segundo a cada host
+    REQUESTS_PER_SECOND = 2
     MAP_MUNICIPIO_TO_ID = {
         "Ariquemes, Rondônia": 1100023,
         "Guajará-Mirim, Rondônia": 1100106,
@@ -4,7 +4,6 @@
 
 
 import asyncio
-import time
 import os
 from typing import List, Tuple
 
@@ -20,6 +19,7 @@ from pipelines.datasets.br_mercadolivre_ofertas.utils import (
     main_seller,
     get_id,
     clean_experience,
+    FuzzyIndex,
 )
 
 less100 = const_mercadolivre.LESS100.value
@@ -45,9 +45,7 @@ def crawler_mercadolivre_item():
     Raises:
         None
     """
-    loop = asyncio.get_event_loop()
-    contents = loop.run_until_complete(main_item(dict_tables, kwargs_list))
-    time.sleep(5)
+    contents = asyncio.run(main_item(dict_tables, kwargs_list))
     df = pd.DataFrame(contents)
     total = df.shape[0]
     df = df.dropna(subset=["title"])
@@ -77,8 +75,6 @@ def crawler_mercadolivre_item():
     filepath = "/tmp/items_raw.csv"
     df.to_csv(filepath, index=False)
 
-    loop.close()
-
     return filepath
 
 
@@ -227,7 +223,7 @@ def clean_seller(filepath_raw):
     # log("depois do replace")
     # log(seller)
     # log(seller["classificacao"].unique())
-    dict_municipios = const_mercadolivre.MAP_MUNICIPIO_TO_ID.value
+    dict_municipios = FuzzyIndex(const_mercadolivre.MAP_MUNICIPIO_TO_ID.value)
     seller["localizacao"] = seller["localizacao"].apply(
         lambda x: get_id(x, dict_municipios)
     )
@@ -5,68 +5,110 @@ import asyncio
 import hashlib
 import re
 from datetime import datetime
+from functools import partial
+from typing import Callable, Dict, Iterable
+from pipelines.utils.async_http import AsyncHttpClient, backoff_delay
 from pipelines.utils.tasks import log
-import requests
-from tqdm import tqdm
+from pipelines.datasets.br_mercadolivre_ofertas.constants import (
+    constants as const_mercadolivre,
+)
 from bs4 import BeautifulSoup
 from fake_useragent import UserAgent
 import Levenshtein
+import numpy as np
 import pandas as pd
 
 ua = UserAgent()
 
 
-def retry(content_function):
-    """Decorator function that retries an asynchronous content retrieval function.
+def new_client() -> AsyncHttpClient:
+    """
+    Returns an HTTP client with the limits of the Mercado Livre crawlers. A new
+    client must be created for each `asyncio.run`.
+    """
+    return AsyncHttpClient(
+        max_concurrency=const_mercadolivre.MAX_CONCURRENCY.value,
+        max_per_host=const_mercadolivre.MAX_PER_HOST.value,
+        rate=const_mercadolivre.REQUESTS_PER_SECOND.value,
+        headers=const_mercadolivre.HEADERS.value,
+    )
+
+
+class PageCache:
+    """
+    HTML of the pages fetched during a run, by URL.
+
+    Each page is requested once, even if many coroutines (or many site sections
+    listing the same item) ask for it at the same time. Pages are only requested
+    again with `refresh=True`.
+    """
+
+    def __init__(self, client: AsyncHttpClient = None):
+        self.client = client or new_client()
+        self._pages: Dict[str, asyncio.Future] = {}
+        self.requests = 0
+
+    async def _fetch(self, url: str):
+        self.requests += 1
+        return await self.client.get_text(url)
+
+    async def get(self, url: str, refresh: bool = False):
+        """
+        Returns the HTML of the page at `url`, or None if it could not be fetched.
+        """
+        if refresh or url not in self._pages:
+            self._pages[url] = asyncio.ensure_future(self._fetch(url))
+        return await self._pages[url]
+
+
+async def scrape_page(
+    url: str,
+    extractors: Dict[str, Callable[[BeautifulSoup], object]],
+    required: Iterable[str] = (),
+    attempts: int = 5,
+    wait_time: float = 5,
+    pages: PageCache = None,
+) -> dict:
+    """
+    Extracts fields from a page, parsing it once for all extractors.
 
     Args:
-        content_function (callable): An asynchronous function that takes BeautifulSoup object and additional keyword arguments as parameters, and returns the desired content.
+        url (str): The URL of the page.
+        extractors (dict): Functions that take the parsed page and return a field, by the name of the field.
+        required (iterable): Names of the fields that must be found. While any of them is missing, the page is
+            fetched again, up to `attempts` fetches, and only the missing fields are extracted again.
+        attempts (int): The maximum number of fetches of the page.
+        wait_time (float): Seconds to wait before the first new fetch, doubled (with jitter) before each of the next ones.
+        pages (PageCache): The pages of the run. A new cache is used if None.
 
     Returns:
-        callable: A wrapper function that retries the content retrieval function.
+        dict: The value of each field, None for fields that could not be extracted. Empty fields are extracted
+            again from each new fetch, but do not cause one unless they are required.
 
     Raises:
         None
-
-    Example:
-        @retry
-        async def get_title(soup):
-            # Retrieves the title from a BeautifulSoup object
-            title = soup.title.string
-            return title
-
-        # Usage
-        url = 'https://example.com'
-        title = await get_title(url)
     """
-
-    async def wrapper(url, attempts=2, wait_time=2, **kwargs):
-        content = None
-        count = 0
-
-        while content is None and count < attempts:
-            # print(f'Attempt {count + 1} of {attempts}')
-            headers = {"User-Agent": "Chrome/39.0.2171.95"}
-            try:
-                response = await asyncio.to_thread(
-                    requests.get, url, headers=headers, timeout=100
-                )
-            except Exception:
-                return None
-            await asyncio.sleep(wait_time)
-            soup = BeautifulSoup(response.text, "html.parser")
+    pages = pages or PageCache()
+    info = dict.fromkeys(extractors)
+    missing = list(extractors)
+    for attempt in range(attempts):
+        if attempt:
+            await asyncio.sleep(backoff_delay(attempt - 1, wait_time))
+        html = await pages.get(url, refresh=attempt > 0)
+        if html is None:
+            continue
+        soup = BeautifulSoup(html, "html.parser")
+        for key in missing:
             try:
-                content = content_function(soup, **kwargs)
+                info[key] = extractors[key](soup)
             except Exception:
-                if count == (attempts - 1):
-                    # Could not get content
-                    content = None
-            count += 1
-            # await asyncio.sleep(10)
-
-        return content
+                info[key] = None
+        # campos vazios (ex. avaliações) também são extraídos de novo da próxima página
+        missing = [key for key in extractors if info[key] in (None, "", [], {})]
+        if not any(key in missing for key in required):
+            break
 
-    return wrapper
+    return info
 
 
 def generate_unique_id(text: str):
@@ -101,7 +143,6 @@ def generate_unique_id(text: str):
     return unique_id
 
 
-@retry
 def get_byelement(soup, **kwargs):
     """
     Retrieves the content of an HTML element identified by the given attributes from a BeautifulSoup object.
@@ -121,13 +162,95 @@ def get_byelement(soup, **kwargs):
     return content
 
 
+def ngrams(text, size=2):
+    """
+    Returns the set of substrings of `size` characters of a string.
+    """
+    return {text[i : i + size] for i in range(len(text) - size + 1)}
+
+
+class FuzzyIndex:
+    """
+    Index of the keys of a dictionary for the lookups of `get_id`.
+
+    Keys are lowercased once and indexed by their bigrams. A lookup counts the
+    bigrams shared by the input and each key, which bounds their Levenshtein
+    distance from below (an edit changes at most two bigrams), and only computes
+    the distance to the keys whose bound is not worse than the best match found
+    so far. Exact matches skip the search and every input is looked up once.
+    """
+
+    size = 2
+
+    def __init__(self, dictionary):
+        values = list(dictionary.values())
+        # a primeira chave do dicionário vence empates, como na busca linear
+        keys = {}
+        for key, value in zip(dictionary, values):
+            keys.setdefault(key.lower(), value)
+        self.keys = list(keys)
+        self.values = list(keys.values())
+        self._exact = keys
+        self._memo = {}
+        grams = [ngrams(key, self.size) for key in self.keys]
+        postings = {}
+        for position, key_grams in enumerate(grams):
+            for gram in key_grams:
+                postings.setdefault(gram, []).append(position)
+        self._postings = {
+            gram: np.array(positions) for gram, positions in postings.items()
+        }
+        self._grams = np.array([len(key_grams) for key_grams in grams])
+        self._lengths = np.array([len(key) for key in self.keys])
+
+    def _closest(self, text):
+        grams = ngrams(text, self.size)
+        postings = [self._postings[gram] for gram in grams if gram in self._postings]
+        shared = np.bincount(
+            np.concatenate(postings) if postings else np.array([], dtype=int),
+            minlength=len(self.keys),
+        )
+        # limites inferiores da distância a cada chave
+        bounds = np.maximum(
+            -((shared - np.maximum(len(grams), self._grams)) // self.size),
+            np.abs(self._lengths - len(text)),
+        )
+        best_distance, best_position = float("inf"), None
+        for position in np.argsort(bounds, kind="stable"):
+            if bounds[position] > best_distance:
+                break
+            distance = Levenshtein.distance(text, self.keys[position])
+            if distance < best_distance or (
+                distance == best_distance and position < best_position
+            ):
+                best_distance, best_position = distance, position
+        return best_position
+
+    def get(self, input_string):
+        """
+        Returns the value of the key with the closest Levenshtein distance to the
+        input string, ignoring case, or None if the input is not a string or the
+        dictionary is empty.
+        """
+        if not isinstance(input_string, str) or not self.keys:
+            return None
+        if input_string not in self._memo:
+            text = input_string.lower()
+            if text in self._exact:
+                self._memo[input_string] = self._exact[text]
+            else:
+                self._memo[input_string] = self.values[self._closest(text)]
+        return self._memo[input_string]
+
+
 def get_id(input_string, dictionary):
     """
     Retrieves the value from a dictionary based on the input string, using the key with the closest Levenshtein distance.
 
     Args:
         input_string (str): The input string for which to find the closest matching key in the dictionary.
-        dictionary (dict): The dictionary containing key-value pairs.
+        dictionary (dict or FuzzyIndex): The dictionary containing key-value pairs. Build a `FuzzyIndex` of it once
+            to look up many strings.
 
     Returns:
         Any: The value associated with the key that has the closest Levenshtein distance to the input string.
@@ -136,30 +259,19 @@ def get_id(input_string, dictionary):
     Raises:
         None
     """
-    if input_string is None:
-        return None
-
-    if not isinstance(input_string, str):
-        return None
+    if not isinstance(dictionary, FuzzyIndex):
+        dictionary = FuzzyIndex(dictionary)
 
-    best_match = None
-    min_distance = float("inf")
+    return dictionary.get(input_string)
 
-    for key in dictionary:
-        distance = Levenshtein.distance(input_string.lower(), key.lower())
-        if distance < min_distance:
-            min_distance = distance
-            best_match = key
 
-    return dictionary.get(best_match)
-
-
-def get_items_urls(url):
+async def get_items_urls(url, pages):
     """
     Retrieves the URLs of items from the given URL by scraping the HTML content.
 
     Args:
         url (str): The URL of the webpage containing the items.
+        pages (PageCache): The pages fetched in the run.
 
     Returns:
         list: A list of URLs of the items found on the webpage.
@@ -167,8 +279,11 @@ def get_items_urls(url):
     Raises:
         None
     """
-    response = requests.get(url)
-    soup = BeautifulSoup(response.text, "html.parser")
+    html = await pages.get(url)
+    if html is None:
+        log(f"Não foi possível baixar {url}")
+        return []
+    soup = BeautifulSoup(html, "html.parser")
 
     items = soup.find_all(class_="promotion-item__link-container")
 
@@ -177,7 +292,6 @@ def get_items_urls(url):
     return items_urls
 
 
-@retry
 def get_price(soup, **kwargs):
     """
     Retrieves the price value from the HTML content represented by a BeautifulSoup object.
@@ -196,7 +310,6 @@ def get_price(soup, **kwargs):
     return price
 
 
-@retry
 def get_features(soup):
     """
     Retrieves the features from the HTML content represented by a BeautifulSoup object.
@@ -219,7 +332,6 @@ def get_features(soup):
     return features_dict
 
 
-@retry
 def get_features_seller(soup):
     span_elements = soup.find_all("span", class_="buyers-feedback-qualification")
 
@@ -235,7 +347,6 @@ def get_features_seller(soup):
     return result_dict
 
 
-@retry
 def get_seller_link(soup):
     """
     Retrieves the link to the seller from the HTML content represented by a BeautifulSoup object.
@@ -257,7 +368,6 @@ def get_seller_link(soup):
     return seller_link
 
 
-@retry
 def get_categories(soup):
     """
     Retrieves the categories from the HTML content represented by a BeautifulSoup object.
@@ -276,7 +386,6 @@ def get_categories(soup):
     return categories_list
 
 
-@retry
 def get_original_price(soup):
     """
     Retrieves the original price from the HTML content represented by a BeautifulSoup object.
@@ -304,13 +413,16 @@ def get_original_price(soup):
     return float_amount
 
 
-async def process_item_url(item_url, kwargs_list):
+async def process_item_url(item_url, kwargs_list, pages=None, attempts=5, wait_time=20):
     """
-    Processes an item URL by retrieving various information using asynchronous operations.
+    Processes an item URL by extracting every field from a single fetch of the item page.
 
     Args:
         item_url (str): The URL of the item to process.
         kwargs_list (list): A list of keyword argument dictionaries for the 'get_byelement' function.
+        pages (PageCache): The pages fetched in the run. A new cache is used if None.
+        attempts (int): The maximum number of fetches of the page while required fields are missing.
+        wait_time (float): Seconds to wait before fetching the page again, doubled on every new fetch.
 
     Returns:
         dict: A dictionary containing the extracted information about the item.
@@ -318,31 +430,35 @@ async def process_item_url(item_url, kwargs_list):
     Raises:
         None
     """
-    tasks = [
-        get_byelement(url=item_url, attempts=5, wait_time=20, **kwargs)
-        for kwargs in kwargs_list
-    ]
-    # log("mostrar a lista de classes")
-    # log(f'Class being used for transport_condition: {kwargs_list}')
-    # log(f'Class being used for transport_condition: {kwargs_list[3]["class_"]}')
-    results = await asyncio.gather(*tasks)
-
     keys = ["title", "review_amount", "discount", "transport_condition", "stars"]
-
-    info = dict(zip(keys, results))
-    price = await get_price(item_url, attempts=10, wait_time=20)
-    info["price"] = price
-    log("Preço de desconto coletado!")
-    price_original = await get_original_price(item_url, attempts=10, wait_time=25)
-    info["price_original"] = price_original
-    log("Preço de original coletado!")
+    extractors = {
+        key: partial(get_byelement, **kwargs) for key, kwargs in zip(keys, kwargs_list)
+    }
+    extractors.update(
+        {
+            "price": get_price,
+            "price_original": get_original_price,
+            "seller_link": get_seller_link,
+            "features": get_features,
+            "categories": get_categories,
+        }
+    )
+    # a página é baixada de novo apenas enquanto faltar algum destes campos
+    info = await scrape_page(
+        item_url,
+        extractors,
+        required=["title", "price", "seller_link"],
+        attempts=attempts,
+        wait_time=wait_time,
+        pages=pages,
+    )
+    features = info.pop("features")
+    categories = info.pop("categories")
 
     if info["title"] is not None:
         info["item_id_bd"] = generate_unique_id(info["title"])
     else:
         info["item_id_bd"] = None
-    seller_link = await get_seller_link(item_url, attempts=5, wait_time=20)
-    info["seller_link"] = seller_link
     if info["seller_link"] is not None:
         seller = info["seller_link"]
         seller = " ".join(re.findall(r"([A-Z]+)+", seller.split("?")[0]))
@@ -354,19 +470,20 @@ async def process_item_url(item_url, kwargs_list):
         info["seller"] = None
 
     info["datetime"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    info["features"] = await get_features(item_url, attempts=2)
+    info["features"] = features
     info["item_url"] = item_url
-    info["categories"] = await get_categories(item_url, attempts=2)
+    info["categories"] = categories
     return info
 
 
-async def process_table(table, url, kwargs_list):
+async def process_table(table, url, kwargs_list, pages=None):
     """
     Processes a table of items by retrieving information for each item using asynchronous operations.
     Args:
         table (str): The name or identifier of the table.
         url (str): The URL of the webpage containing the items.
         kwargs_list (list): A list of keyword argument dictionaries for the 'process_item_url' function.
+        pages (PageCache): The pages fetched in the run, shared by the tables.
 
     Returns:
         list: A list of dictionaries containing the extracted information for each item.
@@ -374,8 +491,11 @@ async def process_table(table, url, kwargs_list):
     Raises:
         None
     """
-    items_urls = get_items_urls(url)
-    tasks = [process_item_url(item_url, kwargs_list) for item_url in items_urls]
+    pages = pages or PageCache()
+    items_urls = await get_items_urls(url, pages)
+    tasks = [
+        process_item_url(item_url, kwargs_list, pages=pages) for item_url in items_urls
+    ]
     results = await asyncio.gather(*tasks)
 
     for result in results:
@@ -399,16 +519,22 @@ async def main_item(dict_tables, kwargs_list):
         None
     """
     contents = []
-    coroutines = [
-        process_table(table, url, kwargs_list) for table, url in dict_tables.items()
-    ]
-    results = await asyncio.gather(*coroutines)
+    async with new_client() as client:
+        # itens listados em mais de uma seção são baixados uma única vez
+        pages = PageCache(client)
+        coroutines = [
+            process_table(table, url, kwargs_list, pages=pages)
+            for table, url in dict_tables.items()
+        ]
+        results = await asyncio.gather(*coroutines)
+        client.log_metrics()
     for table_results in results:
         contents.extend(table_results)
+    log(f"{len(contents)} itens coletados com {pages.requests} requisições")
     return contents
 
 
-async def get_seller_async(url, seller_id):
+async def get_seller_async(url, seller_id, pages=None, attempts=2, wait_time=2):
     kwargs_list = [
         {"class_": "experience"},
         {"class_": "seller-info__subtitle-sales"},
@@ -416,15 +542,27 @@ async def get_seller_async(url, seller_id):
         {"class_": "location__wrapper"},
     ]
     keys = ["experience", "reputation", "classification", "location"]
-    tasks = [get_byelement(url=url, attempts=2, **kwargs) for kwargs in kwargs_list]
-    results = await asyncio.gather(*tasks)
+    extractors = {
+        key: partial(get_byelement, **kwargs) for key, kwargs in zip(keys, kwargs_list)
+    }
+    extractors["opinions"] = get_features_seller
+    # a página é baixada de novo enquanto faltar algum campo do vendedor; as
+    # avaliações podem não existir e não fazem a página ser baixada de novo
+    results = await scrape_page(
+        url,
+        extractors,
+        required=keys,
+        attempts=attempts,
+        wait_time=wait_time,
+        pages=pages,
+    )
     info = {}
     info["title"] = (
         " ".join(re.findall(r"([A-Z]+)+", url.split("?")[0])).strip().title()
     )
-    for key, value in dict(zip(keys, results)).items():
-        info[key] = value
-    info["opinions"] = await asyncio.gather(get_features_seller(url, attempts=2))
+    for key in keys:
+        info[key] = results[key]
+    info["opinions"] = [results["opinions"]]
     info["date"] = datetime.now().strftime("%Y-%m-%d")
     info["seller_id"] = seller_id
 
@@ -435,10 +573,16 @@ async def main_seller(seller_ids, seller_links, file_dest):
     # get list of unique sellers
     dict_id_link = dict(zip(seller_ids, seller_links))
 
-    sellers = []
-    for seller_id, link in tqdm(dict_id_link.items()):
-        seller = await get_seller_async(link, seller_id)
-        sellers.append(seller)
+    # os vendedores são coletados em paralelo, dentro dos limites do cliente
+    async with new_client() as client:
+        pages = PageCache(client)
+        sellers = await asyncio.gather(
+            *[
+                get_seller_async(link, seller_id, pages=pages)
+                for seller_id, link in dict_id_link.items()
+            ]
+        )
+        client.log_metrics()
 
     # save sellers as a pandas dataframe
     df_sellers = pd.DataFrame(sellers)
@@ -106,3 +106,6 @@ class constants(Enum):  # pylint: disable=c0103
         12: "09",
         11: "10",
     }
+
+    # processes converting DBC files to csv, one file per process
+    MAX_WORKERS = 4
@@ -49,6 +49,10 @@ with Flow(
         "materialize after dump", default=True, required=False
     )
     dbt_alias = Parameter("dbt_alias", default=False, required=False)
+    # processes converting the DBC files
+    max_workers = Parameter(
+        "max_workers", default=br_ms_cnes_constants.MAX_WORKERS.value, required=False
+    )
 
     rename_flow_run = rename_current_flow_run_dataset_table(
         prefix="Dump: ", dataset_id=dataset_id, table_id=table_id, wait=table_id
@@ -70,6 +74,7 @@ with Flow(
         file_list=dbc_files,
         path=br_ms_cnes_constants.PATH.value[1],
         table=br_ms_cnes_constants.TABLE.value[0],
+        max_workers=max_workers,
         upstream_tasks=[files_path, dbc_files],
     )
 
@@ -189,6 +194,10 @@ with Flow(
         "materialize after dump", default=True, required=False
     )
     dbt_alias = Parameter("dbt_alias", default=False, required=False)
+    # processes converting the DBC files
+    max_workers = Parameter(
+        "max_workers", default=br_ms_cnes_constants.MAX_WORKERS.value, required=False
+    )
 
     rename_flow_run = rename_current_flow_run_dataset_table(
         prefix="Dump: ", dataset_id=dataset_id, table_id=table_id, wait=table_id
@@ -210,6 +219,7 @@ with Flow(
         file_list=dbc_files,
         path=br_ms_cnes_constants.PATH.value[1],
         table=br_ms_cnes_constants.TABLE.value[1],
+        max_workers=max_workers,
         upstream_tasks=[files_path, dbc_files],
     )
 
@@ -321,6 +331,10 @@ with Flow(name="br_ms_cnes.equipe", code_owners=["Gabriel Pisa"]) as br_ms_cnes_
         "materialize after dump", default=True, required=False
     )
     dbt_alias = Parameter("dbt_alias", default=False, required=False)
+    # processes converting the DBC files
+    max_workers = Parameter(
+        "max_workers", default=br_ms_cnes_constants.MAX_WORKERS.value, required=False
+    )
 
     rename_flow_run = rename_current_flow_run_dataset_table(
         prefix="Dump: ", dataset_id=dataset_id, table_id=table_id, wait=table_id
@@ -342,6 +356,7 @@ with Flow(name="br_ms_cnes.equipe", code_owners=["Gabriel Pisa"]) as br_ms_cnes_
         file_list=dbc_files,
         path=br_ms_cnes_constants.PATH.value[1],
         table=br_ms_cnes_constants.TABLE.value[4],
+        max_workers=max_workers,
         upstream_tasks=[files_path, dbc_files],
     )
 
@@ -453,6 +468,10 @@ with Flow(name="br_ms_cnes.leito", code_owners=["Gabriel Pisa"]) as br_ms_cnes_l
         "materialize after dump", default=True, required=False
     )
     dbt_alias = Parameter("dbt_alias", default=False, required=False)
+    # processes converting the DBC files
+    max_workers = Parameter(
+        "max_workers", default=br_ms_cnes_constants.MAX_WORKERS.value, required=False
+    )
 
     rename_flow_run = rename_current_flow_run_dataset_table(
         prefix="Dump: ", dataset_id=dataset_id, table_id=table_id, wait=table_id
@@ -474,6 +493,7 @@ with Flow(name="br_ms_cnes.leito", code_owners=["Gabriel Pisa"]) as br_ms_cnes_l
         file_list=dbc_files,
         path=br_ms_cnes_constants.PATH.value[1],
         table=br_ms_cnes_constants.TABLE.value[3],
+        max_workers=max_workers,
         upstream_tasks=[files_path, dbc_files],
     )
 
@@ -587,6 +607,10 @@ with Flow(
         "materialize after dump", default=True, required=False
     )
     dbt_alias = Parameter("dbt_alias", default=False, required=False)
+    # processes converting the DBC files
+    max_workers = Parameter(
+        "max_workers", default=br_ms_cnes_constants.MAX_WORKERS.value, required=False
+    )
 
     rename_flow_run = rename_current_flow_run_dataset_table(
         prefix="Dump: ", dataset_id=dataset_id, table_id=table_id, wait=table_id
@@ -608,6 +632,7 @@ with Flow(
         file_list=dbc_files,
         path=br_ms_cnes_constants.PATH.value[1],
         table=br_ms_cnes_constants.TABLE.value[2],
+        max_workers=max_workers,
         upstream_tasks=[files_path, dbc_files],
     )
 
@@ -4,29 +4,21 @@ Tasks for br_ms_cnes
 """
 
 
+import multiprocessing
 from prefect import task
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import timedelta
+from time import perf_counter
 from pipelines.utils.utils import log
 from pipelines.constants import constants
 
-import pandas as pd
-from ftplib import FTP
-import wget
-import os
-from rpy2.robjects.packages import importr
-import rpy2.robjects.packages as rpackages
-import rpy2.robjects as ro
-from rpy2.robjects import pandas2ri
-
 import datetime as dt
 
 from pipelines.datasets.br_ms_cnes.constants import constants as cnes_constants
 from pipelines.datasets.br_ms_cnes.utils import (
     list_all_cnes_dbc_files,
-    year_month_sigla_uf_parser,
-    pre_cleaning_to_utf8,
-    check_and_create_column,
-    if_column_exist_delete,
+    download_dbc_files,
+    convert_dbc_file,
 )
 
 
@@ -60,13 +52,18 @@ def parse_latest_cnes_dbc_files(database: str, cnes_group: str) -> list[str]:
     month_to_parse = cnes_constants.GENERATE_MONTH_TO_PARSE.value[current_month]
     year_month_to_parse = str(current_year) + str(month_to_parse)
 
-    list_files = []
-
     log(f"the YEARMONTH being used to parse files is: {year_month_to_parse}")
 
-    for file in available_dbs:
-        if file[-8:-4] == year_month_to_parse:
-            list_files.append(file)
+    list_files = [file for file in available_dbs if file[-8:-4] == year_month_to_parse]
+
+    # the cached listing may be older than the release of the files
+    if len(list_files) == 0:
+        available_dbs = list_all_cnes_dbc_files(
+            database=cnes_database, CNES_group=cnes_group_file, refresh=True
+        )
+        list_files = [
+            file for file in available_dbs if file[-8:-4] == year_month_to_parse
+        ]
 
     # check if list is null
     if len(list_files) == 0:
@@ -93,133 +90,41 @@ def access_ftp_donwload_files(file_list: list, path: str, table: str) -> list[st
     Returns:
         pd.DataFrame: a list with the downloaded files paths
     """
-    dbc_files_path_list = list()
-
     log(f"wrangling {table} data")
 
-    for file in file_list:
-        # build partition dirs
-
-        year_month_sigla_uf = year_month_sigla_uf_parser(file=file)
-
-        log(f"the file {file} was parsed to {year_month_sigla_uf}")
-        input_path = path + table + "/" + year_month_sigla_uf
-
-        os.system(f"mkdir -p {input_path}")
-
-        log(f"created input dir {path + table + '/' + year_month_sigla_uf}")
-
-        url = f"ftp://ftp.datasus.gov.br/{file}"
-        # access ftp
-        wget.download(url, out=input_path)
-
-        # list downloaded files
-        dbc_file = os.listdir(input_path)
-
-        # append to list
-        complete_path = input_path + "/" + dbc_file[0]
-        log(f"The complete path is -- {complete_path}")
-
-        dbc_files_path_list.append(complete_path)
-
-        log(f"The file {dbc_file} is in {input_path}")
-
-    return dbc_files_path_list
+    return download_dbc_files(file_list=file_list, path=path, table=table)
 
 
 # task to convert dbc to csv and save to a partitioned dir
 @task
-def read_dbc_save_csv(file_list: list, path: str, table: str) -> str:
+def read_dbc_save_csv(
+    file_list: list,
+    path: str,
+    table: str,
+    max_workers: int = cnes_constants.MAX_WORKERS.value,
+) -> str:
     """
-    Convert dbc to csv
+    Convert dbc to csv, one file per worker process
     """
-    log(f"wrangling {table} data")
-    # import R's utility package
-    utils = rpackages.importr("utils")
-
-    # select a mirror for R packages
-    utils.chooseCRANmirror(ind=1)
-
-    log("installing read.dbc package")
-    utils.install_packages("read.dbc")
-    readdbc = importr("read.dbc")
-
-    # list files
-    for file in file_list:
-        log(f"the file {file} is being converted to csv")
-        # read dbc
-        dbc_file = readdbc.read_dbc(file)
-        # convert from r to pandas
-        # https://rpy2.github.io/doc/latest/html/generated_rst/pandas.html#from-r-to-pandas
-
-        # parse year month sigla_uf
-        year_month_sigla_uf = year_month_sigla_uf_parser(file=file)
-        log(f"year_month_sigla_uf of {file} parsed")
-        output_path = path + table + "/" + year_month_sigla_uf
-
-        os.system(f"mkdir -p {output_path}")
-
-        log(f"created output partition dir {path + table + '/'+ year_month_sigla_uf}")
-
-        output_file = output_path + "/" + table + ".csv"
-
-        log(f"{file} 1 saved")
-        # salvar df
-        dbc_file.to_csvfile(
-            output_file,
-            sep=",",
-            na="",
-            row_names=False,
-        )
-
-        # ler df
-
-        log("file 2 being read")
-        df = pd.read_csv(output_file, dtype=str, encoding="latin1")
-
-        # tratar
-        list_columns_to_delete = [
-            "AP01CV07",
-            "AP02CV07",
-            "AP03CV07",
-            "AP04CV07",
-            "AP05CV07",
-            "AP06CV07",
-            "AP07CV07",
-        ]
-
-        if table == "estabelecimento":
-            df = pre_cleaning_to_utf8(df)
-            df = if_column_exist_delete(df=df, col_list=list_columns_to_delete)
-            df = check_and_create_column(df=df, col_name="NAT_JUR")
-
-        elif table == "profissional":
-            df = df[cnes_constants.COLUMNS_TO_KEEP.value["PF"]]
-
-        elif table == "leito":
-            df = df[cnes_constants.COLUMNS_TO_KEEP.value["LT"]]
-
-        elif table == "equipamento":
-            df = df[cnes_constants.COLUMNS_TO_KEEP.value["EP"]]
-
-        else:
-            # equipe
-            # the EQ table has different names for same variables across the years
-            # this is a workaround to standardize the names
-            standardize_colums = {
-                "IDEQUIPE": "ID_EQUIPE",
-                "AREA_EQP": "ID_AREA",
-            }
-
-            df.rename(columns=standardize_colums, inplace=True)
-
-            df = df[cnes_constants.COLUMNS_TO_KEEP.value["EQ"]]
-
-        # salvar de novo
-        df.to_csv(output_file, sep=",", na_rep="", index=False, encoding="utf-8")
-
-        log(
-            f"The file {file} was converted to csv and saved at {output_path + file + '.csv'}"
-        )
+    log(f"wrangling {table} data with {max_workers} processes")
+
+    start = perf_counter()
+    # workers are spawned, not forked: this process already runs threads (prefect's
+    # heartbeat, the FTP session lock) and forking it could deadlock the workers
+    with ProcessPoolExecutor(
+        max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        futures = {
+            executor.submit(convert_dbc_file, file, path, table): file
+            for file in file_list
+        }
+        for future in as_completed(futures):
+            output_file, rows, elapsed = future.result()
+            log(
+                f"The file {futures[future]} was converted to csv and saved at "
+                f"{output_file}: {rows} rows in {elapsed:.2f}s"
+            )
+
+    log(f"{len(file_list)} files converted in {perf_counter() - start:.2f}s")
 
     return path + table
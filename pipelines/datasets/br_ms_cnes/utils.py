@@ -3,35 +3,43 @@
 General purpose functions for the br_ms_cnes project
 """
 
-from ftplib import FTP
+import os
+from time import perf_counter
+from typing import Tuple
+
 import pandas as pd
 
+from pipelines.datasets.br_ms_cnes.constants import constants as cnes_constants
+from pipelines.utils.datasus import DatasusFTP, get_datasus_ftp
+from pipelines.utils.dbc import iter_dbc_batches
+from pipelines.utils.utils import log
+
 
 def list_all_cnes_dbc_files(
     database: str,
     CNES_group: str = None,
+    ftp: DatasusFTP = None,
+    refresh: bool = False,
 ) -> list:
     # todo: insert fcodeco link reference
     """
-    Enters FTP server and lists all DBCs files found for a
-    CNES-ST database group.
+    Lists all DBCs files found for a CNES-ST database group in the
+    DATASUS FTP server. The listing is cached, see `DatasusFTP.list`.
     """
+    ftp = ftp or get_datasus_ftp()
     available_dbs = list()
-    ftp = FTP("ftp.datasus.gov.br")
-    ftp.login()
 
     cnes_path = ["dissemin/publicos/CNES/200508_/Dados"]
 
     for path in cnes_path:
-        try:
-            # CNES
-            if database == "CNES":
-                if not CNES_group:
-                    raise ValueError("No group assigned to CNES_group")
-                available_dbs.extend(ftp.nlst(f"{path}/{CNES_group}/*.DBC"))
-        except Exception as e:
-            raise e
-    ftp.close()
+        # CNES
+        if database == "CNES":
+            if not CNES_group:
+                raise ValueError("No group assigned to CNES_group")
+            available_dbs.extend(
+                entry["path"]
+                for entry in ftp.list(f"{path}/{CNES_group}", "*.DBC", refresh=refresh)
+            )
     return available_dbs
 
 
@@ -131,3 +139,112 @@ def if_column_exist_delete(df: pd.DataFrame, col_list: str):
             del df[col]
 
     return df
+
+
+def download_dbc_files(
+    file_list: list, path: str, table: str, ftp: DatasusFTP = None
+) -> list:
+    """Downloads DATASUS files to their input partition dirs over the shared
+    FTP connection
+
+    Args:
+        file_list (list): paths of the files in the FTP server
+        path (str): root of the input dirs
+        table (str): table name
+
+    Returns:
+        list: the downloaded files paths
+    """
+    ftp = ftp or get_datasus_ftp()
+    dbc_files_path_list = []
+
+    for file in file_list:
+        input_path = path + table + "/" + year_month_sigla_uf_parser(file=file)
+        os.makedirs(input_path, exist_ok=True)
+        complete_path = input_path + "/" + os.path.basename(file)
+
+        start = perf_counter()
+        ftp.download(file, complete_path)
+        elapsed = perf_counter() - start
+
+        log(
+            f"{file} downloaded to {complete_path} in {elapsed:.2f}s "
+            f"({os.path.getsize(complete_path)} bytes)"
+        )
+        dbc_files_path_list.append(complete_path)
+
+    return dbc_files_path_list
+
+
+def convert_dbc_file(file: str, path: str, table: str) -> Tuple[str, int, float]:
+    """Converts a DBC file to a cleaned csv in its output partition dir. It runs
+    in a worker process, so it does not log
+
+    Args:
+        file (str): path of the DBC file
+        path (str): root of the output dirs
+        table (str): table name
+
+    Returns:
+        tuple: the csv path, its number of rows and the elapsed seconds
+    """
+    start = perf_counter()
+    output_path = path + table + "/" + year_month_sigla_uf_parser(file=file)
+    os.makedirs(output_path, exist_ok=True)
+    output_file = output_path + "/" + table + ".csv"
+
+    list_columns_to_delete = [
+        "AP01CV07",
+        "AP02CV07",
+        "AP03CV07",
+        "AP04CV07",
+        "AP05CV07",
+        "AP06CV07",
+        "AP07CV07",
+    ]
+
+    rows = 0
+    # read dbc in batches, cleaning and appending each one to the csv; values are
+    # written as the previous R reader wrote them (`1e+05`, `TRUE`)
+    for i, df in enumerate(iter_dbc_batches(file, encoding="latin1", as_text=True)):
+        # tratar
+        if table == "estabelecimento":
+            df = pre_cleaning_to_utf8(df)
+            df = if_column_exist_delete(df=df, col_list=list_columns_to_delete)
+            df = check_and_create_column(df=df, col_name="NAT_JUR")
+
+        elif table == "profissional":
+            df = df[cnes_constants.COLUMNS_TO_KEEP.value["PF"]]
+
+        elif table == "leito":
+            df = df[cnes_constants.COLUMNS_TO_KEEP.value["LT"]]
+
+        elif table == "equipamento":
+            df = df[cnes_constants.COLUMNS_TO_KEEP.value["EP"]]
+
+        else:
+            # equipe
+            # the EQ table has different names for same variables across the years
+            # this is a workaround to standardize the names
+            standardize_colums = {
+                "IDEQUIPE": "ID_EQUIPE",
+                "AREA_EQP": "ID_AREA",
+            }
+
+            df.rename(columns=standardize_colums, inplace=True)
+
+            df = df[cnes_constants.COLUMNS_TO_KEEP.value["EQ"]]
+
+        # salvar
+        df.to_csv(
+            output_file,
+            sep=",",
+            na_rep="",
+            index=False,
+            encoding="utf-8",
+            mode="a" if i else "w",
+            header=not i,
+        )
+        rows += len(df)
+
+    return output_file, rows, perf_counter() - start
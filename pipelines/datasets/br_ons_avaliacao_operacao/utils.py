@@ -1,16 +1,15 @@
 # -*- coding: utf-8 -*-
 
-import wget
-import requests
 from bs4 import BeautifulSoup
 import os
 import pandas as pd
-from io import StringIO
 from typing import List
 from typing import Dict
-import time as tm
 import unicodedata
 
+from pipelines.utils.architecture import get_architecture
+from pipelines.utils.download import download_files, get_downloader
+
 
 def crawler_ons(
     url: str,
@@ -23,7 +22,7 @@ def crawler_ons(
         list: a list of file links
     """
     # Send a GET request to the URL
-    response = requests.get(url)
+    response = get_downloader().get(url)
 
     # Parse the HTML content of the response using lxml
     html = response.text
@@ -55,15 +54,8 @@ def download_data(
         mun for 'município'.
         table_name (str): the table name is the original name of the zip file with raw data from comex stat website
     """
-    # selects a url given a table name
-    for url in url_list:
-        # log(f"Downloading data from {url}")
-
-        # downloads the file and saves it
-        wget.download(url, out=path + table_name + "/input")
-        # just for precaution,
-        # sleep for 8 secs in between iterations
-        tm.sleep(8)
+    # downloads the files concurrently, saving them with their original names
+    download_files([(url, path + table_name + "/input") for url in url_list])
 
 
 def create_paths(
@@ -169,33 +161,14 @@ def change_columns_name(df: pd.DataFrame, url: str) -> pd.DataFrame:
     """
 
     try:
-        # Converte a URL de edição para um link de exportação em formato csv
-        url = url.replace("edit#gid=", "export?format=csv&gid=")
-
-        # Coloca a arquitetura em um dataframe
-        df_architecture = pd.read_csv(
-            StringIO(requests.get(url, timeout=10).content.decode("utf-8"))
-        )
-
-        df_architecture["original_name"] = df_architecture["original_name"].fillna("")
-        df_architecture["original_name"] = df_architecture["original_name"].str.strip()
-        df_architecture["name"] = df_architecture["name"].str.strip()
-
-        values = df_architecture["name"]
-        keys = df_architecture["original_name"]
-        my_dict = {k: v for k, v in zip(keys, values)}
+        # arquitetura baixada uma vez por execução, ver ArchitectureRegistry.
+        # Colunas sem nome na arquitetura (ex. ano e mes criadas a partir de
+        # uma data) não são renomeadas
+        my_dict = get_architecture(url).rename
 
         print(my_dict)
-        # Cria um dicionário de nomes de colunas e tipos de dados a partir do dataframe df_architecture
-        # column_name_dict = df_architecture.set_index("original_name")["name"].to_dict()
 
-        # ex. caso seja preciso criar uma nova coluna que nao
-        # existe na arquitetura ex. criar colunas ano e mes a
-        # partir de uma data. Esse check evita que a coluna criada
-        # seja renomeada com um valor nulo
-        for key, value in my_dict.items():
-            if value:  # Check if value is not empty
-                df.rename(columns={key: value}, inplace=True)
+        df.rename(columns=my_dict, inplace=True)
 
         print("cols renamed")
         print(df.columns)
@@ -275,18 +248,4 @@ def order_df(df: pd.DataFrame, url: str) -> pd.DataFrame:
         dict: com chaves sendo os nomes originais e valores sendo os nomes padronizados
     """
 
-    # Converte a URL de edição para um link de exportação em formato csv
-    url = url.replace("edit#gid=", "export?format=csv&gid=")
-
-    # Coloca a arquitetura em um dataframe
-    df_architecture = pd.read_csv(
-        StringIO(requests.get(url, timeout=10).content.decode("utf-8"))
-    )
-
-    df_architecture["name"] = df_architecture["name"].str.strip()
-
-    list = df_architecture["name"]
-
-    df = df[list]
-
-    return df
+    return df[get_architecture(url).columns]
@@ -22,6 +22,7 @@ from pipelines.utils.constants import constants as utils_constants
 from pipelines.utils.decorators import Flow
 from pipelines.utils.execute_dbt_model.constants import constants as dump_db_constants
 from pipelines.utils.tasks import (
+    preload_architectures,
     rename_current_flow_run_dataset_table,
     get_current_flow_labels,
     create_table_and_upload_to_gcs,
@@ -64,9 +65,17 @@ with Flow(
         table_name=ons_constants.TABLE_NAME_LIST.value[0],
     )
 
+    architectures = preload_architectures(
+        urls=[
+            ons_constants.TABLE_NAME_ARCHITECHTURE_DICT.value[
+                ons_constants.TABLE_NAME_LIST.value[0]
+            ]
+        ]
+    )
+
     filepath = wrang_data(
         table_name=ons_constants.TABLE_NAME_LIST.value[0],
-        upstream_tasks=[dow_data],
+        upstream_tasks=[dow_data, architectures],
     )
 
     wait_upload_table = create_table_and_upload_to_gcs(
@@ -157,9 +166,17 @@ with Flow(
         table_name=ons_constants.TABLE_NAME_LIST.value[1],
     )
 
+    architectures = preload_architectures(
+        urls=[
+            ons_constants.TABLE_NAME_ARCHITECHTURE_DICT.value[
+                ons_constants.TABLE_NAME_LIST.value[1]
+            ]
+        ]
+    )
+
     filepath = wrang_data(
         table_name=ons_constants.TABLE_NAME_LIST.value[1],
-        upstream_tasks=[dow_data],
+        upstream_tasks=[dow_data, architectures],
     )
 
     wait_upload_table = create_table_and_upload_to_gcs(
@@ -250,9 +267,17 @@ with Flow(
         table_name=ons_constants.TABLE_NAME_LIST.value[2],
     )
 
+    architectures = preload_architectures(
+        urls=[
+            ons_constants.TABLE_NAME_ARCHITECHTURE_DICT.value[
+                ons_constants.TABLE_NAME_LIST.value[2]
+            ]
+        ]
+    )
+
     filepath = wrang_data(
         table_name=ons_constants.TABLE_NAME_LIST.value[2],
-        upstream_tasks=[dow_data],
+        upstream_tasks=[dow_data, architectures],
     )
 
     wait_upload_table = create_table_and_upload_to_gcs(
@@ -344,9 +369,17 @@ with Flow(
         table_name=ons_constants.TABLE_NAME_LIST.value[3],
     )
 
+    architectures = preload_architectures(
+        urls=[
+            ons_constants.TABLE_NAME_ARCHITECHTURE_DICT.value[
+                ons_constants.TABLE_NAME_LIST.value[3]
+            ]
+        ]
+    )
+
     filepath = wrang_data(
         table_name=ons_constants.TABLE_NAME_LIST.value[3],
-        upstream_tasks=[dow_data],
+        upstream_tasks=[dow_data, architectures],
     )
 
     wait_upload_table = create_table_and_upload_to_gcs(
@@ -4,7 +4,6 @@ Tasks for br_ons_avaliacao_operacao
 """
 import os
 import pandas as pd
-import time as tm
 from datetime import datetime
 
 from prefect import task
@@ -53,14 +52,12 @@ def download_data(
         url=constants.TABLE_NAME_URL_DICT.value[table_name],
     )
     log("urls fetched")
-    tm.sleep(2)
     dw(
         path=constants.PATH.value,
         url_list=url_list,
         table_name=table_name,
     )
     log("data downloaded")
-    tm.sleep(2)
 
 
 @task
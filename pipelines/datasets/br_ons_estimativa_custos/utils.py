@@ -3,17 +3,16 @@
 General purpose functions for the br_ons_estimativa_custos project
 """
 
-import wget
-import requests
 from bs4 import BeautifulSoup
 import os
 import pandas as pd
-from io import StringIO
 from typing import List
 from typing import Dict
-import time as tm
 import unicodedata
 
+from pipelines.utils.architecture import get_architecture
+from pipelines.utils.download import download_files, get_downloader
+
 
 def crawler_ons(
     url: str,
@@ -26,7 +25,7 @@ def crawler_ons(
         list: a list of file links
     """
     # Send a GET request to the URL
-    response = requests.get(url)
+    response = get_downloader().get(url)
 
     # Parse the HTML content of the response using lxml
     html = response.text
@@ -58,15 +57,8 @@ def download_data(
         mun for 'município'.
         table_name (str): the table name is the original name of the zip file with raw data from comex stat website
     """
-    # selects a url given a table name
-    for url in url_list:
-        # log(f"Downloading data from {url}")
-
-        # downloads the file and saves it
-        wget.download(url, out=path + table_name + "/input")
-        # just for precaution,
-        # sleep for 8 secs in between iterations
-        tm.sleep(8)
+    # downloads the files concurrently, saving them with their original names
+    download_files([(url, path + table_name + "/input") for url in url_list])
 
 
 def create_paths(
@@ -171,27 +163,14 @@ def change_columns_name(df: pd.DataFrame, url: str) -> pd.DataFrame:
     """
 
     try:
-        # Converte a URL de edição para um link de exportação em formato csv
-        url = url.replace("edit#gid=", "export?format=csv&gid=")
-
-        # Coloca a arquitetura em um dataframe
-        df_architecture = pd.read_csv(
-            StringIO(requests.get(url, timeout=10).content.decode("utf-8"))
-        )
-
-        df_architecture["original_name"] = df_architecture["original_name"].fillna("")
-        df_architecture["original_name"] = df_architecture["original_name"].str.strip()
-        df_architecture["name"] = df_architecture["name"].str.strip()
-
-        values = df_architecture["name"]
-        keys = df_architecture["original_name"]
-        my_dict = {k: v for k, v in zip(keys, values)}
+        # arquitetura baixada uma vez por execução, ver ArchitectureRegistry.
+        # Colunas sem nome na arquitetura (ex. ano e mes criadas a partir de
+        # uma data) não são renomeadas
+        my_dict = get_architecture(url).rename
 
         print(my_dict)
 
-        for key, value in my_dict.items():
-            if value:  # Check if value is not empty
-                df.rename(columns={key: value}, inplace=True)
+        df.rename(columns=my_dict, inplace=True)
 
     except Exception as e:
         # Handle any exceptions that occur during the process
@@ -240,18 +219,4 @@ def order_df(df: pd.DataFrame, url: str) -> pd.DataFrame:
         dict: com chaves sendo os nomes originais e valores sendo os nomes padronizados
     """
 
-    # Converte a URL de edição para um link de exportação em formato csv
-    url = url.replace("edit#gid=", "export?format=csv&gid=")
-
-    # Coloca a arquitetura em um dataframe
-    df_architecture = pd.read_csv(
-        StringIO(requests.get(url, timeout=10).content.decode("utf-8"))
-    )
-
-    df_architecture["name"] = df_architecture["name"].str.strip()
-
-    list = df_architecture["name"]
-
-    df = df[list]
-
-    return df
+    return df[get_architecture(url).columns]
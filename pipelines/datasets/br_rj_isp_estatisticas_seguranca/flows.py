@@ -22,6 +22,7 @@ from pipelines.datasets.br_rj_isp_estatisticas_seguranca.tasks import (
 from pipelines.utils.decorators import Flow
 from pipelines.utils.execute_dbt_model.constants import constants as dump_db_constants
 from pipelines.utils.tasks import (
+    preload_architectures,
     create_table_and_upload_to_gcs,
     rename_current_flow_run_dataset_table,
     get_current_flow_labels,
@@ -75,9 +76,19 @@ with Flow(
         save_dir=isp_constants.INPUT_PATH.value,
     )
 
+    architectures = preload_architectures(
+        urls=[
+            isp_constants.dict_arquitetura.value[
+                isp_constants.dict_original.value[
+                    isp_constants.EVOLUCAO_MENSAL_CISP.value
+                ]
+            ]
+        ]
+    )
+
     filepath = clean_data(
         file_name=isp_constants.EVOLUCAO_MENSAL_CISP.value,
-        upstream_tasks=[d_files],
+        upstream_tasks=[d_files, architectures],
     )
 
     wait_upload_table = create_table_and_upload_to_gcs(
@@ -166,9 +177,19 @@ with Flow(
         save_dir=isp_constants.INPUT_PATH.value,
     )
 
+    architectures = preload_architectures(
+        urls=[
+            isp_constants.dict_arquitetura.value[
+                isp_constants.dict_original.value[
+                    isp_constants.TAXA_EVOLUCAO_MENSAL_UF.value
+                ]
+            ]
+        ]
+    )
+
     filepath = clean_data(
         file_name=isp_constants.TAXA_EVOLUCAO_MENSAL_UF.value,
-        upstream_tasks=[d_files],
+        upstream_tasks=[d_files, architectures],
     )
 
     wait_upload_table = create_table_and_upload_to_gcs(
@@ -259,9 +280,19 @@ with Flow(
         save_dir=isp_constants.INPUT_PATH.value,
     )
 
+    architectures = preload_architectures(
+        urls=[
+            isp_constants.dict_arquitetura.value[
+                isp_constants.dict_original.value[
+                    isp_constants.TAXA_EVOLUCAO_MENSAL_MUNICIPIO.value
+                ]
+            ]
+        ]
+    )
+
     filepath = clean_data(
         file_name=isp_constants.TAXA_EVOLUCAO_MENSAL_MUNICIPIO.value,
-        upstream_tasks=[d_files],
+        upstream_tasks=[d_files, architectures],
     )
 
     wait_upload_table = create_table_and_upload_to_gcs(
@@ -353,9 +384,19 @@ with Flow(
         save_dir=isp_constants.INPUT_PATH.value,
     )
 
+    architectures = preload_architectures(
+        urls=[
+            isp_constants.dict_arquitetura.value[
+                isp_constants.dict_original.value[
+                    isp_constants.FEMINICIDIO_MENSAL_CISP.value
+                ]
+            ]
+        ]
+    )
+
     filepath = clean_data(
         file_name=isp_constants.FEMINICIDIO_MENSAL_CISP.value,
-        upstream_tasks=[d_files],
+        upstream_tasks=[d_files, architectures],
     )
 
     wait_upload_table = create_table_and_upload_to_gcs(
@@ -447,9 +488,19 @@ with Flow(
         save_dir=isp_constants.INPUT_PATH.value,
     )
 
+    architectures = preload_architectures(
+        urls=[
+            isp_constants.dict_arquitetura.value[
+                isp_constants.dict_original.value[
+                    isp_constants.EVOLUCAO_POLICIAL_MORTO.value
+                ]
+            ]
+        ]
+    )
+
     filepath = clean_data(
         file_name=isp_constants.EVOLUCAO_POLICIAL_MORTO.value,
-        upstream_tasks=[d_files],
+        upstream_tasks=[d_files, architectures],
     )
 
     wait_upload_table = create_table_and_upload_to_gcs(
@@ -542,9 +593,19 @@ with Flow(
         save_dir=isp_constants.INPUT_PATH.value,
     )
 
+    architectures = preload_architectures(
+        urls=[
+            isp_constants.dict_arquitetura.value[
+                isp_constants.dict_original.value[
+                    isp_constants.ARMAS_APREENDIDADAS_MENSAL.value
+                ]
+            ]
+        ]
+    )
+
     filepath = clean_data(
         file_name=isp_constants.ARMAS_APREENDIDADAS_MENSAL.value,
-        upstream_tasks=[d_files],
+        upstream_tasks=[d_files, architectures],
     )
 
     wait_upload_table = create_table_and_upload_to_gcs(
@@ -633,9 +694,19 @@ with Flow(
         save_dir=isp_constants.INPUT_PATH.value,
     )
 
+    architectures = preload_architectures(
+        urls=[
+            isp_constants.dict_arquitetura.value[
+                isp_constants.dict_original.value[
+                    isp_constants.EVOLUCAO_MENSAL_MUNICIPIO.value
+                ]
+            ]
+        ]
+    )
+
     filepath = clean_data(
         file_name=isp_constants.EVOLUCAO_MENSAL_MUNICIPIO.value,
-        upstream_tasks=[d_files],
+        upstream_tasks=[d_files, architectures],
     )
 
     wait_upload_table = create_table_and_upload_to_gcs(
@@ -724,9 +795,19 @@ with Flow(
         save_dir=isp_constants.INPUT_PATH.value,
     )
 
+    architectures = preload_architectures(
+        urls=[
+            isp_constants.dict_arquitetura.value[
+                isp_constants.dict_original.value[
+                    isp_constants.EVOLUCAO_MENSAL_UF.value
+                ]
+            ]
+        ]
+    )
+
     filepath = clean_data(
         file_name=isp_constants.EVOLUCAO_MENSAL_UF.value,
-        upstream_tasks=[d_files],
+        upstream_tasks=[d_files, architectures],
     )
 
     wait_upload_table = create_table_and_upload_to_gcs(
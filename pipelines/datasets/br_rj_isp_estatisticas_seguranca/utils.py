@@ -1,11 +1,11 @@
 # -*- coding: utf-8 -*-
 import pandas as pd
-from io import StringIO
 import os
-import requests
 from typing import List
 from typing import Dict
 
+from pipelines.utils.architecture import get_architecture
+
 # build a dict that maps a table name to a architectura and
 # another dict that maps an original table name to a
 # trated table name
@@ -20,13 +20,8 @@ def change_columns_name(url_architecture: str) -> Dict[str, str]:
     Returns:
         dict: com chaves sendo os nomes originais e valores sendo os nomes padronizados
     """
-    # Converte a URL de edição para um link de exportação em formato csv
-    url = url_architecture.replace("edit#gid=", "export?format=csv&gid=")
-
-    # Coloca a arquitetura em um dataframe
-    df_architecture = pd.read_csv(
-        StringIO(requests.get(url, timeout=10).content.decode("utf-8"))
-    )
+    # Coloca a arquitetura em um dataframe, baixada uma vez por execução
+    df_architecture = get_architecture(url_architecture).table
 
     # Cria um dicionário de nomes de colunas e tipos de dados a partir do dataframe df_architecture
     column_name_dict = dict(
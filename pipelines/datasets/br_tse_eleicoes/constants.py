@@ -14,3 +14,6 @@ class constants(Enum):  # pylint: disable=c0103
     CANDIDATOS22_ZIP = "https://cdn.tse.jus.br/estatistica/sead/odsele/consulta_cand/consulta_cand_2022.zip"
     BENS22_ZIP = "https://cdn.tse.jus.br/estatistica/sead/odsele/bem_candidato/bem_candidato_2022.zip"
     CONTAS22_ZIP = "https://cdn.tse.jus.br/estatistica/sead/odsele/prestacao_contas/prestacao_de_contas_eleitorais_candidatos_2022.zip"
+    # mapeamento persistente das chaves dos candidatos para o id_candidato_bd
+    ID_CANDIDATO_BD_BLOB = "raw/br_tse_eleicoes/id_candidato_bd/mapeamento.csv"
+    ID_CANDIDATO_BD_PATH = "/tmp/data/id_candidato_bd/mapeamento.csv"
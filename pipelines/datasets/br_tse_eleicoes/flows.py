@@ -63,7 +63,6 @@ with Flow(
 
         gfiles_task = get_csv_files(
             url=tse_constants.CANDIDATOS22_ZIP.value,
-            save_path="/tmp/data/",
             upstream_tasks=[d22_task],
         )
 
@@ -74,6 +73,7 @@ with Flow(
             start=start,
             end=2022,
             id_candidato_bd=id_candidato_bd,
+            mode=materialization_mode,
             upstream_tasks=[c22_task],
         )
 
@@ -92,7 +92,6 @@ with Flow(
 
         gfiles_task = get_csv_files(
             url=tse_constants.CANDIDATOS22_ZIP.value,
-            save_path="/tmp/data/",
             mkdir=False,
             upstream_tasks=[d22_task],
         )
@@ -104,6 +103,7 @@ with Flow(
             start=start,
             end=2022,
             id_candidato_bd=id_candidato_bd,
+            mode=materialization_mode,
             upstream_tasks=[c22_task],
         )
 
@@ -190,7 +190,6 @@ with Flow(
 
         gfiles_task = get_csv_files(
             url=tse_constants.BENS22_ZIP.value,
-            save_path="/tmp/data/",
             upstream_tasks=[d22_task],
         )
 
@@ -215,7 +214,6 @@ with Flow(
     with case(id_candidato_bd, False):
         gfiles_task = get_csv_files(
             url=tse_constants.BENS22_ZIP.value,
-            save_path="/tmp/data/",
             mkdir=True,
             upstream_tasks=[rename_flow_run],
         )
@@ -307,7 +305,6 @@ with Flow(
     with case(id_candidato_bd, False):
         gfiles_task = get_csv_files(
             url=tse_constants.CONTAS22_ZIP.value,
-            save_path="/tmp/data/",
             mkdir=True,
             upstream_tasks=[rename_flow_run],
         )
@@ -391,7 +388,6 @@ with Flow(
     with case(id_candidato_bd, False):
         gfiles_task = get_csv_files(
             url=tse_constants.CONTAS22_ZIP.value,
-            save_path="/tmp/data/",
             mkdir=True,
             upstream_tasks=[rename_flow_run],
         )
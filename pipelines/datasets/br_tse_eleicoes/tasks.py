@@ -4,26 +4,27 @@ Tasks for br_tse_eleicoes
 """
 # pylint: disable=invalid-name,line-too-long
 from datetime import timedelta
-import zipfile
 import os
 from glob import glob
 from itertools import product
 import re
 
-import requests
-from unidecode import unidecode
 from tqdm import tqdm
 import numpy as np
 import pandas as pd
 from prefect import task
 from pipelines.constants import constants
-from pipelines.utils.utils import log
+from pipelines.utils.download import download_and_unzip
+from pipelines.utils.text import digit_id, lower_ascii, normalize_text, title_ascii
+from pipelines.utils.utils import download_blobs_from_gcs, log
+from pipelines.datasets.br_tse_eleicoes.constants import constants as tse_constants
 from pipelines.datasets.br_tse_eleicoes.utils import (
+    CandidateIdentities,
     get_id_candidato_bd,
-    get_blobs_from_raw,
+    get_dev_bucket,
     normalize_dahis,
     get_data_from_prod,
-    clean_digit_id,
+    update_candidate_identities,
 )
 
 
@@ -36,40 +37,29 @@ def download_before22(table_id: str, start: int) -> None:
     Download external data from previous elections
     """
     os.system("mkdir -p /tmp/data/input")
-    blobs = get_blobs_from_raw(dataset_id="br_tse_eleicoes", table_id=table_id)
-    for blob in tqdm(blobs):
-        if int("".join([k for k in blob.name if k.isdigit()])) > start:
-            df = pd.read_csv(blob.public_url, encoding="utf-8")
-            os.system(f"mkdir -p /tmp/data/{'/'.join(blob.name.split('/')[:-1])}")
-            df.to_csv(f"/tmp/data/{blob.name}", sep=";", index=False, encoding="utf-8")
-            del df
-
-    log(os.system("tree /tmp/data/"))
+    # os arquivos brutos são copiados como estão, de um cache local por geração
+    download_blobs_from_gcs(
+        get_dev_bucket(dataset_id="br_tse_eleicoes", table_id=table_id),
+        f"raw/br_tse_eleicoes/{table_id}",
+        "/tmp/data",
+        blob_filter=lambda blob: int("".join([k for k in blob.name if k.isdigit()]))
+        > start,
+    )
 
 
 @task(
     max_retries=constants.TASK_MAX_RETRIES.value,
     retry_delay=timedelta(seconds=constants.TASK_RETRY_DELAY.value),
 )
-def get_csv_files(url, save_path, chunk_size=128, mkdir=False) -> None:
+def get_csv_files(url, mkdir=False) -> None:
     """
-    Gets all csv files from a url and saves them to a directory.
+    Gets all csv files from a zip file at a url and saves them to a directory.
+    Other files in the zip file are not extracted.
     """
     if mkdir:
         os.system("mkdir -p /tmp/data/input/")
 
-    request_headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/80.0.3987.149 Safari/537.36",
-    }
-    r = requests.get(url, headers=request_headers, stream=True, timeout=10)
-    save_path = save_path + url.split("/")[-1]
-    with open(save_path, "wb") as fd:
-        for chunk in r.iter_content(chunk_size=chunk_size):
-            fd.write(chunk)
-
-    with zipfile.ZipFile(save_path) as z:
-        z.extractall("/tmp/data/input")
-    os.system('cd /tmp/data/input; find . -type f ! -iname "*.csv" -delete')
+    download_and_unzip(url, "/tmp/data/input", pattern="*.csv")
     os.system("tree /tmp/data/input")
 
 
@@ -96,92 +86,47 @@ def clean_candidatos22(folder: str) -> str:
 
     table = pd.DataFrame(
         {
-            "tipo_eleicao": [
-                unidecode(unidecode(k.lower())) if isinstance(k, str) else k
-                for k in df["NM_TIPO_ELEICAO"].to_list()
-            ],
+            "tipo_eleicao": lower_ascii(df["NM_TIPO_ELEICAO"]).to_list(),
             "sigla_uf": df["SG_UF"].to_list(),
             "id_municipio": n * [np.nan],
             "id_municipio_tse": n * [np.nan],
             "id_candidato_bd": n * [np.nan],
-            "cpf": [
-                clean_digit_id(number=k, n_digits=11) if isinstance(k, int) else k
-                for k in df["NR_CPF_CANDIDATO"].to_list()
-            ],
-            "titulo_eleitoral": [
-                clean_digit_id(number=k, n_digits=12) if isinstance(k, int) else k
-                for k in df["NR_TITULO_ELEITORAL_CANDIDATO"].to_list()
-            ],
-            "sequencial": [
-                clean_digit_id(number=k, n_digits=12) if isinstance(k, int) else k
-                for k in df["SQ_CANDIDATO"].to_list()
-            ],
+            "cpf": digit_id(df["NR_CPF_CANDIDATO"], n_digits=11).to_list(),
+            "titulo_eleitoral": digit_id(
+                df["NR_TITULO_ELEITORAL_CANDIDATO"], n_digits=12
+            ).to_list(),
+            "sequencial": digit_id(df["SQ_CANDIDATO"], n_digits=12).to_list(),
             "numero": df["NR_CANDIDATO"].to_list(),
-            "nome": [
-                unidecode(k.title()) if isinstance(k, str) else k
-                for k in df["NM_CANDIDATO"].to_list()
-            ],
-            "nome_urna": [
-                unidecode(k.title()) if isinstance(k, str) else k
-                for k in df["NM_URNA_CANDIDATO"].to_list()
-            ],
+            "nome": title_ascii(df["NM_CANDIDATO"]).to_list(),
+            "nome_urna": title_ascii(df["NM_URNA_CANDIDATO"]).to_list(),
             "numero_partido": df["NR_PARTIDO"].to_list(),
             "sigla_partido": df["SG_PARTIDO"].to_list(),
-            "cargo": [
-                unidecode(k.lower()) if isinstance(k, str) else k
-                for k in df["DS_CARGO"].to_list()
-            ],
-            "situacao": [
-                unidecode(k.lower()) if isinstance(k, str) else k
-                for k in df["DS_SITUACAO_CANDIDATURA"].to_list()
-            ],
-            "ocupacao": [
-                unidecode(k.lower()) if isinstance(k, str) else k
-                for k in df["DS_OCUPACAO"].to_list()
-            ],
+            "cargo": lower_ascii(df["DS_CARGO"]).to_list(),
+            "situacao": lower_ascii(df["DS_SITUACAO_CANDIDATURA"]).to_list(),
+            "ocupacao": lower_ascii(df["DS_OCUPACAO"]).to_list(),
             "data_nascimento": pd.to_datetime(
                 df["DT_NASCIMENTO"], format="%d/%m/%Y"
             ).to_list(),
             "idade": df["NR_IDADE_DATA_POSSE"].to_list(),
-            "genero": [
-                unidecode(k.lower()) if isinstance(k, str) else k
-                for k in df["DS_GENERO"].to_list()
-            ],
-            "instrucao": [
-                unidecode(k.lower()) if isinstance(k, str) else k
-                for k in df["DS_GRAU_INSTRUCAO"].to_list()
-            ],
-            "estado_civil": [
-                unidecode(k.lower()) if isinstance(k, str) else k
-                for k in df["DS_ESTADO_CIVIL"].to_list()
-            ],
-            "nacionalidade": [
-                unidecode(k.lower()) if isinstance(k, str) else k
-                for k in df["DS_NACIONALIDADE"].to_list()
-            ],
+            "genero": lower_ascii(df["DS_GENERO"]).to_list(),
+            "instrucao": lower_ascii(df["DS_GRAU_INSTRUCAO"]).to_list(),
+            "estado_civil": lower_ascii(df["DS_ESTADO_CIVIL"]).to_list(),
+            "nacionalidade": lower_ascii(df["DS_NACIONALIDADE"]).to_list(),
             "sigla_uf_nascimento": df["SG_UF_NASCIMENTO"].to_list(),
-            "municipio_nascimento": [
-                unidecode(k.title()) if isinstance(k, str) else k
-                for k in df["NM_MUNICIPIO_NASCIMENTO"].to_list()
-            ],
-            "email": [
-                k.lower() if isinstance(k, str) else k for k in df["NM_EMAIL"].to_list()
-            ],
-            "raca": [
-                unidecode(k.lower()) if isinstance(k, str) else k
-                for k in df["DS_COR_RACA"].to_list()
-            ],
+            "municipio_nascimento": title_ascii(
+                df["NM_MUNICIPIO_NASCIMENTO"]
+            ).to_list(),
+            "email": normalize_text(
+                df["NM_EMAIL"], case="lower", strip_accents=False
+            ).to_list(),
+            "raca": lower_ascii(df["DS_COR_RACA"]).to_list(),
             "situacao_totalizacao": df["DS_SITUACAO_CANDIDATO_TOT"].to_list(),
             "numero_federacao": df["NR_FEDERACAO"].to_list(),
-            "nome_federacao": [
-                unidecode(k.title()) if isinstance(k, str) else k
-                for k in df["NM_FEDERACAO"].to_list()
-            ],
+            "nome_federacao": title_ascii(df["NM_FEDERACAO"]).to_list(),
             "sigla_federacao": df["SG_FEDERACAO"].to_list(),
-            "composicao_federacao": [
-                unidecode(k.lower()) if isinstance(k, str) else k
-                for k in df["DS_COMPOSICAO_FEDERACAO"].to_list()
-            ],
+            "composicao_federacao": lower_ascii(
+                df["DS_COMPOSICAO_FEDERACAO"]
+            ).to_list(),
             "prestou_contas": df["ST_PREST_CONTAS"].to_list(),
         }
     )
@@ -199,7 +144,6 @@ def clean_candidatos22(folder: str) -> str:
 
     df.to_csv(
         "/tmp/data/raw/br_tse_eleicoes/candidatos/ano=2022/candidatos.csv",
-        sep=";",
         index=False,
     )
 
@@ -212,74 +156,69 @@ def clean_candidatos22(folder: str) -> str:
     max_retries=constants.TASK_MAX_RETRIES.value,
     retry_delay=timedelta(seconds=constants.TASK_RETRY_DELAY.value),
 )
-def build_candidatos(folder: str, start: int, end: int, id_candidato_bd: bool = False):
+def build_candidatos(
+    folder: str,
+    start: int,
+    end: int,
+    id_candidato_bd: bool = False,
+    mode: str = "prod",
+):
     """
     Builds the candidatos csv file.
+
+    With `id_candidato_bd`, the ids are resolved against the mapping saved by
+    the previous runs, which is updated with the new ids only after every year
+    is built, and only in `prod` mode.
     """
 
     if id_candidato_bd:
-        dfs = []
 
-        files = [f"{folder}/ano={ano}/candidatos.csv" for ano in range(end, start, -2)]
-
-        for file in files:
-            df = pd.read_csv(
-                file,
-                sep=";",
-                encoding="utf-8",
-                dtype={
-                    "id_candidato_bd": str,
-                    "cpf": str,
-                    "titulo_eleitoral": str,
-                    "sequencial": str,
-                },
-            )
-            df["ano"] = int(file.split("/")[-2].split("=")[-1])
-            dfs.append(df)
-
-        df = pd.concat(dfs)
-
-        df = get_id_candidato_bd(df)
+        def build(identities: CandidateIdentities) -> None:
+            # os ids são resolvidos uma eleição por vez, da mais antiga para a
+            # mais recente
+            for ano in sorted(range(end, start, -2)):
+                df = pd.read_csv(
+                    f"{folder}/ano={ano}/candidatos.csv",
+                    encoding="utf-8",
+                    dtype={
+                        "id_candidato_bd": str,
+                        "cpf": str,
+                        "titulo_eleitoral": str,
+                        "sequencial": str,
+                    },
+                )
+                df["ano"] = ano
 
-        df = normalize_dahis(df)
+                table = normalize_dahis(get_id_candidato_bd(df, identities))
+                log(f"{ano}: {table.shape[0]} candidatos")
 
-        for ano in range(end, start, -2):
-            os.system(f"mkdir -p /tmp/data/output/ano={ano}/")
-            table = df[df["ano"] == ano]
-            table["cpf"] = [
-                clean_digit_id(number=k, n_digits=11) if isinstance(k, int) else k
-                for k in table["cpf"].to_list()
-            ]
-            table["titulo_eleitoral"] = [
-                clean_digit_id(number=k, n_digits=12) if isinstance(k, int) else k
-                for k in table["titulo_eleitoral"].to_list()
-            ]
-            table["sequencial"] = [
-                clean_digit_id(number=k, n_digits=12) if isinstance(k, int) else k
-                for k in table["sequencial"].to_list()
-            ]
-            table.drop_duplicates(inplace=True)
-            table.drop("ano", axis=1, inplace=True)
-            table.to_csv(f"/tmp/data/output/ano={ano}/candidatos.csv", index=False)
+                os.system(f"mkdir -p /tmp/data/output/ano={ano}/")
+                table["cpf"] = digit_id(table["cpf"], n_digits=11)
+                table["titulo_eleitoral"] = digit_id(
+                    table["titulo_eleitoral"], n_digits=12
+                )
+                table["sequencial"] = digit_id(table["sequencial"], n_digits=12)
+                table.drop_duplicates(inplace=True)
+                table.drop("ano", axis=1, inplace=True)
+                table.to_csv(f"/tmp/data/output/ano={ano}/candidatos.csv", index=False)
+
+        # se outra execução publicar o mapeamento antes desta, os anos são
+        # reconstruídos contra o mapeamento novo
+        update_candidate_identities(
+            build,
+            blob_name=tse_constants.ID_CANDIDATO_BD_BLOB.value,
+            path=tse_constants.ID_CANDIDATO_BD_PATH.value,
+            publish=mode == "prod",
+        )
     else:
         for ano in range(end, start, -2):
             df = pd.read_csv(
                 f"/tmp/data/raw/br_tse_eleicoes/candidatos/ano={ano}/candidatos.csv",
-                sep=";",
                 encoding="utf-8",
             )
-            df["cpf"] = [
-                clean_digit_id(number=k, n_digits=11) if pd.notna(k) else k
-                for k in df["cpf"].to_list()
-            ]
-            df["titulo_eleitoral"] = [
-                clean_digit_id(number=k, n_digits=12) if pd.notna(k) else k
-                for k in df["titulo_eleitoral"].to_list()
-            ]
-            df["sequencial"] = [
-                clean_digit_id(number=k, n_digits=12) if pd.notna(k) else k
-                for k in df["sequencial"].to_list()
-            ]
+            df["cpf"] = digit_id(df["cpf"], n_digits=11)
+            df["titulo_eleitoral"] = digit_id(df["titulo_eleitoral"], n_digits=12)
+            df["sequencial"] = digit_id(df["sequencial"], n_digits=12)
             df.replace("#NULO#", np.nan, inplace=True)
             df.replace("#Nulo#", np.nan, inplace=True)
             df.replace("#NI#", np.nan, inplace=True)
@@ -343,7 +282,7 @@ def build_bens_candidato(
 
         for file in files:
             try:
-                df = pd.read_csv(file, sep=";", encoding="utf-8")
+                df = pd.read_csv(file, encoding="utf-8")
                 df["ano"] = int(file.split("/")[-3].split("=")[-1])
                 df["sigla_uf"] = file.split("/")[-2].split("=")[-1]
                 dfs.append(df)
@@ -406,7 +345,7 @@ def build_bens_candidato(
         for uf in ufs:
             try:
                 file = f"{folder}/ano=2022/sigla_uf={uf}/bens_candidato.csv"
-                df = pd.read_csv(file, sep=";", encoding="utf-8")
+                df = pd.read_csv(file, encoding="utf-8")
                 os.system(f"mkdir -p /tmp/data/output/ano=2022/sigla_uf={uf}/")
                 df.drop("sigla_uf", axis=1, inplace=True)
                 df = df.reindex(
@@ -454,22 +393,13 @@ def clean_bens22(folder) -> None:
 
     table = pd.DataFrame(
         {
-            "tipo_eleicao": [
-                unidecode(unidecode(k.lower())) if isinstance(k, str) else k
-                for k in df["NM_TIPO_ELEICAO"].to_list()
-            ],
+            "tipo_eleicao": lower_ascii(df["NM_TIPO_ELEICAO"]).to_list(),
             "sigla_uf": df["SG_UF"].to_list(),
             "sequencial_candidato": df["SQ_CANDIDATO"].to_list(),
             "id_tipo_item": df["CD_TIPO_BEM_CANDIDATO"].to_list(),
             "id_candidato_bd": n * np.nan,
-            "tipo_item": [
-                unidecode(unidecode(k.title())) if isinstance(k, str) else k
-                for k in df["DS_TIPO_BEM_CANDIDATO"].to_list()
-            ],
-            "descricao_item": [
-                unidecode(unidecode(k.title())) if isinstance(k, str) else k
-                for k in df["DS_BEM_CANDIDATO"].to_list()
-            ],
+            "tipo_item": title_ascii(df["DS_TIPO_BEM_CANDIDATO"]).to_list(),
+            "descricao_item": title_ascii(df["DS_BEM_CANDIDATO"]).to_list(),
             "valor_item": [
                 float(k.replace(",", ".")) if k.replace(",", "").isdigit() else k
                 for k in df["VR_BEM_CANDIDATO"].to_list()
@@ -495,7 +425,6 @@ def clean_bens22(folder) -> None:
         df_uf.to_csv(
             f"/tmp/data/raw/br_tse_eleicoes/bens_candidato/ano=2022/sigla_uf={uf}/bens_candidato.csv",
             index=False,
-            sep=";",
         )
         del df_uf
 
@@ -519,31 +448,22 @@ def clean_despesa22(folder):
             {
                 "ano": int("".join([k for k in file if k.isdigit()])),
                 "turno": df["ST_TURNO"].to_list(),
-                "tipo_eleicao": [
-                    unidecode(k.lower()) if isinstance(k, str) else k
-                    for k in df["NM_TIPO_ELEICAO"]
-                ],
+                "tipo_eleicao": lower_ascii(df["NM_TIPO_ELEICAO"]).to_list(),
                 "sigla_uf": uf,
                 "id_municipio": n * [np.nan],
                 "id_municipio_tse": n * [np.nan],
                 "numero_candidato": df["NR_CANDIDATO"].to_list(),
-                "cpf_candidato": [
-                    clean_digit_id(k, n_digits=11) if pd.notna(k) else k
-                    for k in df["NR_CPF_CANDIDATO"].to_list()
-                ],
-                "sequencial_candidato": [
-                    clean_digit_id(k, n_digits=12) if pd.notna(k) else k
-                    for k in df["SQ_CANDIDATO"].to_list()
-                ],
+                "cpf_candidato": digit_id(
+                    df["NR_CPF_CANDIDATO"], n_digits=11
+                ).to_list(),
+                "sequencial_candidato": digit_id(
+                    df["SQ_CANDIDATO"], n_digits=12
+                ).to_list(),
                 "id_candidato_bd": n * [np.nan],
-                "nome_candidato": [
-                    unidecode(k.title()) if isinstance(k, str) else k
-                    for k in df["NM_CANDIDATO"].to_list()
-                ],
-                "cpf_vice_suplente": [
-                    clean_digit_id(k, n_digits=11) if pd.notna(k) else k
-                    for k in df["NR_CPF_VICE_CANDIDATO"].to_list()
-                ],
+                "nome_candidato": title_ascii(df["NM_CANDIDATO"]).to_list(),
+                "cpf_vice_suplente": digit_id(
+                    df["NR_CPF_VICE_CANDIDATO"], n_digits=11
+                ).to_list(),
                 "numero_partido": df["NR_PARTIDO"].to_list(),
                 "sigla_partido": df["SG_PARTIDO"].to_list(),
                 "nome_partido": df["NM_PARTIDO"].to_list(),
@@ -564,10 +484,9 @@ def clean_despesa22(folder):
                     df["DT_PRESTACAO_CONTAS"], format="%d/%m/%Y"
                 ).to_list(),
                 "sequencial_prestador_contas": df["SQ_PRESTADOR_CONTAS"].to_list(),
-                "cnpj_prestador_contas": [
-                    clean_digit_id(k, n_digits=14) if pd.notna(k) else k
-                    for k in df["NR_CNPJ_PRESTADOR_CONTA"].to_list()
-                ],
+                "cnpj_prestador_contas": digit_id(
+                    df["NR_CNPJ_PRESTADOR_CONTA"], n_digits=14
+                ).to_list(),
                 "cnpj_candidato": n * [np.nan],
                 "tipo_documento": df["DS_TIPO_DOCUMENTO"].to_list(),
                 "numero_documento": df["NR_DOCUMENTO"].to_list(),
@@ -696,28 +615,21 @@ def clean_receita22(folder):
             {
                 "ano": int("".join([k for k in file if k.isdigit()])),
                 "turno": df["ST_TURNO"].to_list(),
-                "tipo_eleicao": [
-                    unidecode(k.lower()) for k in df["NM_TIPO_ELEICAO"].to_list()
-                ],
+                "tipo_eleicao": lower_ascii(df["NM_TIPO_ELEICAO"]).to_list(),
                 "sigla_uf": uf,
                 "id_municipio": n * [np.nan],
                 "id_municipio_tse": n * [np.nan],
                 "numero_candidato": df["NR_CANDIDATO"].to_list(),
-                "cpf_candidato": [
-                    clean_digit_id(k, n_digits=11) if pd.notna(k) else k
-                    for k in df["NR_CPF_CANDIDATO"].to_list()
-                ],
+                "cpf_candidato": digit_id(
+                    df["NR_CPF_CANDIDATO"], n_digits=11
+                ).to_list(),
                 "cnpj_candidato": n * [np.nan],
                 "titulo_eleitor_candidato": n * [np.nan],
-                "sequencial_candidato": [
-                    clean_digit_id(k, n_digits=12) if pd.notna(k) else k
-                    for k in df["SQ_CANDIDATO"].to_list()
-                ],
+                "sequencial_candidato": digit_id(
+                    df["SQ_CANDIDATO"], n_digits=12
+                ).to_list(),
                 "id_candidato_bd": n * [np.nan],
-                "nome_candidato": [
-                    unidecode(k.title()) if pd.notna(k) else k
-                    for k in df["NM_CANDIDATO"].to_list()
-                ],
+                "nome_candidato": title_ascii(df["NM_CANDIDATO"]).to_list(),
                 "cpf_vice_suplente": [
                     str(k).replace(".0", "") if str(k)[0].isdigit() else k
                     for k in df["NR_CPF_VICE_CANDIDATO"].to_list()
@@ -730,18 +642,9 @@ def clean_receita22(folder):
                 "data_receita": pd.to_datetime(
                     df["DT_RECEITA"], format="%d/%m/%Y"
                 ).to_list(),
-                "fonte_receita": [
-                    unidecode(k.lower()) if isinstance(k, str) else k
-                    for k in df["DS_FONTE_RECEITA"].to_list()
-                ],
-                "origem_receita": [
-                    unidecode(k.lower()) if isinstance(k, str) else k
-                    for k in df["DS_ORIGEM_RECEITA"].to_list()
-                ],
-                "natureza_receita": [
-                    unidecode(k.lower()) if isinstance(k, str) else k
-                    for k in df["DS_NATUREZA_RECEITA"].to_list()
-                ],
+                "fonte_receita": lower_ascii(df["DS_FONTE_RECEITA"]).to_list(),
+                "origem_receita": lower_ascii(df["DS_ORIGEM_RECEITA"]).to_list(),
+                "natureza_receita": lower_ascii(df["DS_NATUREZA_RECEITA"]).to_list(),
                 "especie_receita": df["DS_ESPECIE_RECEITA"].to_list(),
                 "situacao_receita": n * [np.nan],
                 "descricao_receita": df["DS_RECEITA"].to_list(),
@@ -753,20 +656,13 @@ def clean_receita22(folder):
                     str(k).replace(".0", "") if str(k)[0].isdigit() else k
                     for k in df["SQ_CANDIDATO_DOADOR"].to_list()
                 ],
-                "cpf_cnpj_doador": [
-                    clean_digit_id(k, n_digits=14) if pd.notna(k) else k
-                    for k in df["NR_CPF_CNPJ_DOADOR"].to_list()
-                ],
+                "cpf_cnpj_doador": digit_id(
+                    df["NR_CPF_CNPJ_DOADOR"], n_digits=14
+                ).to_list(),
                 "sigla_uf_doador": df["SG_UF_DOADOR"].to_list(),
                 "id_municipio_tse_doador": df["CD_MUNICIPIO_DOADOR"].to_list(),
-                "nome_doador": [
-                    unidecode(k.title()) if isinstance(k, str) else k
-                    for k in df["NM_DOADOR"].to_list()
-                ],
-                "nome_doador_rf": [
-                    unidecode(k.title()) if isinstance(k, str) else k
-                    for k in df["NM_DOADOR_RFB"].to_list()
-                ],
+                "nome_doador": title_ascii(df["NM_DOADOR"]).to_list(),
+                "nome_doador_rf": title_ascii(df["NM_DOADOR_RFB"]).to_list(),
                 "cargo_candidato_doador": df["DS_CARGO_CANDIDATO_DOADOR"].to_list(),
                 "numero_partido_doador": df["NR_PARTIDO_DOADOR"].to_list(),
                 "sigla_partido_doador": df["SG_PARTIDO_DOADOR"].to_list(),
@@ -786,10 +682,9 @@ def clean_receita22(folder):
                 "numero_documento": n * [np.nan],
                 "numero_recibo_doacao": df["NR_RECIBO_DOACAO"].to_list(),
                 "numero_documento_doacao": df["NR_DOCUMENTO_DOACAO"].to_list(),
-                "tipo_prestacao_contas": [
-                    unidecode(k.title()) if isinstance(k, str) else k
-                    for k in df["TP_PRESTACAO_CONTAS"].to_list()
-                ],
+                "tipo_prestacao_contas": title_ascii(
+                    df["TP_PRESTACAO_CONTAS"]
+                ).to_list(),
                 "data_prestacao_contas": pd.to_datetime(
                     df["DT_PRESTACAO_CONTAS"], format="%d/%m/%Y"
                 ).to_list(),
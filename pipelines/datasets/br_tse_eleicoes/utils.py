@@ -4,124 +4,225 @@ General purpose functions for the br_tse_eleicoes project
 """
 # pylint: disable=invalid-name,line-too-long
 import re
+from pathlib import Path
+from typing import Callable, Union
 
 import basedosdados as bd
+import numpy as np
 import pandas as pd
-from unidecode import unidecode
+from google.api_core.exceptions import PreconditionFailed
+from google.cloud import storage
 
+from pipelines.utils.text import digit_id, map_unique, normalize_text
+from pipelines.utils.utils import download_blobs_from_gcs, log, read_staging_files
 
-def get_id_candidato_bd(df: pd.DataFrame) -> pd.DataFrame:
+
+class UnionFind:
     """
-    Uses nome, cpf and titulo_eleitor to generate an id_candidato_bd
+    Disjoint sets of the integers `0..n - 1`, with path halving and union by
+    size.
     """
 
-    data = df.copy()
-
-    df[["cpf", "titulo_eleitoral"]] = df[["cpf", "titulo_eleitoral"]].fillna(value=0)
-
-    df["id_candidato_bd"] = (
-        df.set_index(["cpf", "titulo_eleitoral"]).index.factorize()[-0] + 1
-    )
-
-    df["id_candidato_bd"] = df.groupby(["cpf"], dropna=False).id_candidato_bd.transform(
-        "max"
-    )
-    df["id_candidato_bd"] = df.groupby(
-        ["titulo_eleitoral"], dropna=False
-    ).id_candidato_bd.transform("max")
-
-    df["id_candidato_bd_str"] = "1 " + df.id_candidato_bd.astype(str)
-
-    aux_cpf = pd.pivot_table(
-        data=df, index=["id_candidato_bd"], values=["cpf"], aggfunc=pd.Series.nunique
-    )
-    aux_te = pd.pivot_table(
-        data=df,
-        index=["id_candidato_bd"],
-        values=["titulo_eleitoral"],
-        aggfunc=pd.Series.nunique,
-    )
-
-    df["N_cpf"] = df["id_candidato_bd"].map(dict(zip(aux_cpf.index, aux_cpf.cpf)))
-    df["N_TE"] = df["id_candidato_bd"].map(
-        dict(zip(aux_te.index, aux_te.titulo_eleitoral))
-    )
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+        self.size = [1] * n
+
+    def find(self, x: int) -> int:
+        """
+        Returns the representative of the set of `x`.
+        """
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a: int, b: int) -> None:
+        """
+        Joins the sets of `a` and `b`.
+        """
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+
+    def union_groups(self, codes: np.ndarray) -> None:
+        """
+        Joins the elements with the same code, as returned by `pd.factorize`
+        (negative codes are missing values and are not joined).
+        """
+        valid = np.flatnonzero(codes >= 0)
+        first = pd.Series(valid).groupby(codes[valid]).transform("first").to_numpy()
+        for a, b in zip(valid[valid != first], first[valid != first]):
+            self.union(int(a), int(b))
+
+    def roots(self) -> np.ndarray:
+        """
+        Representative of the set of each element.
+        """
+        return np.array([self.find(x) for x in range(len(self.parent))], dtype=int)
+
+
+class CandidateIdentities:
+    """
+    Persistent mapping of the keys of a candidate (cpf, titulo_eleitoral and
+    first and last names) to its id_candidato_bd.
 
-    para_2a_rodada = (
-        df[(df["N_cpf"] > 1) | (df["N_TE"] > 1)]
-        .sort_values("N_cpf")
-        .reset_index(drop=True)
-    )
+    Records sharing a cpf or a titulo_eleitoral are linked into components (see
+    `UnionFind`). A component with a single cpf and titulo_eleitoral is one
+    candidate; otherwise, if all its records have the same first name, each last
+    name is a candidate, and the records get no id if not.
 
-    _1a_rodada = df[(df["N_cpf"] == 1) & (df["N_TE"] == 1)]
-    _1a_rodada = _1a_rodada[["id_candidato_bd_str", "cpf", "titulo_eleitoral", "nome"]]
+    New records are first matched to the mapping by their keys; only the
+    components they touch are resolved again, so a new election does not
+    reprocess the previous ones. Ids already in the mapping never change.
+    """
 
-    if para_2a_rodada.shape[0] > 0:
-        del df
-        df = para_2a_rodada.copy()
+    KEYS = ["cpf", "titulo_eleitoral", "primeiro_nome", "ultimo_nome"]
+    COLUMNS = ["id_candidato_bd", "componente"] + KEYS
 
-        df["nome"] = df["nome"].apply(
-            lambda x: unidecode(x) if isinstance(x, str) else x
+    def __init__(self, mapping: pd.DataFrame = None):
+        if mapping is None:
+            mapping = pd.DataFrame(columns=self.COLUMNS)
+        self.mapping = mapping[self.COLUMNS].astype(
+            {"id_candidato_bd": "Int64", "componente": "Int64"}
         )
-        df["aux_primeiro"] = df["nome"].apply(
-            lambda x: x.split(" ")[0] if isinstance(x, str) else x
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "CandidateIdentities":
+        """
+        Reads the mapping saved at `path`, or starts an empty one if there is no
+        file.
+        """
+        if not Path(path).exists():
+            return cls()
+        return cls(pd.read_csv(path, dtype={key: str for key in cls.KEYS}))
+
+    def save(self, path: Union[str, Path]) -> None:
+        """
+        Writes the mapping to `path` as csv.
+        """
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.mapping.to_csv(path, index=False)
+
+    @classmethod
+    def keys(cls, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Keys of the records of `df`. IDs made only of zeros are missing.
+        """
+        keys = pd.DataFrame(index=df.index)
+        for column, n_digits in [("cpf", 11), ("titulo_eleitoral", 12)]:
+            ids = digit_id(df[column], n_digits=n_digits)
+            keys[column] = ids.where(ids.str.strip("0") != "")
+        names = normalize_text(df["nome"], case="upper")
+        keys["primeiro_nome"] = map_unique(names, lambda s: s.str.split().str[0])
+        keys["ultimo_nome"] = map_unique(names, lambda s: s.str.split().str[-1])
+        return keys
+
+    def resolve(self, df: pd.DataFrame) -> pd.Series:
+        """
+        Returns the id_candidato_bd of each record of `df` (with the columns
+        cpf, titulo_eleitoral and nome), adding its new keys to the mapping.
+        """
+        keys = self.keys(df)
+        linked = keys["cpf"].notna() | keys["titulo_eleitoral"].notna()
+        distinct = keys[linked].drop_duplicates()
+        known = distinct.merge(
+            self.mapping[self.KEYS], on=self.KEYS, how="left", indicator=True
         )
-        df["aux_ultimo"] = df["nome"].apply(
-            lambda x: x.split(" ")[-1] if isinstance(x, str) else x
+        new = known.loc[known["_merge"] == "left_only", self.KEYS]
+        if len(new) > 0:
+            self._add(new.reset_index(drop=True))
+
+        ids = keys.merge(
+            self.mapping[self.KEYS + ["id_candidato_bd"]], on=self.KEYS, how="left"
+        )["id_candidato_bd"]
+        ids.index = df.index
+        ids[~linked] = pd.NA
+        return ids
+
+    def _add(self, new: pd.DataFrame) -> None:
+        """
+        Links the `new` keys to the components of the mapping sharing their cpf
+        or titulo_eleitoral and gives them ids.
+        """
+        mapping = self.mapping
+        touched = mapping["cpf"].isin(new["cpf"].dropna()) | mapping[
+            "titulo_eleitoral"
+        ].isin(new["titulo_eleitoral"].dropna())
+        touched = mapping["componente"].isin(mapping.loc[touched, "componente"])
+        old = mapping[touched]
+        nodes = pd.concat(
+            [
+                old,
+                new.assign(
+                    id_candidato_bd=pd.Series(pd.NA, index=new.index, dtype="Int64"),
+                    componente=pd.Series(pd.NA, index=new.index, dtype="Int64"),
+                ),
+            ],
+            ignore_index=True,
         )
 
-        aux_nomes = pd.pivot_table(
-            data=df,
-            index=["id_candidato_bd_str"],
-            values=["aux_primeiro", "aux_ultimo"],
-            aggfunc=pd.Series.nunique,
+        union_find = UnionFind(len(nodes))
+        for column in ["cpf", "titulo_eleitoral", "componente"]:
+            union_find.union_groups(pd.factorize(nodes[column])[0])
+        roots = pd.Series(union_find.roots())
+
+        # the merged components keep the smallest of their previous labels
+        labels = nodes["componente"].groupby(roots).transform("min")
+        unlabeled = labels.isna()
+        next_label = mapping["componente"].max()
+        next_label = 1 if pd.isna(next_label) else next_label + 1
+        labels[unlabeled] = next_label + pd.factorize(roots[unlabeled])[0]
+        nodes["componente"] = labels
+
+        n_keys = nodes.groupby("componente")[
+            ["cpf", "titulo_eleitoral", "primeiro_nome"]
+        ].transform("nunique")
+        single = (n_keys["cpf"] <= 1) & (n_keys["titulo_eleitoral"] <= 1)
+        by_name = ~single & (n_keys["primeiro_nome"] == 1)
+        group = pd.DataFrame(
+            {
+                "componente": nodes["componente"],
+                "primeiro_nome": nodes["primeiro_nome"].where(by_name).fillna(""),
+                "ultimo_nome": nodes["ultimo_nome"].where(by_name).fillna(""),
+            }
         )
-
-        df["N_nomes"] = df["id_candidato_bd_str"].map(
-            dict(zip(aux_nomes.index, aux_nomes.aux_primeiro))
+        group_ids = nodes["id_candidato_bd"].groupby(
+            [group[column] for column in group.columns]
         )
-
-        # not actually used. See https://github.com/basedosdados/mais/blob/master/bases/br_tse_eleicoes/code/sub/cria_id_candidato.do
-
-        # para_3a_rodada = (
-        #     df[(df["N_nomes"] > 1)].sort_values("N_nomes").reset_index(drop=True)
-        # )
-
-        df = df[(df["N_nomes"] == 1)]
-
-        df["aux_id"] = (
-            df.set_index(
-                ["id_candidato_bd_str", "aux_primeiro", "aux_ultimo"]
-            ).index.factorize()[-0]
-            + 1
+        ids = group_ids.transform("min").where(single | by_name)
+
+        is_new = pd.Series(np.arange(len(nodes)) >= len(old))
+        missing = is_new & ids.isna() & (single | by_name)
+        if missing.any():
+            next_id = mapping["id_candidato_bd"].max()
+            next_id = 1 if pd.isna(next_id) else next_id + 1
+            new_groups = pd.MultiIndex.from_frame(group[missing]).factorize()[0]
+            ids[missing] = next_id + new_groups
+        nodes["id_candidato_bd"] = ids.astype("Int64")
+
+        mapping.loc[touched, "componente"] = nodes.loc[~is_new, "componente"].to_numpy()
+        self.mapping = pd.concat(
+            [mapping, nodes.loc[is_new, self.COLUMNS]], ignore_index=True
         )
 
-        df["id_candidato_bd_str"] = "2 " + df["aux_id"].astype(str)
-
-        df.drop(["aux_id"], axis=1, inplace=True)
-
-        _2a_rodada = df[["id_candidato_bd_str", "cpf", "titulo_eleitoral", "nome"]]
-
-        del df
-
-    if para_2a_rodada.shape[0] > 0:
-        df = _1a_rodada.append(_2a_rodada).sort_values(by="cpf").reset_index(drop=True)
-    else:
-        df = _1a_rodada.copy()
 
-    df["id_candidato_bd"] = (
-        df.set_index(["id_candidato_bd_str"]).index.factorize()[-0] + 1
-    )
-    df.sort_values(by="id_candidato_bd", inplace=True)
-    df = df[["id_candidato_bd", "cpf", "titulo_eleitoral", "nome"]]
-
-    data.drop(["id_candidato_bd"], axis=1, inplace=True)
-
-    data = data.merge(df, on=["cpf", "titulo_eleitoral", "nome"], how="left")
+def get_id_candidato_bd(
+    df: pd.DataFrame, identities: CandidateIdentities = None
+) -> pd.DataFrame:
+    """
+    Uses nome, cpf and titulo_eleitor to generate an id_candidato_bd, from the
+    mapping of `identities` if given (see `CandidateIdentities`)
+    """
+    if identities is None:
+        identities = CandidateIdentities()
 
-    data["id_candidato_bd"] = (
-        data["id_candidato_bd"].fillna(value=0).astype(int).replace({0: None})
-    )
+    data = df.copy()
+    data["id_candidato_bd"] = identities.resolve(data)
 
     data = data.reindex(
         [
@@ -165,50 +266,105 @@ def get_id_candidato_bd(df: pd.DataFrame) -> pd.DataFrame:
     return data
 
 
+def get_dev_bucket(dataset_id: str, table_id: str) -> storage.Bucket:
+    """
+    Get the basedosdados-dev bucket, with the client of a table.
+    """
+
+    storage_bd = bd.Storage(dataset_id=dataset_id, table_id=table_id)
+    return storage_bd.client["storage_staging"].bucket("basedosdados-dev")
+
+
 def get_blobs_from_raw(dataset_id: str, table_id: str) -> list:
     """
     Get all blobs from a table in a dataset.
     """
 
-    storage = bd.Storage(dataset_id=dataset_id, table_id=table_id)
-    return list(
-        storage.client["storage_staging"]
-        .bucket("basedosdados-dev")
-        .list_blobs(prefix=f"raw/{storage.dataset_id}/{storage.table_id}/")
-    )
+    bucket = get_dev_bucket(dataset_id, table_id)
+    return list(bucket.list_blobs(prefix=f"raw/{dataset_id}/{table_id}/"))
 
 
-def get_data_from_prod(dataset_id: str, table_id: str, columns: list) -> list:
-    """
-    Get select columns from a table in prod.
+def download_blob_from_dev(blob_name: str, path: Union[str, Path]) -> int:
     """
+    Downloads a blob of the basedosdados-dev bucket to `path`, if it exists.
 
-    storage = bd.Storage(dataset_id=dataset_id, table_id=table_id)
-    blobs = list(
-        storage.client["storage_staging"]
-        .bucket("basedosdados-dev")
-        .list_blobs(prefix=f"staging/{storage.dataset_id}/{storage.table_id}/")
-    )
+    Returns:
+        int: the generation of the downloaded blob, or 0 if there is no blob (and
+            no file is left at `path`).
+    """
+    blob = get_dev_bucket("br_tse_eleicoes", "candidatos").get_blob(blob_name)
+    if blob is None:
+        Path(path).unlink(missing_ok=True)
+        return 0
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    blob.download_to_filename(str(path), if_generation_match=blob.generation)
+    return blob.generation
+
+
+def upload_blob_to_dev(
+    path: Union[str, Path], blob_name: str, if_generation_match: int = None
+) -> None:
+    """
+    Uploads the file at `path` to a blob of the basedosdados-dev bucket. With
+    `if_generation_match`, the upload fails with `PreconditionFailed` if the
+    blob is not at that generation (0 if it must not exist).
+    """
+    blob = get_dev_bucket("br_tse_eleicoes", "candidatos").blob(blob_name)
+    blob.upload_from_filename(str(path), if_generation_match=if_generation_match)
 
-    dfs = []
 
-    for blob in blobs:
-        partitions = re.findall(r"\w+(?==)", blob.name)
-        if len(set(partitions) & set(columns)) == 0:
-            df = pd.read_csv(blob.public_url, usecols=columns)
-            dfs.append(df)
-        else:
-            columns2add = list(set(partitions) & set(columns))
-            for column in columns2add:
-                columns.remove(column)
-            df = pd.read_csv(blob.public_url, usecols=columns)
-            for column in columns2add:
-                df[column] = blob.name.split(column + "=")[1].split("/")[0]
-            dfs.append(df)
+def update_candidate_identities(
+    update: Callable[[CandidateIdentities], None],
+    blob_name: str,
+    path: Union[str, Path],
+    publish: bool = True,
+    max_attempts: int = 5,
+) -> CandidateIdentities:
+    """
+    Runs `update` on the mapping of id_candidato_bd saved at `blob_name` and, if
+    `publish`, uploads the updated mapping only if no other run replaced it in
+    the meantime. On a conflict, the newer mapping is downloaded and `update` is
+    run again, up to `max_attempts` times, so concurrent runs never drop each
+    other's ids.
+
+    Raises:
+        PreconditionFailed: if the mapping changed during every attempt.
+    """
+    for attempt in range(1, max_attempts + 1):
+        try:
+            generation = download_blob_from_dev(blob_name, path)
+            identities = CandidateIdentities.load(path)
+            update(identities)
+            if not publish:
+                log("The mapping of id_candidato_bd was not published")
+                return identities
+            identities.save(path)
+            upload_blob_to_dev(path, blob_name, if_generation_match=generation)
+        except PreconditionFailed:
+            if attempt == max_attempts:
+                raise
+            log(
+                "The mapping of id_candidato_bd was changed by another run, "
+                f"updating it again ({attempt}/{max_attempts})",
+                "warning",
+            )
+            continue
+        log(f"Published the mapping of id_candidato_bd to {blob_name}")
+        return identities
+
+
+def get_data_from_prod(dataset_id: str, table_id: str, columns: list) -> pd.DataFrame:
+    """
+    Get select columns from a table in prod.
 
-    df = pd.concat(dfs)
+    The staging files are downloaded in parallel and cached by generation (see
+    `download_blobs_from_gcs`) and only `columns` are parsed.
+    """
 
-    return df
+    files = download_blobs_from_gcs(
+        get_dev_bucket(dataset_id, table_id), f"staging/{dataset_id}/{table_id}"
+    )
+    return read_staging_files(files, columns)
 
 
 def normalize_dahis(df: pd.DataFrame) -> pd.DataFrame:
@@ -14,12 +14,16 @@ from pipelines.datasets.cross_update.schedules import schedule_nrows
 from pipelines.datasets.cross_update.tasks import (
     datasearch_json,
     crawler_tables,
+    get_api_mode,
     update_nrows,
     rename_blobs,
 )
 from pipelines.utils.constants import constants as utils_constants
 from pipelines.utils.decorators import Flow
-from pipelines.utils.tasks import get_current_flow_labels
+from pipelines.utils.tasks import (
+    get_current_flow_labels,
+    update_django_metadata_batch,
+)
 
 with Flow(
     name="cross_update.update_nrows", code_owners=["lucas_cr"]
@@ -28,12 +32,26 @@ with Flow(
     days = Parameter("days", default=7, required=False)
     mode = Parameter("mode", default="prod", required=False)
     page_size = Parameter("page_size", default=100, required=False)
+    update_temporal_coverage = Parameter(
+        "update_temporal_coverage", default=False, required=False
+    )
 
     json_response = datasearch_json(page_size=page_size, mode=mode)
     updated_tables, tables_to_zip = crawler_tables(json_response, days=days)
     updated_tables.set_upstream(json_response)
     update_nrows.map(updated_tables, mode=unmapped(mode))
 
+    with case(update_temporal_coverage, True):
+        # the coverage ends at the last date in the data of each table, with the
+        # granularity of its current coverage
+        update_django_metadata_batch(
+            tables=updated_tables,
+            date_format=None,
+            bq_table_last_year_month=True,
+            api_mode=get_api_mode(mode),
+            billing_project_id="basedosdados",
+        )
+
     with case(dump_to_gcs, True):
         current_flow_labels = get_current_flow_labels()
         dump_to_gcs_flow = create_flow_run.map(
@@ -212,3 +212,16 @@ def rename_blobs() -> None:
         table_id = blob.name.split("/")[-2]
         new_name = re.sub(r"data0*\.csv\.gz", table_id + ".csv.gz", blob.name)
         bucket.rename_blob(blob, new_name)
+
+
+@task
+def get_api_mode(mode: str) -> str:
+    """
+    Returns the mode of the metadata API (prod or staging) for the mode of the
+    flow (prod or dev).
+    """
+    if mode == "prod":
+        return "prod"
+    if mode == "dev":
+        return "staging"
+    raise ValueError("mode must be prod or dev")
@@ -43,6 +43,13 @@ class constants(Enum):  # pylint: disable=c0103
     DATA_ATUAL = datetime.datetime.now().strftime("%Y-%m-%d")
     DATA_ATUAL_ANO = datetime.datetime.now().year
     SEASON = datetime.datetime.now().year - 1
+    HEADERS = {
+        "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/55.0.2883.87 Safari/537.36"
+    }
+    # páginas das partidas baixadas em paralelo, no máximo MAX_PER_HOST por vez
+    MAX_PER_HOST = 4
+    REQUESTS_PER_SECOND = 2
+    CACHE_DIR = "/tmp/pipelines/transfermarkt"
     ORDEM_COLUNA_FINAL = [
         "ano_campeonato",
         "data",
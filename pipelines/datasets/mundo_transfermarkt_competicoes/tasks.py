@@ -62,9 +62,7 @@ from datetime import timedelta, datetime
 
 @task
 def execucao_coleta_sync(execucao_coleta):
-    # Obter o loop de eventos atual e executar a tarefa nele
-    loop = asyncio.get_event_loop()
-    df = loop.run_until_complete(execucao_coleta())
+    df = asyncio.run(execucao_coleta())
 
     return df
 
@@ -29,28 +29,122 @@ General purpose functions for the mundo_transfermarkt_competicoes project
 # ```
 #
 ###############################################################################
+import asyncio
+import hashlib
+import json
+import os
 import re
+from pathlib import Path
 from bs4 import BeautifulSoup
-import requests
 import numpy as np
 import pandas as pd
-import asyncio
 from pipelines.datasets.mundo_transfermarkt_competicoes.constants import (
     constants as mundo_constants,
 )
+from pipelines.utils.async_http import AsyncHttpClient
 from pipelines.utils.utils import log
-from pipelines.datasets.mundo_transfermarkt_competicoes.decorators import retry
 
 
-@retry
-def get_content(link_soup):
-    content = link_soup.find("div", id="main")
-    return content
+class MatchPageCache:
+    """
+    HTML of the match pages on disk, along with the version of each page: the
+    result of the match in the schedule when the page was fetched. Pages of
+    matches whose result did not change since the last run are not fetched again.
+    """
+
+    def __init__(self, cache_dir=mundo_constants.CACHE_DIR.value):
+        self.cache_dir = Path(cache_dir)
+        self.index_path = self.cache_dir / "index.json"
+        try:
+            self.index = json.loads(self.index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self.index = {}
+
+    def path(self, url):
+        """
+        Path of the cached page of `url`.
+        """
+        return self.cache_dir / (
+            hashlib.sha1(url.encode("utf-8")).hexdigest() + ".html"
+        )
+
+    def get(self, url, version):
+        """
+        Returns the cached page of `url` if it has the given version, else None.
+        """
+        if self.index.get(url) != version:
+            return None
+        try:
+            return self.path(url).read_text(encoding="utf-8")
+        except OSError:
+            return None
+
+    def put(self, url, version, html):
+        """
+        Saves the page of `url`.
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.path(url).write_text(html, encoding="utf-8")
+        self.index[url] = version
+
+    def save(self):
+        """
+        Saves the index of the cached pages.
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        part = self.index_path.with_name(self.index_path.name + ".part")
+        part.write_text(json.dumps(self.index), encoding="utf-8")
+        os.replace(part, self.index_path)
+
+
+def new_client():
+    """
+    Returns an HTTP client with the limits used for Transfermarkt.
+    """
+    return AsyncHttpClient(
+        max_per_host=mundo_constants.MAX_PER_HOST.value,
+        rate=mundo_constants.REQUESTS_PER_SECOND.value,
+        headers=mundo_constants.HEADERS.value,
+    )
+
+
+async def get_contents(client, cache, pages, attempts=2):
+    """
+    Returns the `div#main` of each match page, or None for pages that could not
+    be fetched.
+
+    Args:
+        client (AsyncHttpClient): The client used to fetch the pages.
+        cache (MatchPageCache): The pages of previous runs.
+        pages (list): (url, version) pairs, see `MatchPageCache`.
+        attempts (int): Fetches of a page without `div#main`.
+    """
+
+    fetched = []
+
+    async def get_content(url, version):
+        html = cache.get(url, version)
+        if html is not None:
+            return BeautifulSoup(html, "html.parser").find("div", id="main")
+        fetched.append(url)
+        for _ in range(attempts):
+            html = await client.get_text(url)
+            if html is None:
+                return None
+            content = BeautifulSoup(html, "html.parser").find("div", id="main")
+            if content is not None:
+                cache.put(url, version, html)
+                return content
+        return None
+
+    contents = await asyncio.gather(*[get_content(*page) for page in pages])
+    log(f"{len(pages)} páginas de partidas, {len(fetched)} baixadas")
+    return contents
 
 
-def process_basico(df, content):
+def process_basico(content):
     """
-    Process data
+    Returns the record of a match without statistics
     """
     # armazenar as informações extraídas do conteúdo HTML.
     # Cada chave do dicionário representa um atributo e seu valor corresponde ao valor extraído do HTML.
@@ -110,13 +204,12 @@ def process_basico(df, content):
         "hfk": None,
         "afk": None,
     }
-    df = pd.concat([df, pd.DataFrame([new_content])], ignore_index=True)
-    return df
+    return new_content
 
 
-def process(df, content):
+def process(content):
     """
-    Process complete
+    Returns the record of a match with statistics
     """
     new_content = {
         "estadio": content.find_all("td", attrs={"class": "hauptlink"})[0].get_text(),
@@ -194,13 +287,12 @@ def process(df, content):
         ].get_text(),
     }
 
-    df = pd.concat([df, pd.DataFrame([new_content])], ignore_index=True)
-    return df
+    return new_content
 
 
-def pegar_valor(df, content):
+def pegar_valor(content):
     """
-    Get value
+    Returns the values and coaches of a match
     """
     # gera um dicionário
     valor_content = {
@@ -223,13 +315,12 @@ def pegar_valor(df, content):
         "tecnico_man": content.find_all("a", attrs={"id": "0"})[1].get_text(),
         "tecnico_vis": content.find_all("a", attrs={"id": "0"})[3].get_text(),
     }
-    df = pd.concat([df, pd.DataFrame([valor_content])], ignore_index=True)
-    return df
+    return valor_content
 
 
-def pegar_valor_sem_tecnico(df, content):
+def pegar_valor_sem_tecnico(content):
     """
-    Get value without technical
+    Returns the values of a match, without coaches
     """
     valor_content = {
         "valor_equipe_titular_man": content.find_all("div", class_="table-footer")[0]
@@ -251,13 +342,12 @@ def pegar_valor_sem_tecnico(df, content):
         "tecnico_man": None,
         "tecnico_vis": None,
     }
-    df = pd.concat([df, pd.DataFrame([valor_content])], ignore_index=True)
-    return df
+    return valor_content
 
 
-def valor_vazio(df):
+def valor_vazio():
     """
-    Return a temmplate DataFrame
+    Returns an empty values record
     """
     valor_content = {
         "valor_equipe_titular_man": None,
@@ -267,13 +357,12 @@ def valor_vazio(df):
         "tecnico_man": None,
         "tecnico_vis": None,
     }
-    df = pd.concat([df, pd.DataFrame([valor_content])], ignore_index=True)
-    return df
+    return valor_content
 
 
-def vazio(df):
+def vazio():
     """
-    Return a template DataFrame
+    Returns an empty match record
     """
     null_content = {
         "estadio": None,
@@ -300,8 +389,7 @@ def vazio(df):
         "hfk": None,
         "afk": None,
     }
-    df = pd.concat([df, pd.DataFrame([null_content])], ignore_index=True)
-    return df
+    return null_content
 
 
 async def execucao_coleta():
@@ -310,9 +398,6 @@ async def execucao_coleta():
     """
     # Armazena informações do site em um único dataframe.
     base_url = "https://www.transfermarkt.com/campeonato-brasileiro-serie-a/gesamtspielplan/wettbewerb/BRA1?saison_id={season}&spieltagVon=1&spieltagBis=38"
-    headers = {
-        "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/55.0.2883.87 Safari/537.36"
-    }
     base_link = "https://www.transfermarkt.com"
     links = []
 
@@ -332,18 +417,18 @@ async def execucao_coleta():
     # expressão regular para encontrar o número de gols marcados pelo time visitante
     pattern_ftag = re.compile(r":\d")
 
-    # para armazenar os dados das partidas
-    df = pd.DataFrame(
-        {"ht": [], "at": [], "fthg": [], "ftag": [], "col_home": [], "col_away": []}
-    )
-    df_valor = pd.DataFrame({})
+    # para armazenar os dados das partidas, um registro por partida
+    records = []
+    valores = []
 
     # season = data_atual.year - 1
     season = mundo_constants.SEASON.value
     # Pegar o link das partidas
     # Para cada temporada, adiciona os links dos jogos em `links`
     log(f"Obtendo links: temporada {season}")
-    site_data = requests.get(base_url.format(season=season), headers=headers)
+    client = new_client()
+    cache = MatchPageCache()
+    site_data = await client.get(base_url.format(season=season))
     soup = BeautifulSoup(site_data.content, "html.parser")
     link_tags = soup.find_all("a", attrs={"class": "ergebnis-link"})
     for tag in link_tags:
@@ -387,35 +472,44 @@ async def execucao_coleta():
     n_links = len(links)
     log(f"Encontrados {n_links} partidas.")
     log("Extraindo dados...")
-    for n, link in enumerate(links_esta):
-        # Tentativas de obter os links
-        content = await get_content(base_link + link, wait_time=0.01)
+    # o placar da partida na tabela é a versão das suas páginas: só são baixadas
+    # de novo as páginas de partidas novas ou cujo resultado mudou
+    versions = [str(tag) for tag in result_tag[:n_links]]
+    async with client:
+        contents = await get_contents(
+            client,
+            cache,
+            list(zip([base_link + link for link in links_esta], versions))
+            + list(zip([base_link + link for link in links_valor], versions)),
+        )
+    cache.save()
+    for content in contents[:n_links]:
         if content:
             try:
-                df = process(df, content)
+                records.append(process(content))
             except Exception:
                 try:
-                    df = process_basico(df, content)
+                    records.append(process_basico(content))
                 except Exception:
-                    df = vazio(df)
+                    records.append(vazio())
         else:
-            df = vazio(df)
-        log(f"{n+1} dados de {n_links} extraídos.")
-    for n, link in enumerate(links_valor):
-        # Tentativas de obter os links
-        content = await get_content(base_link + link, wait_time=0.01)
+            records.append(vazio())
+    log(f"{n_links} dados extraídos.")
+    for content in contents[n_links:]:
         if content:
             try:
-                df_valor = pegar_valor(df_valor, content)
+                valores.append(pegar_valor(content))
             except Exception:
                 try:
-                    df_valor = pegar_valor_sem_tecnico(df_valor, content)
+                    valores.append(pegar_valor_sem_tecnico(content))
                 except Exception:
-                    df_valor = valor_vazio(df_valor)
+                    valores.append(valor_vazio())
         else:
-            df_valor = valor_vazio(df_valor)
-        log(f"{n+1} valores de {n_links} extraídos.")
+            valores.append(valor_vazio())
+    log(f"{n_links} valores extraídos.")
 
+    df = pd.DataFrame(records)
+    df_valor = pd.DataFrame(valores)
     df["ht"] = ht
     df["at"] = at
     df["fthg"] = fthg
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Registry of the architecture sheets of the tables (Google Sheets with the
+`name`, `original_name` and `bigquery_type` of each column) shared by all
+pipelines: each sheet is fetched once per process, kept on disk for a TTL and
+revalidated with conditional requests after it, and parsed once into the column
+renames, order and types used by the cleaning tasks.
+"""
+import hashlib
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Iterable, List, Union
+
+import pandas as pd
+import prefect
+import requests
+
+from pipelines.utils.constants import constants as utils_constants
+from pipelines.utils.download import Downloader, get_downloader
+from pipelines.utils.utils import log
+
+Architecture = namedtuple("Architecture", ["table", "rename", "columns", "dtypes"])
+
+
+def architecture_csv_url(url: str) -> str:
+    """
+    Converts the edit URL of a Google Sheet to the URL of its csv export.
+    """
+    return url.replace("edit#gid=", "export?format=csv&gid=")
+
+
+def parse_architecture(table: pd.DataFrame) -> Architecture:
+    """
+    Parses an architecture sheet. Names are stripped and rows without `name` are
+    not renamed or ordered.
+
+    Returns:
+        Architecture: the sheet itself, a dict from `original_name` to `name`,
+            the list of names in order and a dict from `name` to `bigquery_type`.
+    """
+
+    def strip(value):
+        return (value.strip() or None) if isinstance(value, str) else None
+
+    names = [strip(name) for name in table["name"]]
+    rename = {}
+    if "original_name" in table.columns:
+        rename = {
+            strip(original): name
+            for original, name in zip(table["original_name"], names)
+            if strip(original) and name
+        }
+    columns = [name for name in names if name]
+    dtypes = {}
+    if "bigquery_type" in table.columns:
+        dtypes = {
+            name: strip(dtype)
+            for name, dtype in zip(names, table["bigquery_type"])
+            if name and strip(dtype)
+        }
+    return Architecture(table, rename, columns, dtypes)
+
+
+class ArchitectureRegistry:
+    """
+    Architectures of tables, by the URL of their sheet.
+
+    - `get` fetches and parses each sheet once per process;
+    - sheets are saved in `cache_dir` and used for `ttl` seconds without any
+      request. After that, they are revalidated by the `Downloader` (with the
+      ETag of the sheet, when it has one) and the saved copy is used if the
+      request fails;
+    - `preload` fetches many sheets concurrently, e.g. at the start of a flow.
+    """
+
+    def __init__(
+        self,
+        downloader: Downloader = None,
+        cache_dir: Union[str, Path] = utils_constants.ARCHITECTURE_CACHE_DIR.value,
+        ttl: float = utils_constants.ARCHITECTURE_CACHE_TTL.value,
+    ):
+        self._downloader = downloader
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+        self._architectures: Dict[str, Architecture] = {}
+        self._locks: Dict[str, Lock] = {}
+        self._lock = Lock()
+
+    @property
+    def downloader(self) -> Downloader:
+        """
+        Downloader of the sheets, by default the shared one.
+        """
+        return self._downloader or get_downloader()
+
+    def _fetch(self, url: str) -> Path:
+        csv_url = architecture_csv_url(url)
+        path = self.cache_dir / (
+            hashlib.sha1(csv_url.encode("utf-8")).hexdigest() + ".csv"
+        )
+        if path.exists() and time.time() - path.stat().st_mtime < self.ttl:
+            return path
+        try:
+            self.downloader.download(csv_url, path, resume=False, use_cache=True)
+        except requests.RequestException as error:
+            if not path.exists():
+                raise
+            log(f"Could not revalidate the architecture {url} ({error})", "warning")
+        return path
+
+    def get(self, url: str) -> Architecture:
+        """
+        Returns the architecture in the sheet at `url` (its edit or csv URL). The
+        `table` is shared: copy it before changing it.
+        """
+        with self._lock:
+            lock = self._locks.setdefault(url, Lock())
+        with lock:
+            if url not in self._architectures:
+                table = pd.read_csv(self._fetch(url), encoding="utf-8")
+                self._architectures[url] = parse_architecture(table)
+            return self._architectures[url]
+
+    def preload(self, urls: Iterable[str], max_workers: int = 8) -> List[Architecture]:
+        """
+        Fetches the sheets at `urls` concurrently.
+        """
+        urls = list(dict.fromkeys(urls))
+        # prefect's context (and its logger) is local to the thread running the task
+        context = prefect.context.to_dict()
+
+        def get(url: str) -> Architecture:
+            with prefect.context(**context):
+                return self.get(url)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            architectures = list(pool.map(get, urls))
+        log(f"Loaded {len(urls)} architectures")
+        return architectures
+
+
+@lru_cache(maxsize=None)
+def get_architectures() -> ArchitectureRegistry:
+    """
+    Returns the `ArchitectureRegistry` shared by the tasks running in this process.
+    """
+    return ArchitectureRegistry()
+
+
+def get_architecture(url: str) -> Architecture:
+    """
+    Returns the architecture in the sheet at `url` from the shared registry.
+    """
+    return get_architectures().get(url)
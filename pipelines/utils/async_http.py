@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+HTTP client for crawlers written with asyncio: requests go through a pooled
+keep-alive `requests.Session` run in worker threads, bounded by a global and a
+per host limit of concurrent requests, spaced by a token bucket per host and
+retried with jittered exponential backoff on 429/5xx responses and connection
+errors.
+"""
+import asyncio
+import random
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from pipelines.utils.constants import constants as utils_constants
+from pipelines.utils.utils import log
+
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+def backoff_delay(attempt: int, factor: float, maximum: float = 60) -> float:
+    """
+    Seconds to wait before retry number `attempt` (from 0): `factor * 2**attempt`,
+    capped at `maximum`, with half of it randomized so that concurrent clients
+    do not retry in lockstep.
+    """
+    delay = min(maximum, factor * 2**attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def retry_after(response: requests.Response) -> float:
+    """
+    Seconds asked by the `Retry-After` header of a response, 0 if it has none.
+    """
+    try:
+        return max(float(response.headers.get("Retry-After", 0)), 0)
+    except ValueError:
+        # HTTP dates are not worth parsing here
+        return 0
+
+
+class TokenBucket:
+    """
+    Allows `rate` requests per second on average, in bursts of at most `burst`.
+    Must be used by the coroutines of a single event loop.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+
+    async def acquire(self) -> None:
+        """
+        Waits until a request is allowed.
+        """
+        while True:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class AsyncHttpClient:
+    """
+    Async GET requests for crawlers.
+
+    - at most `max_concurrency` requests are in flight, and at most
+      `max_per_host` to each host, over a keep-alive pool of as many connections;
+    - requests to a host are spaced by a `TokenBucket` of `rate` requests per
+      second (or the rate of the host in `rate_limits`), instead of fixed sleeps;
+    - 429/5xx responses and connection errors are retried up to `max_retries`
+      times, waiting `backoff_delay` (or the `Retry-After` of the response);
+    - the limits belong to the event loop of the first request: create one
+      client per `asyncio.run`, e.g. with `async with AsyncHttpClient() as client`.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = utils_constants.ASYNC_HTTP_MAX_CONCURRENCY.value,
+        max_per_host: int = utils_constants.ASYNC_HTTP_MAX_PER_HOST.value,
+        rate: Optional[float] = utils_constants.ASYNC_HTTP_RATE.value,
+        rate_limits: Dict[str, float] = None,
+        burst: int = 1,
+        max_retries: int = utils_constants.ASYNC_HTTP_MAX_RETRIES.value,
+        backoff_factor: float = utils_constants.ASYNC_HTTP_BACKOFF_FACTOR.value,
+        timeout: float = utils_constants.ASYNC_HTTP_TIMEOUT.value,
+        headers: Dict[str, str] = None,
+        session: requests.Session = None,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_per_host = max_per_host
+        self.rate = rate
+        self.rate_limits = rate_limits or {}
+        self.burst = burst
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.timeout = timeout
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=max_concurrency,
+                pool_maxsize=max_concurrency,
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+        self.session.headers.update(
+            headers or {"User-Agent": utils_constants.DOWNLOAD_USER_AGENT.value}
+        )
+        self.requests = 0
+        self.retries = 0
+        # created on first use, inside the event loop running the requests
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    def _limits(self, host: str):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.max_per_host)
+            rate = self.rate_limits.get(host, self.rate)
+            if rate:
+                self._buckets[host] = TokenBucket(rate, self.burst)
+        return self._semaphore, self._host_semaphores[host], self._buckets.get(host)
+
+    async def get(self, url: str, **kwargs) -> requests.Response:
+        """
+        GET `url` within the limits of the client. Keyword arguments are passed
+        to `requests.Session.get`.
+
+        Raises:
+            requests.HTTPError: if the last response is an error.
+            requests.RequestException: if the last attempt fails to connect.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        semaphore, host_semaphore, bucket = self._limits(urlparse(url).hostname)
+        for attempt in range(self.max_retries + 1):
+            async with host_semaphore:
+                # waiting for the rate of a host does not hold a global slot
+                if bucket is not None:
+                    await bucket.acquire()
+                async with semaphore:
+                    self.requests += 1
+                    try:
+                        response = await asyncio.to_thread(
+                            self.session.get, url, **kwargs
+                        )
+                    except (requests.ConnectionError, requests.Timeout) as error:
+                        response, reason = None, str(error)
+                if response is None:
+                    if attempt == self.max_retries:
+                        raise requests.ConnectionError(f"Could not GET {url}: {reason}")
+                    delay = backoff_delay(attempt, self.backoff_factor)
+                else:
+                    if (
+                        response.status_code not in RETRY_STATUS
+                        or attempt == self.max_retries
+                    ):
+                        response.raise_for_status()
+                        return response
+                    delay = max(
+                        retry_after(response),
+                        backoff_delay(attempt, self.backoff_factor),
+                    )
+                    reason = f"HTTP {response.status_code}"
+            self.retries += 1
+            log(f"GET {url} failed ({reason}), retrying in {delay:.1f}s", "warning")
+            # the slots are released while waiting
+            await asyncio.sleep(delay)
+        raise requests.HTTPError(f"Could not GET {url}")
+
+    async def get_text(self, url: str, **kwargs) -> Optional[str]:
+        """
+        Returns the body of `url` as text, or None if it could not be fetched.
+        """
+        try:
+            response = await self.get(url, **kwargs)
+        except requests.RequestException:
+            return None
+        return response.text
+
+    def log_metrics(self) -> None:
+        """
+        Logs the number of requests made by this client.
+        """
+        log(f"HTTP: {self.requests} requests, {self.retries} retried")
+
+    def close(self) -> None:
+        """
+        Closes the connections of the pool.
+        """
+        self.session.close()
+
+    async def __aenter__(self) -> "AsyncHttpClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.close()
@@ -15,3 +15,87 @@ class constants(Enum):  # pylint: disable=c0103
     FLOW_DUMP_TO_GCS_NAME = "BD template: Ingerir tabela zipada para GCS"
 
     GOOGLE_SHEETS_URL = "https://docs.google.com/spreadsheets/d/{sheet_id}/gviz/tq?tqx=out:csv&sheet={sheet_name}"
+
+    # Parallel upload of staging files
+    UPLOAD_MAX_WORKERS = 16
+    # files bigger than this are uploaded in resumable chunks
+    UPLOAD_RESUMABLE_THRESHOLD = 8 * 1024 * 1024
+    # must be a multiple of 256 KB
+    UPLOAD_CHUNK_SIZE = 32 * 1024 * 1024
+    # Parallel download of blobs, cached locally by generation
+    GCS_DOWNLOAD_MAX_WORKERS = 16
+    GCS_CACHE_DIR = "/tmp/pipelines/gcs_cache"
+    # Reference tables of the directories
+    DIRECTORIES_DATASET_ID = "br_bd_diretorios_brasil"
+    DIRECTORIES_CACHE_DIR = "/tmp/pipelines/directories"
+    # Architecture sheets of the tables
+    ARCHITECTURE_CACHE_DIR = "/tmp/pipelines/architectures"
+    # seconds before a saved sheet is revalidated
+    ARCHITECTURE_CACHE_TTL = 60 * 60
+    STAGING_FILE_SUFFIXES = (".csv", ".csv.gz", ".parquet")
+    # formats of the external staging tables
+    STAGING_FILE_FORMATS = ("csv", "parquet")
+
+    # Base dos Dados GraphQL API
+    API_URL = {
+        "prod": "https://api.basedosdados.org/api/v1/graphql",
+        "staging": "https://staging.api.basedosdados.org/api/v1/graphql",
+    }
+    API_TIMEOUT = 60
+    API_MAX_RETRIES = 3
+    # seconds, doubled on every retry
+    API_BACKOFF_FACTOR = 1
+    API_RETRY_STATUS = (429, 500, 502, 503, 504)
+    # renew the JWT this many seconds before it expires
+    API_TOKEN_REFRESH_MARGIN = 60
+    # lifetime assumed for tokens without an `exp` claim
+    API_TOKEN_DEFAULT_TTL = 300
+    # lookups sent as aliased fields of a single GraphQL query
+    METADATA_BATCH_SIZE = 50
+    # concurrent metadata mutations
+    METADATA_MAX_WORKERS = 8
+    # IDs of tables in the metadata API
+    METADATA_ID_CACHE_TTL = 7 * 24 * 60 * 60
+    METADATA_ID_CACHE_PATH = "/tmp/pipelines/metadata_id_cache.json"
+    # HTTP downloads
+    DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+    DOWNLOAD_MAX_WORKERS = 8
+    # (connect, read) timeouts, in seconds
+    DOWNLOAD_TIMEOUT = (30, 300)
+    DOWNLOAD_MAX_RETRIES = 5
+    DOWNLOAD_CACHE_DIR = "/tmp/pipelines/download_cache"
+    DOWNLOAD_USER_AGENT = (
+        "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/116.0 Safari/537.36"
+    )
+    # minimum interval between requests to the same host, in seconds
+    DOWNLOAD_RATE_LIMITS = {
+        "balanca.economia.gov.br": 8,
+        "dados.ons.org.br": 2,
+        "sidra.ibge.gov.br": 2,
+        "servicodados.ibge.gov.br": 2,
+        "ftp.ibge.gov.br": 1,
+    }
+    # HTTP client of the async crawlers
+    ASYNC_HTTP_MAX_CONCURRENCY = 16
+    ASYNC_HTTP_MAX_PER_HOST = 4
+    # requests per second to each host
+    ASYNC_HTTP_RATE = 2
+    ASYNC_HTTP_MAX_RETRIES = 4
+    # seconds, doubled on every retry
+    ASYNC_HTTP_BACKOFF_FACTOR = 2
+    ASYNC_HTTP_TIMEOUT = 100
+    # SIDRA tables of the IBGE inflation crawler
+    SIDRA_MAX_WORKERS = 4
+    SIDRA_REQUESTS_PER_SECOND = 0.5
+    SIDRA_MAX_RETRIES = 3
+    # seconds, doubled on every retry
+    SIDRA_BACKOFF_FACTOR = 10
+    # used when Redis is not reachable
+    SIDRA_HASHES_PATH = "/tmp/pipelines/sidra_hashes.json"
+    # DATASUS FTP server
+    DATASUS_FTP_HOST = "ftp.datasus.gov.br"
+    DATASUS_FTP_TIMEOUT = 120
+    DATASUS_FTP_CACHE_DIR = "/tmp/pipelines/datasus_ftp"
+    # seconds before a cached directory listing is fetched again
+    DATASUS_FTP_LISTING_TTL = 6 * 60 * 60
@@ -19,6 +19,7 @@ from pipelines.utils.crawler_ibge_inflacao.tasks import (
     clean_mes_rm,
     clean_mes_municipio,
     clean_mes_geral,
+    save_sidra_hashes,
 )
 from pipelines.utils.decorators import Flow
 from pipelines.utils.tasks import (
@@ -63,6 +64,10 @@ with Flow(
             wait=filepath,
         )
 
+        save_sidra_hashes(
+            indice=INDICE, folder=FOLDER, upstream_tasks=[wait_upload_table]
+        )
+
         temporal_coverage = get_temporal_coverage(
             filepath=filepath,
             date_cols=["ano", "mes"],
@@ -153,6 +158,10 @@ with Flow("BD Template - IBGE Inflação: mes_rm") as flow_ibge_inflacao_mes_rm:
             wait=filepath,
         )
 
+        save_sidra_hashes(
+            indice=INDICE, folder=FOLDER, upstream_tasks=[wait_upload_table]
+        )
+
         temporal_coverage = get_temporal_coverage(
             filepath=filepath,
             date_cols=["ano", "mes"],
@@ -243,6 +252,10 @@ with Flow(
             wait=filepath,
         )
 
+        save_sidra_hashes(
+            indice=INDICE, folder=FOLDER, upstream_tasks=[wait_upload_table]
+        )
+
         temporal_coverage = get_temporal_coverage(
             filepath=filepath,
             date_cols=["ano", "mes"],
@@ -335,6 +348,10 @@ with Flow("BD Template - IBGE Inflação: mes_geral") as flow_ibge_inflacao_mes_
             wait=filepath,
         )
 
+        save_sidra_hashes(
+            indice=INDICE, folder=FOLDER, upstream_tasks=[wait_upload_table]
+        )
+
         temporal_coverage = get_temporal_coverage(
             filepath=filepath,
             date_cols=["ano", "mes"],
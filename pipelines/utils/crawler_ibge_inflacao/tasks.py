@@ -8,14 +8,18 @@ import errno
 import glob
 import os
 import ssl
-from time import sleep
+from pathlib import Path
 
 import pandas as pd
-import wget
 from prefect import task
-from tqdm import tqdm
 
-from pipelines.utils.crawler_ibge_inflacao.utils import get_legacy_session
+from pipelines.utils.constants import constants as utils_constants
+from pipelines.utils.crawler_ibge_inflacao.utils import (
+    SidraClient,
+    get_sidra_hashes,
+    set_sidra_hashes,
+)
+from pipelines.utils.download import file_sha256
 from pipelines.utils.utils import log
 
 # necessary for use wget, see: https://stackoverflow.com/questions/35569042/ssl-certificate-verify-failed-with-python3
@@ -26,12 +30,18 @@ ssl._create_default_https_context = ssl._create_unverified_context
 
 
 @task
-def crawler(indice: str, folder: str) -> bool:
+def crawler(
+    indice: str,
+    folder: str,
+    requests_per_second: float = utils_constants.SIDRA_REQUESTS_PER_SECOND.value,
+) -> bool:
     """
-    Crawler for IBGE Inflacao
+    Crawler for IBGE Inflacao. Returns True when every table was downloaded and
+    any of them changed since the last successful run.
 
     indice: inpc | ipca | ip15
     folder: br | rm | mun | mes
+    requests_per_second: budget of requests to SIDRA
     """
     if folder not in ["br", "rm", "mun", "mes"]:
         raise ValueError(
@@ -120,51 +130,44 @@ def crawler(indice: str, folder: str) -> bool:
         if k.__contains__(indice) & k.__contains__(folder)
     }
     links_keys = list(links.keys())
-    success_dwnl = []
-    if folder != "rm":
-        # precisei adicionar try catchs no loop para conseguir baixar todas
-        # as tabelas sem ter pproblema com o limite de requisição do sidra
-        for key in tqdm(links_keys):
-            try:
-                wget.download(links[key], out=f"/tmp/data/input/{key}.csv")
-                success_dwnl.append(key)
-            except Exception:
-                try:
-                    sleep(10)
-                    wget.download(links[key], out=f"/tmp/data/input/{key}.csv")
-                    success_dwnl.append(key)
-                except Exception:
-                    pass
-    else:
-        for key in tqdm(links_keys):
-            try:
-                response = get_legacy_session().get(links[key])
-                # download the csv
-                with open(f"/tmp/data/input/{key}.csv", "wb") as f:
-                    f.write(response.content)
-                success_dwnl.append(key)
-            except Exception as e:
-                log(e)
-                try:
-                    sleep(10)
-                    response = get_legacy_session().get(links[key])
-                    # download the csv
-                    with open(f"/tmp/data/input/{key}.csv", "wb") as f:
-                        f.write(response.content)
-                    success_dwnl.append(key)
-                except Exception as e:  # pylint: disable=redefined-outer-name
-                    log(e)
+    # uma única sessão para todas as tabelas, baixadas em paralelo dentro do
+    # limite de requisições por segundo do sidra
+    client = SidraClient(requests_per_second=requests_per_second)
+    hashes = client.download_many(links, "/tmp/data/input")
+    success_dwnl = list(hashes)
 
     log(os.system("tree /tmp/data"))
-    if len(links_keys) == len(success_dwnl):
-        log("All files were successfully downloaded")
-        return True
-
-    log("The folowing files failed to download:")
-    rems = set(links_keys) - set(success_dwnl)
-    for rem in rems:
-        log(rem)
-    return False
+    if len(links_keys) != len(success_dwnl):
+        log("The folowing files failed to download:")
+        rems = set(links_keys) - set(success_dwnl)
+        for rem in rems:
+            log(rem)
+        return False
+
+    log("All files were successfully downloaded")
+    previous = get_sidra_hashes(indice, folder)
+    changed = [key for key in links_keys if hashes[key] != previous.get(key)]
+    if not changed:
+        log("No table changed since the last successful run")
+        return False
+    # as tasks de limpeza reconstroem a tabela a partir de todos os arquivos,
+    # então todos seguem quando qualquer um deles mudou
+    log(f"Tables changed since the last successful run: {changed}")
+    return True
+
+
+@task
+def save_sidra_hashes(indice: str, folder: str) -> None:
+    """
+    Saves the SHA-256 of the tables downloaded by `crawler`, after they were
+    uploaded, so that the next run only goes on if any of them changes.
+    """
+    hashes = {
+        f"{folder}/{Path(path).stem}": file_sha256(path)
+        for path in glob.glob(f"/tmp/data/input/{folder}/{indice}_*.csv")
+    }
+    set_sidra_hashes(indice, folder, hashes)
+    log(f"Saved the hashes of {len(hashes)} tables")
 
 
 @task
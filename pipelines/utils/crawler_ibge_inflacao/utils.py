@@ -3,15 +3,25 @@
 Schedules for ibge inflacao
 """
 # pylint: disable=arguments-differ
+import json
 import ssl
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from pathlib import Path
+from typing import Dict, Union
 
+import prefect
+import redis
 import requests
 from prefect.schedules import Schedule, filters, adjustments
 from prefect.schedules.clocks import CronClock
 import urllib3
 
 from pipelines.constants import constants
+from pipelines.utils.constants import constants as utils_constants
+from pipelines.utils.download import Downloader, file_sha256
+from pipelines.utils.utils import get_redis_client, log
 
 
 def generate_inflacao_clocks(parameters: dict):
@@ -53,10 +63,150 @@ class CustomHttpAdapter(requests.adapters.HTTPAdapter):
         )
 
 
-def get_legacy_session():
+def get_legacy_session(pool_maxsize: int = 10):
     """Get the session with the ssl context"""
     ctx = ssl.create_default_context(ssl.Purpose.SERVER_AUTH)
     ctx.options |= 0x4  # OP_LEGACY_SERVER_CONNECT
     session = requests.session()
-    session.mount("https://", CustomHttpAdapter(ctx))
+    session.mount(
+        "https://",
+        CustomHttpAdapter(
+            ctx, pool_connections=pool_maxsize, pool_maxsize=pool_maxsize
+        ),
+    )
     return session
+
+
+def verify_sidra_table(path: Union[str, Path]) -> None:
+    """
+    Checks that a file is a table exported by SIDRA (`format=br.csv`): two title
+    lines, a `;` separated header, at least one row and the 14 lines of notes
+    skipped by the cleaning tasks. SIDRA answers some failures with 200 and an
+    HTML page or an empty file.
+
+    Raises:
+        ValueError: if the file is not a SIDRA table.
+    """
+    try:
+        text = Path(path).read_text(encoding="utf-8")
+    except UnicodeDecodeError as error:
+        raise ValueError(f"{path} is not a SIDRA table: {error}") from error
+    lines = text.splitlines()
+    if text.lstrip().startswith("<") or len(lines) < 17 or ";" not in lines[2]:
+        raise ValueError(f"{path} is not a SIDRA table ({len(lines)} lines)")
+
+
+class SidraClient:
+    """
+    Downloads SIDRA tables through a single legacy SSL session.
+
+    - at most `max_workers` tables are downloaded at once, with at most
+      `requests_per_second` requests started per second;
+    - every file is checked with `verify_sidra_table`; failed downloads and
+      invalid files are tried again `max_retries` times, with exponential
+      backoff.
+    """
+
+    def __init__(
+        self,
+        requests_per_second: float = utils_constants.SIDRA_REQUESTS_PER_SECOND.value,
+        max_workers: int = utils_constants.SIDRA_MAX_WORKERS.value,
+        max_retries: int = utils_constants.SIDRA_MAX_RETRIES.value,
+        backoff_factor: float = utils_constants.SIDRA_BACKOFF_FACTOR.value,
+    ):
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.downloader = Downloader(
+            session=get_legacy_session(pool_maxsize=max_workers),
+            max_workers=max_workers,
+            rate_limits={"sidra.ibge.gov.br": 1 / requests_per_second},
+        )
+
+    def download(self, url: str, path: Union[str, Path]) -> str:
+        """
+        Downloads and verifies a table.
+
+        Returns:
+            str: the SHA-256 of the file.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.downloader.download(url, path, resume=False)
+                verify_sidra_table(path)
+                return file_sha256(path)
+            except (requests.RequestException, ValueError) as error:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff_factor * 2**attempt
+                log(f"SIDRA: {error}, trying again in {delay}s", "warning")
+                time.sleep(delay)
+        raise ValueError(f"Could not download {url}")
+
+    def download_many(
+        self, links: Dict[str, str], directory: Union[str, Path]
+    ) -> Dict[str, str]:
+        """
+        Downloads the tables in `links` (name -> URL) to `directory/<name>.csv`.
+        Tables that fail are logged and left out.
+
+        Returns:
+            dict: the SHA-256 of each downloaded table, by name.
+        """
+        # prefect's context (and its logger) is local to the thread running the task
+        context = prefect.context.to_dict()
+
+        def download(name: str):
+            with prefect.context(**context):
+                try:
+                    return self.download(links[name], Path(directory) / f"{name}.csv")
+                except (requests.RequestException, ValueError) as error:
+                    log(f"SIDRA: could not download {name}: {error}", "error")
+                    return None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            hashes = dict(zip(links, pool.map(download, links)))
+        self.downloader.log_metrics()
+        return {name: sha256 for name, sha256 in hashes.items() if sha256}
+
+
+def _sidra_hashes_key(indice: str, folder: str) -> str:
+    return f"sidra_hashes__{indice}__{folder}"
+
+
+def get_sidra_hashes(indice: str, folder: str) -> Dict[str, str]:
+    """
+    Returns the SHA-256 of the tables of the last successful run of
+    (`indice`, `folder`), from Redis or, when Redis is not reachable, from
+    a JSON file on local disk.
+    """
+    key = _sidra_hashes_key(indice, folder)
+    try:
+        return get_redis_client().get(key) or {}
+    except redis.RedisError as error:
+        log(f"Redis unavailable, reading SIDRA hashes from disk: {error}")
+    try:
+        path = Path(utils_constants.SIDRA_HASHES_PATH.value)
+        return json.loads(path.read_text(encoding="utf-8")).get(key, {})
+    except (OSError, ValueError):
+        return {}
+
+
+def set_sidra_hashes(indice: str, folder: str, hashes: Dict[str, str]) -> None:
+    """
+    Saves the SHA-256 of the tables of a successful run, see `get_sidra_hashes`.
+    """
+    key = _sidra_hashes_key(indice, folder)
+    try:
+        get_redis_client().set(key, hashes)
+        return
+    except redis.RedisError as error:
+        log(f"Redis unavailable, saving SIDRA hashes on disk: {error}")
+    path = Path(utils_constants.SIDRA_HASHES_PATH.value)
+    try:
+        entries = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        entries = {}
+    entries[key] = hashes
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(entries), encoding="utf-8")
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+Client of the DATASUS FTP server shared by all pipelines: one logged in
+connection per process, reused by every listing and download, and directory
+listings (names, sizes and modification times) cached on disk for a TTL.
+"""
+import json
+import os
+import time
+from fnmatch import fnmatch
+from ftplib import FTP, error_perm, error_temp
+from functools import lru_cache
+from pathlib import Path
+from threading import Lock
+from typing import Callable, List, Union
+
+from pipelines.utils.constants import constants as utils_constants
+from pipelines.utils.utils import log
+
+# errors after which the connection is opened again
+CONNECTION_ERRORS = (EOFError, OSError, error_temp)
+
+
+class DatasusFTP:
+    """
+    FTP client keeping a single anonymous login to `host`.
+
+    - operations that fail because the server dropped the connection are retried
+      once over a new one;
+    - `list` caches each directory listing as JSON under `cache_dir` and only
+      asks the server again when the cached listing is older than `listing_ttl`
+      seconds.
+    """
+
+    def __init__(
+        self,
+        host: str = utils_constants.DATASUS_FTP_HOST.value,
+        port: int = 21,
+        timeout: float = utils_constants.DATASUS_FTP_TIMEOUT.value,
+        cache_dir: Union[str, Path] = utils_constants.DATASUS_FTP_CACHE_DIR.value,
+        listing_ttl: float = utils_constants.DATASUS_FTP_LISTING_TTL.value,
+    ):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.cache_dir = Path(cache_dir) / f"{host}_{port}"
+        self.listing_ttl = listing_ttl
+        self._ftp: FTP = None
+        self._lock = Lock()
+
+    def _connect(self) -> FTP:
+        ftp = FTP()
+        ftp.connect(self.host, self.port, timeout=self.timeout)
+        ftp.login()
+        log(f"logged in {self.host}")
+        return ftp
+
+    def _run(self, operation: Callable[[FTP], object]):
+        """
+        Runs `operation` with the shared connection, reconnecting once if it was
+        dropped.
+        """
+        with self._lock:
+            for attempt in range(2):
+                if self._ftp is None:
+                    self._ftp = self._connect()
+                try:
+                    return operation(self._ftp)
+                except CONNECTION_ERRORS:
+                    self._ftp.close()
+                    self._ftp = None
+                    if attempt:
+                        raise
+            return None
+
+    def close(self) -> None:
+        """
+        Closes the shared connection.
+        """
+        with self._lock:
+            if self._ftp is not None:
+                try:
+                    self._ftp.quit()
+                except CONNECTION_ERRORS:
+                    self._ftp.close()
+                self._ftp = None
+
+    def _listing_path(self, directory: str) -> Path:
+        return self.cache_dir / (directory.strip("/").replace("/", "__") + ".json")
+
+    @staticmethod
+    def _fetch_listing(ftp: FTP, directory: str) -> List[dict]:
+        try:
+            return [
+                {
+                    "name": name,
+                    "size": int(facts["size"]) if "size" in facts else None,
+                    "modify": facts.get("modify"),
+                }
+                for name, facts in ftp.mlsd(directory, facts=["type", "size", "modify"])
+                if facts.get("type") == "file"
+            ]
+        except error_perm:
+            # servers without MLSD
+            return [
+                {"name": os.path.basename(name), "size": None, "modify": None}
+                for name in ftp.nlst(directory)
+            ]
+
+    def list(
+        self, directory: str, pattern: str = "*", refresh: bool = False
+    ) -> List[dict]:
+        """
+        Lists the files in `directory` matching `pattern` (case insensitive), as
+        dicts with their `name`, full `path`, `size` and `modify` time
+        (YYYYMMDDHHMMSS), from the cache when it is fresh enough.
+        """
+        cache_path = self._listing_path(directory)
+        listing = None
+        if not refresh:
+            try:
+                cached = json.loads(cache_path.read_text(encoding="utf-8"))
+                if time.time() - cached["fetched_at"] < self.listing_ttl:
+                    listing = cached["files"]
+            except (OSError, ValueError, KeyError):
+                pass
+        if listing is None:
+            listing = self._run(lambda ftp: self._fetch_listing(ftp, directory))
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            cache_path.write_text(
+                json.dumps({"fetched_at": time.time(), "files": listing}),
+                encoding="utf-8",
+            )
+            log(f"listed {len(listing)} files in {self.host}/{directory}")
+        return [
+            dict(entry, path=f"{directory.rstrip('/')}/{entry['name']}")
+            for entry in listing
+            if fnmatch(entry["name"].lower(), pattern.lower())
+        ]
+
+    def download(self, remote_path: str, path: Union[str, Path]) -> Path:
+        """
+        Downloads `remote_path` to `path`, or into it if it is a directory.
+        """
+        path = Path(path)
+        if path.is_dir():
+            path = path / os.path.basename(remote_path)
+        part = path.with_name(path.name + ".part")
+
+        def retrieve(ftp: FTP):
+            with open(part, "wb") as file:
+                ftp.retrbinary(f"RETR {remote_path}", file.write)
+
+        self._run(retrieve)
+        os.replace(part, path)
+        return path
+
+
+@lru_cache(maxsize=None)
+def get_datasus_ftp() -> DatasusFTP:
+    """
+    Returns the `DatasusFTP` shared by the tasks running in this process.
+    """
+    return DatasusFTP()
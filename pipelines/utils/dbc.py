@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+"""
+Reader of DATASUS DBC files.
+
+A DBC file is a DBF file whose records are compressed with the PKWare Data
+Compression Library "implode" method: the DBF header is stored as is, followed
+by a 4 bytes CRC and the compressed records. `iter_blast_decompress` streams
+them through Mark Adler's `blast.c` (zlib/contrib/blast, the decompressor of
+R's `read.dbc`), compiled in `dclimplode`, and `iter_dbf_records` decodes the
+records into pandas DataFrames, one numpy structured array per batch, as they
+are decompressed.
+"""
+import codecs
+import re
+from collections import namedtuple
+from io import BytesIO
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Tuple, Union
+
+import dclimplode
+import numpy as np
+import pandas as pd
+
+DBFField = namedtuple("DBFField", ["name", "type", "length", "decimals"])
+
+# bytes stripped from the values of the fields: whitespace and the NUL padding
+_BLANKS = np.zeros(256, dtype=bool)
+_BLANKS[[0, 9, 10, 11, 12, 13, 32]] = True
+
+# errors returned by `blast.c`
+_BLAST_ERRORS = {
+    2: "Truncated imploded stream",
+    -1: "Invalid literal flag in imploded stream",
+    -2: "Invalid dictionary size in imploded stream",
+    -3: "Distance too far back in imploded stream",
+}
+
+
+def _blast_error(error: RuntimeError) -> ValueError:
+    """
+    Converts the `RuntimeError("blast() error (<code>)")` of `dclimplode` into a
+    ValueError with the message of its code.
+    """
+    code = re.search(r"\((-?\d+)\)", str(error))
+    message = _BLAST_ERRORS.get(int(code.group(1)) if code else None)
+    return ValueError(message or f"Invalid imploded stream: {error}")
+
+
+def iter_blast_decompress(
+    file: BinaryIO, chunk_size: int = 1024 * 1024
+) -> Iterator[bytes]:
+    """
+    Decompresses a PKWare DCL imploded stream read from `file`, yielding the
+    output as it is decompressed, one chunk per `chunk_size` bytes of input.
+    Only one chunk of input and its output are held in memory.
+
+    Raises:
+        ValueError: if the stream is invalid or truncated.
+    """
+    decompressor = dclimplode.decompressobj()
+    while not decompressor.eof:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            raise ValueError(_BLAST_ERRORS[2])
+        try:
+            output = decompressor.decompress(chunk)
+        except RuntimeError as error:
+            raise _blast_error(error) from error
+        if output:
+            yield output
+
+
+def blast_decompress(data: bytes) -> bytes:
+    """
+    Decompresses a PKWare DCL imploded stream held in memory.
+
+    Raises:
+        ValueError: if the stream is invalid or truncated.
+    """
+    return b"".join(iter_blast_decompress(BytesIO(data), chunk_size=len(data) + 1))
+
+
+def read_dbc_header(file: BinaryIO) -> bytes:
+    """
+    Reads the DBF header at the start of a DBC file, leaving `file` at the start
+    of the compressed records.
+    """
+    header = file.read(10)
+    header_length = int.from_bytes(header[8:10], "little")
+    if header_length < 32:
+        raise ValueError(f"Invalid DBC header length: {header_length}")
+    header += file.read(header_length - 10)
+    # CRC of the compressed records
+    if len(header) < header_length or len(file.read(4)) < 4:
+        raise ValueError(f"Invalid DBC header length: {header_length}")
+    return header
+
+
+def dbc_to_dbf(data: bytes) -> bytes:
+    """
+    Converts the contents of a DBC file to the contents of the DBF file.
+    """
+    file = BytesIO(data)
+    header = read_dbc_header(file)
+    return header + blast_decompress(file.read())
+
+
+def read_dbf_header(data: bytes) -> Tuple[int, int, int, List[DBFField]]:
+    """
+    Parses the header of a DBF file.
+
+    Returns:
+        tuple: number of records, header length, record length and fields.
+    """
+    n_records = int.from_bytes(data[4:8], "little")
+    header_length = int.from_bytes(data[8:10], "little")
+    record_length = int.from_bytes(data[10:12], "little")
+    fields = []
+    for offset in range(32, header_length - 1, 32):
+        descriptor = data[offset : offset + 32]
+        if descriptor[0] == 0x0D:
+            break
+        fields.append(
+            DBFField(
+                name=descriptor[:11].split(b"\x00")[0].decode("ascii").strip(),
+                type=chr(descriptor[11]),
+                length=descriptor[16],
+                decimals=descriptor[17],
+            )
+        )
+    return n_records, header_length, record_length, fields
+
+
+def format_r_double(value: float) -> Optional[str]:
+    """
+    Formats a number like R's `write.table`: rounded to 15 significant digits,
+    with the fewest digits that keep them, in fixed notation unless the
+    scientific one is shorter (`1e+05`, but `123456` and `0.1`).
+    """
+    if np.isnan(value):
+        return None
+    if np.isinf(value):
+        return "Inf" if value > 0 else "-Inf"
+    mantissa, exponent = f"{value:.14e}".split("e")
+    mantissa = mantissa.rstrip("0").rstrip(".")
+    exponent = int(exponent)
+    scientific = f"{mantissa}e{'-' if exponent < 0 else '+'}{abs(exponent):02d}"
+    digits = len(mantissa.lstrip("-").replace(".", ""))
+    fixed = f"{value:.{max(digits - 1 - exponent, 0)}f}"
+    return fixed if len(fixed) <= len(scientific) else scientific
+
+
+def _strip(values: np.ndarray) -> np.ndarray:
+    """
+    Strips the whitespace around an array of byte strings, like `np.char.strip`,
+    clearing the trailing blanks of all values at once: only some values (e.g.
+    right aligned numbers) also start with blanks.
+    """
+    width = values.dtype.itemsize
+    raw = np.frombuffer(bytearray(values.tobytes()), dtype=np.uint8)
+    raw = raw.reshape(-1, width)
+    filled = ~_BLANKS[raw]
+    ends = width - filled[:, ::-1].argmax(axis=1)
+    ends[~filled.any(axis=1)] = 0
+    raw[np.arange(width) >= ends[:, None]] = 0
+    stripped = raw.view(f"S{width}").ravel()
+    leading = _BLANKS[raw[:, 0]] & (raw[:, 0] != 0)
+    if leading.any():
+        stripped[leading] = np.char.lstrip(stripped[leading])
+    return stripped
+
+
+def _decode_strings(values: np.ndarray, encoding: str) -> np.ndarray:
+    """
+    Decodes an array of byte strings. Latin-1, the encoding of the DATASUS
+    files, is decoded at once by widening each byte to its code point.
+    """
+    if codecs.lookup(encoding).name == "iso8859-1":
+        codes = np.frombuffer(values.tobytes(), dtype=np.uint8).astype(np.uint32)
+        return codes.view(f"<U{values.dtype.itemsize}")
+    return np.array([value.decode(encoding) for value in values], dtype=object)
+
+
+def _decode_column(
+    values: np.ndarray, field: DBFField, encoding: str, as_text: bool = False
+) -> pd.Series:
+    """
+    Converts the raw bytes of a field like `foreign::read.dbf`: blank values are
+    missing, numbers are integers (without decimals and up to 9 digits) or
+    floats, dates are datetimes and logicals are booleans.
+
+    With `as_text`, values are strings written like R's `write.table` writes
+    the columns of `read.dbf` (`12`, `1e+05`, `2023-01-15`, `TRUE`).
+    """
+    values = _strip(values)
+    if field.type in "NF":
+        numbers = pd.to_numeric(values.astype(str), errors="coerce")
+        if field.decimals == 0 and field.length < 10:
+            numbers = pd.Series(numbers).astype("Int64")
+            return numbers.astype("string") if as_text else numbers
+        if as_text:
+            # each distinct value is formatted once: most of them repeat
+            codes, uniques = pd.factorize(numbers)
+            texts = np.array([format_r_double(number) for number in uniques] + [None])
+            return pd.Series(texts[codes]).astype("string")
+        return pd.Series(numbers)
+    if field.type == "D":
+        dates = pd.Series(
+            pd.to_datetime(values.astype(str), format="%Y%m%d", errors="coerce")
+        )
+        return dates.dt.strftime("%Y-%m-%d").astype("string") if as_text else dates
+    if field.type == "L":
+        logicals = {"T": True, "Y": True, "F": False, "N": False}
+        if as_text:
+            logicals = {"T": "TRUE", "Y": "TRUE", "F": "FALSE", "N": "FALSE"}
+        logicals = pd.Series(values.astype(str)).str.upper().map(logicals)
+        return logicals.astype("string") if as_text else logicals
+    strings = _decode_strings(values, encoding)
+    empty = strings == ""
+    strings = pd.Series(strings, dtype="string" if as_text else object)
+    return strings.mask(empty)
+
+
+def iter_dbf_records(
+    header: bytes,
+    chunks: Iterable[bytes],
+    batch_size: int = 100_000,
+    encoding: str = "latin-1",
+    as_text: bool = False,
+) -> Iterator[pd.DataFrame]:
+    """
+    Decodes the records of a DBF file with the given `header`, read from
+    `chunks` of any size, into DataFrames of up to `batch_size` rows, without
+    the deleted records. At most one batch of raw records is held in memory.
+    """
+    n_records, _, record_length, fields = read_dbf_header(header)
+    offsets, offset = [], 1
+    for field in fields:
+        offsets.append(offset)
+        offset += field.length
+    dtype = np.dtype(
+        {
+            "names": ["_deleted"] + [f"f{i}" for i in range(len(fields))],
+            "formats": ["S1"] + [f"S{field.length}" for field in fields],
+            "offsets": [0] + offsets,
+            "itemsize": record_length,
+        }
+    )
+
+    def decode(count: int) -> pd.DataFrame:
+        records = np.frombuffer(bytes(buffer[: count * record_length]), dtype=dtype)
+        del buffer[: count * record_length]
+        records = records[records["_deleted"] != b"*"]
+        return pd.DataFrame(
+            {
+                field.name: _decode_column(records[f"f{i}"], field, encoding, as_text)
+                for i, field in enumerate(fields)
+            }
+        )
+
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        while n_records and len(buffer) >= batch_size * record_length:
+            count = min(batch_size, n_records)
+            n_records -= count
+            yield decode(count)
+    # some files end before the number of records in their header
+    count = min(n_records, len(buffer) // record_length)
+    if count:
+        yield decode(count)
+
+
+def iter_dbf_batches(
+    data: bytes,
+    batch_size: int = 100_000,
+    encoding: str = "latin-1",
+    as_text: bool = False,
+) -> Iterator[pd.DataFrame]:
+    """
+    Yields the records of a DBF file, without the deleted ones, as DataFrames of
+    up to `batch_size` rows.
+    """
+    _, header_length, record_length, _ = read_dbf_header(data)
+    step = batch_size * max(record_length, 1)
+    view = memoryview(data)
+    chunks = (
+        view[start : start + step] for start in range(header_length, len(data), step)
+    )
+    yield from iter_dbf_records(
+        data[:header_length], chunks, batch_size, encoding, as_text
+    )
+
+
+def iter_dbc_batches(
+    path: Union[str, Path],
+    batch_size: int = 100_000,
+    encoding: str = "latin-1",
+    as_text: bool = False,
+) -> Iterator[pd.DataFrame]:
+    """
+    Yields the records of a DBC file as DataFrames of up to `batch_size` rows,
+    decompressing the file as the batches are read.
+    """
+    with open(path, "rb") as file:
+        header = read_dbc_header(file)
+        yield from iter_dbf_records(
+            header, iter_blast_decompress(file), batch_size, encoding, as_text
+        )
+
+
+def read_dbc(
+    path: Union[str, Path], encoding: str = "latin-1", as_text: bool = False
+) -> pd.DataFrame:
+    """
+    Reads a DBC file into a DataFrame, like R's `read.dbc::read.dbc`.
+    """
+    batches = list(
+        iter_dbc_batches(path, batch_size=1_000_000, encoding=encoding, as_text=as_text)
+    )
+    if not batches:
+        with open(path, "rb") as file:
+            fields = read_dbf_header(read_dbc_header(file))[3]
+        return pd.DataFrame(columns=[field.name for field in fields])
+    return pd.concat(batches, ignore_index=True)
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+Reference tables of the Base dos Dados directories (`br_bd_diretorios_brasil`)
+shared by all pipelines: each table is read from its staging files once, kept on
+disk as Parquet along with the version of the files it was built from, and
+exposed through lookup dicts (e.g. id_municipio_bcb -> id_municipio) built once
+per process.
+"""
+import hashlib
+import os
+from functools import lru_cache
+from pathlib import Path
+from threading import RLock
+from typing import Callable, Dict, Hashable, Tuple, Union
+from uuid import uuid4
+
+import basedosdados as bd
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from google.cloud import storage
+
+from pipelines.utils.constants import constants as utils_constants
+from pipelines.utils.text import map_unique
+from pipelines.utils.utils import download_blobs_from_gcs, log, read_staging_files
+
+# schema metadata of the cached Parquet files
+VERSION_KEY = b"directory_version"
+
+
+def normalize_nome_municipio(series: pd.Series) -> pd.Series:
+    """
+    Normalizes names of municipalities to join them by name: accents and
+    punctuation are removed and names are lowercased and stripped, e.g.
+    `"Santa Bárbara d'Oeste"` -> `"santa barbara doeste"`.
+    """
+    return map_unique(
+        series.astype(str),
+        lambda names: names.str.normalize("NFKD")
+        .str.encode("ascii", "ignore")
+        .str.decode("utf-8")
+        .str.replace(r"[^\w\s]", "", regex=True)
+        .str.lower()
+        .str.strip(),
+    )
+
+
+class DirectoryCache:
+    """
+    Tables of the directories dataset, read from the staging bucket.
+
+    - `table` compares the generations of the staging files of a table with the
+      version of its Parquet copy in `cache_dir`, and reads the files again only
+      when they changed. The check is made once per process;
+    - `lookup` returns dicts from a key column (or a tuple of columns) to a value
+      column, built once per process. All values are strings.
+    """
+
+    def __init__(
+        self,
+        dataset_id: str = utils_constants.DIRECTORIES_DATASET_ID.value,
+        cache_dir: Union[str, Path] = utils_constants.DIRECTORIES_CACHE_DIR.value,
+        bucket: storage.Bucket = None,
+    ):
+        self.dataset_id = dataset_id
+        self.cache_dir = Path(cache_dir)
+        self._bucket = bucket
+        self._tables: Dict[str, pd.DataFrame] = {}
+        self._lookups: Dict[Hashable, dict] = {}
+        self._lock = RLock()
+
+    @property
+    def bucket(self) -> storage.Bucket:
+        """
+        Staging bucket of the directories.
+        """
+        if self._bucket is None:
+            storage_bd = bd.Storage(dataset_id=self.dataset_id, table_id="municipio")
+            self._bucket = storage_bd.client["storage_staging"].bucket(
+                "basedosdados-dev"
+            )
+        return self._bucket
+
+    def _version(self, prefix: str) -> str:
+        blobs = sorted(
+            f"{blob.name}#{blob.generation}"
+            for blob in self.bucket.client.list_blobs(self.bucket, prefix=f"{prefix}/")
+            if not blob.name.endswith("/")
+        )
+        if not blobs:
+            raise FileNotFoundError(f"No staging files in {prefix}")
+        return hashlib.sha256("\n".join(blobs).encode("utf-8")).hexdigest()
+
+    def _read(self, table_id: str) -> pd.DataFrame:
+        prefix = f"staging/{self.dataset_id}/{table_id}"
+        version = self._version(prefix)
+        path = self.cache_dir / f"{table_id}.parquet"
+        try:
+            metadata = pq.read_schema(path).metadata or {}
+            if metadata.get(VERSION_KEY) == version.encode("utf-8"):
+                return pd.read_parquet(path)
+        except (OSError, pa.ArrowInvalid):
+            pass
+
+        files = download_blobs_from_gcs(
+            self.bucket, prefix, cache_dir=self.cache_dir / "blobs"
+        )
+        df = read_staging_files(files, dtype=str)
+        # parquet staging files keep their types
+        for column in df.columns:
+            if df[column].dtype != object:
+                df[column] = df[column].astype(str).where(df[column].notna())
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata(
+            {**(table.schema.metadata or {}), VERSION_KEY: version.encode("utf-8")}
+        )
+        path.parent.mkdir(parents=True, exist_ok=True)
+        part = path.with_name(f"{path.name}.{uuid4().hex}.part")
+        pq.write_table(table, part)
+        os.replace(part, path)
+        log(f"Cached {self.dataset_id}.{table_id}: {len(df)} rows")
+        return df
+
+    def table(self, table_id: str) -> pd.DataFrame:
+        """
+        Returns a table of the directories. The DataFrame is shared: copy it
+        before changing it.
+        """
+        with self._lock:
+            if table_id not in self._tables:
+                self._tables[table_id] = self._read(table_id)
+            return self._tables[table_id]
+
+    def _memo(self, key: Hashable, build: Callable[[], dict]) -> dict:
+        with self._lock:
+            if key not in self._lookups:
+                self._lookups[key] = build()
+            return self._lookups[key]
+
+    def lookup(
+        self, table_id: str, key: Union[str, Tuple[str, ...]], value: str
+    ) -> dict:
+        """
+        Returns a dict from the values of the `key` column (or tuples of the
+        values of `key` columns) of a table to the values of the `value` column,
+        without missing keys.
+        """
+
+        def build() -> dict:
+            df = self.table(table_id)
+            keys = [key] if isinstance(key, str) else list(key)
+            df = df.dropna(subset=keys)
+            if isinstance(key, str):
+                return dict(zip(df[key], df[value]))
+            return dict(zip(zip(*[df[column] for column in keys]), df[value]))
+
+        return self._memo((table_id, key, value), build)
+
+    def id_municipio_by_nome(self) -> Dict[Tuple[str, str], str]:
+        """
+        Returns a dict from (normalized name, sigla_uf) to id_municipio, see
+        `normalize_nome_municipio`.
+        """
+
+        def build() -> dict:
+            municipio = self.table("municipio")
+            keys = zip(
+                normalize_nome_municipio(municipio["nome"]), municipio["sigla_uf"]
+            )
+            return dict(zip(keys, municipio["id_municipio"]))
+
+        return self._memo(("municipio", "nome normalizado"), build)
+
+
+@lru_cache(maxsize=None)
+def get_directories() -> DirectoryCache:
+    """
+    Returns the `DirectoryCache` shared by the tasks running in this process.
+    """
+    return DirectoryCache()
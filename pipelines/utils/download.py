@@ -0,0 +1,487 @@
+# -*- coding: utf-8 -*-
+"""
+HTTP downloads shared by all pipelines: pooled sessions, large chunks, resume of
+partial files, bounded concurrency, per host rate limits and a content addressed
+cache on disk, plus streaming reads of the members of zip archives.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from fnmatch import fnmatch
+from functools import lru_cache
+from pathlib import Path
+from threading import Lock
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from urllib.parse import unquote, urlparse
+from zipfile import ZipFile, ZipInfo
+
+import prefect
+import requests
+from requests.adapters import HTTPAdapter
+
+from pipelines.utils.constants import constants as utils_constants
+from pipelines.utils.utils import human_readable, log
+
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+class RateLimiter:
+    """
+    Spaces the requests made to each host by a minimum interval, in seconds.
+    """
+
+    def __init__(self, intervals: Dict[str, float] = None):
+        self.intervals = intervals or {}
+        self._next_request: Dict[str, float] = {}
+        self._lock = Lock()
+
+    def wait(self, url: str) -> None:
+        """
+        Blocks until a request to the host of `url` is allowed.
+        """
+        host = urlparse(url).hostname
+        interval = self.intervals.get(host, 0)
+        if not interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_request.get(host, now))
+            self._next_request[host] = start + interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class DownloadCache:
+    """
+    Content addressed cache of downloaded files. Files are stored once under their
+    SHA-256 and an index maps each URL to its content and validators (ETag and
+    Last-Modified), used to revalidate the entry with a conditional request.
+    """
+
+    def __init__(self, directory: Union[str, Path]):
+        self.directory = Path(directory)
+        self.index_path = self.directory / "index.json"
+        self._lock = Lock()
+
+    def _read_index(self) -> dict:
+        try:
+            return json.loads(self.index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def object_path(self, sha256: str) -> Path:
+        """
+        Path of the cached content with the given SHA-256.
+        """
+        return self.directory / "objects" / sha256[:2] / sha256
+
+    def lookup(self, url: str) -> dict:
+        """
+        Returns the index entry of `url` if its content is cached, else an empty dict.
+        """
+        with self._lock:
+            entry = self._read_index().get(url, {})
+        if entry and self.object_path(entry["sha256"]).exists():
+            return entry
+        return {}
+
+    def store(self, url: str, path: Path, sha256: str, headers: dict) -> None:
+        """
+        Adds the file downloaded from `url` to the cache.
+        """
+        target = self.object_path(sha256)
+        if not target.exists():
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(path, target)
+        with self._lock:
+            index = self._read_index()
+            index[url] = {
+                "sha256": sha256,
+                "etag": headers.get("ETag"),
+                "last_modified": headers.get("Last-Modified"),
+            }
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self.index_path.write_text(json.dumps(index), encoding="utf-8")
+
+    def restore(self, entry: dict, path: Path) -> None:
+        """
+        Copies a cached file to `path`.
+        """
+        shutil.copyfile(self.object_path(entry["sha256"]), path)
+
+
+class Downloader:
+    """
+    Downloads files over HTTP with a pooled `requests.Session`.
+
+    - responses are streamed to disk in chunks of `chunk_size` bytes;
+    - interrupted downloads are kept as `<file>.part`, next to the ETag or
+      Last-Modified of the response in `<file>.part.validator`, and resumed with a
+      `Range` request conditioned on it (`If-Range`), by the retries of the same
+      call or by a later call. Partial files without a validator, or of another
+      version of the file, are downloaded again from the start;
+    - `download_many` downloads a list of files with at most `max_workers` at once;
+    - `rate_limits` maps hosts to the minimum interval between requests to them;
+    - with `cache_dir`, files downloaded with `use_cache=True` are kept in a
+      `DownloadCache` and revalidated with conditional requests instead of being
+      downloaded again;
+    - 429/5xx responses and connection errors are retried up to `max_retries`
+      times, resuming the partial file;
+    - `session` replaces the pooled session, e.g. by one with a custom SSL adapter.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = utils_constants.DOWNLOAD_CHUNK_SIZE.value,
+        max_workers: int = utils_constants.DOWNLOAD_MAX_WORKERS.value,
+        timeout: Tuple[float, float] = utils_constants.DOWNLOAD_TIMEOUT.value,
+        max_retries: int = utils_constants.DOWNLOAD_MAX_RETRIES.value,
+        rate_limits: Dict[str, float] = None,
+        cache_dir: Union[str, Path] = None,
+        headers: Dict[str, str] = None,
+        session: requests.Session = None,
+    ):
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.rate_limiter = RateLimiter(
+            utils_constants.DOWNLOAD_RATE_LIMITS.value
+            if rate_limits is None
+            else rate_limits
+        )
+        self.cache = DownloadCache(cache_dir) if cache_dir else None
+        if session is None:
+            session = requests.Session()
+            # retries are made by `get` and `download`, which can resume files
+            adapter = HTTPAdapter(
+                pool_connections=max_workers,
+                pool_maxsize=max_workers,
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+        self.session.headers.update(
+            headers or {"User-Agent": utils_constants.DOWNLOAD_USER_AGENT.value}
+        )
+        self.downloaded_bytes = 0
+        self.downloaded_seconds = 0.0
+        self._metrics_lock = Lock()
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """
+        Rate limited GET through the pooled session, for small responses. 429/5xx
+        responses and connection errors are retried up to `max_retries` times.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.wait(url)
+            try:
+                response = self.session.get(url, **kwargs)
+                if response.status_code in RETRY_STATUS:
+                    raise requests.ConnectionError(
+                        f"HTTP {response.status_code}", response=response
+                    )
+                response.raise_for_status()
+                return response
+            except (requests.ConnectionError, requests.Timeout) as error:
+                if attempt == self.max_retries:
+                    raise
+                log(f"GET {url} failed ({error}), retrying", "warning")
+                time.sleep(2**attempt)
+        raise requests.HTTPError(f"Could not GET {url}")
+
+    def download(
+        self,
+        url: str,
+        path: Union[str, Path],
+        resume: bool = True,
+        use_cache: bool = False,
+    ) -> Path:
+        """
+        Downloads `url` to `path`. If `path` is an existing directory, the file is
+        saved there with the name in the URL.
+
+        With `use_cache`, the file is kept in the `DownloadCache` of the
+        downloader and revalidated by later calls. Only worth it for files read
+        again by later runs on the same disk, since it stores a copy of each one.
+
+        Returns:
+            Path: path of the downloaded file.
+        """
+        path = Path(path)
+        if path.is_dir():
+            path = path / unquote(Path(urlparse(url).path).name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        part_path = path.with_name(path.name + ".part")
+        validator_path = path.with_name(path.name + ".part.validator")
+        cache = self.cache if use_cache else None
+        cached = cache.lookup(url) if cache is not None else {}
+
+        start = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            offset = part_path.stat().st_size if resume and part_path.exists() else 0
+            validator = read_validator(validator_path) if offset else None
+            # without a validator, the partial file may be of an older version
+            offset = offset if validator else 0
+            headers = (
+                {"Range": f"bytes={offset}-", "If-Range": validator} if offset else {}
+            )
+            if cached and not offset:
+                if cached.get("etag"):
+                    headers["If-None-Match"] = cached["etag"]
+                if cached.get("last_modified"):
+                    headers["If-Modified-Since"] = cached["last_modified"]
+            self.rate_limiter.wait(url)
+            try:
+                with self.session.get(
+                    url, headers=headers, stream=True, timeout=self.timeout
+                ) as response:
+                    if response.status_code == 304 and cached:
+                        cache.restore(cached, path)
+                        log(f"Download {url}: not modified, using the cached file")
+                        return path
+                    if response.status_code == 416:
+                        # the partial file is not valid for this resource anymore
+                        discard_partial(part_path, validator_path)
+                        continue
+                    if response.status_code in RETRY_STATUS:
+                        raise requests.ConnectionError(
+                            f"HTTP {response.status_code}", response=response
+                        )
+                    response.raise_for_status()
+                    if response.status_code != 206:
+                        # the whole file, e.g. because it changed since `validator`
+                        offset = 0
+                    elif not is_range_of(response, offset, validator):
+                        discard_partial(part_path, validator_path)
+                        continue
+                    if not offset:
+                        write_validator(validator_path, response.headers)
+                    with open(part_path, "ab" if offset else "wb") as file:
+                        for chunk in response.iter_content(self.chunk_size):
+                            file.write(chunk)
+                    response_headers = response.headers
+                break
+            except (requests.ConnectionError, requests.Timeout) as error:
+                if attempt == self.max_retries:
+                    raise
+                log(f"Download {url} interrupted ({error}), resuming", "warning")
+                time.sleep(2**attempt)
+        else:
+            raise requests.HTTPError(f"Could not download {url}")
+
+        os.replace(part_path, path)
+        validator_path.unlink(missing_ok=True)
+        seconds = time.perf_counter() - start
+        size = path.stat().st_size
+        with self._metrics_lock:
+            self.downloaded_bytes += size
+            self.downloaded_seconds += seconds
+        log(
+            f"Downloaded {url} to {path}: {human_readable(size, 'B')} in "
+            f"{seconds:.1f}s ({human_readable(size / max(seconds, 1e-6), 'B/s')})"
+        )
+        if cache is not None:
+            cache.store(url, path, file_sha256(path), response_headers)
+        return path
+
+    def download_many(
+        self,
+        files: Union[
+            Dict[str, Union[str, Path]], Iterable[Tuple[str, Union[str, Path]]]
+        ],
+        max_workers: int = None,
+        **kwargs,
+    ) -> List[Path]:
+        """
+        Downloads many `(url, path)` pairs (or a `{url: path}` dict) concurrently,
+        with at most `max_workers` downloads at once. Keyword arguments are passed
+        to `download`.
+
+        Returns:
+            list: the downloaded paths, in the same order.
+        """
+        files = list(files.items() if isinstance(files, dict) else files)
+        # prefect's context (and its logger) is local to the thread running the task
+        context = prefect.context.to_dict()
+
+        def download(url: str, path: Union[str, Path]) -> Path:
+            with prefect.context(**context):
+                return self.download(url, path, **kwargs)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max_workers or self.max_workers) as pool:
+            futures = [pool.submit(download, url, path) for url, path in files]
+            paths = [future.result() for future in futures]
+        seconds = time.perf_counter() - start
+        size = sum(path.stat().st_size for path in paths)
+        log(
+            f"Downloaded {len(paths)} files, {human_readable(size, 'B')} in "
+            f"{seconds:.1f}s ({human_readable(size / max(seconds, 1e-6), 'B/s')})"
+        )
+        return paths
+
+    def log_metrics(self) -> None:
+        """
+        Logs the volume and throughput of all downloads made by this instance.
+        """
+        seconds = max(self.downloaded_seconds, 1e-6)
+        log(
+            f"Downloads: {human_readable(self.downloaded_bytes, 'B')} in "
+            f"{self.downloaded_seconds:.1f}s "
+            f"({human_readable(self.downloaded_bytes / seconds, 'B/s')})"
+        )
+
+
+def response_validator(headers) -> Optional[str]:
+    """
+    Returns the validator of a response that can be sent in `If-Range`: its ETag,
+    unless it is weak, or else its Last-Modified date.
+    """
+    etag = headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return headers.get("Last-Modified")
+
+
+def read_validator(path: Path) -> Optional[str]:
+    """
+    Returns the validator saved at `path`, if any.
+    """
+    try:
+        return path.read_text(encoding="utf-8").strip() or None
+    except OSError:
+        return None
+
+
+def write_validator(path: Path, headers) -> None:
+    """
+    Saves the validator of a response at `path`, or removes the saved one if the
+    response has none.
+    """
+    validator = response_validator(headers)
+    if validator:
+        path.write_text(validator, encoding="utf-8")
+    else:
+        path.unlink(missing_ok=True)
+
+
+def is_range_of(response: requests.Response, offset: int, validator: str) -> bool:
+    """
+    Whether a 206 response continues, from `offset`, the version of the file
+    identified by `validator`.
+    """
+    return response_validator(response.headers) == validator and response.headers.get(
+        "Content-Range", ""
+    ).startswith(f"bytes {offset}-")
+
+
+def discard_partial(part_path: Path, validator_path: Path) -> None:
+    """
+    Removes a partial download and its validator.
+    """
+    part_path.unlink(missing_ok=True)
+    validator_path.unlink(missing_ok=True)
+
+
+def file_sha256(path: Union[str, Path]) -> str:
+    """
+    Returns the SHA-256 hex digest of a file.
+    """
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def get_downloader() -> Downloader:
+    """
+    Returns the `Downloader` shared by the tasks of a flow run, so that they share
+    connections and host rate limits.
+    """
+    return Downloader(cache_dir=utils_constants.DOWNLOAD_CACHE_DIR.value)
+
+
+def download_file(url: str, path: Union[str, Path], **kwargs) -> Path:
+    """
+    Downloads `url` to `path` with the shared `Downloader`.
+    """
+    return get_downloader().download(url, path, **kwargs)
+
+
+def download_files(
+    files: Union[Dict[str, Union[str, Path]], Iterable[Tuple[str, Union[str, Path]]]],
+    max_workers: int = None,
+    **kwargs,
+) -> List[Path]:
+    """
+    Downloads many `(url, path)` pairs concurrently with the shared `Downloader`.
+    """
+    return get_downloader().download_many(files, max_workers=max_workers, **kwargs)
+
+
+@contextmanager
+def open_archive(source: Union[str, Path]) -> Iterator[ZipFile]:
+    """
+    Opens the zip file at `source`, a local path or a URL. Remote archives are
+    spooled to a temporary file, removed on exit, instead of being held in memory.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if not Path(source).is_file():
+            source = download_file(source, Path(tmp_dir) / "archive.zip")
+        with ZipFile(source) as zipfile:
+            yield zipfile
+
+
+def matching_members(zipfile: ZipFile, pattern: str = "*") -> List[ZipInfo]:
+    """
+    Lists the files of `zipfile` whose names match the (case insensitive) glob
+    `pattern`.
+    """
+    return [
+        info
+        for info in zipfile.infolist()
+        if not info.is_dir()
+        and fnmatch(Path(info.filename).name.lower(), pattern.lower())
+    ]
+
+
+def iter_zip_members(
+    source: Union[str, Path], pattern: str = "*"
+) -> Iterator[Tuple[str, IO[bytes]]]:
+    """
+    Yields `(name, file)` for the members of the zip file at `source` (a local
+    path or a URL) matching `pattern`. Each file is decompressed as it is read,
+    so it can be passed to `pd.read_csv` without being extracted to disk; it is
+    closed when the next member is requested.
+    """
+    with open_archive(source) as zipfile:
+        for info in matching_members(zipfile, pattern):
+            with zipfile.open(info) as member:
+                yield info.filename, member
+
+
+def download_and_unzip(
+    url: str, path: Union[str, Path], pattern: str = "*"
+) -> Union[str, Path]:
+    """
+    Downloads the zip file at `url` (or opens it, if `url` is a local path) and
+    extracts the members matching `pattern` to `path`. Other members are never
+    written to disk.
+
+    Returns:
+        the `path` where the files were extracted.
+    """
+    os.makedirs(path, exist_ok=True)
+    with open_archive(url) as zipfile:
+        for info in matching_members(zipfile, pattern):
+            zipfile.extract(info, path=path)
+    return path
@@ -6,7 +6,7 @@ Helper tasks that could fit any pipeline.
 
 from datetime import timedelta, datetime
 from pathlib import Path
-from typing import Any, Union, List
+from typing import Any, Dict, List, Optional, Union
 
 import basedosdados as bd
 import pandas as pd
@@ -17,7 +17,10 @@ from prefect.backend import FlowRunView
 from prefect.client import Client
 
 from pipelines.constants import constants
+from pipelines.utils.architecture import get_architectures
 from pipelines.utils.utils import (
+    check_file_format,
+    delete_staging_header,
     dump_header_to_csv,
     get_ids,
     parse_temporal_coverage,
@@ -25,10 +28,18 @@ from pipelines.utils.utils import (
     create_update,
     extract_last_update,
     extract_last_date,
+    freshness_batch,
+    get_coverage_date_formats,
     get_first_date,
+    get_graphql_client,
+    get_metadata_id_cache,
+    get_tables_last_date,
     log,
+    MetadataAPIError,
     get_credentials_from_secret,
     get_token,
+    update_temporal_coverages,
+    upload_files_to_gcs,
 )
 from typing import Tuple
 
@@ -73,11 +84,26 @@ def create_table_and_upload_to_gcs(
     dataset_id: str,
     table_id: str,
     dump_mode: str,
+    file_format: str = "csv",
+    incremental: bool = False,
+    skip_unchanged: bool = True,
     wait=None,  # pylint: disable=unused-argument
 ) -> None:
     """
     Create table using BD+ and upload to GCS.
+
+    `file_format` is the format of the files in `data_path` (`csv` or `parquet`)
+    and of the external staging table; other values raise ValueError. Changing
+    the format of an existing table needs a run with `dump_mode="overwrite"`.
+
+    With `incremental=True` the staging data already in GCS is kept and only new
+    or changed files are uploaded. In overwrite mode, blobs with no local file are
+    deleted.
+
+    Files identical to a blob already in GCS are not uploaded again, unless
+    `skip_unchanged=False`.
     """
+    check_file_format(file_format)
     bd_version = bd.__version__
     log(f"USING BASEDOSDADOS {bd_version}")
     # pylint: disable=C0103
@@ -87,6 +113,7 @@ def create_table_and_upload_to_gcs(
     st = bd.Storage(dataset_id=dataset_id, table_id=table_id)
     storage_path = f"{st.bucket_name}.staging.{dataset_id}.{table_id}"
     storage_path_link = f"https://console.cloud.google.com/storage/browser/{st.bucket_name}/staging/{dataset_id}/{table_id}"
+    storage_prefix = f"staging/{dataset_id}/{table_id}"
 
     #####################################
     #
@@ -104,11 +131,14 @@ def create_table_and_upload_to_gcs(
         else:
             # the header is needed to create a table when dosen't exist
             log("MODE APPEND: Table DOSEN'T EXISTS\n" + "Start to CREATE HEADER file")
-            header_path = dump_header_to_csv(data_path=data_path)
+            header_path = dump_header_to_csv(
+                data_path=data_path, file_format=file_format
+            )
             log("MODE APPEND: Created HEADER file:\n" f"{header_path}")
 
             tb.create(
                 path=header_path,
+                source_format=file_format,
                 if_storage_data_exists="replace",
                 if_table_exists="replace",
             )
@@ -119,16 +149,32 @@ def create_table_and_upload_to_gcs(
                 f"{storage_path_link}"
             )  # pylint: disable=C0301
 
-            st.delete_table(
-                mode="staging", bucket_name=st.bucket_name, not_found_ok=True
-            )
+            if incremental:
+                delete_staging_header(header_path, st.bucket, storage_prefix)
+            else:
+                st.delete_table(
+                    mode="staging", bucket_name=st.bucket_name, not_found_ok=True
+                )
             log(
                 "MODE APPEND: Sucessfully REMOVED HEADER DATA from Storage:\n"
                 f"{storage_path}\n"
                 f"{storage_path_link}"
             )  # pylint: disable=C0301
     elif dump_mode == "overwrite":
-        if tb.table_exists(mode="staging"):
+        if tb.table_exists(mode="staging") and incremental:
+            log(
+                "MODE OVERWRITE: Table ALREADY EXISTS, KEEPING OLD DATA, "
+                "only new and changed files will be uploaded\n"
+                f"{storage_path}\n"
+                f"{storage_path_link}"
+            )  # pylint: disable=C0301
+            tb.delete(mode="all")
+            log(
+                "MODE OVERWRITE: Sucessfully DELETED TABLE:\n"
+                f"{table_staging}\n"
+                f"{tb.table_full_name['prod']}"
+            )  # pylint: disable=C0301
+        elif tb.table_exists(mode="staging"):
             log(
                 "MODE OVERWRITE: Table ALREADY EXISTS, DELETING OLD DATA!\n"
                 f"{storage_path}\n"
@@ -152,11 +198,12 @@ def create_table_and_upload_to_gcs(
         # the header is needed to create a table when dosen't exist
         # in overwrite mode the header is always created
         log("MODE OVERWRITE: Table DOSEN'T EXISTS\n" + "Start to CREATE HEADER file")
-        header_path = dump_header_to_csv(data_path=data_path)
+        header_path = dump_header_to_csv(data_path=data_path, file_format=file_format)
         log("MODE OVERWRITE: Created HEADER file:\n" f"{header_path}")
 
         tb.create(
             path=header_path,
+            source_format=file_format,
             if_storage_data_exists="replace",
             if_table_exists="replace",
         )
@@ -167,7 +214,12 @@ def create_table_and_upload_to_gcs(
             f"{storage_path_link}"
         )
 
-        st.delete_table(mode="staging", bucket_name=st.bucket_name, not_found_ok=True)
+        if incremental:
+            delete_staging_header(header_path, st.bucket, storage_prefix)
+        else:
+            st.delete_table(
+                mode="staging", bucket_name=st.bucket_name, not_found_ok=True
+            )
         log(
             f"MODE OVERWRITE: Sucessfully REMOVED HEADER DATA from Storage\n:"
             f"{storage_path}\n"
@@ -176,14 +228,20 @@ def create_table_and_upload_to_gcs(
 
     #####################################
     #
-    # Uploads a bunch of CSVs using BD+
+    # Uploads a bunch of CSVs in parallel, sharing BD+ storage client
     #
     #####################################
 
     log("STARTING UPLOAD TO GCS")
     if tb.table_exists(mode="staging"):
         # the name of the files need to be the same or the data doesn't get overwritten
-        tb.append(filepath=data_path, if_exists="replace")
+        upload_files_to_gcs(
+            data_path=data_path,
+            bucket=st.bucket,
+            prefix=storage_prefix,
+            skip_unchanged=skip_unchanged,
+            delete_stale=incremental and dump_mode == "overwrite",
+        )
 
         log(
             f"STEP UPLOAD: Successfully uploaded {data_path} to Storage:\n"
@@ -442,76 +500,232 @@ def update_django_metadata(
         table_id,
         email,
         password,
+        api_mode=api_mode,
     )
     log(f"IDS:{ids}")
 
-    if metadata_type == "DateTimeRange":
-        if bq_last_update:
-            log(
-                f"Attention! bq_last_update was set to TRUE, it will update the temporal coverage according to the metadata of the last modification made to {table_id}.{dataset_id}"
-            )
-            last_date = extract_last_update(
-                dataset_id,
-                table_id,
-                date_format,
-                billing_project_id=billing_project_id,
-            )
+    try:
+        if metadata_type == "DateTimeRange":
+            if bq_last_update:
+                log(
+                    f"Attention! bq_last_update was set to TRUE, it will update the temporal coverage according to the metadata of the last modification made to {table_id}.{dataset_id}"
+                )
+                last_date = extract_last_update(
+                    dataset_id,
+                    table_id,
+                    date_format,
+                    billing_project_id=billing_project_id,
+                )
+
+                resource_to_temporal_coverage = parse_temporal_coverage(f"{last_date}")
+                resource_to_temporal_coverage["coverage"] = ids.get("coverage_id")
+                log(f"Mutation parameters: {resource_to_temporal_coverage}")
+
+                create_update(
+                    query_class="allDatetimerange",
+                    query_parameters={"$coverage_Id: ID": ids.get("coverage_id")},
+                    mutation_class="CreateUpdateDateTimeRange",
+                    mutation_parameters=resource_to_temporal_coverage,
+                    update=True,
+                    email=email,
+                    password=password,
+                    api_mode=api_mode,
+                )
+            elif bq_table_last_year_month:
+                log(
+                    f"Attention! bq_table_last_year_month was set to TRUE, this function will update the temporal coverage according to the most recent date in the data or ano-mes columns of {table_id}.{dataset_id}"
+                )
+                last_date = extract_last_date(
+                    dataset_id,
+                    table_id,
+                    date_format=date_format,
+                    billing_project_id=billing_project_id,
+                )
+
+                resource_to_temporal_coverage = parse_temporal_coverage(f"{last_date}")
+                resource_to_temporal_coverage["coverage"] = ids.get("coverage_id")
+                log(f"Mutation parameters: {resource_to_temporal_coverage}")
+
+                create_update(
+                    query_class="allDatetimerange",
+                    query_parameters={"$coverage_Id: ID": ids.get("coverage_id")},
+                    mutation_class="CreateUpdateDateTimeRange",
+                    mutation_parameters=resource_to_temporal_coverage,
+                    update=True,
+                    email=email,
+                    password=password,
+                    api_mode=api_mode,
+                )
+            else:
+                last_date = _last_date
+                log(f"Última data {last_date}")
+
+                resource_to_temporal_coverage = parse_temporal_coverage(f"{last_date}")
+
+                resource_to_temporal_coverage["coverage"] = ids.get("coverage_id")
+                log(f"Mutation parameters: {resource_to_temporal_coverage}")
+
+                create_update(
+                    query_class="allDatetimerange",
+                    query_parameters={"$coverage_Id: ID": ids.get("coverage_id")},
+                    mutation_class="CreateUpdateDateTimeRange",
+                    mutation_parameters=resource_to_temporal_coverage,
+                    update=True,
+                    email=email,
+                    password=password,
+                    api_mode=api_mode,
+                )
+    except MetadataAPIError as error:
+        # the API no longer knows the cached IDs, so the next run resolves them again
+        if error.missing_id:
+            get_metadata_id_cache(api_mode).invalidate(dataset_id, table_id)
+        raise
+
+    get_graphql_client(email, password, api_mode).log_metrics()
+    get_metadata_id_cache(api_mode).log_stats()
 
-            resource_to_temporal_coverage = parse_temporal_coverage(f"{last_date}")
-            resource_to_temporal_coverage["coverage"] = ids.get("coverage_id")
-            log(f"Mutation parameters: {resource_to_temporal_coverage}")
-
-            create_update(
-                query_class="allDatetimerange",
-                query_parameters={"$coverage_Id: ID": ids.get("coverage_id")},
-                mutation_class="CreateUpdateDateTimeRange",
-                mutation_parameters=resource_to_temporal_coverage,
-                update=True,
-                email=email,
-                password=password,
-                api_mode=api_mode,
-            )
-        elif bq_table_last_year_month:
-            log(
-                f"Attention! bq_table_last_year_month was set to TRUE, this function will update the temporal coverage according to the most recent date in the data or ano-mes columns of {table_id}.{dataset_id}"
-            )
-            last_date = extract_last_date(
+
+@task
+def update_django_metadata_batch(
+    tables: List[Dict[str, str]],
+    _last_date=None,
+    date_format: Optional[str] = "yy-mm-dd",
+    bq_table_last_year_month: bool = False,
+    api_mode: str = "prod",
+    billing_project_id: str = "basedosdados-dev",
+):
+    """
+    Updates the temporal coverage (`DateTimeRange`) of many tables in one task,
+    resolving all IDs in a few requests and sending the mutations concurrently.
+
+    Args:
+        -   `tables (list):` dicts with `dataset_id`, `table_id` and, optionally,
+        `last_date` and `date_format`.
+        -   `_last_date (optional):` The last date of tables without `last_date`. If None,
+        the last modification of each table in BigQuery is used, as with `bq_last_update=True`
+        in `update_django_metadata`.
+        -   `date_format (str, optional):` The date format of tables without `date_format`
+        ('yy-mm-dd', 'yy-mm' or 'yy'), used when reading their last date in BigQuery. If None,
+        the format of the current coverage of each table is kept; tables without a coverage
+        are skipped.
+        -   `bq_table_last_year_month (bool):` if true, tables without a last date use the
+        most recent date in their data, as in `update_django_metadata`. Dates are read from
+        partition metadata whenever possible, with one query per dataset.
+        -   `api_mode (str, optional):` The API mode to be used ('prod', 'staging'). Defaults to 'prod'.
+        -   `billing_project_id (str):` the billing_project_id used to read the last
+        modification in BigQuery.
+
+    Example:
+        ```
+        update_django_metadata_batch(
+            tables=[
+                {"dataset_id": "example_dataset", "table_id": "table_a"},
+                {"dataset_id": "example_dataset", "table_id": "table_b", "last_date": "2023-06"},
+                {"dataset_id": "example_dataset", "table_id": "table_c", "date_format": "yy"},
+            ],
+            api_mode="prod",
+            upstream_tasks=[wait_for_materialization],
+        )
+        ```
+    """
+    accepted_billing_project_id = [
+        "basedosdados-dev",
+        "basedosdados",
+        "basedosdados-staging",
+    ]
+
+    if billing_project_id not in accepted_billing_project_id:
+        raise Exception(
+            f"The given billing_project_id: {billing_project_id} is invalid. The accepted valuesare {accepted_billing_project_id}"
+        )
+
+    (email, password) = get_credentials_utils(secret_path=f"api_user_{api_mode}")
+
+    coverages = {}
+    to_probe = [
+        (table["dataset_id"], table["table_id"], table.get("date_format", date_format))
+        for table in tables
+        if (table.get("last_date") or _last_date) is None
+    ]
+    for table in tables:
+        last_date = table.get("last_date") or _last_date
+        if last_date is not None:
+            coverages[(table["dataset_id"], table["table_id"])] = last_date
+
+    # a date at the wrong granularity would replace the current coverage
+    unknown = [
+        (dataset_id, table_id)
+        for dataset_id, table_id, table_format in to_probe
+        if table_format is None
+    ]
+    if unknown:
+        current_formats = get_coverage_date_formats(
+            unknown, email, password, api_mode=api_mode
+        )
+        for dataset_id, table_id in unknown:
+            if (dataset_id, table_id) not in current_formats:
+                log(
+                    f"Skipping {dataset_id}.{table_id}: the date format of its "
+                    "temporal coverage is unknown",
+                    level="warning",
+                )
+        to_probe = [
+            (
                 dataset_id,
                 table_id,
-                date_format=date_format,
-                billing_project_id=billing_project_id,
+                table_format or current_formats.get((dataset_id, table_id)),
             )
+            for dataset_id, table_id, table_format in to_probe
+        ]
+        to_probe = [table for table in to_probe if table[2] is not None]
+
+    # the freshness of all tables of a dataset comes from the same queries
+    probes = {}
+    for dataset_id, table_id, table_format in to_probe:
+        probes.setdefault((dataset_id, table_format), []).append(table_id)
+    failed = []
+    # the freshness queries are shared by the probes of this batch only
+    with freshness_batch():
+        for (dataset_id, table_format), table_ids in probes.items():
+            try:
+                if bq_table_last_year_month:
+                    last_dates = get_tables_last_date(
+                        dataset_id,
+                        table_ids,
+                        date_format=table_format,
+                        billing_project_id=billing_project_id,
+                        project_id=billing_project_id
+                        if table_format == "yy-mm"
+                        else "basedosdados",
+                    )
+                else:
+                    last_dates = {
+                        table_id: extract_last_update(
+                            dataset_id,
+                            table_id,
+                            table_format,
+                            billing_project_id=billing_project_id,
+                        )
+                        for table_id in table_ids
+                    }
+            except Exception as error:  # pylint: disable=broad-except
+                log(f"Failed to read the last date of {dataset_id}: {error}", "error")
+                failed.extend(f"{dataset_id}.{table_id}" for table_id in table_ids)
+                continue
+            for table_id, last_date in last_dates.items():
+                coverages[(dataset_id, table_id)] = last_date
+    log(f"Temporal coverages: {coverages}")
+
+    if coverages:
+        update_temporal_coverages(coverages, email, password, api_mode=api_mode)
+    if failed:
+        raise Exception(f"Last date not found for {', '.join(failed)}")
 
-            resource_to_temporal_coverage = parse_temporal_coverage(f"{last_date}")
-            resource_to_temporal_coverage["coverage"] = ids.get("coverage_id")
-            log(f"Mutation parameters: {resource_to_temporal_coverage}")
-
-            create_update(
-                query_class="allDatetimerange",
-                query_parameters={"$coverage_Id: ID": ids.get("coverage_id")},
-                mutation_class="CreateUpdateDateTimeRange",
-                mutation_parameters=resource_to_temporal_coverage,
-                update=True,
-                email=email,
-                password=password,
-                api_mode=api_mode,
-            )
-        else:
-            last_date = _last_date
-            log(f"Última data {last_date}")
-
-            resource_to_temporal_coverage = parse_temporal_coverage(f"{last_date}")
-
-            resource_to_temporal_coverage["coverage"] = ids.get("coverage_id")
-            log(f"Mutation parameters: {resource_to_temporal_coverage}")
-
-            create_update(
-                query_class="allDatetimerange",
-                query_parameters={"$coverage_Id: ID": ids.get("coverage_id")},
-                mutation_class="CreateUpdateDateTimeRange",
-                mutation_parameters=resource_to_temporal_coverage,
-                update=True,
-                email=email,
-                password=password,
-                api_mode=api_mode,
-            )
+
+@task
+def preload_architectures(urls: List[str]) -> None:
+    """
+    Fetches the architecture sheets at `urls` concurrently, so that the cleaning
+    tasks of the flow run find them in the shared `ArchitectureRegistry`.
+    """
+    get_architectures().preload(urls)
@@ -17,7 +17,11 @@ from pipelines.utils.temporal_coverage_updater.utils import (
     get_first_date,
 )
 from datetime import datetime
-from pipelines.utils.utils import log, get_credentials_from_secret
+from pipelines.utils.utils import (
+    log,
+    get_credentials_from_secret,
+    get_graphql_client,
+)
 from typing import Tuple
 
 
@@ -112,3 +116,5 @@ def update_django_metadata(
                 email=email,
                 password=password,
             )
+
+    get_graphql_client(email, password).log_metrics()
@@ -4,7 +4,6 @@ General purpose functions for the temporal_coverage_updater project
 """
 import os
 import json
-import requests
 from datetime import datetime
 import re
 import basedosdados as bd
@@ -12,7 +11,11 @@ from pipelines.utils.temporal_coverage_updater.constants import (
     constants as temp_constants,
 )
 from typing import Tuple
-from pipelines.utils.utils import log, get_credentials_from_secret
+from pipelines.utils.utils import (
+    log,
+    get_credentials_from_secret,
+    get_graphql_client,
+)
 
 
 def get_first_date(ids, email, password):
@@ -123,22 +126,7 @@ def get_credentials(secret_path: str) -> Tuple[str, str]:
 
 
 def get_token(email, password):
-    r = requests.post(
-        "http://api.basedosdados.org/api/v1/graphql",
-        headers={"Content-Type": "application/json"},
-        json={
-            "query": """
-        mutation ($email: String!, $password: String!) {
-            tokenAuth(email: $email, password: $password) {
-                token
-            }
-        }
-    """,
-            "variables": {"email": email, "password": password},
-        },
-    )
-    r.raise_for_status()
-    return r.json()["data"]["tokenAuth"]["token"]
+    return get_graphql_client(email, password).token
 
 
 def get_id(
@@ -150,10 +138,6 @@ def get_id(
     # email = temp_constants.EMAIL.value
     # password = temp_constants.PASSWORD.value
     # backend = b.Backend(graphql_url="http://api.basedosdados.org/api/v1/graphql")
-    token = get_token(email, password)
-    header = {
-        "Authorization": f"Bearer {token}",
-    }
     _filter = ", ".join(list(query_parameters.keys()))
     keys = [
         parameter.replace("$", "").split(":")[0]
@@ -171,11 +155,9 @@ def get_id(
                         }}
                         }}
                     }}"""
-    r = requests.post(
-        url="https://api.basedosdados.org/api/v1/graphql",
-        json={"query": query, "variables": dict(zip(keys, values))},
-        headers=header,
-    ).json()
+    r = get_graphql_client(email, password).execute(
+        query, dict(zip(keys, values)), operation=query_class
+    )
 
     if "data" in r and r is not None:
         if r.get("data", {}).get(query_class, {}).get("edges") == []:
@@ -197,10 +179,6 @@ def get_date(
     # email = temp_constants.EMAIL.value
     # password = temp_constants.PASSWORD.value
     # backend = b.Backend(graphql_url="http://api.basedosdados.org/api/v1/graphql")
-    token = get_token(email=email, password=password)
-    header = {
-        "Authorization": f"Bearer {token}",
-    }
     _filter = ", ".join(list(query_parameters.keys()))
     keys = [
         parameter.replace("$", "").split(":")[0]
@@ -221,11 +199,9 @@ def get_date(
                         }}
                         }}
                     }}"""
-    r = requests.post(
-        url="https://api.basedosdados.org/api/v1/graphql",
-        json={"query": query, "variables": dict(zip(keys, values))},
-        headers=header,
-    ).json()
+    r = get_graphql_client(email, password).execute(
+        query, dict(zip(keys, values)), operation=query_class
+    )
     return r
 
 
@@ -241,11 +217,6 @@ def create_update(
     # email = temp_constants.EMAIL.value
     # password = temp_constants.PASSWORD.value
     # backend = b.Backend(graphql_url="http://api.basedosdados.org/api/v1/graphql")
-    token = get_token(email=email, password=password)
-    header = {
-        "Authorization": f"Bearer {token}",
-    }
-
     r, id = get_id(
         query_class=query_class,
         query_parameters=query_parameters,
@@ -275,11 +246,9 @@ def create_update(
 
     if update is True and id is not None:
         mutation_parameters["id"] = id
-    r = requests.post(
-        "https://api.basedosdados.org/api/v1/graphql",
-        json={"query": query, "variables": {"input": mutation_parameters}},
-        headers=header,
-    ).json()
+    r = get_graphql_client(email, password).execute(
+        query, {"input": mutation_parameters}, operation=mutation_class
+    )
 
     r["r"] = "mutation"
     if "data" in r and r is not None:
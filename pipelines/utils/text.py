@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Vectorized text normalization of pandas Series: accent stripping, case changes
+and zero padded digit IDs, with the results of the element-wise functions they
+replace.
+
+Columns of microdata repeat a few values (cargo, situacao, genero...) millions
+of times, so string functions run once per distinct value (see `map_unique`).
+"""
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+from unidecode import unidecode
+
+CASES = ["lower", "title", "upper"]
+
+
+# transliteration of the Latin-1 and Latin Extended characters, applied with
+# `str.translate`; `unidecode` maps each character independently, so strings only
+# made of these characters get the same result
+_ASCII_TABLE = {code: unidecode(chr(code)) for code in range(0x80, 0x250)}
+
+
+def _strip_accents(series: pd.Series) -> pd.Series:
+    """
+    Transliterates a Series of strings to ASCII, like `unidecode`.
+    """
+    result = series.str.translate(_ASCII_TABLE)
+    remaining = ~result.map(str.isascii).astype(bool)
+    if remaining.any():
+        result[remaining] = series[remaining].map(unidecode)
+    return result
+
+
+def map_unique(
+    series: pd.Series, function: Callable[[pd.Series], pd.Series]
+) -> pd.Series:
+    """
+    Applies the vectorized `function` to the distinct strings of `series`, like
+    `[f(k) if isinstance(k, str) else k for k in series]`. Other values,
+    including missing ones, are kept.
+    """
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    uniques = pd.Series(np.asarray(uniques, dtype=object), dtype=object)
+    strings = uniques.map(type) == str
+    if strings.any():
+        uniques[strings] = function(uniques[strings])
+    values = np.append(uniques.to_numpy(), np.nan)[codes]
+    missing = codes == -1
+    values[missing] = np.asarray(series, dtype=object)[missing]
+    return pd.Series(values, index=series.index, name=series.name)
+
+
+def normalize_text(
+    series: pd.Series, case: str = None, strip_accents: bool = True
+) -> pd.Series:
+    """
+    Changes the case of the strings of `series` (`lower`, `title` or `upper`) and
+    transliterates them to ASCII, like
+    `unidecode(k.lower()) if isinstance(k, str) else k`.
+    """
+    if case is not None and case not in CASES:
+        raise ValueError(f"Invalid case: {case}. Use one of {CASES}")
+
+    def normalize(strings: pd.Series) -> pd.Series:
+        if case is not None:
+            strings = getattr(strings.str, case)()
+        return _strip_accents(strings) if strip_accents else strings
+
+    return map_unique(series, normalize)
+
+
+def lower_ascii(series: pd.Series) -> pd.Series:
+    """
+    Lowercase ASCII strings, e.g. `"ELEIÇÃO ORDINÁRIA"` -> `"eleicao ordinaria"`.
+    """
+    return normalize_text(series, case="lower")
+
+
+def title_ascii(series: pd.Series) -> pd.Series:
+    """
+    Title case ASCII strings, e.g. `"JOSÉ DA SILVA"` -> `"Jose Da Silva"`.
+    """
+    return normalize_text(series, case="title")
+
+
+def digit_id(series: pd.Series, n_digits: int) -> pd.Series:
+    """
+    Formats the non missing values of `series` as IDs of `n_digits` digits, like
+    `clean_digit_id`: the decimal part is dropped, the value is zero padded and
+    anything but digits is removed, e.g. `1234567890.0` -> `"01234567890"`.
+    """
+    valid = series.notna()
+    values = series[valid]
+    numbers = values.to_numpy()
+    # `str` of floats from 1e16 on is in scientific notation
+    if values.dtype.kind in "iuf" and ((numbers >= 0) & (numbers < 1e16)).all():
+        text = pd.Series(numbers.astype(np.int64), index=values.index).astype(str)
+    else:
+        text = values.astype(str)
+    ids = text.str.zfill(n_digits)
+    other = ~text.str.isdigit().astype(bool)
+    if other.any():
+        ids[other] = (
+            text[other]
+            .str.split(".", n=1)
+            .str[0]
+            .str.zfill(n_digits)
+            .str.replace(r"\D", "", regex=True)
+        )
+    result = series.astype(object)
+    result[valid] = ids
+    return result
@@ -3,15 +3,23 @@
 General utilities for all pipelines.
 """
 import base64
+import gzip
+import hashlib
 import json
 
 # pylint: disable=too-many-arguments
 import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import datetime
+from functools import lru_cache, partial, wraps
 from os import getenv, walk
 from os.path import join
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple, Union
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 from uuid import uuid4
 
 import basedosdados as bd
@@ -20,19 +28,26 @@ import hvac
 import numpy as np
 import pandas as pd
 import prefect
+import pyarrow as pa
+import pyarrow.parquet as pq
 import requests
+import google_crc32c
 from google.cloud import storage
 from google.cloud.storage.blob import Blob
 from google.oauth2 import service_account
 from prefect.client import Client
 from prefect.engine.state import State
 from prefect.run_configs import KubernetesRun, VertexRun
+import redis
 from redis_pal import RedisPal
 
 from pipelines.constants import constants
+from pipelines.utils.constants import constants as utils_constants
 
 import os
 import re
+import shutil
+import time
 
 
 def log(msg: Any, level: str = "info") -> None:
@@ -348,12 +363,266 @@ def remove_columns_accents(dataframe: pd.DataFrame) -> list:
     )
 
 
-def to_partitions(data: pd.DataFrame, partition_columns: List[str], savepath: str):
+def split_partitions(
+    data: pd.DataFrame, partition_columns: List[str]
+) -> List[Tuple[Dict[str, Any], np.ndarray]]:
+    """
+    Splits a dataframe into its partitions in a single pass.
+
+    Rows are factorized by the values of the partition columns, so the dataframe is
+    scanned only once, no matter how many partitions it has.
+    Args:
+        data (pandas.core.frame.DataFrame): Dataframe to be partitioned.
+        partition_columns (list): List of columns to be used as partitions.
+    Returns:
+        list: (partition values, row positions) tuples, in order of first appearance
+        of each partition. Row positions keep the original order of the rows.
+    """
+    if data.empty:
+        return []
+
+    codes = (
+        data.groupby(partition_columns, sort=False, dropna=False).ngroup().to_numpy()
+    )
+    # stable sort keeps the original order of the rows inside each partition
+    positions = np.argsort(codes, kind="stable")
+    bounds = np.cumsum(np.bincount(codes))[:-1]
+    partitions_positions = np.split(positions, bounds)
+
+    partitions_values = (
+        data[partition_columns]
+        .iloc[[rows[0] for rows in partitions_positions]]
+        .to_dict(orient="records")
+    )
+    return list(zip(partitions_values, partitions_positions))
+
+
+class PartitionSink:
+    """
+    Streams dataframe chunks into hive partitions (`col=value/.../data.<ext>`).
+
+    Chunks are split by their partition values and buffered; buffered rows are
+    written in bulk once `buffer_rows` is reached (or on `flush`/`close`). At most
+    `max_open_files` partition files are kept open, the least recently used one is
+    closed when the limit is reached. Supported formats are `csv`, `csv.gz`
+    and `parquet`. Parquet columns are written as strings, like the STRING
+    columns of the staging tables created from CSV files.
+
+    Exemple:
+        with PartitionSink("output/", ["ano", "mes"]) as sink:
+            for chunk in pd.read_csv("input.csv", chunksize=100_000):
+                sink.write(chunk)
+    """
+
+    FILE_FORMATS = ["csv", "csv.gz", "parquet"]
+
+    def __init__(
+        self,
+        savepath: Union[str, Path],
+        partition_columns: List[str],
+        file_format: str = "csv",
+        if_exists: str = "append",
+        max_open_files: int = 64,
+        buffer_rows: int = 1_000_000,
+        max_workers: int = 1,
+    ):
+        """
+        Args:
+            savepath (str, pathlib.PosixPath): folder path to save the partitions
+            partition_columns (list): List of columns to be used as partitions.
+            file_format (str): `csv`, `csv.gz` or `parquet`. Defaults to `csv`.
+            if_exists (str): `append` to existing partition files or `replace` them.
+            max_open_files (int): maximum number of partition files kept open.
+            buffer_rows (int): number of buffered rows that triggers a flush.
+            max_workers (int): number of threads writing partitions concurrently.
+        """
+        if file_format not in self.FILE_FORMATS:
+            raise ValueError(
+                f"Invalid file format: {file_format}. Use one of {self.FILE_FORMATS}"
+            )
+        if if_exists not in ["append", "replace"]:
+            raise ValueError("if_exists must be 'append' or 'replace'")
+        self.savepath = Path(savepath)
+        self.partition_columns = partition_columns
+        self.file_format = file_format
+        self.if_exists = if_exists
+        self.max_open_files = max(max_open_files, 1)
+        self.buffer_rows = buffer_rows
+        self.max_workers = max_workers
+        self.rows_written = 0
+        self._buffer: Dict[Path, List[Tuple[pd.DataFrame, np.ndarray, List[int]]]] = {}
+        self._buffered_rows = 0
+        self._open_files: "OrderedDict[Path, dict]" = OrderedDict()
+        self._seen_files = set()
+
+    def __enter__(self) -> "PartitionSink":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @property
+    def partitions(self) -> List[Path]:
+        """
+        Folders of the partitions written so far.
+        """
+        return sorted({file.parent for file in self._seen_files})
+
+    def write(self, chunk: pd.DataFrame) -> None:
+        """
+        Buffers a chunk, flushing the buffer when it gets too large.
+        """
+        if not isinstance(chunk, pd.DataFrame):
+            raise BaseException("Data need to be a pandas DataFrame")
+
+        data_columns = [
+            position
+            for position, column in enumerate(chunk.columns)
+            if column not in self.partition_columns
+        ]
+        for partition_values, rows in split_partitions(chunk, self.partition_columns):
+            folder = "/".join(
+                f"{column}={value}" for column, value in partition_values.items()
+            )
+            # slices are only taken when written, so buffering does not copy data
+            self._buffer.setdefault(self.savepath / folder, []).append(
+                (chunk, rows, data_columns)
+            )
+            self._buffered_rows += len(rows)
+
+        if self._buffered_rows >= self.buffer_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Writes every buffered row to its partition file.
+        """
+        folders = list(self._buffer)
+        # at most `max_open_files` partitions are written at a time, so every
+        # partition in a batch can hold an open file while the batch is written
+        for start in range(0, len(folders), self.max_open_files):
+            batch = [
+                (self._open(folder), self._buffer.pop(folder))
+                for folder in folders[start : start + self.max_open_files]
+            ]
+            if self.max_workers > 1:
+                with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                    list(executor.map(lambda args: self._write_file(*args), batch))
+            else:
+                for partition_file, slices in batch:
+                    self._write_file(partition_file, slices)
+        self.rows_written += self._buffered_rows
+        self._buffered_rows = 0
+
+    def close(self) -> None:
+        """
+        Flushes the buffer and closes every open partition file.
+        """
+        self.flush()
+        while self._open_files:
+            _, partition_file = self._open_files.popitem(last=False)
+            self._close_file(partition_file)
+
+    def _open(self, folder: Path) -> dict:
+        """
+        Returns the open file of a partition, opening it when needed.
+        """
+        if folder in self._open_files:
+            self._open_files.move_to_end(folder)
+            return self._open_files[folder]
+
+        if len(self._open_files) >= self.max_open_files:
+            _, least_recent = self._open_files.popitem(last=False)
+            self._close_file(least_recent)
+
+        folder.mkdir(parents=True, exist_ok=True)
+        path = folder / f"data.{self.file_format}"
+        if self.if_exists == "replace" and path not in self._seen_files:
+            for old_file in folder.glob(f"data*.{self.file_format}"):
+                old_file.unlink()
+
+        if self.file_format == "parquet":
+            # parquet files can't be appended, so each opening gets its own file
+            index = 0
+            while path.exists():
+                index += 1
+                path = folder / f"data_{index}.parquet"
+            partition_file = {"path": path, "writer": None}
+        else:
+            header = not path.exists() or path.stat().st_size == 0
+            if self.file_format == "csv.gz":
+                handle = gzip.open(path, "at", encoding="utf-8", newline="")
+            else:
+                handle = open(  # pylint: disable=consider-using-with
+                    path, "a", encoding="utf-8", newline=""
+                )
+            partition_file = {"path": path, "handle": handle, "header": header}
+
+        self._seen_files.add(folder / f"data.{self.file_format}")
+        self._open_files[folder] = partition_file
+        return partition_file
+
+    def _write_file(
+        self,
+        partition_file: dict,
+        slices: List[Tuple[pd.DataFrame, np.ndarray, List[int]]],
+    ) -> None:
+        """
+        Writes buffered slices to an open partition file.
+        """
+        frames = (chunk.iloc[rows, columns] for chunk, rows, columns in slices)
+        if self.file_format == "parquet":
+            tables = [
+                pa.Table.from_pandas(frame.astype("string"), preserve_index=False)
+                for frame in frames
+            ]
+            if partition_file["writer"] is None:
+                partition_file["writer"] = pq.ParquetWriter(
+                    partition_file["path"], tables[0].schema
+                )
+            schema = partition_file["writer"].schema
+            partition_file["writer"].write_table(
+                pa.concat_tables([table.cast(schema) for table in tables])
+            )
+        else:
+            for frame in frames:
+                frame.to_csv(
+                    partition_file["handle"],
+                    sep=",",
+                    na_rep="",
+                    index=False,
+                    header=partition_file["header"],
+                )
+                partition_file["header"] = False
+
+    def _close_file(self, partition_file: dict) -> None:
+        """
+        Closes a partition file.
+        """
+        if self.file_format == "parquet":
+            if partition_file["writer"] is not None:
+                partition_file["writer"].close()
+        else:
+            partition_file["handle"].close()
+
+
+def to_partitions(
+    data: pd.DataFrame,
+    partition_columns: List[str],
+    savepath: str,
+    max_workers: int = 1,
+    file_format: str = "csv",
+):
     """Save data in to hive patitions schema, given a dataframe and a list of partition columns.
+    The dataframe is split once (see `split_partitions`) and each partition is written
+    exactly once, so the cost does not grow with the number of partitions. Use
+    `PartitionSink` directly to write data that is read in chunks.
     Args:
         data (pandas.core.frame.DataFrame): Dataframe to be partitioned.
         partition_columns (list): List of columns to be used as partitions.
         savepath (str, pathlib.PosixPath): folder path to save the partitions
+        max_workers (int): number of threads writing partitions concurrently. Defaults to 1.
+        file_format (str): `csv`, `csv.gz` or `parquet`. Defaults to `csv`.
     Exemple:
         data = {
             "ano": [2020, 2021, 2020, 2021, 2020, 2021, 2021,2025],
@@ -369,44 +638,14 @@ def to_partitions(data: pd.DataFrame, partition_columns: List[str], savepath: st
     """
 
     if isinstance(data, (pd.core.frame.DataFrame)):
-        savepath = Path(savepath)
-        # create unique combinations between partition columns
-        unique_combinations = (
-            data[partition_columns]
-            .drop_duplicates(subset=partition_columns)
-            .to_dict(orient="records")
-        )
-
-        for filter_combination in unique_combinations:
-            patitions_values = [
-                f"{partition}={value}"
-                for partition, value in filter_combination.items()
-            ]
-
-            # get filtered data
-            df_filter = data.loc[
-                data[filter_combination.keys()]
-                .isin(filter_combination.values())
-                .all(axis=1),
-                :,
-            ]
-            df_filter = df_filter.drop(columns=partition_columns)
-
-            # create folder tree
-            filter_save_path = Path(savepath / "/".join(patitions_values))
-            filter_save_path.mkdir(parents=True, exist_ok=True)
-            file_filter_save_path = Path(filter_save_path) / "data.csv"
-
-            # append data to csv
-            df_filter.to_csv(
-                file_filter_save_path,
-                sep=",",
-                encoding="utf-8",
-                na_rep="",
-                index=False,
-                mode="a",
-                header=not file_filter_save_path.exists(),
-            )
+        with PartitionSink(
+            savepath,
+            partition_columns,
+            file_format=file_format,
+            buffer_rows=len(data),
+            max_workers=max_workers,
+        ) as sink:
+            sink.write(data)
     else:
         raise BaseException("Data need to be a pandas DataFrame")
 
@@ -449,46 +688,336 @@ def parser_blobs_to_partition_dict(blobs: list) -> dict:
     return partitions_dict
 
 
+def crc32c_checksum(path: Union[str, Path]) -> str:
+    """
+    Returns the base64 encoded CRC32C of a file, as reported by GCS blobs.
+    """
+    checksum = google_crc32c.Checksum()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            checksum.update(block)
+    return base64.b64encode(checksum.digest()).decode("utf-8")
+
+
+def list_staging_files(data_path: Union[str, Path]) -> Dict[str, Path]:
+    """
+    Lists the files to be uploaded from `data_path`, keyed by their path relative
+    to it (e.g. `ano=2020/mes=1/data.csv`). A single file is keyed by its name.
+    """
+    path = Path(data_path)
+    if not path.is_dir():
+        return {path.name: path}
+    return {
+        file.relative_to(path).as_posix(): file
+        for file in sorted(path.rglob("*"))
+        if file.is_file()
+        and file.name.endswith(utils_constants.STAGING_FILE_SUFFIXES.value)
+    }
+
+
+def blob_matches_file(blob: Blob, path: Union[str, Path]) -> bool:
+    """
+    Checks whether a local file has the same content as a blob, comparing the
+    sizes first and then the CRC32C (or the MD5, for blobs without CRC32C).
+    """
+    if blob.size is not None and blob.size != Path(path).stat().st_size:
+        return False
+    if blob.crc32c:
+        return blob.crc32c == crc32c_checksum(path)
+    if blob.md5_hash:
+        md5 = hashlib.md5()
+        with open(path, "rb") as file:
+            for block in iter(lambda: file.read(1024 * 1024), b""):
+                md5.update(block)
+        return blob.md5_hash == base64.b64encode(md5.digest()).decode("utf-8")
+    return False
+
+
+def upload_files_to_gcs(
+    data_path: Union[str, Path],
+    bucket: storage.Bucket,
+    prefix: str,
+    max_workers: int = utils_constants.UPLOAD_MAX_WORKERS.value,
+    skip_unchanged: bool = True,
+    delete_stale: bool = False,
+) -> Dict[str, Any]:
+    """
+    Uploads every file under `data_path` to `gs://<bucket>/<prefix>/`, keeping
+    the hive partition folders, using a bounded pool of threads that share the
+    bucket's client.
+
+    Remote blobs are listed once and every file is classified as new, changed or
+    unchanged (see `blob_matches_file`), and unchanged files are not uploaded
+    again. With `skip_unchanged=False` files are not checksummed: every file
+    with a remote blob is uploaded and counted as changed. When `delete_stale` is set, blobs under `prefix`
+    with no local file are deleted, so the prefix mirrors `data_path`. Files
+    bigger than `UPLOAD_RESUMABLE_THRESHOLD` use chunked resumable uploads.
+
+    Returns:
+        dict: counts of uploaded, skipped and deleted files, uploaded bytes,
+            elapsed seconds and partition folders by status.
+    """
+    prefix = prefix.strip("/")
+    files = list_staging_files(data_path)
+    remote_blobs = {
+        blob.name: blob
+        for blob in bucket.client.list_blobs(bucket, prefix=f"{prefix}/")
+    }
+
+    def upload(name: str, path: Path) -> Tuple[str, int]:
+        blob_name = f"{prefix}/{name}"
+        if blob_name not in remote_blobs:
+            status = "new"
+        elif skip_unchanged and blob_matches_file(remote_blobs[blob_name], path):
+            return "unchanged", 0
+        else:
+            status = "changed"
+        size = path.stat().st_size
+        chunk_size = (
+            utils_constants.UPLOAD_CHUNK_SIZE.value
+            if size > utils_constants.UPLOAD_RESUMABLE_THRESHOLD.value
+            else None
+        )
+        bucket.blob(blob_name, chunk_size=chunk_size).upload_from_filename(
+            str(path), checksum="crc32c"
+        )
+        return status, size
+
+    local_blob_names = {f"{prefix}/{name}" for name in files}
+    stale_blobs = (
+        [blob for name, blob in remote_blobs.items() if name not in local_blob_names]
+        if delete_stale
+        else []
+    )
+
+    start = datetime.now()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            name: executor.submit(upload, name, path) for name, path in files.items()
+        }
+        deletions = [executor.submit(blob.delete) for blob in stale_blobs]
+        results = {name: future.result() for name, future in futures.items()}
+        for deletion in deletions:
+            deletion.result()
+    seconds = max((datetime.now() - start).total_seconds(), 1e-6)
+
+    # a partition is new or unchanged only if all of its files are
+    partition_statuses = {}
+    for name, (status, _) in results.items():
+        partition = Path(name).parent.as_posix()
+        previous = partition_statuses.setdefault(partition, status)
+        if previous != status:
+            partition_statuses[partition] = "changed"
+    partitions = {
+        status: sorted(
+            partition
+            for partition, partition_status in partition_statuses.items()
+            if partition_status == status
+        )
+        for status in ("new", "changed", "unchanged")
+    }
+
+    skipped = sum(1 for status, _ in results.values() if status == "unchanged")
+    uploaded_bytes = sum(size for _, size in results.values())
+    stats = {
+        "uploaded": len(results) - skipped,
+        "skipped": skipped,
+        "deleted": len(stale_blobs),
+        "bytes": uploaded_bytes,
+        "seconds": seconds,
+        "partitions": partitions,
+    }
+    log(
+        f"Uploaded {stats['uploaded']} files ({human_readable(uploaded_bytes, 'B')}) "
+        f"to gs://{bucket.name}/{prefix}/ in {seconds:.1f}s: "
+        f"{human_readable(uploaded_bytes / seconds, 'B/s')}, "
+        f"{stats['uploaded'] / seconds:.1f} files/s. "
+        f"Skipped {stats['skipped']} unchanged files, "
+        f"deleted {stats['deleted']} stale blobs.\n"
+        f"Partitions: {len(partitions['new'])} new, "
+        f"{len(partitions['changed'])} changed, "
+        f"{len(partitions['unchanged'])} unchanged"
+    )
+    return stats
+
+
+def download_blobs_from_gcs(
+    bucket: storage.Bucket,
+    prefix: str,
+    path: Union[str, Path] = None,
+    blob_filter: Callable[[Blob], bool] = None,
+    max_workers: int = utils_constants.GCS_DOWNLOAD_MAX_WORKERS.value,
+    cache_dir: Union[str, Path] = utils_constants.GCS_CACHE_DIR.value,
+) -> Dict[str, Path]:
+    """
+    Downloads the blobs under `gs://<bucket>/<prefix>/` (those for which
+    `blob_filter` is true, if given) with a bounded pool of threads that share the
+    bucket's client.
+
+    Blobs are stored in `cache_dir` under their name and generation, so a blob is
+    only downloaded again after it changes. When `path` is given, the cached
+    files are copied to `path/<blob name>`.
+
+    Returns:
+        dict: local path of each blob, by blob name.
+    """
+    prefix = prefix.strip("/")
+    blobs = [
+        blob
+        for blob in bucket.client.list_blobs(bucket, prefix=f"{prefix}/")
+        if not blob.name.endswith("/") and (blob_filter is None or blob_filter(blob))
+    ]
+    cache = Path(cache_dir) / bucket.name
+
+    def download(blob: Blob) -> Tuple[Path, Optional[int]]:
+        cached = cache / f"{blob.name}#{blob.generation}"
+        size = None
+        if not cached.exists():
+            cached.parent.mkdir(parents=True, exist_ok=True)
+            part = cached.with_name(f"{cached.name}.{uuid4().hex}.part")
+            blob.download_to_filename(str(part))
+            os.replace(part, cached)
+            size = cached.stat().st_size
+            # previous generations of the blob
+            for old in cached.parent.iterdir():
+                if (
+                    old.name.startswith(f"{Path(blob.name).name}#")
+                    and old != cached
+                    and not old.name.endswith(".part")
+                ):
+                    old.unlink(missing_ok=True)
+        if path is None:
+            return cached, size
+        target = Path(path) / blob.name
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(cached, target)
+        return target, size
+
+    start = datetime.now()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = dict(
+            zip([blob.name for blob in blobs], executor.map(download, blobs))
+        )
+    seconds = max((datetime.now() - start).total_seconds(), 1e-6)
+
+    downloaded = [size for _, size in results.values() if size is not None]
+    log(
+        f"Downloaded {len(downloaded)} of {len(results)} blobs "
+        f"({human_readable(sum(downloaded), 'B')}) from gs://{bucket.name}/{prefix}/ "
+        f"in {seconds:.1f}s, {len(results) - len(downloaded)} from the cache"
+    )
+    return {name: local_path for name, (local_path, _) in results.items()}
+
+
+def read_staging_files(
+    files: Dict[str, Path], columns: List[str] = None, **kwargs
+) -> pd.DataFrame:
+    """
+    Reads the csv or parquet files of a table, by blob name (as returned by
+    `download_blobs_from_gcs`), into one DataFrame. Only `columns` are parsed, if
+    given, and partition columns are taken from the blob names. Other keyword
+    arguments are passed to `pd.read_csv`.
+    """
+    dfs = []
+    for blob_name, file in files.items():
+        partitions = dict(re.findall(r"([^/=]+)=([^/]+)", blob_name))
+        usecols = None
+        if columns is not None:
+            usecols = [column for column in columns if column not in partitions]
+        if blob_name.endswith(".parquet"):
+            df = pd.read_parquet(file, columns=usecols)
+        else:
+            df = pd.read_csv(file, usecols=usecols, **kwargs)
+        for column, value in partitions.items():
+            if columns is None or column in columns:
+                df[column] = value
+        dfs.append(df if columns is None else df[columns])
+    return pd.concat(dfs, ignore_index=True)
+
+
+def delete_staging_header(
+    header_path: Union[str, Path], bucket: storage.Bucket, prefix: str
+) -> None:
+    """
+    Deletes the header files uploaded by `Table.create` from `header_path`, keeping
+    the rest of the data under `gs://<bucket>/<prefix>/`.
+    """
+    prefix = prefix.strip("/")
+    for name in list_staging_files(header_path):
+        bucket.blob(f"{prefix}/{name}").delete()
+
+
+def check_file_format(file_format: str) -> None:
+    """
+    Raises ValueError if `file_format` is not a format of the staging tables.
+    """
+    if file_format not in utils_constants.STAGING_FILE_FORMATS.value:
+        raise ValueError(
+            f"Invalid file format: {file_format}. "
+            f"Use one of {utils_constants.STAGING_FILE_FORMATS.value}"
+        )
+
+
 def dump_header_to_csv(
     data_path: Union[str, Path],
+    file_format: str = "csv",
 ):
     """
     Writes a header to a CSV file.
+
+    With `file_format="parquet"` the header is a parquet file with the first row
+    of the data, so the staging table gets the parquet schema.
     """
+    check_file_format(file_format)
     # Remove filename from path
     path = Path(data_path)
     if not path.is_dir():
         path = path.parent
-    # Grab first CSV file found
+    # Grab first file found
     found: bool = False
     file: str = None
     for subdir, _, filenames in walk(str(path)):
         for fname in filenames:
-            if fname.endswith(".csv"):
+            if fname.endswith(f".{file_format}"):
                 file = join(subdir, fname)
-                log(f"Found CSV file: {file}")
+                log(f"Found {file_format.upper()} file: {file}")
                 found = True
                 break
         if found:
             break
 
     if file is None:
-        raise FileNotFoundError("No csv file found")
+        raise FileNotFoundError(f"No {file_format} file found")
 
     save_header_path = f"data/{uuid4()}"
     # discover if it's a partitioned table
     if partition_folders := [folder for folder in file.split("/") if "=" in folder]:
         partition_path = "/".join(partition_folders)
-        save_header_file_path = Path(f"{save_header_path}/{partition_path}/header.csv")
+        save_header_file_path = Path(
+            f"{save_header_path}/{partition_path}/header.{file_format}"
+        )
         log(f"Found partition path: {save_header_file_path}")
 
     else:
-        save_header_file_path = Path(f"{save_header_path}/header.csv")
+        save_header_file_path = Path(f"{save_header_path}/header.{file_format}")
         log(f"Do not found partition path: {save_header_file_path}")
 
     # Create directory if it doesn't exist
     save_header_file_path.parent.mkdir(parents=True, exist_ok=True)
 
+    if file_format == "parquet":
+        # Read just first row, keeping the schema of the file
+        parquet_file = pq.ParquetFile(file)
+        first_row = next(parquet_file.iter_batches(batch_size=1), None)
+        header = (
+            pa.Table.from_batches([first_row])
+            if first_row is not None
+            else parquet_file.schema_arrow.empty_table()
+        )
+        pq.write_table(header, save_header_file_path)
+        log(f"Wrote header PARQUET: {save_header_file_path}")
+        return save_header_path
+
     # Read just first row
     dataframe = pd.read_csv(file, nrows=1)
 
@@ -621,6 +1150,194 @@ def get_first_date(
         raise
 
 
+# results of the freshness probes, only set inside `freshness_batch`
+_FRESHNESS_RESULTS: ContextVar[Optional[dict]] = ContextVar(
+    "freshness_results", default=None
+)
+
+
+@contextmanager
+def freshness_batch():
+    """
+    Memoizes the functions decorated with `cache_for_freshness_batch` inside the
+    block, e.g. to probe many tables of a dataset with a single query. Results
+    are dropped when the block exits, so probes made after an upload or a
+    materialization are never answered from before it.
+    """
+    token = _FRESHNESS_RESULTS.set({})
+    try:
+        yield
+    finally:
+        _FRESHNESS_RESULTS.reset(token)
+
+
+def in_freshness_batch() -> bool:
+    """
+    Tells whether the caller runs inside a `freshness_batch` block.
+    """
+    return _FRESHNESS_RESULTS.get() is not None
+
+
+def cache_for_freshness_batch(function):
+    """
+    Caches the results of `function` inside a `freshness_batch` block. Outside
+    of one, every call runs `function`.
+    """
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        results = _FRESHNESS_RESULTS.get()
+        if results is None:
+            return function(*args, **kwargs)
+        key = (function.__qualname__, args, tuple(sorted(kwargs.items())))
+        if key not in results:
+            results[key] = function(*args, **kwargs)
+        return results[key]
+
+    return wrapper
+
+
+def format_date(date: datetime, date_format: str) -> str:
+    """
+    Formats a date as 'yy-mm-dd', 'yy-mm' or 'yy'.
+    """
+    return date.strftime(
+        {"yy-mm-dd": "%Y-%m-%d", "yy-mm": "%Y-%m", "yy": "%Y"}[date_format]
+    )
+
+
+@cache_for_freshness_batch
+def get_tables_last_modified(
+    dataset_id: str,
+    billing_project_id: str,
+    project_id: str = "basedosdados",
+    table_id: Optional[str] = None,
+) -> Dict[str, datetime]:
+    """
+    Returns the last modification time of every table of a dataset, or of
+    `table_id` only, reading `__TABLES__` once per dataset inside a
+    `freshness_batch`.
+    """
+    where = f"WHERE table_id = '{table_id}'" if table_id else ""
+    query_bd = f"""
+    SELECT
+    table_id, last_modified_time
+    FROM
+    `{project_id}.{dataset_id}.__TABLES__`
+    {where}
+    """
+    t = bd.read_sql(
+        query=query_bd,
+        billing_project_id=billing_project_id,
+        from_file=True,
+    )
+    return {
+        # Convert to seconds by dividing by 1000
+        table_id: datetime.fromtimestamp(last_modified_time / 1000)
+        for table_id, last_modified_time in zip(t["table_id"], t["last_modified_time"])
+    }
+
+
+@cache_for_freshness_batch
+def get_tables_last_partition(
+    dataset_id: str, billing_project_id: str, project_id: str = "basedosdados"
+) -> Dict[str, Tuple[str, str]]:
+    """
+    Returns the partitioning column and the last non empty partition of every
+    partitioned table of a dataset, from INFORMATION_SCHEMA, once per dataset
+    inside a `freshness_batch`. INFORMATION_SCHEMA queries are billed too (at
+    least 10 MB each), but read much less than a scan of the tables.
+
+    Returns:
+        dict: `{table_id: (column_name, partition_id)}`, e.g. `("ano", "2023")` for
+            integer range partitions or `("data", "20230615")` for daily partitions.
+    """
+    query_bd = f"""
+    SELECT
+    p.table_name, c.column_name, MAX(p.partition_id) AS partition_id
+    FROM
+    `{project_id}.{dataset_id}.INFORMATION_SCHEMA.PARTITIONS` AS p
+    JOIN
+    `{project_id}.{dataset_id}.INFORMATION_SCHEMA.COLUMNS` AS c
+    ON c.table_name = p.table_name AND c.is_partitioning_column = 'YES'
+    WHERE
+    p.partition_id NOT IN ('__NULL__', '__UNPARTITIONED__') AND p.total_rows > 0
+    GROUP BY 1, 2
+    """
+    t = bd.read_sql(
+        query=query_bd,
+        billing_project_id=billing_project_id,
+        from_file=True,
+    )
+    return {
+        table_name: (column_name, partition_id)
+        for table_name, column_name, partition_id in zip(
+            t["table_name"], t["column_name"], t["partition_id"]
+        )
+    }
+
+
+def get_tables_last_date(
+    dataset_id: str,
+    table_ids: List[str],
+    date_format: str,
+    billing_project_id: str,
+    project_id: str = "basedosdados",
+) -> Dict[str, str]:
+    """
+    Returns the most recent date in the data of many tables of a dataset (see
+    `extract_last_date`), avoiding full column scans where possible:
+
+    - tables partitioned by `data` by day take the date from the last partition;
+    - tables partitioned by `ano` take the year from the last partition and, with
+      `date_format="yy-mm"`, read `MAX(mes)` of that partition only, with a
+      single query for all of them;
+    - other tables fall back to a `MAX()` over the whole table.
+    """
+    last_partitions = get_tables_last_partition(
+        dataset_id, billing_project_id, project_id=project_id
+    )
+    last_dates, by_ano = {}, {}
+    for table_id in table_ids:
+        column_name, partition_id = last_partitions.get(table_id, (None, None))
+        if column_name == "data" and len(partition_id) == 8:
+            last_dates[table_id] = format_date(
+                datetime.strptime(partition_id, "%Y%m%d"), date_format
+            )
+        elif column_name == "ano" and date_format == "yy-mm":
+            by_ano[table_id] = int(partition_id)
+        elif column_name == "ano" and date_format == "yy":
+            last_dates[table_id] = partition_id
+
+    if by_ano:
+        query_bd = "\nUNION ALL\n".join(
+            f"""
+            SELECT
+            '{table_id}' AS table_id, MAX(CAST(mes AS INT64)) AS mes
+            FROM
+            `{project_id}.{dataset_id}.{table_id}`
+            WHERE
+            ano = {ano}
+            """
+            for table_id, ano in by_ano.items()
+        )
+        t = bd.read_sql(
+            query=query_bd,
+            billing_project_id=billing_project_id,
+            from_file=True,
+        )
+        for table_id, mes in zip(t["table_id"], t["mes"]):
+            if not pd.isna(mes):
+                last_dates[table_id] = f"{by_ano[table_id]}-{int(mes):02d}"
+
+    for table_id in table_ids:
+        if table_id not in last_dates:
+            last_dates[table_id] = scan_last_date(
+                dataset_id, table_id, date_format, billing_project_id, project_id
+            )
+    return last_dates
+
+
 def extract_last_update(
     dataset_id, table_id, date_format: str, billing_project_id: str
 ):
@@ -639,35 +1356,78 @@ def extract_last_update(
         Exception: If an error occurs while extracting the last update date.
     """
     try:
+        # a single table is probed alone: the whole dataset is only worth reading
+        # when the result is shared by the other probes of a `freshness_batch`
+        dt = get_tables_last_modified(
+            dataset_id,
+            billing_project_id,
+            table_id=None if in_freshness_batch() else table_id,
+        )[table_id]
+        last_date = format_date(dt, date_format)
+        log(f"Última data: {last_date}")
+        return last_date
+    except Exception as e:
+        log(f"An error occurred while extracting the last update date: {str(e)}")
+        raise
+
+
+def scan_last_date(
+    dataset_id: str,
+    table_id: str,
+    date_format: str,
+    billing_project_id: str,
+    project_id: str = "basedosdados",
+) -> str:
+    """
+    Reads the most recent date of a table with a `MAX()` over the whole table.
+    """
+    if date_format == "yy-mm":
         query_bd = f"""
         SELECT
-        *
+        MAX(CONCAT(ano,"-",mes)) as max_date
         FROM
-        `basedosdados.{dataset_id}.__TABLES__`
-        WHERE
-        table_id = '{table_id}'
+        `{project_id}.{dataset_id}.{table_id}`
         """
+        t = bd.read_sql(
+            query=query_bd,
+            billing_project_id=billing_project_id,
+            from_file=True,
+        )
+        input_date_str = t["max_date"][0]
+
+        date_obj = datetime.strptime(input_date_str, "%Y-%m")
 
+        return date_obj.strftime("%Y-%m")
+
+    if date_format == "yy":
+        query_bd = f"""
+        SELECT
+        MAX(ano) as max_date
+        FROM
+        `{project_id}.{dataset_id}.{table_id}`
+        """
         t = bd.read_sql(
             query=query_bd,
             billing_project_id=billing_project_id,
             from_file=True,
         )
-        timestamp = (
-            t["last_modified_time"][0] / 1000
-        )  # Convert to seconds by dividing by 1000
-        dt = datetime.fromtimestamp(timestamp)
-        if date_format == "yy-mm-dd":
-            last_date = dt.strftime("%Y-%m-%d")
-        elif date_format == "yy-mm":
-            last_date = dt.strftime("%Y-%m")
-        elif date_format == "yy":
-            last_date = dt.strftime("%Y")
-        log(f"Última data: {last_date}")
-        return last_date
-    except Exception as e:
-        log(f"An error occurred while extracting the last update date: {str(e)}")
-        raise
+        return str(int(t["max_date"][0]))
+
+    query_bd = f"""
+    SELECT
+    MAX(data) as max_date
+    FROM
+    `{project_id}.{dataset_id}.{table_id}`
+    """
+    log(f"Query: {query_bd}")
+    t = bd.read_sql(
+        query=query_bd,
+        billing_project_id=billing_project_id,
+        from_file=True,
+    )
+    # it infers that the data variable is already on basedosdados standart format
+    # yyyy-mm-dd
+    return t["max_date"][0]
 
 
 def extract_last_date(dataset_id, table_id, date_format: str, billing_project_id: str):
@@ -682,61 +1442,37 @@ def extract_last_date(dataset_id, table_id, date_format: str, billing_project_id
         and return a concatenated string in the formar yyyy-mm. if set to 'yyyy-mm-dd'
         the function will look for  data named column in the format 'yyyy-mm-dd' and return it.
 
+    Inside a `freshness_batch`, the date is read from partition metadata when the
+    table is partitioned by `ano` or `data` (see `get_tables_last_date`).
+    Outside of one, the table is read with a single `MAX()` query: the
+    INFORMATION_SCHEMA probe is billed at least 10 MB and would not be shared.
+
     Returns:
         str: The last update date in the format 'yyyy-mm' or 'yyyy-mm-dd'.
 
     Raises:
         Exception: If an error occurs while extracting the last update date.
     """
-    if date_format == "yy-mm":
-        try:
-            query_bd = f"""
-            SELECT
-            MAX(CONCAT(ano,"-",mes)) as max_date
-            FROM
-            `{billing_project_id}.{dataset_id}.{table_id}`
-            """
-
-            t = bd.read_sql(
-                query=query_bd,
-                billing_project_id=billing_project_id,
-                from_file=True,
-            )
-            input_date_str = t["max_date"][0]
-
-            date_obj = datetime.strptime(input_date_str, "%Y-%m")
-
-            last_date = date_obj.strftime("%Y-%m")
-            log(f"Última data YYYY-MM: {last_date}")
-
-            return last_date
-        except Exception as e:
-            log(f"An error occurred while extracting the last update date: {str(e)}")
-            raise
-    else:
-        try:
-            query_bd = f"""
-            SELECT
-            MAX(data) as max_date
-            FROM
-            `basedosdados.{dataset_id}.{table_id}`
-            """
-            log(f"Query: {query_bd}")
-            t = bd.read_sql(
-                query=query_bd,
+    # the tables with ano and mes columns have always been read from the billing project
+    project_id = billing_project_id if date_format == "yy-mm" else "basedosdados"
+    try:
+        if in_freshness_batch():
+            last_date = get_tables_last_date(
+                dataset_id,
+                [table_id],
+                date_format=date_format,
                 billing_project_id=billing_project_id,
-                from_file=True,
+                project_id=project_id,
+            )[table_id]
+        else:
+            last_date = scan_last_date(
+                dataset_id, table_id, date_format, billing_project_id, project_id
             )
-            # it infers that the data variable is already on basedosdados standart format
-            # yyyy-mm-dd
-            last_date = t["max_date"][0]
-
-            log(f"Última data YYYY-MM-DD: {last_date}")
-
-            return last_date
-        except Exception as e:
-            log(f"An error occurred while extracting the last update date: {str(e)}")
-            raise
+        log(f"Última data {date_format.upper()}: {last_date}")
+        return last_date
+    except Exception as e:
+        log(f"An error occurred while extracting the last update date: {str(e)}")
+        raise
 
 
 def find_ids(dataset_id, table_id, email, password):
@@ -775,45 +1511,212 @@ def get_credentials_utils(secret_path: str) -> Tuple[str, str]:
     return email, password
 
 
-def get_token(email, password, api_mode: str = "prod"):
+class BDGraphQLClient:
     """
-    Get api token.
+    Client for the Base dos Dados GraphQL API.
+
+    Keeps one `requests.Session` (and its connection pool) for all calls, caches
+    the JWT from `tokenAuth` until it is close to expiring, retries connection
+    errors and `API_RETRY_STATUS` responses with exponential backoff, and records
+    the latency of every call by operation.
+
+    Use `get_graphql_client` to share a client between helpers.
     """
-    r = None
-    if api_mode == "prod":
-        r = requests.post(
-            "http://api.basedosdados.org/api/v1/graphql",
-            headers={"Content-Type": "application/json"},
-            json={
-                "query": """
-            mutation ($email: String!, $password: String!) {
-                tokenAuth(email: $email, password: $password) {
-                    token
-                }
-            }
-        """,
-                "variables": {"email": email, "password": password},
-            },
-        )
 
-        r.raise_for_status()
-    elif api_mode == "staging":
-        r = requests.post(
-            "http://staging.api.basedosdados.org/api/v1/graphql",
-            headers={"Content-Type": "application/json"},
-            json={
-                "query": """
-            mutation ($email: String!, $password: String!) {
-                tokenAuth(email: $email, password: $password) {
-                    token
+    def __init__(
+        self,
+        email: str,
+        password: str,
+        api_mode: str = "prod",
+        url: str = None,
+        timeout: float = utils_constants.API_TIMEOUT.value,
+        max_retries: int = utils_constants.API_MAX_RETRIES.value,
+        backoff_factor: float = utils_constants.API_BACKOFF_FACTOR.value,
+    ):
+        self.email = email
+        self.password = password
+        self.url = url or utils_constants.API_URL.value[api_mode]
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.session = requests.Session()
+        self.session.headers.update({"Content-Type": "application/json"})
+        self.latencies: Dict[str, List[float]] = {}
+        self._token: Optional[str] = None
+        self._token_expires_at = 0.0
+        self._token_lock = Lock()
+
+    def __enter__(self) -> "BDGraphQLClient":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Closes the pooled connections.
+        """
+        self.session.close()
+
+    @property
+    def token(self) -> str:
+        """
+        A valid JWT, logging in again only when the cached one is about to expire.
+        """
+        with self._token_lock:
+            refresh_at = (
+                self._token_expires_at - utils_constants.API_TOKEN_REFRESH_MARGIN.value
+            )
+            if self._token is None or time.time() >= refresh_at:
+                self._token = self._login()
+                self._token_expires_at = self._token_expiration(self._token)
+            return self._token
+
+    def invalidate_token(self) -> None:
+        """
+        Forgets the cached JWT, so the next call logs in again.
+        """
+        with self._token_lock:
+            self._token = None
+
+    def _login(self) -> str:
+        response = self._post(
+            query="""
+                mutation ($email: String!, $password: String!) {
+                    tokenAuth(email: $email, password: $password) {
+                        token
+                    }
                 }
-            }
-        """,
-                "variables": {"email": email, "password": password},
-            },
+            """,
+            variables={"email": self.email, "password": self.password},
+            operation="tokenAuth",
         )
-        r.raise_for_status()
-    return r.json()["data"]["tokenAuth"]["token"]
+        response.raise_for_status()
+        return response.json()["data"]["tokenAuth"]["token"]
+
+    @staticmethod
+    def _token_expiration(token: str) -> float:
+        """
+        Reads the `exp` claim of a JWT, without verifying its signature.
+        """
+        try:
+            payload = token.split(".")[1]
+            payload += "=" * (-len(payload) % 4)
+            return float(json.loads(base64.urlsafe_b64decode(payload))["exp"])
+        except (IndexError, KeyError, TypeError, ValueError):
+            return time.time() + utils_constants.API_TOKEN_DEFAULT_TTL.value
+
+    def _post(
+        self,
+        query: str,
+        variables: dict,
+        operation: str,
+        authenticated: bool = False,
+    ) -> requests.Response:
+        """
+        Posts a query, retrying connection errors and retryable status codes. An
+        authenticated call answered with 401 logs in again before retrying.
+        """
+        for attempt in range(self.max_retries + 1):
+            headers = {"Authorization": f"Bearer {self.token}"} if authenticated else {}
+            start = time.perf_counter()
+            try:
+                response = self.session.post(
+                    self.url,
+                    json={"query": query, "variables": variables},
+                    headers=headers,
+                    timeout=self.timeout,
+                )
+            except (requests.ConnectionError, requests.Timeout) as error:
+                response, last_error = None, error
+            elapsed = time.perf_counter() - start
+            self.latencies.setdefault(operation, []).append(elapsed)
+            log(f"GraphQL {operation}: {elapsed * 1000:.0f}ms", level="debug")
+
+            if response is not None:
+                if response.status_code == 401 and authenticated:
+                    self.invalidate_token()
+                elif response.status_code not in utils_constants.API_RETRY_STATUS.value:
+                    return response
+                last_error = requests.HTTPError(
+                    f"{response.status_code} from {self.url}", response=response
+                )
+            if attempt < self.max_retries:
+                time.sleep(self.backoff_factor * 2**attempt)
+        raise last_error
+
+    def execute(
+        self, query: str, variables: dict = None, operation: str = "graphql"
+    ) -> dict:
+        """
+        Runs an authenticated query or mutation and returns the decoded response.
+
+        Args:
+            query (str): GraphQL document.
+            variables (dict): Variables of the document.
+            operation (str): Name under which the latency is recorded.
+        """
+        return self._post(
+            query=query,
+            variables=variables or {},
+            operation=operation,
+            authenticated=True,
+        ).json()
+
+    def log_metrics(self) -> None:
+        """
+        Logs number of calls and latency of each operation.
+        """
+        for operation, latencies in self.latencies.items():
+            log(
+                f"GraphQL {operation}: {len(latencies)} calls, "
+                f"{sum(latencies):.2f}s total, "
+                f"{1000 * sum(latencies) / len(latencies):.0f}ms mean, "
+                f"{1000 * max(latencies):.0f}ms max"
+            )
+
+
+@lru_cache(maxsize=None)
+def get_graphql_client(
+    email: str, password: str, api_mode: str = "prod"
+) -> BDGraphQLClient:
+    """
+    Returns the `BDGraphQLClient` shared by every call with the same credentials.
+    """
+    return BDGraphQLClient(email=email, password=password, api_mode=api_mode)
+
+
+def get_token(email, password, api_mode: str = "prod"):
+    """
+    Get api token.
+    """
+    return get_graphql_client(email, password, api_mode).token
+
+
+class MetadataAPIError(Exception):
+    """
+    Error answered by the metadata API. `missing_id` tells whether the API
+    reported an object referenced by ID as missing, i.e. whether cached IDs may
+    be stale.
+    """
+
+    def __init__(self, message: str, missing_id: bool = False):
+        super().__init__(message)
+        self.missing_id = missing_id
+
+
+def reports_missing_id(response: dict, mutation_class: str) -> bool:
+    """
+    Tells whether a mutation failed because an object it references does not
+    exist: Django answers `<Model> matching query does not exist.` when the
+    object to update is missing, and a form error on `coverage` when the
+    related coverage is.
+    """
+    messages = [error.get("message", "") for error in response.get("errors") or []]
+    result = (response.get("data") or {}).get(mutation_class) or {}
+    return any("does not exist" in message for message in messages) or any(
+        error.get("field") in ("id", "coverage") for error in result.get("errors") or []
+    )
 
 
 def get_id(
@@ -824,10 +1727,6 @@ def get_id(
     api_mode: str = "prod",
     cloud_table: bool = True,
 ):
-    token = get_token(email, password, api_mode)
-    header = {
-        "Authorization": f"Bearer {token}",
-    }
     _filter = ", ".join(list(query_parameters.keys()))
     keys = [
         parameter.replace("$", "").split(":")[0]
@@ -860,18 +1759,9 @@ def get_id(
                             }}
                         }}"""
 
-    if api_mode == "staging":
-        r = requests.post(
-            url=f"https://{api_mode}.api.basedosdados.org/api/v1/graphql",
-            json={"query": query, "variables": dict(zip(keys, values))},
-            headers=header,
-        ).json()
-    elif api_mode == "prod":
-        r = requests.post(
-            url="https://api.basedosdados.org/api/v1/graphql",
-            json={"query": query, "variables": dict(zip(keys, values))},
-            headers=header,
-        ).json()
+    r = get_graphql_client(email, password, api_mode).execute(
+        query, dict(zip(keys, values)), operation=query_class
+    )
 
     if "data" in r and r is not None:
         if r.get("data", {}).get(query_class, {}).get("edges") == []:
@@ -894,16 +1784,6 @@ def get_date(
     password,
     api_mode: str = "prod",
 ):
-    token = get_token(
-        email=email,
-        password=password,
-        api_mode=api_mode,
-    )
-    log("puxou token")
-    header = {
-        "Authorization": f"Bearer {token}",
-    }
-    log(f"{header}")
     _filter = ", ".join(list(query_parameters.keys()))
     keys = [
         parameter.replace("$", "").split(":")[0]
@@ -925,18 +1805,9 @@ def get_date(
                         }}
                     }}"""
 
-    if api_mode == "staging":
-        r = requests.post(
-            url=f"https://{api_mode}.api.basedosdados.org/api/v1/graphql",
-            json={"query": query, "variables": dict(zip(keys, values))},
-            headers=header,
-        ).json()
-    elif api_mode == "prod":
-        r = requests.post(
-            url="https://api.basedosdados.org/api/v1/graphql",
-            json={"query": query, "variables": dict(zip(keys, values))},
-            headers=header,
-        ).json()
+    r = get_graphql_client(email, password, api_mode).execute(
+        query, dict(zip(keys, values)), operation=query_class
+    )
 
     return r
 
@@ -951,15 +1822,6 @@ def create_update(
     update=False,
     api_mode: str = "prod",
 ):
-    token = get_token(
-        email=email,
-        password=password,
-        api_mode=api_mode,
-    )
-    header = {
-        "Authorization": f"Bearer {token}",
-    }
-
     r, id = get_id(
         query_class=query_class,
         query_parameters=query_parameters,
@@ -989,34 +1851,27 @@ def create_update(
                 }}
             """
 
-    if update is True and id is not None:
-        mutation_parameters["id"] = id
-
-        if api_mode == "prod":
-            r = requests.post(
-                "https://api.basedosdados.org/api/v1/graphql",
-                json={"query": query, "variables": {"input": mutation_parameters}},
-                headers=header,
-            ).json()
-        elif api_mode == "staging":
-            r = requests.post(
-                f"https://{api_mode}api.basedosdados.org/api/v1/graphql",
-                json={"query": query, "variables": {"input": mutation_parameters}},
-                headers=header,
-            ).json()
+    if id is None:
+        # nothing matches the query, e.g. the datetime range of a stale coverage ID
+        raise MetadataAPIError(
+            f"create: not found {query_class} {query_parameters}", missing_id=True
+        )
+
+    mutation_parameters["id"] = id
+    r = get_graphql_client(email, password, api_mode).execute(
+        query, {"input": mutation_parameters}, operation=mutation_class
+    )
 
     r["r"] = "mutation"
-    if "data" in r and r is not None:
-        if r.get("data", {}).get(mutation_class, {}).get("errors", []) != []:
-            print(f"create: not found {mutation_class}", mutation_parameters)
-            print("create: error\n", json.dumps(r, indent=4, ensure_ascii=False), "\n")
-            id = None
-            raise Exception("create: Error")
-        else:
-            id = r["data"][mutation_class][_classe]["id"]
-            id = id.split(":")[1]
+    result = (r.get("data") or {}).get(mutation_class) or {}
+    if result.get(_classe) and not result.get("errors"):
+        id = result[_classe]["id"]
+        id = id.split(":")[1]
 
-            return r, id
+        return r, id
+    if result.get("errors"):
+        print(f"create: not found {mutation_class}", mutation_parameters)
+        print("create: error\n", json.dumps(r, indent=4, ensure_ascii=False), "\n")
     else:
         print("\n", "create: query\n", query, "\n")
         print(
@@ -1025,7 +1880,9 @@ def create_update(
             "\n",
         )
         print("create: error\n", json.dumps(r, indent=4, ensure_ascii=False), "\n")
-        raise Exception("create: Error")
+    raise MetadataAPIError(
+        "create: Error", missing_id=reports_missing_id(r, mutation_class)
+    )
 
 
 def parse_temporal_coverage(temporal_coverage):
@@ -1082,16 +1939,136 @@ def parse_temporal_coverage(temporal_coverage):
     return end_result
 
 
+class MetadataIDCache:
+    """
+    Cache of the metadata API IDs of tables (see `get_ids`), which almost never
+    change. Entries live in Redis for `METADATA_ID_CACHE_TTL` seconds; when Redis
+    is not reachable, a JSON file on local disk is used instead.
+
+    Drop an entry with `invalidate` when an update using its IDs fails.
+    """
+
+    def __init__(
+        self,
+        api_mode: str = "prod",
+        ttl: int = utils_constants.METADATA_ID_CACHE_TTL.value,
+        path: Union[str, Path] = utils_constants.METADATA_ID_CACHE_PATH.value,
+        redis_client: RedisPal = None,
+    ):
+        self.api_mode = api_mode
+        self.ttl = ttl
+        self.path = Path(path)
+        self.hits = 0
+        self.misses = 0
+        self._redis_client = redis_client
+        self._use_redis = True
+        self._lock = Lock()
+
+    def _key(self, dataset_id: str, table_id: str) -> str:
+        return f"metadata_ids__{self.api_mode}__{dataset_id}__{table_id}"
+
+    def _redis(self, method: str, *args, **kwargs) -> Any:
+        """
+        Runs a Redis command, switching to the disk cache if Redis fails.
+        """
+        if self._use_redis:
+            try:
+                if self._redis_client is None:
+                    self._redis_client = get_redis_client()
+                return getattr(self._redis_client, method)(*args, **kwargs)
+            except redis.RedisError as error:
+                log(f"Redis unavailable, caching IDs on {self.path}: {error}")
+                self._use_redis = False
+        return None
+
+    def _read_disk(self) -> dict:
+        try:
+            entries = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        return {
+            key: entry
+            for key, entry in entries.items()
+            if entry["expires_at"] > time.time()
+        }
+
+    def _write_disk(self, entries: dict) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps(entries), encoding="utf-8")
+
+    def get(self, dataset_id: str, table_id: str) -> Optional[dict]:
+        """
+        Returns the cached IDs of a table, or None.
+        """
+        key = self._key(dataset_id, table_id)
+        with self._lock:
+            ids = self._redis("get", key)
+            if not self._use_redis:
+                ids = self._read_disk().get(key, {}).get("value")
+            if ids is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return ids
+
+    def set(self, dataset_id: str, table_id: str, ids: dict) -> None:
+        """
+        Caches the IDs of a table.
+        """
+        key = self._key(dataset_id, table_id)
+        with self._lock:
+            self._redis("set", key, ids, ex=self.ttl)
+            if not self._use_redis:
+                entries = self._read_disk()
+                entries[key] = {"value": ids, "expires_at": time.time() + self.ttl}
+                self._write_disk(entries)
+
+    def invalidate(self, dataset_id: str, table_id: str) -> None:
+        """
+        Drops the cached IDs of a table.
+        """
+        key = self._key(dataset_id, table_id)
+        log(f"Invalidating cached IDs of {dataset_id}.{table_id}")
+        with self._lock:
+            self._redis("delete", key, f"{key}_timestamp")
+            if not self._use_redis:
+                entries = self._read_disk()
+                entries.pop(key, None)
+                self._write_disk(entries)
+
+    def log_stats(self) -> None:
+        """
+        Logs cache hits and misses.
+        """
+        log(f"Metadata ID cache: {self.hits} hits, {self.misses} misses")
+
+
+@lru_cache(maxsize=None)
+def get_metadata_id_cache(api_mode: str = "prod") -> MetadataIDCache:
+    """
+    Returns the `MetadataIDCache` shared by every lookup of an API mode.
+    """
+    return MetadataIDCache(api_mode=api_mode)
+
+
 def get_ids(
     dataset_name: str,
     table_name: str,
     email: str,
     password: str,
     api_mode: str = "prod",
+    use_cache: bool = True,
 ) -> dict:
     """
     Obtains the IDs of the table and coverage based on the provided names.
+
+    IDs are read from and stored in `get_metadata_id_cache` unless `use_cache` is False.
     """
+    cache = get_metadata_id_cache(api_mode) if use_cache else None
+    if cache is not None:
+        ids = cache.get(dataset_name, table_name)
+        if ids is not None:
+            return {"table_id": ids["table_id"], "coverage_id": ids["coverage_id"]}
     try:
         # Get the table ID
         table_result = get_id(
@@ -1138,10 +2115,282 @@ def get_ids(
         ].split(":")[-1]
 
         # Return the 2 IDs in a dictionary
-        return {
+        ids = {
             "table_id": table_id,
             "coverage_id": coverage_id,
         }
+        if cache is not None:
+            cache.set(dataset_name, table_name, ids)
+        return ids
     except Exception as e:
         print(f"Error occurred while retrieving IDs: {str(e)}")
         raise
+
+
+def query_aliased(
+    client: BDGraphQLClient,
+    query_class: str,
+    filters: List[Dict[str, Any]],
+    types: Dict[str, str],
+    fields: str,
+    batch_size: int = utils_constants.METADATA_BATCH_SIZE.value,
+) -> List[List[dict]]:
+    """
+    Runs one `query_class` lookup per item of `filters` as aliased fields of a
+    single query, `batch_size` lookups per request.
+
+    Args:
+        client (BDGraphQLClient): client used for the requests.
+        query_class (str): GraphQL field to query, e.g. `allCoverage`.
+        filters (list): arguments of each lookup, e.g. `[{"table_Id": "..."}]`.
+        types (dict): GraphQL type of each argument, e.g. `{"table_Id": "ID"}`.
+        fields (str): fields selected in each node.
+
+    Returns:
+        list: the nodes found for each item of `filters`, in the same order.
+
+    Raises:
+        MetadataAPIError: If a request returns no data.
+    """
+    nodes = []
+    for start in range(0, len(filters), batch_size):
+        batch = filters[start : start + batch_size]
+        declarations, selections, variables = [], [], {}
+        for i, arguments in enumerate(batch):
+            inputs = []
+            for name, value in arguments.items():
+                declarations.append(f"${name}{i}: {types[name]}")
+                inputs.append(f"{name}: ${name}{i}")
+                variables[f"{name}{i}"] = value
+            selections.append(
+                f"q{i}: {query_class}({', '.join(inputs)}) "
+                f"{{ edges {{ node {{ {fields} }} }} }}"
+            )
+        query = f"query({', '.join(declarations)}) {{ {' '.join(selections)} }}"
+        r = client.execute(query, variables, operation=f"{query_class} batch")
+        if not r.get("data"):
+            log(
+                f"{query_class} batch failed: {json.dumps(r, ensure_ascii=False)}",
+                "error",
+            )
+            raise MetadataAPIError(f"{query_class} batch query returned no data")
+        nodes.extend(
+            [edge["node"] for edge in r["data"][f"q{i}"]["edges"]]
+            for i in range(len(batch))
+        )
+    return nodes
+
+
+def get_ids_batch(
+    tables: List[Tuple[str, str]],
+    email: str,
+    password: str,
+    api_mode: str = "prod",
+    use_cache: bool = True,
+) -> Dict[Tuple[str, str], dict]:
+    """
+    Obtains the table, coverage and datetime range IDs of many tables, with one
+    aliased query per `METADATA_BATCH_SIZE` tables for each kind of ID. Tables
+    found in `get_metadata_id_cache` are not queried, unless `use_cache` is False.
+
+    Args:
+        tables (list): `(dataset_id, table_id)` pairs, as named in BigQuery.
+
+    Returns:
+        dict: `{(dataset_id, table_id): {"table_id", "coverage_id", "datetime_range_id"}}`.
+            Tables without a cloud table or a coverage are left out. The
+            datetime range ID is None when the coverage has none yet.
+    """
+    client = get_graphql_client(email, password, api_mode)
+    cache = get_metadata_id_cache(api_mode) if use_cache else None
+    tables = list(dict.fromkeys(tables))
+
+    ids = {}
+    if cache is not None:
+        for table in tables:
+            cached = cache.get(*table)
+            if cached is not None and cached.get("datetime_range_id") is not None:
+                ids[table] = cached
+    missing = [table for table in tables if table not in ids]
+
+    cloud_tables = query_aliased(
+        client,
+        query_class="allCloudtable",
+        filters=[
+            {"gcpDatasetId": dataset_id, "gcpTableId": table_id}
+            for dataset_id, table_id in missing
+        ],
+        types={"gcpDatasetId": "String", "gcpTableId": "String"},
+        fields="table { _id }",
+    )
+    resolved = {
+        table: {"table_id": nodes[0]["table"]["_id"]}
+        for table, nodes in zip(missing, cloud_tables)
+        if nodes
+    }
+
+    coverages = query_aliased(
+        client,
+        query_class="allCoverage",
+        filters=[
+            {"table_Id": table_ids["table_id"]} for table_ids in resolved.values()
+        ],
+        types={"table_Id": "ID"},
+        fields="id",
+    )
+    for table, nodes in zip(list(resolved), coverages):
+        if not nodes:
+            del resolved[table]
+            continue
+        if len(nodes) > 1:
+            log(
+                f"WARNING: {table[0]}.{table[1]} has more than one coverage. "
+                "Only the first ID has been selected."
+            )
+        resolved[table]["coverage_id"] = nodes[0]["id"].split(":")[-1]
+
+    datetime_ranges = query_aliased(
+        client,
+        query_class="allDatetimerange",
+        filters=[
+            {"coverage_Id": table_ids["coverage_id"]} for table_ids in resolved.values()
+        ],
+        types={"coverage_Id": "ID"},
+        fields="id",
+    )
+    for table, nodes in zip(resolved, datetime_ranges):
+        resolved[table]["datetime_range_id"] = (
+            nodes[0]["id"].split(":")[1] if nodes else None
+        )
+        if cache is not None:
+            cache.set(*table, resolved[table])
+    ids.update(resolved)
+
+    for table in tables:
+        if table not in ids:
+            log(f"IDs not found for {table[0]}.{table[1]}", level="warning")
+    return ids
+
+
+def get_coverage_date_formats(
+    tables: List[Tuple[str, str]],
+    email: str,
+    password: str,
+    api_mode: str = "prod",
+) -> Dict[Tuple[str, str], str]:
+    """
+    Reads the granularity of the current temporal coverage of many tables from
+    the end of their `DateTimeRange`, with one aliased query per
+    `METADATA_BATCH_SIZE` tables.
+
+    Returns:
+        dict: `{(dataset_id, table_id): date_format}`, where the format is
+            'yy-mm-dd', 'yy-mm' or 'yy'. Tables without a datetime range, or
+            with a range without an end, are left out.
+    """
+    client = get_graphql_client(email, password, api_mode)
+    ids = get_ids_batch(tables, email, password, api_mode)
+    datetime_ranges = query_aliased(
+        client,
+        query_class="allDatetimerange",
+        filters=[
+            {"coverage_Id": table_ids["coverage_id"]} for table_ids in ids.values()
+        ],
+        types={"coverage_Id": "ID"},
+        fields="endYear endMonth endDay",
+    )
+    date_formats = {}
+    for table, nodes in zip(ids, datetime_ranges):
+        if not nodes:
+            continue
+        if nodes[0].get("endDay"):
+            date_formats[table] = "yy-mm-dd"
+        elif nodes[0].get("endMonth"):
+            date_formats[table] = "yy-mm"
+        elif nodes[0].get("endYear"):
+            date_formats[table] = "yy"
+    return date_formats
+
+
+def update_temporal_coverages(
+    coverages: Dict[Tuple[str, str], str],
+    email: str,
+    password: str,
+    api_mode: str = "prod",
+    max_workers: int = utils_constants.METADATA_MAX_WORKERS.value,
+) -> Dict[Tuple[str, str], str]:
+    """
+    Updates the temporal coverage of many tables: resolves all IDs with
+    `get_ids_batch` and sends the `CreateUpdateDateTimeRange` mutations through a
+    bounded pool of threads.
+
+    Args:
+        coverages (dict): `{(dataset_id, table_id): temporal_coverage}`, where the
+            coverage is accepted by `parse_temporal_coverage` (e.g. `2023-06`).
+
+    Returns:
+        dict: the datetime range ID of each updated table.
+
+    Raises:
+        Exception: If any table was not found or any mutation failed, after all
+            the others were sent.
+    """
+    client = get_graphql_client(email, password, api_mode)
+    ids = get_ids_batch(list(coverages), email, password, api_mode)
+
+    mutation_class = "CreateUpdateDateTimeRange"
+    query = f"""
+        mutation($input:{mutation_class}Input!){{
+            {mutation_class}(input: $input){{
+                errors {{
+                    field,
+                    messages
+                }},
+                datetimerange {{
+                    id,
+                }}
+            }}
+        }}
+    """
+
+    def update(table: Tuple[str, str]) -> str:
+        mutation_parameters = parse_temporal_coverage(f"{coverages[table]}")
+        mutation_parameters["coverage"] = ids[table]["coverage_id"]
+        if ids[table]["datetime_range_id"] is not None:
+            mutation_parameters["id"] = ids[table]["datetime_range_id"]
+        r = client.execute(
+            query, {"input": mutation_parameters}, operation=mutation_class
+        )
+        result = (r.get("data") or {}).get(mutation_class) or {}
+        if result.get("errors") or not result.get("datetimerange"):
+            raise MetadataAPIError(
+                f"create: Error {json.dumps(r, indent=4, ensure_ascii=False)}",
+                missing_id=reports_missing_id(r, mutation_class),
+            )
+        return result["datetimerange"]["id"].split(":")[1]
+
+    cache = get_metadata_id_cache(api_mode)
+    updated, failed = {}, [table for table in coverages if table not in ids]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {table: executor.submit(update, table) for table in ids}
+        for table, future in futures.items():
+            try:
+                updated[table] = future.result()
+            except Exception as error:  # pylint: disable=broad-except
+                log(f"Failed to update {table[0]}.{table[1]}: {error}", "error")
+                failed.append(table)
+                if isinstance(error, MetadataAPIError) and error.missing_id:
+                    cache.invalidate(*table)
+                continue
+            if ids[table]["datetime_range_id"] != updated[table]:
+                cache.set(*table, {**ids[table], "datetime_range_id": updated[table]})
+
+    log(f"Updated the temporal coverage of {len(updated)} tables")
+    client.log_metrics()
+    cache.log_stats()
+    if failed:
+        raise Exception(
+            "Temporal coverage not updated for "
+            + ", ".join(f"{dataset_id}.{table_id}" for dataset_id, table_id in failed)
+        )
+    return updated
@@ -0,0 +1,4 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks for the performance sensitive helpers of the pipelines.
+"""
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the DATASUS DBC readers on a directory of `.dbc` files, such as the
+27 files of one month of CNES: `read_dbc`, which builds the whole DataFrame,
+the batches of `iter_dbc_batches` written as text (as `br_ms_cnes` does), and
+R's `read.dbc` through rpy2 (the reader used by `br_ms_cnes` before). Reports
+the time and, with `--memory`, the peak of memory allocated by the Python
+readers, measured in a second pass since tracing slows them down.
+
+Without real files, `--synthetic ROWS` writes a CNES-like file of ROWS records,
+imploded like the DATASUS files.
+
+Usage:
+    python -m scripts.benchmarks.dbc /tmp/br_ms_cnes/input/ST
+    python -m scripts.benchmarks.dbc /tmp/br_ms_cnes/input/ST --no-r
+    python -m scripts.benchmarks.dbc /tmp/dbc --synthetic 200000 --no-r
+"""
+import argparse
+import tracemalloc
+from pathlib import Path
+from time import perf_counter
+
+import dclimplode
+import numpy as np
+
+from pipelines.utils.dbc import iter_dbc_batches, read_dbc
+from pipelines.utils.utils import human_readable
+
+# name, type, length and decimals of the fields of the synthetic file
+SYNTHETIC_FIELDS = [
+    ("CNES", "C", 7, 0),
+    ("CODUFMUN", "C", 6, 0),
+    ("LEITOS", "N", 4, 0),
+    ("VALOR", "N", 12, 2),
+    ("DATA", "D", 8, 0),
+    ("NOME", "C", 40, 0),
+]
+
+
+def write_synthetic_dbc(path: Path, rows: int) -> None:
+    """
+    Writes a DBC file of `rows` random records.
+    """
+    rng = np.random.default_rng(0)
+    header_length = 32 * (len(SYNTHETIC_FIELDS) + 1) + 1
+    record_length = 1 + sum(field[2] for field in SYNTHETIC_FIELDS)
+    header = bytearray(32)
+    header[0] = 3
+    header[4:8] = rows.to_bytes(4, "little")
+    header[8:10] = header_length.to_bytes(2, "little")
+    header[10:12] = record_length.to_bytes(2, "little")
+    for name, kind, length, decimals in SYNTHETIC_FIELDS:
+        descriptor = bytearray(32)
+        descriptor[: len(name)] = name.encode()
+        descriptor[11] = ord(kind)
+        descriptor[16], descriptor[17] = length, decimals
+        header += descriptor
+    header += b"\r"
+    records = b"".join(
+        b" "
+        + f"{rng.integers(10**6, 10**7)}{rng.integers(10**5, 10**6)}".encode()
+        + f"{rng.integers(0, 500):4d}{rng.integers(0, 10**8) / 100:12.2f}".encode()
+        + f"2023{rng.integers(1, 13):02d}{rng.integers(1, 29):02d}".encode()
+        + f"{'HOSPITAL ' + str(rng.integers(0, 10**6)):40s}".encode()
+        for _ in range(rows)
+    )
+    compressor = dclimplode.compressobj(dclimplode.CMP_BINARY, 4096)
+    body = compressor.compress(records) + compressor.flush()
+    path.write_bytes(bytes(header) + bytes(4) + body)
+
+
+def read_dbc_r():
+    """
+    Returns a function reading a DBC file with R's `read.dbc`.
+    """
+    # pylint: disable=import-outside-toplevel
+    from rpy2.robjects import pandas2ri
+    from rpy2.robjects.packages import importr, isinstalled
+
+    utils = importr("utils")
+    if not isinstalled("read.dbc"):
+        utils.chooseCRANmirror(ind=1)
+        utils.install_packages("read.dbc")
+    readdbc = importr("read.dbc")
+    pandas2ri.activate()
+    return lambda path: len(pandas2ri.rpy2py(readdbc.read_dbc(str(path))))
+
+
+def read_batches(path: Path) -> int:
+    """
+    Reads a DBC file in batches, as text, returning the number of rows.
+    """
+    return sum(len(df) for df in iter_dbc_batches(path, as_text=True))
+
+
+def main():
+    """
+    Reads every file with each reader and reports rows, time and memory.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("directory", type=Path)
+    parser.add_argument("--no-r", action="store_true", help="skip R's read.dbc")
+    parser.add_argument("--synthetic", type=int, help="write a file of N records")
+    parser.add_argument("--memory", action="store_true", help="measure peak memory")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        args.directory.mkdir(parents=True, exist_ok=True)
+        write_synthetic_dbc(args.directory / "SYNTHETIC.dbc", args.synthetic)
+    files = sorted(args.directory.glob("*.[dD][bB][cC]"))
+    size = sum(file.stat().st_size for file in files)
+    print(f"{len(files)} files, {human_readable(size, 'B')}")
+
+    readers = {
+        "read_dbc": lambda path: len(read_dbc(path)),
+        "iter_dbc_batches": read_batches,
+    }
+    if not args.no_r:
+        readers["r"] = read_dbc_r()
+    for name, reader in readers.items():
+        start = perf_counter()
+        rows = sum(reader(file) for file in files)
+        elapsed = perf_counter() - start
+        peak = 0
+        if args.memory and name != "r":
+            for file in files:
+                tracemalloc.start()
+                reader(file)
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+        memory = f", peak {human_readable(peak, 'B')}" if peak else ""
+        print(
+            f"{name}: {rows} rows in {elapsed:.2f}s "
+            f"({human_readable(size / elapsed, 'B')}/s compressed){memory}"
+        )
+
+
+if __name__ == "__main__":
+    main()
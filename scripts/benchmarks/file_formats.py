@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the staging file formats (csv, csv.gz and parquet) on data shaped
+like `br_cvm_fi.documentos_informe_diario`: size on disk, write time and,
+optionally, upload time to a GCS bucket.
+
+Usage:
+    python -m scripts.benchmarks.file_formats --rows 2000000
+    python -m scripts.benchmarks.file_formats --bucket basedosdados-dev --prefix tmp/bench
+"""
+import argparse
+import shutil
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+from google.cloud import storage
+
+from pipelines.utils.utils import human_readable, to_partitions
+
+
+def informe_diario_dataframe(rows: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Builds a dataframe with the columns of `documentos_informe_diario`.
+    """
+    rng = np.random.default_rng(seed)
+    n_funds = max(rows // 250, 1)
+    cnpjs = np.char.zfill(rng.integers(10**12, 10**14, n_funds).astype(str), 14)
+    dates = pd.date_range("2021-01-01", "2023-12-31", freq="D")
+    data_competencia = pd.Series(rng.choice(dates, rows)).dt.strftime("%Y-%m-%d")
+    fund = rng.integers(0, n_funds, rows)
+    return pd.DataFrame(
+        {
+            "id_fundo": fund,
+            "cnpj": cnpjs[fund],
+            "data_competencia": data_competencia,
+            "valor_total": (rng.random(rows) * 1e8).round(2),
+            "valor_cota": (rng.random(rows) * 100).round(12),
+            "valor_patrimonio_liquido": (rng.random(rows) * 1e8).round(2),
+            "captacao_dia": (rng.random(rows) * 1e6).round(2),
+            "regate_dia": (rng.random(rows) * 1e6).round(2),
+            "quantidade_cotistas": rng.integers(0, 100000, rows),
+            "ano": data_competencia.str[:4].astype(int),
+            "mes": data_competencia.str[5:7].astype(int),
+        }
+    )
+
+
+def upload_tree(path: Path, bucket: storage.Bucket, prefix: str) -> float:
+    """
+    Uploads every file under `path` and returns the elapsed seconds.
+    """
+    start = perf_counter()
+    for file in path.rglob("*"):
+        if file.is_file():
+            blob = bucket.blob(f"{prefix}/{file.relative_to(path).as_posix()}")
+            blob.upload_from_filename(str(file))
+    return perf_counter() - start
+
+
+def main():
+    """
+    Writes the same data in every format and reports sizes and timings.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--bucket", help="upload each format to this bucket")
+    parser.add_argument("--prefix", default="benchmarks/file_formats")
+    args = parser.parse_args()
+
+    data = informe_diario_dataframe(args.rows)
+    bucket = storage.Client().bucket(args.bucket) if args.bucket else None
+    tmp_dir = Path(tempfile.mkdtemp())
+    try:
+        for file_format in ["csv", "csv.gz", "parquet"]:
+            path = tmp_dir / file_format
+            start = perf_counter()
+            to_partitions(data, ["ano", "mes"], path, file_format=file_format)
+            elapsed = perf_counter() - start
+            size = sum(file.stat().st_size for file in path.rglob("*.*"))
+            report = (
+                f"{file_format}: {human_readable(size, 'B')} written in {elapsed:.2f}s"
+            )
+            if bucket is not None:
+                seconds = upload_tree(path, bucket, f"{args.prefix}/{file_format}")
+                report += f", uploaded in {seconds:.2f}s"
+            print(report)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
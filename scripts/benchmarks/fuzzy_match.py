@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark of the `get_id` lookups of `br_mercadolivre_ofertas` over the
+real `MAP_MUNICIPIO_TO_ID` table: the previous linear scan (one Levenshtein
+distance per key for every input) against the `FuzzyIndex`, checking that both
+return the same ids. Inputs are locations like the ones in the seller pages
+("Juiz de Fora, Minas Gerais."), with random typos, many of them repeated.
+
+Usage:
+    python -m scripts.benchmarks.fuzzy_match
+    python -m scripts.benchmarks.fuzzy_match --inputs 5000 --distinct 500
+"""
+import argparse
+import random
+import string
+from time import perf_counter
+
+import Levenshtein
+
+from pipelines.datasets.br_mercadolivre_ofertas.constants import (
+    constants as const_mercadolivre,
+)
+from pipelines.datasets.br_mercadolivre_ofertas.utils import FuzzyIndex, get_id
+
+
+def linear_get_id(input_string, dictionary):
+    """
+    The previous `get_id`.
+    """
+    if not isinstance(input_string, str):
+        return None
+    best_match = None
+    min_distance = float("inf")
+    for key in dictionary:
+        distance = Levenshtein.distance(input_string.lower(), key.lower())
+        if distance < min_distance:
+            min_distance = distance
+            best_match = key
+    return dictionary.get(best_match)
+
+
+def typo(text, rng):
+    """
+    Replaces, deletes or inserts a random character.
+    """
+    position = rng.randrange(len(text))
+    letter = rng.choice(string.ascii_lowercase)
+    return rng.choice(
+        [
+            text[:position] + letter + text[position + 1 :],
+            text[:position] + text[position + 1 :],
+            text[:position] + letter + text[position:],
+        ]
+    )
+
+
+def main():
+    """
+    Looks up the same inputs with both implementations and reports timings.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--inputs", type=int, default=2000)
+    parser.add_argument("--distinct", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    dictionary = const_mercadolivre.MAP_MUNICIPIO_TO_ID.value
+    rng = random.Random(args.seed)
+    keys = list(dictionary)
+    distinct = []
+    for _ in range(args.distinct):
+        text = rng.choice(keys) + "."
+        for _ in range(rng.randrange(3)):
+            text = typo(text, rng)
+        distinct.append(text)
+    inputs = [rng.choice(distinct) for _ in range(args.inputs)]
+    print(f"{len(dictionary)} keys, {len(inputs)} inputs ({len(distinct)} distinct)")
+
+    start = perf_counter()
+    expected = [linear_get_id(text, dictionary) for text in inputs]
+    linear = perf_counter() - start
+    print(f"linear scan: {linear:.2f}s")
+
+    start = perf_counter()
+    index = FuzzyIndex(dictionary)
+    built = perf_counter() - start
+    ids = [get_id(text, index) for text in inputs]
+    indexed = perf_counter() - start
+    print(f"index: {indexed:.2f}s ({built:.2f}s to build), {linear / indexed:.0f}x")
+
+    start = perf_counter()
+    index = FuzzyIndex(dictionary)
+    for text in distinct:
+        index.get(text)
+    print(f"index without repeated inputs: {perf_counter() - start:.2f}s")
+
+    mismatches = sum(a != b for a, b in zip(expected, ids))
+    print(f"{mismatches} mismatches")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the Mercado Livre item crawler against a local stub server serving
+recorded pages: the previous strategy (one unpooled `requests.get` per field of
+each item, all at once) against the current one (each page fetched once through
+the bounded `AsyncHttpClient`). The stub answers with some latency and with 429
+when too many requests are in flight, like the real site.
+
+Usage:
+    python -m scripts.benchmarks.mercadolivre
+    python -m scripts.benchmarks.mercadolivre --pages /tmp/paginas_salvas --items 50
+"""
+import argparse
+import asyncio
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import cycle
+from pathlib import Path
+from threading import Lock, Thread
+
+import requests
+from bs4 import BeautifulSoup
+
+from pipelines.datasets.br_mercadolivre_ofertas.constants import (
+    constants as const_mercadolivre,
+)
+from pipelines.datasets.br_mercadolivre_ofertas.utils import (
+    PageCache,
+    get_byelement,
+    get_categories,
+    get_features,
+    get_original_price,
+    get_price,
+    get_seller_link,
+    process_table,
+)
+from pipelines.utils.async_http import AsyncHttpClient
+
+ITEM = """
+<html><body>
+<h1 class="ui-pdp-title">Produto {i}</h1>
+<span class="ui-pdp-review__amount">(12)</span>
+<meta itemprop="price" content="99.9">
+<s class="andes-money-amount--previous">
+  <span class="andes-visually-hidden">149 reais con 90 centavos</span>
+</s>
+<div class="ui-box-component ui-box-component-pdp__visible--desktop">
+  <a href="https://www.mercadolivre.com.br/perfil/LOJA+EXEMPLO">Loja</a>
+</div>
+<a class="andes-breadcrumb__link">Eletrônicos</a>
+</body></html>
+"""
+# fixed sleeps of the previous extractors, run one after the other per item
+PREVIOUS_SLEEPS = 20 + 20 + 25 + 20 + 2 + 2
+
+
+class Stub(BaseHTTPRequestHandler):
+    """Serves one listing page per section and the recorded item pages"""
+
+    protocol_version = "HTTP/1.1"
+    pages = {}
+    latency = 0.05
+    limit = 16
+    lock = Lock()
+    in_flight = 0
+    stats = {"requests": 0, "connections": 0, "throttled": 0}
+
+    def setup(self):
+        super().setup()
+        with Stub.lock:
+            Stub.stats["connections"] += 1
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Answers with the page at the path, or 429 above the limit"""
+        with Stub.lock:
+            Stub.in_flight += 1
+            Stub.stats["requests"] += 1
+            throttled = Stub.in_flight > Stub.limit
+            Stub.stats["throttled"] += throttled
+        try:
+            time.sleep(Stub.latency)
+            body = b"" if throttled else Stub.pages.get(self.path, b"")
+            self.send_response(429 if throttled else 200)
+            if throttled:
+                self.send_header("Retry-After", "1")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with Stub.lock:
+                Stub.in_flight -= 1
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        """Silences the server"""
+
+
+def serve(recorded, sections, items):
+    """
+    Starts the stub with `items` item pages per section, taken from the
+    `recorded` pages in turn. Returns the URLs of the listing pages.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Stub)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    pages = cycle(recorded)
+    tables = {}
+    for section in range(sections):
+        links = []
+        for i in range(items):
+            path = f"/item/{section}-{i}"
+            Stub.pages[path] = next(pages).replace("{i}", str(i)).encode("utf-8")
+            links.append(
+                '<a class="promotion-item__link-container" '
+                f'href="{base_url}{path}"></a>'
+            )
+        Stub.pages[f"/ofertas/{section}"] = "".join(links).encode("utf-8")
+        tables[f"secao_{section}"] = f"{base_url}/ofertas/{section}"
+    Thread(target=server.serve_forever, daemon=True).start()
+    return tables
+
+
+async def previous(tables, kwargs_list):
+    """
+    One unpooled request per field of each item, without the fixed sleeps.
+    """
+
+    async def field(url, extractor):
+        try:
+            response = await asyncio.to_thread(requests.get, url, timeout=100)
+            return extractor(BeautifulSoup(response.text, "html.parser"))
+        except Exception:  # pylint: disable=broad-except
+            return None
+
+    extractors = [
+        lambda soup, kwargs=kwargs: get_byelement(soup, **kwargs)
+        for kwargs in kwargs_list
+    ]
+    extractors += [
+        get_price,
+        get_original_price,
+        get_seller_link,
+        get_features,
+        get_categories,
+    ]
+    items = []
+    for url in tables.values():
+        soup = BeautifulSoup(requests.get(url, timeout=100).text, "html.parser")
+        for link in soup.find_all(class_="promotion-item__link-container"):
+            items.append(
+                asyncio.gather(
+                    *[field(link["href"], extractor) for extractor in extractors]
+                )
+            )
+    return await asyncio.gather(*items)
+
+
+async def current(tables, kwargs_list, rate):
+    """
+    Each page fetched once through the bounded client.
+    """
+    async with AsyncHttpClient(
+        max_concurrency=const_mercadolivre.MAX_CONCURRENCY.value,
+        max_per_host=const_mercadolivre.MAX_PER_HOST.value,
+        rate=rate,
+        backoff_factor=1,
+    ) as client:
+        pages = PageCache(client)
+        results = await asyncio.gather(
+            *[
+                process_table(table, url, kwargs_list, pages=pages)
+                for table, url in tables.items()
+            ]
+        )
+    return [item for items in results for item in items]
+
+
+def main():
+    """
+    Crawls the stub with each strategy and reports requests and timings.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=Path, help="directory of recorded item pages")
+    parser.add_argument("--sections", type=int, default=4)
+    parser.add_argument("--items", type=int, default=20, help="items per section")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--limit", type=int, default=16, help="requests before 429")
+    parser.add_argument("--rate", type=float, default=None, help="requests/s")
+    args = parser.parse_args()
+
+    recorded = [ITEM]
+    if args.pages:
+        recorded = [path.read_text() for path in sorted(args.pages.glob("*.html"))]
+    Stub.latency, Stub.limit = args.latency, args.limit
+    tables = serve(recorded, args.sections, args.items)
+    kwargs_list = const_mercadolivre.KWARGS_LIST.value
+    total = args.sections * args.items
+
+    strategies = {
+        "previous": lambda: previous(tables, kwargs_list),
+        "current": lambda: current(tables, kwargs_list, args.rate),
+    }
+    for name, strategy in strategies.items():
+        Stub.stats = dict.fromkeys(Stub.stats, 0)
+        start = time.perf_counter()
+        asyncio.run(strategy())
+        elapsed = time.perf_counter() - start
+        print(
+            f"{name}: {total} items in {elapsed:.2f}s, "
+            f"{Stub.stats['requests']} requests, "
+            f"{Stub.stats['connections']} connections, "
+            f"{Stub.stats['throttled']} throttled"
+        )
+    print(f"(the previous extractors also slept {PREVIOUS_SLEEPS}s per item)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of `pipelines.utils.utils.to_partitions` against the previous
+implementation, which re-scanned the whole dataframe once per partition.
+
+Usage:
+    python -m scripts.benchmarks.partitions --rows 10000000 --max-workers 4
+"""
+import argparse
+import hashlib
+import shutil
+import tempfile
+from pathlib import Path
+from time import perf_counter
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from pipelines.utils.utils import to_partitions
+
+UFS = [
+    "AC", "AL", "AM", "AP", "BA", "CE", "DF", "ES", "GO", "MA", "MG", "MS", "MT", "PA",
+    "PB", "PE", "PI", "PR", "RJ", "RN", "RO", "RR", "RS", "SC", "SE", "SP", "TO",
+]  # fmt: skip
+
+
+def legacy_to_partitions(
+    data: pd.DataFrame, partition_columns: List[str], savepath: str
+):
+    """
+    Previous implementation of `to_partitions`, kept for comparison.
+    """
+    savepath = Path(savepath)
+    unique_combinations = (
+        data[partition_columns]
+        .drop_duplicates(subset=partition_columns)
+        .to_dict(orient="records")
+    )
+    for filter_combination in unique_combinations:
+        patitions_values = [
+            f"{partition}={value}" for partition, value in filter_combination.items()
+        ]
+        df_filter = data.loc[
+            data[filter_combination.keys()]
+            .isin(filter_combination.values())
+            .all(axis=1),
+            :,
+        ]
+        df_filter = df_filter.drop(columns=partition_columns)
+        filter_save_path = Path(savepath / "/".join(patitions_values))
+        filter_save_path.mkdir(parents=True, exist_ok=True)
+        file_filter_save_path = Path(filter_save_path) / "data.csv"
+        df_filter.to_csv(
+            file_filter_save_path,
+            sep=",",
+            encoding="utf-8",
+            na_rep="",
+            index=False,
+            mode="a",
+            header=not file_filter_save_path.exists(),
+        )
+
+
+def synthetic_dataframe(rows: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Builds a comex-like dataframe partitioned by ano/mes/sigla_uf.
+    """
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "ano": rng.integers(2010, 2024, rows),
+            "mes": rng.integers(1, 13, rows),
+            "sigla_uf": rng.choice(UFS, rows),
+            "id_sh4": rng.integers(100, 9999, rows),
+            "id_pais": rng.integers(1, 250, rows),
+            "kg_liquido": rng.random(rows) * 1000,
+            "valor_fob_dolar": rng.random(rows) * 100000,
+        }
+    )
+
+
+def hash_tree(path: Path) -> Dict[str, str]:
+    """
+    Returns the md5 of every file under `path`, keyed by the relative path.
+    """
+    return {
+        str(file.relative_to(path)): hashlib.md5(file.read_bytes()).hexdigest()
+        for file in sorted(path.rglob("*"))
+        if file.is_file()
+    }
+
+
+def main():
+    """
+    Runs both implementations on the same dataframe and compares the outputs.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--max-workers", type=int, default=4)
+    parser.add_argument(
+        "--skip-legacy",
+        action="store_true",
+        help="the legacy implementation takes hours on 10M rows",
+    )
+    args = parser.parse_args()
+
+    data = synthetic_dataframe(args.rows)
+    partition_columns = ["ano", "mes", "sigla_uf"]
+    n_partitions = len(data[partition_columns].drop_duplicates())
+    print(f"{args.rows} rows, {n_partitions} partitions")
+
+    tmp_dir = Path(tempfile.mkdtemp())
+    try:
+        runs = {
+            "to_partitions": lambda path: to_partitions(data, partition_columns, path),
+            f"to_partitions(max_workers={args.max_workers})": lambda path: (
+                to_partitions(
+                    data, partition_columns, path, max_workers=args.max_workers
+                )
+            ),
+        }
+        if not args.skip_legacy:
+            runs["legacy"] = lambda path: legacy_to_partitions(
+                data, partition_columns, path
+            )
+
+        hashes = {}
+        for name, run in runs.items():
+            path = tmp_dir / name
+            start = perf_counter()
+            run(path)
+            print(f"{name}: {perf_counter() - start:.2f}s")
+            hashes[name] = hash_tree(path)
+
+        reference = hashes["to_partitions"]
+        for name, tree in hashes.items():
+            status = "identical" if tree == reference else "DIFFERENT"
+            print(f"{name}: output {status}")
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
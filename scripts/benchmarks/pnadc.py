@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the readers of the PNAD Contínua fixed width microdata on a
+synthetic file with the column layout of `br_ibge_pnadc/constants.py`:
+`pd.read_fwf` against `iter_fixed_width`, and the partitioned output of each
+file format.
+
+Usage:
+    python -m scripts.benchmarks.pnadc --rows 200000
+    python -m scripts.benchmarks.pnadc --rows 200000 --chunksize 50000
+"""
+import argparse
+import shutil
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+from pipelines.datasets.br_ibge_pnadc.constants import constants as pnad_constants
+from pipelines.datasets.br_ibge_pnadc.utils import iter_fixed_width
+from pipelines.utils.utils import PartitionSink, human_readable
+
+WIDTHS = pnad_constants.COLUMNS_WIDTHS.value
+NAMES = pnad_constants.COLUMNS_NAMES.value
+
+
+def microdados_file(path: Path, rows: int, seed: int = 0) -> None:
+    """
+    Writes `rows` lines of random digits, with 40% of blank values, sorted by UF
+    like the files published by IBGE.
+    """
+    rng = np.random.default_rng(seed)
+    records = rng.integers(ord("0"), ord("9") + 1, (rows, sum(WIDTHS)), np.uint8)
+    start = 0
+    for width in WIDTHS:
+        records[rng.random(rows) < 0.4, start : start + width] = ord(" ")
+        start += width
+    records[:, :5] = np.frombuffer(b"20231", np.uint8)
+    ufs = np.sort(rng.choice(list(pnad_constants.map_codigo_sigla_uf.value), rows))
+    records[:, 5:7] = np.array([list(uf.encode()) for uf in ufs], np.uint8)
+    lines = np.hstack([records, np.full((rows, 1), ord("\n"), np.uint8)])
+    path.write_bytes(lines.tobytes())
+
+
+def main():
+    """
+    Reads the same file with each reader and reports timings.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--chunksize", type=int, default=pnad_constants.CHUNKSIZE.value)
+    args = parser.parse_args()
+
+    tmp_dir = Path(tempfile.mkdtemp())
+    try:
+        path = tmp_dir / "PNADC_012023.txt"
+        microdados_file(path, args.rows)
+        print(f"{args.rows} rows, {human_readable(path.stat().st_size, 'B')}")
+
+        start = perf_counter()
+        for _ in pd.read_fwf(
+            path, widths=WIDTHS, names=NAMES, header=None, dtype=str, chunksize=10000
+        ):
+            pass
+        print(f"read_fwf: {perf_counter() - start:.2f}s")
+
+        start = perf_counter()
+        for _ in iter_fixed_width(path, WIDTHS, NAMES, chunksize=args.chunksize):
+            pass
+        print(f"iter_fixed_width: {perf_counter() - start:.2f}s")
+
+        for file_format in ["csv", "parquet"]:
+            output = tmp_dir / file_format
+            start = perf_counter()
+            with PartitionSink(
+                output,
+                ["Ano", "Trimestre", "UF"],
+                file_format=file_format,
+                buffer_rows=args.chunksize,
+            ) as sink:
+                for chunk in iter_fixed_width(
+                    path, WIDTHS, NAMES, chunksize=args.chunksize
+                ):
+                    sink.write(chunk)
+            size = sum(file.stat().st_size for file in output.rglob("*.*"))
+            print(
+                f"iter_fixed_width to {file_format}: {perf_counter() - start:.2f}s, "
+                f"{human_readable(size, 'B')} in {len(sink.partitions)} partitions"
+            )
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the text normalization of `br_tse_eleicoes`: the per cell list
+comprehensions the tasks used against `pipelines.utils.text`, on synthetic
+columns shaped like the candidatos and receitas files (a few distinct values in
+categorical columns, mostly distinct names and IDs).
+
+Usage:
+    python -m scripts.benchmarks.tse_text --rows 1000000
+"""
+import argparse
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+from unidecode import unidecode
+
+from pipelines.datasets.br_tse_eleicoes.utils import clean_digit_id
+from pipelines.utils.text import digit_id, lower_ascii, title_ascii
+
+CARGOS = [
+    "DEPUTADO ESTADUAL",
+    "DEPUTADO FEDERAL",
+    "SENADOR",
+    "GOVERNADOR",
+    "VICE-GOVERNADOR",
+]
+NOMES = ["JOSÉ", "MARIA", "JOÃO", "ANTÔNIO", "FRANCISCA", "LUÍS", "CONCEIÇÃO", "ANDRÉ"]
+SOBRENOMES = ["DA SILVA", "DOS SANTOS", "ARAÚJO", "GONÇALVES", "MÜLLER", "D'ÁVILA"]
+
+
+def candidatos_dataframe(rows: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Builds categorical, name and ID columns with missing values.
+    """
+    rng = np.random.default_rng(seed)
+    # about ten rows per candidate, as in bens and receitas
+    candidato = pd.Series(rng.integers(0, max(rows // 10, 1), rows)).astype(str)
+    nomes = pd.Series(rng.choice(NOMES, rows)) + " " + candidato
+    nomes += " " + pd.Series(rng.choice(SOBRENOMES, rows))
+    cpf = rng.integers(10**8, 10**11, rows).astype(float)
+    cpf[rng.random(rows) < 0.05] = np.nan
+    return pd.DataFrame(
+        {
+            "DS_CARGO": rng.choice(CARGOS, rows),
+            "NM_CANDIDATO": nomes,
+            "NR_CPF_CANDIDATO": cpf,
+        }
+    )
+
+
+def main():
+    """
+    Normalizes the same columns with both implementations and checks the results.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    df = candidatos_dataframe(args.rows)
+    cases = {
+        "DS_CARGO (lower)": (
+            lambda s: [unidecode(k.lower()) if isinstance(k, str) else k for k in s],
+            lower_ascii,
+        ),
+        "NM_CANDIDATO (title)": (
+            lambda s: [unidecode(k.title()) if isinstance(k, str) else k for k in s],
+            title_ascii,
+        ),
+        "NR_CPF_CANDIDATO (id)": (
+            lambda s: [clean_digit_id(k, n_digits=11) if pd.notna(k) else k for k in s],
+            lambda s: digit_id(s, n_digits=11),
+        ),
+    }
+    for (name, (before, after)), column in zip(cases.items(), df.columns):
+        start = perf_counter()
+        expected = before(df[column].to_list())
+        elapsed_before = perf_counter() - start
+
+        start = perf_counter()
+        result = after(df[column]).to_list()
+        elapsed_after = perf_counter() - start
+
+        assert pd.Series(result).equals(pd.Series(expected)), name
+        print(f"{name}: {elapsed_before:.2f}s -> {elapsed_after:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
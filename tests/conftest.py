@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+Fixtures shared by the tests: local stub HTTP servers and an in memory GCS bucket
+"""
+import base64
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+from threading import Lock, Thread
+
+import google_crc32c
+import pytest
+from google.api_core.exceptions import PreconditionFailed
+
+
+@pytest.fixture(name="serve")
+def fixture_serve():
+    """
+    Starts a stub server for a `BaseHTTPRequestHandler` subclass and returns its
+    base URL, e.g. `serve(StubFiles)`. Servers are silenced and shut down at the
+    end of the test.
+    """
+    servers = []
+
+    def serve(handler) -> str:
+        quiet = type(handler.__name__, (handler,), {"log_message": lambda *args: None})
+        server = ThreadingHTTPServer(("127.0.0.1", 0), quiet)
+        Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield serve
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+class FakeBlob:
+    """Blob of a `FakeBucket`, recording transfers and checking generations"""
+
+    def __init__(self, bucket, name, chunk_size=None):
+        self.bucket = bucket
+        self.name = name
+        self.chunk_size = chunk_size
+        content, self.generation = bucket.objects.get(name, (None, 0))
+        self.size = self.crc32c = self.md5_hash = None
+        if content is not None:
+            self.size = len(content)
+            checksum = google_crc32c.Checksum(content).digest()
+            self.crc32c = base64.b64encode(checksum).decode("utf-8")
+
+    def _check_generation(self, if_generation_match):
+        generation = self.bucket.objects.get(self.name, (None, 0))[1]
+        if if_generation_match not in (None, generation):
+            raise PreconditionFailed("generation mismatch")
+        return generation
+
+    def download_to_filename(self, filename, if_generation_match=None):
+        """Writes the content of the blob to `filename`"""
+        with self.bucket.lock:
+            self._check_generation(if_generation_match)
+            self.bucket.downloads.append(self.name)
+            content = self.bucket.objects[self.name][0]
+        Path(filename).write_bytes(content)
+
+    def upload_from_filename(self, filename, checksum=None, if_generation_match=None):
+        """Replaces the content of the blob, if it is at the expected generation"""
+        # pylint: disable=unused-argument
+        content = Path(filename).read_bytes()
+        with self.bucket.lock:
+            generation = self._check_generation(if_generation_match)
+            self.bucket.uploads.append(self.name)
+            self.bucket.objects[self.name] = (content, generation + 1)
+
+    def delete(self):
+        """Removes the blob from the bucket"""
+        with self.bucket.lock:
+            del self.bucket.objects[self.name]
+
+
+class FakeClient:
+    """Client listing the blobs of a `FakeBucket`"""
+
+    @staticmethod
+    def list_blobs(bucket, prefix=""):
+        """Lists blobs under `prefix`"""
+        return [
+            FakeBlob(bucket, name) for name in bucket.objects if name.startswith(prefix)
+        ]
+
+
+class FakeBucket:
+    """
+    In memory stand in for `google.cloud.storage.Bucket`, holding
+    `{name: (content, generation)}` in `objects`
+    """
+
+    name = "bucket"
+
+    def __init__(self):
+        self.client = FakeClient()
+        self.objects = {}
+        self.uploads = []
+        self.downloads = []
+        self.lock = Lock()
+
+    def blob(self, name, chunk_size=None):
+        """Returns a blob, existing or not"""
+        return FakeBlob(self, name, chunk_size)
+
+    def get_blob(self, name):
+        """Returns the blob, or None if it does not exist"""
+        return FakeBlob(self, name) if name in self.objects else None
+
+
+@pytest.fixture(name="bucket")
+def fixture_bucket():
+    """Empty in memory GCS bucket"""
+    return FakeBucket()
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the registry of architecture sheets, against a local stub server
+"""
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+from pipelines.utils.architecture import ArchitectureRegistry
+from pipelines.utils.download import Downloader
+
+SHEET = (
+    "name,original_name,bigquery_type\n"
+    " ano ,,INT64\n"
+    "id_municipio, CODMUN ,STRING\n"
+    "valor,VALOR,FLOAT64\n"
+).encode("utf-8")
+
+
+class StubSheets(BaseHTTPRequestHandler):
+    """Serves `SHEET` as any csv export, with an ETag"""
+
+    requests = []
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Answers with the sheet or 304"""
+        StubSheets.requests.append(self.path)
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Length", str(len(SHEET)))
+        self.end_headers()
+        self.wfile.write(SHEET)
+
+
+@pytest.fixture(name="base_url")
+def fixture_base_url(serve):
+    """URL of a fresh stub server"""
+    StubSheets.requests = []
+    return serve(StubSheets)
+
+
+def test_sheets_are_fetched_once(base_url, tmp_path):
+    """Sheets are parsed once per registry and revalidated after the TTL"""
+    downloader = Downloader(rate_limits={}, cache_dir=tmp_path / "downloads")
+    url = f"{base_url}/spreadsheets/d/1/edit#gid=2"
+
+    def registry(ttl):
+        return ArchitectureRegistry(downloader, cache_dir=tmp_path / "sheets", ttl=ttl)
+
+    architectures = registry(ttl=3600)
+    architectures.preload([url, url, f"{base_url}/spreadsheets/d/3/edit#gid=4"])
+    architecture = architectures.get(url)
+    assert architecture.rename == {"CODMUN": "id_municipio", "VALOR": "valor"}
+    assert architecture.columns == ["ano", "id_municipio", "valor"]
+    assert architecture.dtypes["ano"] == "INT64"
+    assert sorted(StubSheets.requests) == [
+        "/spreadsheets/d/1/export?format=csv&gid=2",
+        "/spreadsheets/d/3/export?format=csv&gid=4",
+    ]
+
+    # the saved sheet is used while it is fresh
+    registry(ttl=3600).get(url)
+    assert len(StubSheets.requests) == 2
+    # and revalidated after the TTL
+    assert registry(ttl=0).get(url).columns == architecture.columns
+    assert len(StubSheets.requests) == 3
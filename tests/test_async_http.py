@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the async HTTP client of the crawlers, against a local stub server
+"""
+import asyncio
+import time
+from http.server import BaseHTTPRequestHandler
+from threading import Lock
+
+import pytest
+
+from pipelines.utils.async_http import AsyncHttpClient, TokenBucket
+
+
+class StubPages(BaseHTTPRequestHandler):
+    """Serves slow pages, failing the first request to `/flaky`"""
+
+    protocol_version = "HTTP/1.1"
+    lock = Lock()
+    in_flight = 0
+    max_in_flight = 0
+    paths = []
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Answers with the path of the request, or 503"""
+        with StubPages.lock:
+            StubPages.in_flight += 1
+            StubPages.max_in_flight = max(StubPages.max_in_flight, StubPages.in_flight)
+            failed = self.path == "/flaky" and self.path not in StubPages.paths
+            StubPages.paths.append(self.path)
+        time.sleep(0.05)
+        body = self.path.encode("utf-8")
+        self.send_response(503 if failed else 200)
+        if failed:
+            self.send_header("Retry-After", "0")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with StubPages.lock:
+            StubPages.in_flight -= 1
+
+
+@pytest.fixture(name="base_url")
+def fixture_base_url(serve):
+    """URL of a fresh stub server"""
+    StubPages.in_flight = StubPages.max_in_flight = 0
+    StubPages.paths = []
+    return serve(StubPages)
+
+
+def test_requests_are_bounded_and_retried(base_url):
+    """Concurrent requests respect the host limit and 5xx are retried"""
+
+    async def crawl():
+        async with AsyncHttpClient(
+            max_per_host=3, rate=None, backoff_factor=0.01
+        ) as client:
+            pages = await asyncio.gather(
+                *[client.get_text(f"{base_url}/{i}") for i in range(12)],
+                client.get_text(f"{base_url}/flaky"),
+            )
+            return pages, client
+
+    pages, client = asyncio.run(crawl())
+    assert pages[:12] == [f"/{i}" for i in range(12)]
+    assert pages[12] == "/flaky"
+    assert StubPages.max_in_flight == 3
+    assert (client.requests, client.retries) == (14, 1)
+
+
+def test_token_bucket_spaces_requests():
+    """Requests beyond the burst wait for tokens"""
+
+    async def acquire():
+        bucket = TokenBucket(rate=20, burst=2)
+        start = time.monotonic()
+        for _ in range(6):
+            await bucket.acquire()
+        return time.monotonic() - start
+
+    # 2 requests at once, then one every 50ms
+    assert 0.18 < asyncio.run(acquire()) < 0.5
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the br_ms_cnes download and conversion, against a local FTP server
+"""
+from threading import Thread
+
+import pandas as pd
+import pytest
+
+from pipelines.datasets.br_ms_cnes.tasks import read_dbc_save_csv
+from pipelines.datasets.br_ms_cnes.utils import (
+    download_dbc_files,
+    list_all_cnes_dbc_files,
+)
+from pipelines.utils.datasus import DatasusFTP
+from tests.test_dbc import write_dbc
+
+pytest.importorskip("pyftpdlib")
+
+FTP_DIR = "dissemin/publicos/CNES/200508_/Dados/LT"
+FIELDS = [
+    ("CNES", "C", 7, 0),
+    ("TP_LEITO", "C", 2, 0),
+    ("CODLEITO", "C", 2, 0),
+    ("QT_EXIST", "N", 4, 0),
+    ("QT_CONTR", "N", 4, 0),
+    ("QT_SUS", "N", 4, 0),
+    ("OUTRA", "C", 3, 0),
+]
+
+
+@pytest.fixture(name="ftp_server")
+def fixture_ftp_server(tmp_path):
+    """Local stand-in of the DATASUS FTP server with one LT file per UF"""
+    # pylint: disable=import-outside-toplevel
+    from pyftpdlib.authorizers import DummyAuthorizer
+    from pyftpdlib.handlers import FTPHandler
+    from pyftpdlib.servers import ThreadedFTPServer
+
+    root = tmp_path / "ftp"
+    (root / FTP_DIR).mkdir(parents=True)
+    for i, sigla_uf in enumerate(["AC", "RJ", "SP"]):
+        records = [
+            b" " + f"{i:07}".encode() + b"1 01   2   1   1abc",
+            b" " + f"{i + 10:07}".encode() + b"2 74  10       0xyz",
+        ]
+        write_dbc(root / FTP_DIR / f"LT{sigla_uf}2301.DBC", FIELDS, records)
+
+    authorizer = DummyAuthorizer()
+    authorizer.add_anonymous(str(root))
+    handler = type("Handler", (FTPHandler,), {"authorizer": authorizer})
+    server = ThreadedFTPServer(("127.0.0.1", 0), handler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.address
+    ftp = DatasusFTP(host, port, cache_dir=tmp_path / "cache")
+    yield ftp
+    ftp.close()
+    server.close_all()
+
+
+def test_download_and_convert(ftp_server, tmp_path):
+    """Files are downloaded over one session and converted to partitions"""
+    files = list_all_cnes_dbc_files("CNES", "LT", ftp=ftp_server)
+    assert files == [
+        f"{FTP_DIR}/LT{sigla_uf}2301.DBC" for sigla_uf in ["AC", "RJ", "SP"]
+    ]
+    dbc_files = download_dbc_files(files, f"{tmp_path}/input/", "leito", ftp=ftp_server)
+    assert dbc_files[1] == (
+        f"{tmp_path}/input/leito/ano=2023/mes=1/sigla_uf=RJ/LTRJ2301.DBC"
+    )
+
+    output = read_dbc_save_csv.run(
+        dbc_files, f"{tmp_path}/output/", "leito", max_workers=2
+    )
+    df = pd.read_csv(f"{output}/ano=2023/mes=1/sigla_uf=SP/leito.csv", dtype=str)
+    assert df.columns.tolist() == [
+        "CNES",
+        "TP_LEITO",
+        "CODLEITO",
+        "QT_EXIST",
+        "QT_CONTR",
+        "QT_SUS",
+    ]
+    assert df["CNES"].tolist() == ["0000002", "0000012"]
+    assert df["QT_SUS"].tolist() == ["1", "0"]
+    assert df["QT_CONTR"].isna().tolist() == [False, True]
+
+
+def test_listings_are_cached(ftp_server, tmp_path):
+    """Listings are read from the cache until they expire or are refreshed"""
+    listing = ftp_server.list(FTP_DIR, "*.dbc")
+    assert [entry["size"] for entry in listing] == [
+        (tmp_path / "ftp" / entry["path"]).stat().st_size for entry in listing
+    ]
+
+    (tmp_path / "ftp" / FTP_DIR / "LTMG2301.DBC").write_bytes(b"")
+    assert len(ftp_server.list(FTP_DIR)) == 3
+    assert len(ftp_server.list(FTP_DIR, refresh=True)) == 4
+
+    (tmp_path / "ftp" / FTP_DIR / "LTRS2301.DBC").write_bytes(b"")
+    assert len(ftp_server.list(FTP_DIR)) == 4
+    ftp_server.listing_ttl = 0
+    assert len(ftp_server.list(FTP_DIR)) == 5
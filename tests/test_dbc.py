@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the DBC reader
+"""
+from io import BytesIO
+from pathlib import Path
+
+import dclimplode
+import numpy as np
+import pandas as pd
+import pytest
+
+from pipelines.utils import dbc
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def implode(data: bytes) -> bytes:
+    """
+    Compresses `data` as DATASUS does, with binary literals and a 4 KB dictionary.
+    """
+    compressor = dclimplode.compressobj(dclimplode.CMP_BINARY, 4096)
+    return compressor.compress(data) + compressor.flush()
+
+
+def write_dbc(path, fields: list, records: list):
+    """
+    Writes a DBC file with `fields` as (name, type, length, decimals) and
+    `records` as the raw bytes of each record, deletion flag included.
+    """
+    header_length = 32 * (len(fields) + 1) + 1
+    header = bytearray(32)
+    header[0] = 3
+    header[4:8] = len(records).to_bytes(4, "little")
+    header[8:10] = header_length.to_bytes(2, "little")
+    header[10:12] = (1 + sum(field[2] for field in fields)).to_bytes(2, "little")
+    for name, kind, length, decimals in fields:
+        descriptor = bytearray(32)
+        descriptor[: len(name)] = name.encode()
+        descriptor[11] = ord(kind)
+        descriptor[16], descriptor[17] = length, decimals
+        header += descriptor
+    header += b"\r"
+    path.write_bytes(bytes(header) + bytes(4) + implode(b"".join(records)))
+
+
+def test_blast_decompress():
+    """Decodes the test vector of blast.c"""
+    data = bytes([0x00, 0x04, 0x82, 0x24, 0x25, 0x8F, 0x80, 0x7F])
+    assert dbc.blast_decompress(data) == b"AIAIAIAIAIAIA"
+
+
+def test_read_dbc(tmp_path):
+    """Records are decoded like R's read.dbc, skipping deleted ones"""
+    path = tmp_path / "STRJ2301.dbc"
+    fields = [("CNES", "C", 7, 0), ("LEITOS", "N", 4, 0), ("DATA", "D", 8, 0)]
+    # deletion flag, CNES, LEITOS and DATA
+    records = [
+        b" " + b"2077485" + b"  12" + b"20230115",
+        b"*" + b"9999999" + b"   1" + b"20230115",
+        b" " + b"0000001" + b"    " + b"20230201",
+    ]
+    write_dbc(path, fields, records)
+
+    df = dbc.read_dbc(path)
+    assert list(df.columns) == ["CNES", "LEITOS", "DATA"]
+    assert df["CNES"].tolist() == ["2077485", "0000001"]
+    assert df["LEITOS"].tolist() == [12, pd.NA]
+    assert df["DATA"].tolist() == [
+        pd.Timestamp("2023-01-15"),
+        pd.Timestamp("2023-02-01"),
+    ]
+
+
+def test_text_matches_the_r_reader(tmp_path):
+    """
+    With `as_text`, the CSV is written as R's `read.dbc` and `write.table` wrote
+    it: integers without padding, other numbers with 15 significant digits in
+    the shorter notation, ISO dates and TRUE/FALSE
+    """
+    path = tmp_path / "STRJ2301.dbc"
+    fields = [
+        ("CNES", "C", 7, 0),
+        ("LEITOS", "N", 4, 0),
+        ("VALOR", "N", 12, 2),
+        ("TOTAL", "N", 12, 0),
+        ("DATA", "D", 8, 0),
+        ("ATIVO", "L", 1, 0),
+        ("NOME", "C", 10, 0),
+    ]
+    records = [
+        b" 2077485  12   100000.00  100000000020230115TS\xe3o Paulo ",
+        b"*9999999   1        1.00           120230115TApagado   ",
+        b" 0000001            0.10         123        N          ",
+        b" 0000002-003     1234.25            20230201?Rio       ",
+    ]
+    write_dbc(path, fields, records)
+    golden = (FIXTURES / "dbc_read_dbc_r.csv").read_text(encoding="utf-8")
+
+    df = dbc.read_dbc(path, as_text=True)
+    assert df.to_csv(index=False, na_rep="") == golden
+    # the same output when decoded one record at a time
+    batches = list(dbc.iter_dbc_batches(path, batch_size=1, as_text=True))
+    assert len(batches) == 4
+    assert pd.concat(batches).to_csv(index=False, na_rep="") == golden
+
+
+def test_decompression_is_streamed():
+    """The output is yielded in chunks, identical to the whole stream"""
+    content = np.random.default_rng(0).bytes(64 * 1024)
+    data = implode(content)
+    chunks = list(dbc.iter_blast_decompress(BytesIO(data), chunk_size=1024))
+    assert len(chunks) > 1
+    assert b"".join(chunks) == dbc.blast_decompress(data) == content
+
+
+@pytest.mark.parametrize(
+    "data,message",
+    [
+        (b"", "Truncated imploded stream"),
+        (implode(bytes(range(256)) * 64)[:-3], "Truncated imploded stream"),
+        (bytes([2, 4, 0x82, 0x24]), "Invalid literal flag in imploded stream"),
+        (bytes([0, 9, 0x82, 0x24]), "Invalid dictionary size in imploded stream"),
+    ],
+)
+def test_invalid_streams_are_rejected(data, message):
+    """Truncated and invalid streams raise instead of yielding partial records"""
+    with pytest.raises(ValueError, match=message):
+        dbc.blast_decompress(data)
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the cache of the directories reference tables
+"""
+import pandas as pd
+
+from pipelines.utils.directories import DirectoryCache, normalize_nome_municipio
+
+MUNICIPIO = (
+    "id_municipio,id_municipio_bcb,nome,id_uf,sigla_uf,ddd\n"
+    "3545803,6943,Santa Bárbara d'Oeste,35,SP,19\n"
+    "1100015,0001,Alta Floresta D'Oeste,11,RO,69\n"
+).encode("utf-8")
+
+
+def test_tables_are_cached_by_version(tmp_path, bucket):
+    """Tables are read again only when their staging files change"""
+    bucket.objects["staging/diretorios/municipio/municipio.csv"] = (MUNICIPIO, 1)
+
+    def directories():
+        return DirectoryCache("diretorios", cache_dir=tmp_path / "cache", bucket=bucket)
+
+    cache = directories()
+    assert cache.lookup("municipio", "id_municipio_bcb", "id_municipio") == {
+        "6943": "3545803",
+        "0001": "1100015",
+    }
+    assert cache.lookup("municipio", "id_uf", "sigla_uf") == {"35": "SP", "11": "RO"}
+    assert cache.id_municipio_by_nome()[("santa barbara doeste", "SP")] == "3545803"
+    assert len(bucket.downloads) == 1
+
+    # a new process reads the Parquet copy
+    assert directories().table("municipio").equals(cache.table("municipio"))
+    assert len(bucket.downloads) == 1
+
+    bucket.objects["staging/diretorios/municipio/municipio.csv"] = (
+        MUNICIPIO.replace(b",19\n", b",18\n"),
+        2,
+    )
+    assert directories().lookup("municipio", "id_municipio", "ddd")["3545803"] == "18"
+    assert len(bucket.downloads) == 2
+
+
+def test_nome_municipio_normalization():
+    """Accents and punctuation are removed from names"""
+    names = pd.Series(["São João d'Aliança", " Itaú de Minas ", None])
+    assert normalize_nome_municipio(names).tolist() == [
+        "sao joao dalianca",
+        "itau de minas",
+        "none",
+    ]
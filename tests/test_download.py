@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the shared HTTP downloader, against a local stub server
+"""
+import time
+import zipfile
+from http.server import BaseHTTPRequestHandler
+
+import pandas as pd
+import pytest
+
+from pipelines.utils.download import (
+    Downloader,
+    RateLimiter,
+    download_and_unzip,
+    iter_zip_members,
+)
+
+CONTENT = bytes(range(256)) * 1024
+
+
+class StubFiles(BaseHTTPRequestHandler):
+    """Serves `CONTENT` with an ETag, honouring `Range`, `If-Range` and `If-None-Match`"""
+
+    requests = []
+    etag = '"v1"'
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Answers with the whole content, a range of it or 304"""
+        StubFiles.requests.append(dict(self.headers))
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        start = 0
+        if self.headers.get("Range") and self.headers.get("If-Range") in (
+            None,
+            StubFiles.etag,
+        ):
+            start = int(self.headers["Range"].split("=")[1].rstrip("-"))
+        self.send_response(206 if start else 200)
+        self.send_header("ETag", StubFiles.etag)
+        if start:
+            self.send_header(
+                "Content-Range", f"bytes {start}-{len(CONTENT) - 1}/{len(CONTENT)}"
+            )
+        self.send_header("Content-Length", str(len(CONTENT) - start))
+        self.end_headers()
+        self.wfile.write(CONTENT[start:])
+
+
+@pytest.fixture(name="base_url")
+def fixture_base_url(serve):
+    """URL of a fresh stub server"""
+    StubFiles.requests = []
+    StubFiles.etag = '"v1"'
+    return serve(StubFiles)
+
+
+def test_download_resumes_partial_file(base_url, tmp_path):
+    """An existing `.part` file is completed with a conditional range request"""
+    (tmp_path / "data.bin.part").write_bytes(CONTENT[:1000])
+    (tmp_path / "data.bin.part.validator").write_text('"v1"')
+    downloader = Downloader(rate_limits={})
+
+    path = downloader.download(f"{base_url}/data.bin", tmp_path)
+    assert path == tmp_path / "data.bin"
+    assert path.read_bytes() == CONTENT
+    assert StubFiles.requests[0]["Range"] == "bytes=1000-"
+    assert StubFiles.requests[0]["If-Range"] == '"v1"'
+    assert not (tmp_path / "data.bin.part").exists()
+    assert not (tmp_path / "data.bin.part.validator").exists()
+
+
+@pytest.mark.parametrize("validator", [None, '"v0"'])
+def test_download_restarts_partial_file_of_another_version(
+    base_url, tmp_path, validator
+):
+    """A `.part` file without a validator, or of an older version, is not resumed"""
+    (tmp_path / "data.bin.part").write_bytes(b"old release" * 100)
+    if validator:
+        (tmp_path / "data.bin.part.validator").write_text(validator)
+    downloader = Downloader(rate_limits={})
+
+    path = downloader.download(f"{base_url}/data.bin", tmp_path)
+    assert path.read_bytes() == CONTENT
+    assert len(StubFiles.requests) == 1
+    assert ("Range" in StubFiles.requests[0]) == bool(validator)
+
+
+def test_cached_files_are_revalidated(base_url, tmp_path):
+    """Cached files are restored when the server answers 304"""
+    downloader = Downloader(rate_limits={}, cache_dir=tmp_path / "cache")
+    urls = [(f"{base_url}/{i}.bin", tmp_path / f"{i}.bin") for i in range(3)]
+    downloader.download_many(urls, max_workers=3, use_cache=True)
+
+    (tmp_path / "0.bin").unlink()
+    downloader.download(*urls[0], use_cache=True)
+    assert StubFiles.requests[-1]["If-None-Match"] == '"v1"'
+    assert (tmp_path / "0.bin").read_bytes() == CONTENT
+    # the same content is stored once
+    assert len(list((tmp_path / "cache" / "objects").rglob("*"))) == 2
+
+
+def test_rate_limiter_spaces_requests_per_host():
+    """Requests to a limited host wait for their slot, other hosts do not"""
+    limiter = RateLimiter({"slow.example": 0.2})
+    start = time.monotonic()
+    for _ in range(3):
+        limiter.wait("https://slow.example/file")
+        limiter.wait("https://fast.example/file")
+    assert 0.4 <= time.monotonic() - start < 1
+
+
+def test_zip_members_are_streamed(tmp_path):
+    """Only members matching the pattern are read or extracted"""
+    archive = tmp_path / "data.zip"
+    with zipfile.ZipFile(archive, "w") as zip_file:
+        zip_file.writestr("dados/a.CSV", "x;y\n1;2\n")
+        zip_file.writestr("b.csv", "x;y\n3;4\n")
+        zip_file.writestr("leiame.pdf", b"%PDF")
+
+    frames = {
+        name: pd.read_csv(member, sep=";")
+        for name, member in iter_zip_members(archive, "*.csv")
+    }
+    assert sorted(frames) == ["b.csv", "dados/a.CSV"]
+    assert frames["b.csv"]["x"].tolist() == [3]
+
+    download_and_unzip(archive, tmp_path / "input", pattern="*.csv")
+    extracted = sorted(p.name for p in (tmp_path / "input").rglob("*") if p.is_file())
+    assert extracted == ["a.CSV", "b.csv"]
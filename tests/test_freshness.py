@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the BigQuery freshness probes
+"""
+import pandas as pd
+
+from pipelines.utils import utils
+
+
+def test_last_date_from_partitions(monkeypatch):
+    """Partitioned tables are probed with one query per dataset, cached per batch"""
+    queries = []
+
+    def read_sql(query, **kwargs):  # pylint: disable=unused-argument
+        queries.append(query)
+        if "INFORMATION_SCHEMA" in query:
+            return pd.DataFrame(
+                {
+                    "table_name": ["mensal_a", "mensal_b", "diaria"],
+                    "column_name": ["ano", "ano", "data"],
+                    "partition_id": ["2023", "2022", "20230615"],
+                }
+            )
+        return pd.DataFrame({"table_id": ["mensal_a", "mensal_b"], "mes": [9, 12]})
+
+    monkeypatch.setattr(utils.bd, "read_sql", read_sql)
+    with utils.freshness_batch():
+        last_dates = utils.get_tables_last_date(
+            "dataset", ["mensal_a", "mensal_b"], "yy-mm", "basedosdados-dev"
+        )
+        assert last_dates == {"mensal_a": "2023-09", "mensal_b": "2022-12"}
+        assert len(queries) == 2
+        assert "ano = 2023" in queries[1] and "ano = 2022" in queries[1]
+
+        last_dates = utils.get_tables_last_date(
+            "dataset", ["diaria"], "yy-mm-dd", "basedosdados-dev"
+        )
+        assert last_dates == {"diaria": "2023-06-15"}
+        assert len(queries) == 2
+
+    # outside the batch, probes see the tables as they are now
+    utils.get_tables_last_date("dataset", ["diaria"], "yy-mm-dd", "basedosdados-dev")
+    assert len(queries) == 3
+
+
+def test_single_table_probes_outside_a_batch(monkeypatch):
+    """Single-table probes outside a batch run one query on that table only"""
+    queries = []
+
+    def read_sql(query, **kwargs):  # pylint: disable=unused-argument
+        queries.append(query)
+        if "__TABLES__" in query:
+            return pd.DataFrame(
+                {"table_id": ["mensal"], "last_modified_time": [1686787200000]}
+            )
+        return pd.DataFrame({"max_date": ["2023-9"]})
+
+    monkeypatch.setattr(utils.bd, "read_sql", read_sql)
+    monkeypatch.setattr(utils, "log", lambda *args, **kwargs: None)
+    assert (
+        utils.extract_last_date("dataset", "mensal", "yy-mm", "basedosdados-dev")
+        == "2023-09"
+    )
+    assert len(queries) == 1
+    assert "INFORMATION_SCHEMA" not in queries[0]
+    assert "`basedosdados-dev.dataset.mensal`" in queries[0]
+
+    assert (
+        utils.extract_last_update("dataset", "mensal", "yy", "basedosdados-dev")
+        == "2023"
+    )
+    assert len(queries) == 2
+    assert "WHERE table_id = 'mensal'" in queries[1]
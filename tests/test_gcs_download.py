@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the parallel download of blobs
+"""
+from pipelines.utils.utils import download_blobs_from_gcs
+
+
+def test_blobs_are_cached_by_generation(tmp_path, bucket):
+    """Blobs are downloaded again only when their generation changes"""
+    bucket.objects.update(
+        {
+            "raw/ds/tb/ano=2018/tb.csv": (b"a,b\n1,2\n", 1),
+            "raw/ds/tb/ano=2020/tb.csv": (b"a,b\n3,4\n", 1),
+            "raw/ds/tb/ano=2022/tb.csv": (b"a,b\n5,6\n", 1),
+            "raw/ds/outra/ano=2022/tb.csv": (b"", 1),
+        }
+    )
+    kwargs = {
+        "blob_filter": lambda blob: "2018" not in blob.name,
+        "cache_dir": tmp_path / "cache",
+        "max_workers": 2,
+    }
+
+    files = download_blobs_from_gcs(bucket, "raw/ds/tb", tmp_path / "data", **kwargs)
+    assert sorted(files) == ["raw/ds/tb/ano=2020/tb.csv", "raw/ds/tb/ano=2022/tb.csv"]
+    assert files["raw/ds/tb/ano=2020/tb.csv"] == (
+        tmp_path / "data/raw/ds/tb/ano=2020/tb.csv"
+    )
+    assert files["raw/ds/tb/ano=2020/tb.csv"].read_bytes() == b"a,b\n3,4\n"
+    assert len(bucket.downloads) == 2
+
+    bucket.objects["raw/ds/tb/ano=2022/tb.csv"] = (b"a,b\n7,8\n", 2)
+    files = download_blobs_from_gcs(bucket, "raw/ds/tb", **kwargs)
+    assert bucket.downloads[2:] == ["raw/ds/tb/ano=2022/tb.csv"]
+    assert files["raw/ds/tb/ano=2022/tb.csv"].read_bytes() == b"a,b\n7,8\n"
+    # only the last generation is kept
+    cached = tmp_path / "cache/bucket/raw/ds/tb/ano=2022"
+    assert [path.name for path in cached.iterdir()] == ["tb.csv#2"]
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the GraphQL client of the metadata API, against a local stub server
+"""
+import base64
+import json
+import time
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+import requests
+
+from pipelines.utils.utils import (
+    BDGraphQLClient,
+    MetadataAPIError,
+    MetadataIDCache,
+    get_redis_client,
+    query_aliased,
+)
+
+
+def make_token(expires_in: float) -> str:
+    """Unsigned JWT expiring in `expires_in` seconds"""
+    payload = json.dumps({"exp": time.time() + expires_in}).encode()
+    return "header." + base64.urlsafe_b64encode(payload).decode().rstrip("=") + ".sig"
+
+
+class StubAPI(BaseHTTPRequestHandler):
+    """Answers `tokenAuth` and echoes queries, failing on demand"""
+
+    # status codes returned, in order, before answering normally
+    failures = []
+    token_lifetime = 3600
+    logins = 0
+    queries = []
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Handles a GraphQL request"""
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if "tokenAuth" in body["query"]:
+            StubAPI.logins += 1
+            StubAPI.token = make_token(StubAPI.token_lifetime)
+            return self.reply(200, {"data": {"tokenAuth": {"token": StubAPI.token}}})
+        if StubAPI.failures:
+            return self.reply(StubAPI.failures.pop(0), {})
+        if self.headers.get("Authorization") != f"Bearer {StubAPI.token}":
+            return self.reply(401, {})
+        StubAPI.queries.append(body)
+        return self.reply(200, {"data": {"echo": body["variables"]}})
+
+    def reply(self, status, content):
+        """Sends a JSON response"""
+        payload = json.dumps(content).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+@pytest.fixture(name="client")
+def fixture_client(serve):
+    """Client pointing to a fresh stub server"""
+    StubAPI.failures, StubAPI.logins, StubAPI.queries = [], 0, []
+    StubAPI.token_lifetime = 3600
+    url = f"{serve(StubAPI)}/api/v1/graphql"
+    with BDGraphQLClient("email", "password", url=url, backoff_factor=0) as client:
+        yield client
+
+
+def test_token_is_reused(client):
+    """Many calls share a single login"""
+    for i in range(5):
+        assert client.execute("query", {"i": i}) == {"data": {"echo": {"i": i}}}
+    assert StubAPI.logins == 1
+    assert len(client.latencies["graphql"]) == 5
+
+
+def test_token_is_refreshed_before_expiring(client):
+    """Tokens inside the refresh margin are renewed"""
+    StubAPI.token_lifetime = 30
+    client.execute("query")
+    client.execute("query")
+    assert StubAPI.logins == 2
+
+
+def test_retries_and_reauthenticates(client):
+    """Retryable status codes are retried, 401 logs in again"""
+    client.execute("query")
+    StubAPI.failures = [503, 401]
+    assert client.execute("query", {"a": 1}) == {"data": {"echo": {"a": 1}}}
+    assert StubAPI.logins == 2
+    assert len(StubAPI.queries) == 2
+
+    StubAPI.failures = [503] * (client.max_retries + 1)
+    with pytest.raises(requests.HTTPError):
+        client.execute("query")
+
+
+class EchoClient:
+    """Client answering each aliased lookup with its own argument"""
+
+    def __init__(self):
+        self.queries = []
+
+    def execute(self, query, variables, operation):  # pylint: disable=unused-argument
+        """Returns one node per alias, with the variable as ID"""
+        self.queries.append(query)
+        return {
+            "data": {
+                f"q{name[len('table_Id'):]}": {"edges": [{"node": {"id": value}}]}
+                for name, value in variables.items()
+            }
+        }
+
+
+def test_query_aliased_batches_lookups():
+    """Lookups are sent `batch_size` at a time and answered in order"""
+    client = EchoClient()
+    filters = [{"table_Id": str(i)} for i in range(5)]
+    nodes = query_aliased(
+        client, "allCoverage", filters, {"table_Id": "ID"}, "id", batch_size=2
+    )
+    assert nodes == [[{"id": str(i)}] for i in range(5)]
+    assert len(client.queries) == 3
+    assert "q1: allCoverage(table_Id: $table_Id1)" in client.queries[0]
+
+    client.execute = lambda *args, **kwargs: {"errors": [{"message": "Bad query"}]}
+    with pytest.raises(MetadataAPIError, match="allCoverage batch"):
+        query_aliased(client, "allCoverage", filters, {"table_Id": "ID"}, "id")
+
+
+def test_id_cache_falls_back_to_disk(tmp_path):
+    """Without Redis, IDs are cached on disk until they expire or are invalidated"""
+    cache = MetadataIDCache(
+        path=tmp_path / "ids.json",
+        redis_client=get_redis_client(host="127.0.0.1", port=1),
+    )
+    assert cache.get("dataset", "table") is None
+    cache.set("dataset", "table", {"table_id": "1", "coverage_id": "2"})
+    assert cache.get("dataset", "table") == {"table_id": "1", "coverage_id": "2"}
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    cache.invalidate("dataset", "table")
+    assert cache.get("dataset", "table") is None
+
+    cache.ttl = -1
+    cache.set("dataset", "table", {"table_id": "1", "coverage_id": "2"})
+    assert cache.get("dataset", "table") is None
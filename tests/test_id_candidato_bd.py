@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the incremental resolution of id_candidato_bd
+"""
+import numpy as np
+import pandas as pd
+
+from pipelines.datasets.br_tse_eleicoes import utils as tse_utils
+from pipelines.datasets.br_tse_eleicoes.utils import (
+    CandidateIdentities,
+    get_id_candidato_bd,
+    update_candidate_identities,
+)
+
+
+def candidatos(rows):
+    """DataFrame of (cpf, titulo_eleitoral, nome) rows"""
+    return pd.DataFrame(rows, columns=["cpf", "titulo_eleitoral", "nome"])
+
+
+def test_records_are_linked_by_cpf_or_titulo():
+    """Shared keys are one candidate, conflicting ones are split by last name"""
+    df = candidatos(
+        [
+            ("111", "9", "José Silva"),
+            ("111", np.nan, "JOSE SILVA"),
+            (np.nan, "9", "Jose Silva"),
+            ("222", "8", "Ana Souza"),
+            # two cpfs for one titulo, with the same first name
+            ("333", "7", "Carlos Lima"),
+            ("444", "7", "Carlos Souza"),
+            # two cpfs for one titulo, with different first names
+            ("555", "6", "Maria Costa"),
+            ("666", "6", "Joana Costa"),
+            (np.nan, np.nan, "Sem Documentos"),
+            ("00000000000", np.nan, "Zeros"),
+        ]
+    )
+    ids = get_id_candidato_bd(df)["id_candidato_bd"]
+
+    assert ids.iloc[0] == ids.iloc[1] == ids.iloc[2]
+    assert ids.iloc[:6].nunique() == 4
+    assert ids.iloc[6:].isna().all()
+
+
+def test_new_elections_are_matched_against_the_mapping(tmp_path):
+    """Ids of saved keys are kept and new records join their components"""
+    identities = CandidateIdentities()
+    first = identities.resolve(
+        candidatos([("111", "9", "José Silva"), ("222", "8", "Ana Souza")])
+    )
+    identities.save(tmp_path / "mapeamento.csv")
+
+    identities = CandidateIdentities.load(tmp_path / "mapeamento.csv")
+    second = identities.resolve(
+        candidatos(
+            [
+                ("333", "9", "José Silva"),
+                ("222", "8", "Ana Souza"),
+                ("777", "5", "Pedro Alves"),
+            ]
+        )
+    )
+    assert second.iloc[:2].tolist() == first.tolist()
+    assert second.iloc[2] == 3
+    assert len(identities.mapping) == 4
+    # resolving the same election again adds nothing
+    identities.resolve(candidatos([("333", "9", "José Silva")]))
+    assert len(identities.mapping) == 4
+    assert CandidateIdentities.load(tmp_path / "missing.csv").mapping.empty
+
+
+def test_concurrent_updates_keep_every_id(tmp_path, monkeypatch, bucket):
+    """A run that loses the race resolves its records again on the new mapping"""
+    monkeypatch.setattr(tse_utils, "get_dev_bucket", lambda *args: bucket)
+    blob_name = "raw/br_tse_eleicoes/id_candidato_bd/mapeamento.csv"
+    runs = []
+
+    def update(identities):
+        runs.append(identities.resolve(candidatos([("111", "9", "José Silva")])))
+        if len(runs) == 1:
+            # another run publishes its ids while this one is building
+            update_candidate_identities(
+                lambda other: other.resolve(candidatos([("222", "8", "Ana Souza")])),
+                blob_name,
+                tmp_path / "other.csv",
+            )
+
+    identities = update_candidate_identities(update, blob_name, tmp_path / "map.csv")
+    assert len(runs) == 2
+    assert len(identities.mapping) == 2
+    published = CandidateIdentities.load(tmp_path / "map.csv").mapping
+    assert sorted(published["cpf"]) == ["00000000111", "00000000222"]
+    assert bucket.objects[blob_name][1] == 2
+
+    # dev runs resolve ids without publishing them
+    update_candidate_identities(
+        lambda other: other.resolve(candidatos([("333", "7", "Pedro Alves")])),
+        blob_name,
+        tmp_path / "dev.csv",
+        publish=False,
+    )
+    assert bucket.objects[blob_name][1] == 2
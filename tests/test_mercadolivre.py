@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the Mercado Livre item scraper
+"""
+import asyncio
+
+from pipelines.datasets.br_mercadolivre_ofertas.constants import (
+    constants as const_mercadolivre,
+)
+from pipelines.datasets.br_mercadolivre_ofertas.utils import (
+    FuzzyIndex,
+    PageCache,
+    get_id,
+    get_seller_async,
+    process_item_url,
+)
+
+ITEM = """
+<html><body>
+<h1 class="ui-pdp-title">Fone de Ouvido</h1>
+<span class="ui-pdp-review__amount">(120)</span>
+<meta itemprop="price" content="99.9">
+<s class="andes-money-amount--previous">
+  <span class="andes-visually-hidden">149 reais con 90 centavos</span>
+</s>
+<div class="ui-box-component ui-box-component-pdp__visible--desktop">
+  <a href="https://www.mercadolivre.com.br/perfil/LOJA+EXEMPLO?x=1">Loja</a>
+</div>
+<a class="andes-breadcrumb__link">Eletrônicos</a>
+<a class="andes-breadcrumb__link">Fones</a>
+</body></html>
+"""
+
+SELLER = """
+<html><body>
+<p class="experience">10 anos vendendo</p>
+<p class="seller-info__subtitle-sales">+1000 vendas</p>
+<p class="message__title">MercadoLíder Platinum</p>
+<p class="location__wrapper">São Paulo</p>
+<span class="buyers-feedback-qualification">Boa (95)</span>
+</body></html>
+"""
+
+
+class FakePages(PageCache):
+    """Serves recorded pages, in order, instead of requesting them"""
+
+    def __init__(self, responses):
+        super().__init__()
+        self.responses = list(responses)
+
+    async def _fetch(self, url):
+        self.requests += 1
+        return self.responses.pop(0)
+
+
+def test_item_page_is_fetched_once():
+    """Every field comes from a single fetch of a complete page"""
+    pages = FakePages([ITEM])
+    kwargs_list = const_mercadolivre.KWARGS_LIST.value
+
+    async def crawl():
+        return await asyncio.gather(
+            process_item_url("https://item", kwargs_list, pages=pages),
+            process_item_url("https://item", kwargs_list, pages=pages),
+        )
+
+    info, again = asyncio.run(crawl())
+    assert pages.requests == 1
+    assert info["title"] == again["title"] == "Fone de Ouvido"
+    assert info["price"] == "99.9"
+    assert info["price_original"] == 149.90
+    assert info["seller"] == "Loja Exemplo"
+    assert info["categories"] == ["Eletrônicos", "Fones"]
+    assert info["discount"] is None
+
+
+def test_item_page_is_fetched_again_while_fields_are_missing():
+    """Incomplete pages are requested again"""
+    pages = FakePages([None, "<html></html>", ITEM])
+    info = asyncio.run(
+        process_item_url(
+            "https://item",
+            const_mercadolivre.KWARGS_LIST.value,
+            pages=pages,
+            wait_time=0,
+        )
+    )
+    assert pages.requests == 3
+    assert info["title"] == "Fone de Ouvido"
+
+
+def test_seller_page_is_fetched_again_while_fields_are_missing():
+    """A blocked or partial seller page is requested again"""
+    partial_page = '<html><p class="experience">10 anos vendendo</p></html>'
+    pages = FakePages([partial_page, SELLER])
+    info = asyncio.run(
+        get_seller_async("https://perfil/LOJA+EXEMPLO", 1, pages=pages, wait_time=0)
+    )
+    assert pages.requests == 2
+    assert info["experience"] == "10 anos vendendo"
+    assert info["location"] == "São Paulo"
+    assert info["opinions"] == [{"Boa": 95}]
+
+
+def test_fuzzy_index_matches_the_closest_key():
+    """The index returns the id of the closest key, the first one on ties"""
+    dictionary = {
+        "Juiz de Fora, Minas Gerais": 3136702,
+        "Santa Rita, Paraíba": 2513703,
+        "Santa Rita, Maranhão": 2110302,
+        "Santa RITA, Paraíba": 0,
+        "Rio Branco, Acre": 1200401,
+    }
+    index = FuzzyIndex(dictionary)
+    assert get_id("Juiz de Fora, Minas Gerais.", index) == 3136702
+    assert get_id("santa rita, paraíba", index) == 2513703
+    assert get_id("Santa Rita", index) == 2513703
+    assert get_id("Rio Brnco, Acre", index) == 1200401
+    assert get_id("Rio Brnco, Acre", dictionary) == 1200401
+    assert get_id(None, index) is None
+    assert get_id("Rio Branco", {}) is None
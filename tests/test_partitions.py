@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the hive partition writers
+"""
+import numpy as np
+import pandas as pd
+
+from pipelines.utils.utils import PartitionSink, split_partitions, to_partitions
+
+
+# pylint: disable=invalid-name
+
+
+def sample_dataframe():
+    """Dataframe from the `to_partitions` docstring"""
+    return pd.DataFrame(
+        {
+            "ano": [2020, 2021, 2020, 2021, 2020, 2021, 2021, 2025],
+            "mes": [1, 2, 3, 4, 5, 6, 6, 9],
+            "sigla_uf": ["SP", "SP", "RJ", "RJ", "PR", "PR", "PR", "PR"],
+            "dado": ["a", "b", "c", "d", "e", "f", "g", "h"],
+        }
+    )
+
+
+def test_split_partitions_keeps_order():
+    """Partitions follow first appearance and rows keep their order"""
+    df = pd.DataFrame({"ano": [2021, 2020, 2021, 2020], "dado": [1, 2, 3, 4]})
+    partitions = split_partitions(df, ["ano"])
+    assert [values for values, _ in partitions] == [{"ano": 2021}, {"ano": 2020}]
+    assert [rows.tolist() for _, rows in partitions] == [[0, 2], [1, 3]]
+
+
+def test_split_partitions_empty():
+    """An empty dataframe has no partitions"""
+    assert split_partitions(sample_dataframe().iloc[:0], ["ano"]) == []
+
+
+def test_to_partitions(tmp_path):
+    """Writes one csv per partition, appending on later calls"""
+    df = sample_dataframe()
+    to_partitions(df, ["ano", "mes", "sigla_uf"], tmp_path)
+    to_partitions(df, ["ano", "mes", "sigla_uf"], tmp_path, max_workers=4)
+
+    files = sorted(tmp_path.rglob("data.csv"))
+    assert len(files) == 7
+    partition = tmp_path / "ano=2021" / "mes=6" / "sigla_uf=PR" / "data.csv"
+    assert partition.read_text(encoding="utf-8") == "dado\nf\ng\nf\ng\n"
+
+
+def test_to_partitions_missing_values(tmp_path):
+    """Missing partition values keep their own partition"""
+    df = pd.DataFrame({"ano": [2020, np.nan, 2020], "dado": ["a", "b", None]})
+    to_partitions(df, ["ano"], tmp_path)
+    assert (tmp_path / "ano=nan" / "data.csv").read_text(encoding="utf-8") == (
+        "dado\nb\n"
+    )
+    assert (tmp_path / "ano=2020.0" / "data.csv").read_text(encoding="utf-8") == (
+        'dado\na\n""\n'
+    )
+
+
+def test_partition_sink_chunks(tmp_path):
+    """Chunks written to a sink match a single to_partitions call"""
+    df = sample_dataframe()
+    to_partitions(df, ["ano", "sigla_uf"], tmp_path / "reference")
+
+    with PartitionSink(
+        tmp_path / "sink", ["ano", "sigla_uf"], max_open_files=2, buffer_rows=3
+    ) as sink:
+        for start in range(0, len(df), 3):
+            sink.write(df.iloc[start : start + 3])
+
+    assert sink.rows_written == len(df)
+    for reference in (tmp_path / "reference").rglob("data.csv"):
+        written = tmp_path / "sink" / reference.relative_to(tmp_path / "reference")
+        assert written.read_bytes() == reference.read_bytes()
+
+
+def test_partition_sink_formats(tmp_path):
+    """Gzip csv and parquet partitions hold every row"""
+    df = sample_dataframe()
+    for file_format in ["csv.gz", "parquet"]:
+        with PartitionSink(
+            tmp_path / file_format, ["ano"], file_format=file_format, max_open_files=1
+        ) as sink:
+            sink.write(df.iloc[:4])
+            sink.flush()
+            sink.write(df.iloc[4:])
+
+        files = sorted((tmp_path / file_format).rglob(f"data*.{file_format}"))
+        if file_format == "parquet":
+            written = pd.concat([pd.read_parquet(file) for file in files])
+        else:
+            written = pd.concat([pd.read_csv(file) for file in files])
+        assert len(written) == len(df)
+        assert list(written.columns) == ["mes", "sigla_uf", "dado"]
+
+
+def test_partition_sink_replace(tmp_path):
+    """Replace mode overwrites partitions from earlier runs"""
+    df = sample_dataframe()
+    for _ in range(2):
+        with PartitionSink(tmp_path, ["ano"], if_exists="replace") as sink:
+            sink.write(df)
+    assert (tmp_path / "ano=2025" / "data.csv").read_text(encoding="utf-8") == (
+        "mes,sigla_uf,dado\n9,PR,h\n"
+    )
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the br_ibge_pnadc fixed width reader
+"""
+import pandas as pd
+
+from pipelines.datasets.br_ibge_pnadc.utils import iter_fixed_width
+
+WIDTHS = [4, 1, 2, 3, 5]
+NAMES = ["Ano", "Trimestre", "UF", "V1", "V2"]
+
+
+def test_iter_fixed_width_matches_read_fwf(tmp_path):
+    """Chunks have the values read_fwf reads, whatever the line breaks"""
+    lines = [b"2023133 12ab  c", b"2023135   ", b"", b"2023141001  7  "]
+    for name, content in [
+        ("lf.txt", b"\n".join(lines) + b"\n"),
+        ("crlf.txt", b"\r\n".join(lines)),
+        ("regular.txt", b"".join(line.ljust(15) + b"\n" for line in lines if line)),
+    ]:
+        path = tmp_path / name
+        path.write_bytes(content)
+        chunks = list(iter_fixed_width(path, WIDTHS, NAMES, chunksize=2))
+        expected = pd.read_fwf(path, widths=WIDTHS, names=NAMES, dtype=str)
+
+        assert [len(chunk) for chunk in chunks] == [2, 1]
+        pd.testing.assert_frame_equal(
+            pd.concat(chunks, ignore_index=True), expected, check_dtype=False
+        )
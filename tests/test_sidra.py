@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the SIDRA client of the IBGE inflation crawler, against a local stub
+server
+"""
+import hashlib
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+from pipelines.utils.crawler_ibge_inflacao.utils import SidraClient
+
+TABLE = (
+    "Tabela 7060 - IPCA\n\n"
+    '"Mês";"Categoria";"IPCA - Variação mensal (%)"\n'
+    + '"janeiro 2020";"1.Alimentação";"0,39"\n'
+    + "Fonte: IBGE\n" * 14
+).encode("utf-8")
+
+
+class StubSidra(BaseHTTPRequestHandler):
+    """Serves `TABLE`, answering the first request to `/flaky` with HTML"""
+
+    requests = []
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Answers with the table, an error page or 404"""
+        first = self.path not in StubSidra.requests
+        StubSidra.requests.append(self.path)
+        body = TABLE
+        if self.path == "/html" or (self.path == "/flaky" and first):
+            body = b"<html>Erro</html>"
+        self.send_response(404 if self.path == "/missing" else 200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture(name="base_url")
+def fixture_base_url(serve):
+    """URL of a fresh stub server"""
+    StubSidra.requests = []
+    return serve(StubSidra)
+
+
+def test_tables_are_verified_and_retried(base_url, tmp_path):
+    """Invalid tables are downloaded again and left out if they stay invalid"""
+    client = SidraClient(requests_per_second=100, max_retries=1, backoff_factor=0)
+    links = {name: f"{base_url}/{name}" for name in ["ok", "flaky", "html", "missing"]}
+    hashes = client.download_many(links, tmp_path)
+
+    assert hashes == dict.fromkeys(["ok", "flaky"], hashlib.sha256(TABLE).hexdigest())
+    assert (tmp_path / "flaky.csv").read_bytes() == TABLE
+    assert StubSidra.requests.count("/flaky") == 2
+    assert StubSidra.requests.count("/html") == 2
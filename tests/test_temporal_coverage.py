@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the batch update of temporal coverages
+"""
+import pandas as pd
+import pytest
+
+from pipelines.utils import tasks, utils
+
+# end of the current datetime range of each coverage
+DATETIME_RANGES = {
+    "coverage_diaria": {"endYear": 2023, "endMonth": 6, "endDay": 15},
+    "coverage_mensal": {"endYear": 2023, "endMonth": 6, "endDay": None},
+    "coverage_anual": {"endYear": 2022, "endMonth": None, "endDay": None},
+}
+
+
+class DatetimeRangeClient:
+    """Client answering `allDatetimerange` lookups from `DATETIME_RANGES`"""
+
+    def execute(self, query, variables, operation):  # pylint: disable=unused-argument
+        """Returns the datetime range of each coverage, if it has one"""
+        return {
+            "data": {
+                f"q{name[len('coverage_Id'):]}": {
+                    "edges": [{"node": DATETIME_RANGES[value]}]
+                    if value in DATETIME_RANGES
+                    else []
+                }
+                for name, value in variables.items()
+            }
+        }
+
+
+def test_batch_keeps_the_granularity_of_each_coverage(monkeypatch):
+    """Monthly and annual tables are not updated with day-level dates"""
+    tables = ["diaria", "mensal", "anual", "sem_cobertura"]
+    monkeypatch.setattr(
+        tasks, "get_credentials_utils", lambda secret_path: ("email", "password")
+    )
+    monkeypatch.setattr(
+        utils, "get_graphql_client", lambda *args: DatetimeRangeClient()
+    )
+    monkeypatch.setattr(
+        utils,
+        "get_ids_batch",
+        lambda tables, *args: {
+            table: {"coverage_id": f"coverage_{table[1]}"} for table in tables
+        },
+    )
+
+    def read_sql(query, **kwargs):  # pylint: disable=unused-argument
+        if "INFORMATION_SCHEMA" in query:
+            return pd.DataFrame(
+                {
+                    "table_name": ["diaria", "mensal", "anual"],
+                    "column_name": ["data", "ano", "ano"],
+                    "partition_id": ["20231020", "2023", "2023"],
+                }
+            )
+        return pd.DataFrame({"table_id": ["mensal"], "mes": [9]})
+
+    monkeypatch.setattr(utils.bd, "read_sql", read_sql)
+    updated = {}
+    monkeypatch.setattr(
+        tasks,
+        "update_temporal_coverages",
+        lambda coverages, *args, **kwargs: updated.update(coverages),
+    )
+
+    tasks.update_django_metadata_batch.run(
+        tables=[{"dataset_id": "dataset", "table_id": table} for table in tables],
+        date_format=None,
+        bq_table_last_year_month=True,
+        billing_project_id="basedosdados",
+    )
+    assert updated == {
+        ("dataset", "diaria"): "2023-10-20",
+        ("dataset", "mensal"): "2023-09",
+        ("dataset", "anual"): "2023",
+    }
+
+
+@pytest.mark.parametrize("missing_id", [True, False])
+def test_stale_ids_are_invalidated_in_the_api_mode(monkeypatch, missing_id):
+    """IDs are cached per API mode and dropped only when the API misses them"""
+    invalidated = []
+
+    class Cache:
+        """Records the invalidated tables of each API mode"""
+
+        def __init__(self, api_mode):
+            self.api_mode = api_mode
+
+        def invalidate(self, dataset_id, table_id):
+            """Records the table"""
+            invalidated.append((self.api_mode, dataset_id, table_id))
+
+    def get_ids(dataset_id, table_id, email, password, api_mode="prod"):
+        # pylint: disable=unused-argument
+        assert api_mode == "staging"
+        return {"table_id": "table", "coverage_id": "coverage"}
+
+    def create_update(**kwargs):  # pylint: disable=unused-argument
+        raise utils.MetadataAPIError("create: Error", missing_id=missing_id)
+
+    monkeypatch.setattr(
+        tasks, "get_credentials_utils", lambda secret_path: ("email", "password")
+    )
+    monkeypatch.setattr(tasks, "get_ids", get_ids)
+    monkeypatch.setattr(tasks, "get_metadata_id_cache", Cache)
+    monkeypatch.setattr(tasks, "create_update", create_update)
+
+    with pytest.raises(utils.MetadataAPIError):
+        tasks.update_django_metadata.run(
+            dataset_id="dataset",
+            table_id="table",
+            metadata_type="DateTimeRange",
+            _last_date="2023-06",
+            bq_last_update=False,
+            api_mode="staging",
+        )
+    assert invalidated == ([("staging", "dataset", "table")] if missing_id else [])
+
+
+def test_missing_ids_in_mutation_responses():
+    """Only errors about a referenced object make the cached IDs stale"""
+    mutation_class = "CreateUpdateDateTimeRange"
+    assert utils.reports_missing_id(
+        {
+            "errors": [{"message": "DateTimeRange matching query does not exist."}],
+            "data": {mutation_class: None},
+        },
+        mutation_class,
+    )
+    assert utils.reports_missing_id(
+        {
+            "data": {
+                mutation_class: {
+                    "errors": [{"field": "coverage", "messages": ["Select a valid"]}]
+                }
+            }
+        },
+        mutation_class,
+    )
+    assert not utils.reports_missing_id(
+        {
+            "data": {
+                mutation_class: {
+                    "errors": [{"field": "start_year", "messages": ["Invalid"]}]
+                }
+            }
+        },
+        mutation_class,
+    )
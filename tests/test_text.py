@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the vectorized text normalization
+"""
+import numpy as np
+import pandas as pd
+from unidecode import unidecode
+
+from pipelines.datasets.br_tse_eleicoes.utils import clean_digit_id
+from pipelines.utils.text import digit_id, lower_ascii, normalize_text, title_ascii
+
+
+def test_normalization_matches_elementwise_functions():
+    """Results are the ones of the list comprehensions they replace"""
+    values = ["ELEIÇÃO ORDINÁRIA", "d'ávila são-joão", np.nan, "ELEIÇÃO ORDINÁRIA", 7]
+    # characters outside of the translation table fall back to unidecode
+    values += ["MCDONALD’S “ÇA”", "ǅEMAL"]
+    series = pd.Series(values, index=[3, 3, 1, 0, 2, 5, 6])
+
+    assert lower_ascii(series).to_list()[:2] == [
+        "eleicao ordinaria",
+        "d'avila sao-joao",
+    ]
+    for result, function in [
+        (lower_ascii(series), lambda k: unidecode(k.lower())),
+        (title_ascii(series), lambda k: unidecode(k.title())),
+        (normalize_text(series, strip_accents=False), lambda k: k),
+    ]:
+        expected = [function(k) if isinstance(k, str) else k for k in values]
+        assert result.index.equals(series.index)
+        assert result.iloc[2] is np.nan
+        assert result.drop(index=1).to_list() == [
+            k for i, k in enumerate(expected) if i != 2
+        ]
+
+
+def test_digit_id_matches_clean_digit_id():
+    """IDs are formatted like clean_digit_id, missing values are kept"""
+    values = [12345678901, 123.0, "98765.0", "-1", np.nan]
+    result = digit_id(pd.Series(values), n_digits=11)
+    assert result.to_list()[:4] == [clean_digit_id(k, n_digits=11) for k in values[:4]]
+    assert result.to_list()[1] == "00000000123"
+    assert np.isnan(result.iloc[4])
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the cache of the Transfermarkt match pages
+"""
+import asyncio
+
+from pipelines.datasets.mundo_transfermarkt_competicoes.utils import (
+    MatchPageCache,
+    get_contents,
+)
+
+
+class FakeClient:
+    """Serves pages by URL, recording the requests"""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.urls = []
+
+    async def get_text(self, url):
+        """Returns the page at `url`"""
+        self.urls.append(url)
+        return self.pages.get(url)
+
+
+def test_match_pages_are_fetched_when_new_or_changed(tmp_path):
+    """Pages are fetched again only when the result of the match changes"""
+    client = FakeClient(
+        {
+            "/jogo/1": '<div id="main">2:1</div>',
+            "/jogo/2": '<div id="main">-:-</div>',
+            "/jogo/3": "<html>Too many requests</html>",
+        }
+    )
+
+    def crawl(versions):
+        cache = MatchPageCache(tmp_path)
+        contents = asyncio.run(get_contents(client, cache, versions))
+        cache.save()
+        return [content.get_text() if content else None for content in contents]
+
+    pages = [("/jogo/1", "2:1"), ("/jogo/2", "-:-"), ("/jogo/3", "-:-")]
+    assert crawl(pages) == ["2:1", "-:-", None]
+    # pages without `div#main` are tried twice and not cached
+    assert client.urls == ["/jogo/1", "/jogo/2", "/jogo/3", "/jogo/3"]
+
+    client.urls = []
+    client.pages["/jogo/2"] = '<div id="main">0:0</div>'
+    pages[1] = ("/jogo/2", "0:0")
+    assert crawl(pages) == ["2:1", "0:0", None]
+    assert client.urls == ["/jogo/2", "/jogo/3", "/jogo/3"]
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the parallel staging upload
+"""
+import pytest
+
+from pipelines.utils.utils import (
+    dump_header_to_csv,
+    upload_files_to_gcs,
+)
+
+
+def write_partitions(path, anos):
+    """Writes one `data.csv` per `ano` partition"""
+    for ano in anos:
+        folder = path / f"ano={ano}"
+        folder.mkdir(parents=True, exist_ok=True)
+        (folder / "data.csv").write_text(f"dado\n{ano}\n")
+
+
+def test_upload_keeps_partitions_and_skips_unchanged(tmp_path, bucket):
+    """Files are uploaded once, unchanged files are skipped in the next run"""
+    write_partitions(tmp_path, [2020, 2021])
+    (tmp_path / "ignored.txt").write_text("x")
+
+    stats = upload_files_to_gcs(tmp_path, bucket, "staging/ds/tb", max_workers=2)
+    assert stats["uploaded"] == 2
+    assert sorted(bucket.uploads) == [
+        "staging/ds/tb/ano=2020/data.csv",
+        "staging/ds/tb/ano=2021/data.csv",
+    ]
+
+    (tmp_path / "ano=2021" / "data.csv").write_text("dado\n2022\n")
+    write_partitions(tmp_path, [2023])
+    stats = upload_files_to_gcs(tmp_path, bucket, "staging/ds/tb", max_workers=2)
+    assert (stats["uploaded"], stats["skipped"]) == (2, 1)
+    assert stats["partitions"] == {
+        "new": ["ano=2023"],
+        "changed": ["ano=2021"],
+        "unchanged": ["ano=2020"],
+    }
+
+
+def test_upload_without_skipping_does_not_checksum(tmp_path, monkeypatch, bucket):
+    """With `skip_unchanged=False` every file is uploaded without being hashed"""
+    write_partitions(tmp_path, [2020])
+    upload_files_to_gcs(tmp_path, bucket, "staging/ds/tb")
+
+    def fail(_):
+        raise AssertionError("checksummed a file that is uploaded anyway")
+
+    monkeypatch.setattr("pipelines.utils.utils.blob_matches_file", fail)
+    stats = upload_files_to_gcs(tmp_path, bucket, "staging/ds/tb", skip_unchanged=False)
+    assert (stats["uploaded"], stats["skipped"]) == (1, 0)
+    assert stats["partitions"]["changed"] == ["ano=2020"]
+
+
+def test_upload_deletes_stale_blobs(tmp_path, bucket):
+    """With `delete_stale` the prefix mirrors the local files"""
+    write_partitions(tmp_path / "old", [2020, 2021])
+    upload_files_to_gcs(tmp_path / "old", bucket, "staging/ds/tb")
+    write_partitions(tmp_path / "new", [2021])
+
+    stats = upload_files_to_gcs(
+        tmp_path / "new", bucket, "staging/ds/tb", delete_stale=True
+    )
+    assert (stats["uploaded"], stats["deleted"]) == (0, 1)
+    assert list(bucket.objects) == ["staging/ds/tb/ano=2021/data.csv"]
+
+
+def test_invalid_file_format_is_rejected(tmp_path):
+    """A typo in the file format fails instead of falling back to CSV"""
+    (tmp_path / "data.csv").write_text("a\n1\n")
+    with pytest.raises(ValueError, match="Invalid file format"):
+        dump_header_to_csv(tmp_path, file_format="parquett")